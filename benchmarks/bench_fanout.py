@@ -0,0 +1,56 @@
+"""Fan-out command execution against a simulated fleet.
+
+Runs a command on 1,000 simulated hosts (each with a handshake and a
+command latency) for several worker counts, and reports the wall time,
+the sum of per-host times (what running them one after another would
+cost) and the peak number of threads, which includes one timer thread
+per running command in the simulated fleet.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_fanout [--hosts 1000] [--workers 8 32 128]
+"""
+
+import argparse
+import threading
+import time
+from typing import List, Optional
+
+from src.core.connection_pool import ConnectionPool
+from src.core.fanout import OK, FanOutExecutor
+from src.core.host_manager import SSHHost
+from tests.fake_fleet import FakeFleet
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hosts", type=int, default=1000, help="Number of simulated hosts")
+    parser.add_argument("--workers", type=int, nargs="+", default=[8, 32, 128],
+                        help="Worker counts to measure")
+    parser.add_argument("--latency", type=float, default=0.05, help="Command latency in seconds")
+    parser.add_argument("--connect-latency", type=float, default=0.02,
+                        help="Handshake latency in seconds")
+    args = parser.parse_args(argv)
+
+    hosts = [SSHHost(host=f"node{i}.example.com", user="deploy", alias=f"node{i}")
+             for i in range(args.hosts)]
+    print(f"{args.hosts} hosts, {args.connect_latency * 1000:.0f} ms handshake, "
+          f"{args.latency * 1000:.0f} ms command")
+    for workers in args.workers:
+        fleet = FakeFleet(latency=args.latency, connect_latency=args.connect_latency)
+        executor = FanOutExecutor(ConnectionPool(max_connections=workers, connector=fleet.connect),
+                                  max_workers=workers)
+        peak_threads = threading.active_count()
+        started = time.perf_counter()
+        ok = serial = 0
+        for result in executor.run(hosts, "uptime"):
+            ok += result.status == OK
+            serial += result.duration
+            peak_threads = max(peak_threads, threading.active_count())
+        elapsed = time.perf_counter() - started
+        print(f"  {workers:>4} workers  {elapsed:7.2f} s wall  {serial:7.2f} s one by one  "
+              f"{ok:>5} ok  peak {peak_threads} threads")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Probing and fan-out against a fleet of in-process SSH servers.
+
+Starts ``--hosts`` real paramiko servers on localhost, each behind a
+simulated link with a handshake delay and a per-packet latency, a
+tenth of them refusing logins, and times with the application's own
+connection code:
+
+- probing every server's banner with ``HostProber``
+- a cold fan-out of a canned command, each worker opening its sessions
+- a warm fan-out of the same command over the pooled sessions
+- an SFTP upload to every host over the pooled sessions
+
+Run from the repository root:
+
+    python -m benchmarks.bench_fleet [--hosts 200] [--workers 32] [--latency 0.02]
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+from src.core.connection_pool import ConnectionPool
+from src.core.fanout import OK, FanOutExecutor
+from src.core.prober import HostProber
+from src.core.ssh_client import SSHClient
+from tests.ssh_server import SSHFleet
+
+UPTIME = " 10:00:00 up 42 days,  1 user,  load average: 0.00, 0.01, 0.05\n"
+
+
+def probe(fleet: SSHFleet, concurrency: int) -> int:
+    """Probe every server; returns how many answered with a banner."""
+    prober = HostProber(concurrency=concurrency, timeout=10)
+
+    async def probe_all():
+        return await asyncio.gather(*(prober.probe((host.host, host.port)) for host in fleet.hosts))
+    try:
+        return sum(result.reachable for result in asyncio.run(probe_all()))
+    finally:
+        prober.close()
+
+
+def upload(pool: ConnectionPool, fleet: SSHFleet, source: str, workers: int) -> int:
+    """Upload ``source`` to every host through the pool; returns how many succeeded."""
+    def one(host) -> bool:
+        client = SSHClient(pool)
+        return client.connect(host)[0] and client.scp_upload(source, "payload.bin")[0]
+    with ThreadPoolExecutor(workers) as executor:
+        return sum(executor.map(one, fleet.hosts))
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hosts", type=int, default=200, help="Number of servers in the fleet")
+    parser.add_argument("--workers", type=int, default=32, help="Fan-out workers and probe concurrency")
+    parser.add_argument("--latency", type=float, default=0.02, help="Per-packet latency in seconds")
+    parser.add_argument("--handshake-delay", type=float, default=0.05,
+                        help="Seconds each server holds back its banner")
+    parser.add_argument("--size", type=int, default=256 * 1024, help="Bytes uploaded to each host")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as root:
+        started = time.perf_counter()
+        fleet = SSHFleet(args.hosts, root, latency=args.latency, handshake_delay=args.handshake_delay,
+                         responses={"uptime": UPTIME},
+                         per_host=lambda i: {"reject_auth": True} if i % 10 == 9 else {})
+        setup = time.perf_counter() - started
+        source = os.path.join(root, "payload.bin")
+        with open(source, "wb") as f:
+            f.write(os.urandom(args.size))
+        try:
+            print(f"{args.hosts} servers started in {setup:.2f} s, {args.latency * 1000:.0f} ms latency, "
+                  f"{args.handshake_delay * 1000:.0f} ms handshake, {args.workers} workers")
+
+            started = time.perf_counter()
+            reachable = probe(fleet, args.workers)
+            print(f"  probe          {time.perf_counter() - started:7.2f} s  {reachable:>5} reachable")
+
+            pool = ConnectionPool(max_connections=args.hosts)
+            executor = FanOutExecutor(pool, max_workers=args.workers)
+            for run in ("cold", "warm"):
+                started = time.perf_counter()
+                ok = sum(result.status == OK for result in executor.run(fleet.hosts, "uptime"))
+                print(f"  fan-out, {run}  {time.perf_counter() - started:7.2f} s  {ok:>5} ok")
+
+            started = time.perf_counter()
+            uploaded = upload(pool, fleet, source, args.workers)
+            elapsed = time.perf_counter() - started
+            print(f"  upload         {elapsed:7.2f} s  {uploaded:>5} ok  "
+                  f"{uploaded * args.size / elapsed / 1e6:.1f} MB/s")
+            pool.close()
+        finally:
+            fleet.close()
+
+
+if __name__ == "__main__":
+    main()
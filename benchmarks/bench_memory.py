@@ -0,0 +1,93 @@
+"""Memory used per host by the different host representations.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_memory [--count 1000000]
+"""
+
+import argparse
+import gc
+import json
+import tracemalloc
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, List, Optional
+
+from src.core.host_manager import INTERNED_FIELDS, SSHHost
+from src.core.records import LazyHostMap
+
+
+@dataclass
+class DictHost:
+    """SSHHost as it was before: a plain dataclass with a per-instance __dict__."""
+    host: str
+    user: str
+    port: int = 22
+    alias: Optional[str] = None
+    description: Optional[str] = None
+    group: Optional[str] = None
+    key_path: Optional[str] = None
+
+
+def synthetic_records(count: int, chunk: int = 10000) -> Iterator[Dict]:
+    """Yield host records decoded from JSON, so repeated strings are separate objects."""
+    for start in range(0, count, chunk):
+        rows = [
+            {
+                "host": f"node{i}.dc{i % 8}.example.com",
+                "user": ("deploy", "root", "admin", "ubuntu")[i % 4],
+                "port": 22,
+                "alias": f"node{i}",
+                "description": None,
+                "group": f"rack-{i % 200}",
+                "key_path": f"/home/ops/.ssh/id_{i % 5}",
+            }
+            for i in range(start, min(start + chunk, count))
+        ]
+        yield from json.loads(json.dumps(rows))
+
+
+def measure(count: int, build: Callable[[Iterator[Dict]], object]) -> float:
+    """Return the bytes per host still allocated after building ``count`` hosts."""
+    gc.collect()
+    tracemalloc.start()
+    hosts = build(synthetic_records(count))
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del hosts
+    return current / count
+
+
+def build_dict_hosts(records: Iterator[Dict]) -> Dict[str, DictHost]:
+    return {record["alias"]: DictHost(**record) for record in records}
+
+
+def build_slotted_hosts(records: Iterator[Dict]) -> Dict[str, SSHHost]:
+    return {record["alias"]: SSHHost(**record) for record in records}
+
+
+def build_lazy_records(records: Iterator[Dict]) -> LazyHostMap:
+    hosts = LazyHostMap(SSHHost, interned=INTERNED_FIELDS)
+    for record in records:
+        hosts.set_record(record["alias"], record)
+    return hosts
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=1_000_000, help="Number of synthetic hosts")
+    args = parser.parse_args(argv)
+
+    results = [
+        ("dataclass with __dict__ (before)", measure(args.count, build_dict_hosts)),
+        ("slotted SSHHost, interned fields", measure(args.count, build_slotted_hosts)),
+        ("lazy host records, interned fields", measure(args.count, build_lazy_records)),
+    ]
+    baseline = results[0][1]
+    print(f"{args.count} hosts")
+    for name, per_host in results:
+        print(f"  {name:<36} {per_host:8.1f} bytes/host  ({per_host / baseline:5.1%})")
+
+
+if __name__ == "__main__":
+    main()
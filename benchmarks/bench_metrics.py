@@ -0,0 +1,76 @@
+"""Cost of timing SSH operations, with instrumentation turned off and on.
+
+Times, best of ``--runs``:
+
+- one ``Metrics.span`` block around nothing, disabled and enabled,
+  against an empty loop
+- summarising a full ring buffer per host and per group, and exporting
+  it as JSON lines and Prometheus text
+
+A command records four spans and a new connection five, so even enabled
+the cost stays in microseconds against operations of milliseconds.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_metrics [--spans 1000000] [--runs 5]
+"""
+
+import argparse
+import io
+import time
+from typing import Callable, List, Optional
+
+from src.core.host_manager import SSHHost
+from src.core.metrics import DEFAULT_CAPACITY, EXECUTE, TOTAL, Metrics
+
+
+def best_of(runs: int, func: Callable[[], object]) -> float:
+    """Fastest of ``runs`` timed calls, in seconds."""
+    times = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - started)
+    return min(times)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--spans", type=int, default=1_000_000, help="Span blocks timed in a loop")
+    parser.add_argument("--runs", type=int, default=5, help="Repetitions to take the best of")
+    args = parser.parse_args(argv)
+
+    host = SSHHost(host="web.example.com", user="deploy", alias="web", group="prod")
+    hosts = [SSHHost(host=f"node{i}.example.com", user="deploy", alias=f"node{i}", group=f"rack-{i % 50}")
+             for i in range(1000)]
+
+    def loop(metrics: Optional[Metrics]) -> Callable[[], None]:
+        def run() -> None:
+            for _ in range(args.spans):
+                if metrics is None:
+                    pass
+                else:
+                    with metrics.span(EXECUTE, TOTAL, host):
+                        pass
+        return run
+
+    empty = best_of(args.runs, loop(None))
+    disabled = best_of(args.runs, loop(Metrics(enabled=False)))
+    enabled = best_of(args.runs, loop(Metrics()))
+    print(f"{args.spans} span blocks, best of {args.runs}, per block:")
+    print(f"  empty loop        {empty / args.spans * 1e9:8.0f} ns")
+    print(f"  span, disabled    {(disabled - empty) / args.spans * 1e9:8.0f} ns")
+    print(f"  span, enabled     {(enabled - empty) / args.spans * 1e9:8.0f} ns")
+
+    full = Metrics()
+    for i in range(DEFAULT_CAPACITY):
+        full.record(EXECUTE, TOTAL, hosts[i % len(hosts)], 0.0, i / 1e5)
+    print(f"{DEFAULT_CAPACITY} buffered spans:")
+    print(f"  summary by host   {best_of(args.runs, lambda: full.summary('alias')) * 1000:8.1f} ms")
+    print(f"  summary by group  {best_of(args.runs, lambda: full.summary('group')) * 1000:8.1f} ms")
+    print(f"  JSON lines        {best_of(args.runs, lambda: full.write_jsonl(io.StringIO())) * 1000:8.1f} ms")
+    print(f"  Prometheus text   {best_of(args.runs, full.prometheus) * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Host-to-host copy: download then upload against streaming between the hosts.
+
+Copies one file between two paramiko SFTP servers running in this process,
+each reached through a relay that delays traffic to simulate a distant
+link. The old way downloads the file to local disk and uploads it again;
+the streamed copy pipes the read stream of one host into the write stream
+of the other. Both use the transfer engine on one channel per host. The
+streamed copy also reports how long it waited on each leg. Everything runs
+in one Python process, so absolute numbers are bound by paramiko's CPU
+cost; the ratios are what matters.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_remote_copy [--size-mb 32] [--latency-ms 0 20 50]
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from typing import List, Optional
+
+from src.core.connection_pool import ConnectionPool
+from src.core.host_manager import SSHHost
+from src.core.transfer import SFTPTransfer
+from tests.ssh_server import SSHServer
+
+SOURCE = SSHHost(host="source.example.com", user="bench", alias="source")
+DESTINATION = SSHHost(host="destination.example.com", user="bench", alias="destination")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=int, default=32, help="File size in MiB")
+    parser.add_argument("--latency-ms", type=float, nargs="+", default=[0, 20, 50],
+                        help="One-way latencies to measure, in milliseconds")
+    args = parser.parse_args(argv)
+
+    size = args.size_mb * 1024 * 1024
+    workdir = tempfile.mkdtemp()
+    try:
+        roots = {}
+        for name in ("local", SOURCE.host, DESTINATION.host):
+            roots[name] = os.path.join(workdir, name)
+            os.mkdir(roots[name])
+        with open(os.path.join(roots[SOURCE.host], "dump.bin"), "wb") as f:
+            f.write(os.urandom(size))
+        staged = os.path.join(roots["local"], "dump.bin")
+
+        print(f"{args.size_mb} MiB file, seconds (MB/s)")
+        for latency_ms in args.latency_ms:
+            with SSHServer(roots[SOURCE.host], latency=latency_ms / 1000) as source, \
+                    SSHServer(roots[DESTINATION.host], latency=latency_ms / 1000) as destination:
+                servers = {SOURCE.host: source, DESTINATION.host: destination}
+                pool = ConnectionPool(
+                    connector=lambda host, timeout, keepalive: servers[host.host].connect(host, timeout, keepalive)
+                )
+                transfer = SFTPTransfer(pool, parallel=1)
+                print(f"  {latency_ms:g} ms one way")
+
+                started = time.perf_counter()
+                transfer.download(SOURCE, "/dump.bin", staged)
+                transfer.upload(DESTINATION, staged, "/staged.bin")
+                elapsed = time.perf_counter() - started
+                print(f"    {'download + upload':<18} {elapsed:6.2f}s ({size / elapsed / 1e6:6.1f})")
+                os.remove(staged)
+
+                started = time.perf_counter()
+                result = transfer.copy(SOURCE, "/dump.bin", DESTINATION, "/copied.bin")
+                elapsed = time.perf_counter() - started
+                print(f"    {'streamed copy':<18} {elapsed:6.2f}s ({size / elapsed / 1e6:6.1f})   "
+                      f"read leg {result.read_throughput / 1e6:.1f} MB/s, "
+                      f"write leg {result.write_throughput / 1e6:.1f} MB/s")
+                pool.close()
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Per-keystroke search latency at 100k hosts.
+
+Types a few queries one character at a time and reports the worst and
+median time per keystroke for the trigram SearchIndex (with the result
+limit the TUI uses) and for a plain substring scan over every host.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_search [--count 100000]
+"""
+
+import argparse
+import statistics
+import time
+from typing import Callable, Dict, List, Optional
+
+from src.core.search_index import SEARCH_FIELDS, SearchIndex
+from src.tui.interface import SSHManagerApp
+
+QUERIES = ["node4242", "dc3.example", "rack-17", "web frontend", "nxde4242"]
+
+
+def synthetic_hosts(count: int) -> Dict[str, Dict]:
+    return {
+        f"node{i}": {
+            "alias": f"node{i}",
+            "host": f"node{i}.dc{i % 8}.example.com",
+            "user": ("deploy", "root", "admin", "ubuntu")[i % 4],
+            "group": f"rack-{i % 200}",
+            "description": "web frontend" if i % 5 == 0 else None,
+        }
+        for i in range(count)
+    }
+
+
+def scan(hosts: Dict[str, Dict], query: str) -> List[str]:
+    query = query.lower()
+    return [
+        alias for alias, host in hosts.items()
+        if any(query in str(host.get(field) or "").lower() for field in SEARCH_FIELDS)
+    ]
+
+
+def keystroke_times(search: Callable[[str], List[str]]) -> List[float]:
+    times = []
+    for query in QUERIES:
+        for end in range(1, len(query) + 1):
+            start = time.perf_counter()
+            search(query[:end])
+            times.append(time.perf_counter() - start)
+    return times
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=100_000, help="Number of synthetic hosts")
+    args = parser.parse_args(argv)
+
+    hosts = synthetic_hosts(args.count)
+    start = time.perf_counter()
+    index = SearchIndex.build(hosts)
+    print(f"{args.count} hosts, index built in {time.perf_counter() - start:.2f} s")
+
+    limit = SSHManagerApp.SEARCH_LIMIT
+    for name, search in (
+        (f"trigram index, limit {limit}", lambda q: index.search(q, limit)),
+        ("trigram index, no limit", index.search),
+        ("substring scan", lambda q: scan(hosts, q)),
+    ):
+        times = keystroke_times(search)
+        print(f"  {name:<28} median {statistics.median(times) * 1000:8.3f} ms"
+              f"   worst {max(times) * 1000:8.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Inventory load time: parsing ssh_hosts.json against reading its binary snapshot.
+
+Writes a pretty-printed inventory the way the application saves it, then
+times, best of ``--runs``:
+
+- parsing: ``json.load`` of the file against reading the snapshot columns
+- a full ``HostManager`` load (hosts built and indexed) with the snapshot
+  turned off, cold (snapshot rebuilt) and warm (served from the snapshot)
+- a streamed load through ``stream_records``, as the interface does, with
+  and without a warm snapshot
+
+Run from the repository root:
+
+    python -m benchmarks.bench_snapshot [--hosts 100000] [--runs 5]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+from typing import Callable, List, Optional
+
+from src.core.host_manager import HostManager
+from src.core.snapshot import SnapshotCache
+from src.core.storage import atomic_write
+
+
+def write_inventory(config_dir: str, hosts: int) -> str:
+    """Write ``hosts`` synthetic hosts as pretty-printed JSON; returns the file path."""
+    inventory = {
+        f"node{i}": {
+            "host": f"node{i}.dc{i % 8}.example.com",
+            "user": ("deploy", "root", "admin", "ubuntu")[i % 4],
+            "port": 22 if i % 10 else 2222,
+            "alias": f"node{i}",
+            "description": "web frontend" if i % 5 == 0 else None,
+            "group": f"rack-{i % 200}",
+            "key_path": None if i % 3 else "/keys/id_ed25519",
+        }
+        for i in range(hosts)
+    }
+    path = os.path.join(config_dir, "ssh_hosts.json")
+    atomic_write(path, json.dumps(inventory, indent=2))
+    return path
+
+
+def best_of(runs: int, func: Callable[[], object], before: Optional[Callable[[], None]] = None) -> float:
+    """Fastest of ``runs`` timed calls, in seconds; ``before`` runs untimed ahead of each."""
+    times = []
+    for _ in range(runs):
+        if before is not None:
+            before()
+        started = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - started)
+    return min(times)
+
+
+def settings(config_dir: str, snapshot: bool) -> None:
+    with open(os.path.join(config_dir, "settings.json"), "w") as f:
+        json.dump({"storage": "json", "snapshot_cache": snapshot}, f)
+
+
+def stream(config_dir: str) -> None:
+    manager = HostManager(config_dir=config_dir, lazy=True)
+    for page in manager.stream_records():
+        manager.apply_records(page)
+    manager.finish_loading()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hosts", type=int, default=100_000, help="Hosts in the synthetic inventory")
+    parser.add_argument("--runs", type=int, default=5, help="Repetitions to take the best of")
+    args = parser.parse_args(argv)
+
+    config_dir = tempfile.mkdtemp()
+    try:
+        path = write_inventory(config_dir, args.hosts)
+        cache = SnapshotCache(path)
+        discard = cache.discard
+
+        def parse_json() -> None:
+            with open(path) as f:
+                json.load(f)
+
+        settings(config_dir, snapshot=True)
+        HostManager(config_dir=config_dir)
+        json_parse = best_of(args.runs, parse_json)
+        snapshot_read = best_of(args.runs, cache.read)
+
+        manager_cold = best_of(args.runs, lambda: HostManager(config_dir=config_dir), before=discard)
+        manager_warm = best_of(args.runs, lambda: HostManager(config_dir=config_dir))
+        stream_warm = best_of(args.runs, lambda: stream(config_dir))
+        settings(config_dir, snapshot=False)
+        manager_plain = best_of(args.runs, lambda: HostManager(config_dir=config_dir))
+        stream_plain = best_of(args.runs, lambda: stream(config_dir))
+
+        print(f"{args.hosts} hosts, {os.path.getsize(path) / 1e6:.1f} MB of JSON, "
+              f"{os.path.getsize(cache.path) / 1e6:.1f} MB snapshot, best of {args.runs}")
+        print(f"  json.load                    {json_parse * 1000:8.1f} ms")
+        print(f"  snapshot read                {snapshot_read * 1000:8.1f} ms"
+              f"   {json_parse / snapshot_read:5.1f}x faster")
+        print(f"  HostManager, no snapshot     {manager_plain * 1000:8.1f} ms")
+        print(f"  HostManager, cold snapshot   {manager_cold * 1000:8.1f} ms")
+        print(f"  HostManager, warm snapshot   {manager_warm * 1000:8.1f} ms"
+              f"   {manager_plain / manager_warm:5.1f}x faster")
+        print(f"  streamed, no snapshot        {stream_plain * 1000:8.1f} ms")
+        print(f"  streamed, warm snapshot      {stream_warm * 1000:8.1f} ms"
+              f"   {stream_plain / stream_warm:5.1f}x faster")
+    finally:
+        shutil.rmtree(config_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Cold start of the interface: import time and launch to an interactive host list.
+
+Each run starts a fresh interpreter with ``-X importtime`` that imports the
+interface, runs the app headless against a synthetic inventory and
+reports as soon as the host list is loaded and painted. The wall time is
+measured from spawning the process, so interpreter start-up is included.
+The slowest imports are listed from the last run, along with whether
+paramiko was loaded by the time the list was up.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_startup [--hosts 1000] [--runs 5]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional, Tuple
+
+# Runs in the child; prints once the list is up, then exits
+CHILD = """
+import sys
+from src.tui.interface import SSHManagerApp
+
+async def wait_for_hosts(pilot):
+    app = pilot.app
+    while not (app.host_manager.loaded and app.host_table.keys()):
+        await pilot.pause(0.005)
+    print("ready", "paramiko" in sys.modules, flush=True)
+    app.exit()
+
+SSHManagerApp(config_dir=sys.argv[1]).run(headless=True, auto_pilot=wait_for_hosts)
+"""
+
+
+def write_inventory(config_dir: str, hosts: int) -> None:
+    """Write ``hosts`` synthetic hosts and turn background probing off."""
+    inventory = {
+        f"node{i}": {
+            "host": f"node{i}.example.com",
+            "user": "deploy",
+            "port": 22,
+            "alias": f"node{i}",
+            "description": None,
+            "group": f"rack-{i % 20}",
+            "key_path": None,
+        }
+        for i in range(hosts)
+    }
+    with open(os.path.join(config_dir, "ssh_hosts.json"), "w") as f:
+        json.dump(inventory, f)
+    with open(os.path.join(config_dir, "settings.json"), "w") as f:
+        json.dump({"probe": False}, f)
+
+
+def parse_importtime(stderr: str) -> Dict[str, Tuple[int, int]]:
+    """Map module name to (self, cumulative) microseconds from ``-X importtime`` output."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = [part.strip() for part in line[len("import time:"):].split("|")]
+        if parts[0].isdigit():
+            modules[parts[2]] = (int(parts[0]), int(parts[1]))
+    return modules
+
+
+def launch(config_dir: str) -> Tuple[float, bool, str]:
+    """Start the app once; returns (seconds to the host list, paramiko loaded, importtime output)."""
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-X", "importtime", "-c", CHILD, config_dir],
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    elapsed = time.perf_counter() - started
+    _, stderr = process.communicate(timeout=60)
+    if not line.startswith("ready"):
+        raise RuntimeError(f"App did not start:\n{stderr[-2000:]}")
+    return elapsed, line.split()[1] == "True", stderr
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hosts", type=int, default=1000, help="Hosts in the synthetic inventory")
+    parser.add_argument("--runs", type=int, default=5, help="Launches to take the median of")
+    parser.add_argument("--top", type=int, default=10, help="Slowest imports to list")
+    args = parser.parse_args(argv)
+
+    config_dir = tempfile.mkdtemp()
+    try:
+        write_inventory(config_dir, args.hosts)
+        times = []
+        for _ in range(args.runs):
+            elapsed, paramiko_loaded, stderr = launch(config_dir)
+            times.append(elapsed)
+        modules = parse_importtime(stderr)
+        interface = modules.get("src.tui.interface", (0, 0))[1]
+        print(f"{args.hosts} hosts, {args.runs} runs")
+        print(f"  launch to host list   {statistics.median(times) * 1000:7.0f} ms median "
+              f"(min {min(times) * 1000:.0f})")
+        print(f"  import of interface   {interface / 1000:7.0f} ms")
+        print(f"  paramiko loaded       {'yes' if paramiko_loaded else 'no'}")
+        print(f"  slowest imports (cumulative ms):")
+        top = sorted(modules.items(), key=lambda item: item[1][1], reverse=True)[:args.top]
+        for name, (_, cumulative) in top:
+            print(f"    {cumulative / 1000:7.1f}  {name}")
+    finally:
+        shutil.rmtree(config_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Host table refresh latency against inventory size.
+
+Compares rebuilding a textual DataTable row by row (how the host list
+used to be refreshed) with replacing the rows of the virtual HostTable
+and with applying a single-row change to it. Each timing includes the
+repaint that follows.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_table_refresh [--sizes 1000 10000 50000]
+"""
+
+import argparse
+import asyncio
+import time
+from typing import Dict, List, Optional, Tuple
+
+from textual.app import App, ComposeResult
+from textual.widgets import DataTable
+
+from src.tui.host_table import HostTable
+from src.tui.interface import HOST_COLUMNS
+
+
+def synthetic_rows(count: int) -> Dict[str, Tuple[str, ...]]:
+    return {
+        f"node{i}": (f"node{i}", f"node{i}.example.com", "deploy", "22", "up", "12 ms",
+                     f"rack-{i % 200}", "")
+        for i in range(count)
+    }
+
+
+class BenchApp(App):
+    def __init__(self, rows: Dict[str, Tuple[str, ...]]):
+        super().__init__()
+        self.rows = rows
+
+    def compose(self) -> ComposeResult:
+        yield DataTable(id="data-table")
+        yield HostTable(HOST_COLUMNS, self.rows.__getitem__, id="host-table")
+
+
+async def timed(pilot, action) -> float:
+    start = time.perf_counter()
+    action()
+    await pilot.pause()
+    return time.perf_counter() - start
+
+
+async def measure(count: int) -> Tuple[float, float, float]:
+    rows = synthetic_rows(count)
+    app = BenchApp(rows)
+    async with app.run_test(size=(120, 40)) as pilot:
+        data_table = app.query_one(DataTable)
+        data_table.add_columns(*HOST_COLUMNS)
+        host_table = app.query_one(HostTable)
+
+        def rebuild_data_table():
+            data_table.clear()
+            for alias, cells in rows.items():
+                data_table.add_row(*cells, key=alias)
+
+        full_rebuild = await timed(pilot, rebuild_data_table)
+        data_table.display = False
+        set_rows = await timed(pilot, lambda: host_table.set_rows(rows))
+        changed = f"node{count // 2}"
+        rows[changed] = rows[changed][:-1] + ("changed",)
+        single_row = await timed(pilot, lambda: host_table.update_rows([changed]))
+    return full_rebuild, set_rows, single_row
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000],
+                        help="Inventory sizes to measure")
+    args = parser.parse_args(argv)
+
+    print(f"{'hosts':>8}  {'DataTable rebuild':>18}  {'HostTable set_rows':>18}  {'HostTable 1-row diff':>20}")
+    for count in args.sizes:
+        full_rebuild, set_rows, single_row = asyncio.run(measure(count))
+        print(f"{count:>8}  {full_rebuild * 1000:>15.1f} ms  {set_rows * 1000:>15.1f} ms  "
+              f"{single_row * 1000:>17.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
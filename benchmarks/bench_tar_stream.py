@@ -0,0 +1,87 @@
+"""Directory sync of many small files: per-file SFTP against a tar stream.
+
+Builds a synthetic tree shaped like a package directory (small text
+files in nested directories) and syncs it to and from a paramiko server
+running in this process, reached through a relay that delays traffic to
+simulate a distant link. Each sync starts from an empty destination, once
+with every file copied over pooled SFTP channels and once with the files
+streamed through ``tar`` on a single exec channel. Everything runs in one
+Python process, so absolute numbers are bound by paramiko's CPU cost; the
+ratios are what matters.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_tar_stream [--files 2000] [--latency-ms 0 20 50]
+"""
+
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+from typing import List, Optional
+
+from src.core.connection_pool import ConnectionPool
+from src.core.host_manager import SSHHost
+from src.core.sync import DirectorySync
+from tests.ssh_server import SSHServer
+
+HOST = SSHHost(host="bench.example.com", user="bench", alias="bench")
+
+
+def build_tree(root: str, files: int, seed: int = 0) -> int:
+    """Write ``files`` small text files under ``root``; returns their total size."""
+    rng = random.Random(seed)
+    words = ["const", "return", "function", "module", "exports", "require", "value", "index"]
+    total = 0
+    for i in range(files):
+        path = os.path.join(root, f"pkg{i % 50}", "lib", f"dir{i % 7}", f"file{i}.js")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Mostly a few hundred bytes, some a few kilobytes
+        size = int(rng.lognormvariate(6, 1))
+        text = " ".join(rng.choice(words) for _ in range(size // 6 + 1))[:size]
+        with open(path, "w") as f:
+            f.write(text)
+        total += len(text)
+    return total
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=2000, help="Files in the synthetic tree")
+    parser.add_argument("--latency-ms", type=float, nargs="+", default=[0, 20, 50],
+                        help="One-way latencies to measure, in milliseconds")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp()
+    try:
+        source = os.path.join(workdir, "source")
+        remote_dir = os.path.join(workdir, "remote")
+        copy = os.path.join(workdir, "copy")
+        os.mkdir(remote_dir)
+        size = build_tree(source, args.files)
+        print(f"{args.files} files, {size / 1e6:.1f} MB; seconds up / down")
+        for latency_ms in args.latency_ms:
+            print(f"  {latency_ms:g} ms one way")
+            with SSHServer(remote_dir, latency=latency_ms / 1000) as server:
+                pool = ConnectionPool(connector=server.connect)
+                sync = DirectorySync(pool)
+                for method in ("sftp", "tar"):
+                    shutil.rmtree(os.path.join(remote_dir, "tree"), ignore_errors=True)
+                    shutil.rmtree(copy, ignore_errors=True)
+                    started = time.perf_counter()
+                    sync.push(HOST, source, "tree", method=method)
+                    up = time.perf_counter() - started
+                    started = time.perf_counter()
+                    sync.pull(HOST, "tree", copy, method=method)
+                    down = time.perf_counter() - started
+                    print(f"    {method:<5} {up:7.2f} / {down:7.2f}   "
+                          f"({args.files / up:6.0f} / {args.files / down:6.0f} files/s)")
+                pool.close()
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""SFTP transfer throughput against an in-process server with injected latency.
+
+Uploads and downloads one file through a paramiko SFTP server running in
+this process, reached through a relay that delays traffic to simulate a
+distant link. Compares the old per-call ``sftp.put``/``sftp.get`` (a new
+SFTP session per transfer) with the transfer engine on one channel and
+with the file split over several channels. Everything, including the
+server, runs in one Python process, so absolute numbers are bound by
+paramiko's CPU cost; the ratios are what matters.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_transfer [--size-mb 32] [--latency-ms 0 20 50]
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from typing import Callable, List, Optional
+
+from src.core.connection_pool import ConnectionPool
+from src.core.host_manager import SSHHost
+from src.core.transfer import SFTPTransfer
+from tests.ssh_server import SSHServer
+
+HOST = SSHHost(host="bench.example.com", user="bench", alias="bench")
+
+
+def timed(action: Callable[[], None], size: int) -> float:
+    started = time.perf_counter()
+    action()
+    return size / (time.perf_counter() - started) / 1e6
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=int, default=32, help="File size in MiB")
+    parser.add_argument("--latency-ms", type=float, nargs="+", default=[0, 20, 50],
+                        help="One-way latencies to measure, in milliseconds")
+    parser.add_argument("--parallel", type=int, default=4, help="Channels for split transfers")
+    args = parser.parse_args(argv)
+
+    size = args.size_mb * 1024 * 1024
+    workdir = tempfile.mkdtemp()
+    try:
+        local_dir = os.path.join(workdir, "local")
+        remote_dir = os.path.join(workdir, "remote")
+        os.mkdir(local_dir)
+        os.mkdir(remote_dir)
+        source = os.path.join(local_dir, "source.bin")
+        with open(source, "wb") as f:
+            f.write(os.urandom(size))
+        copy = os.path.join(local_dir, "copy.bin")
+
+        print(f"{args.size_mb} MiB file, MB/s up / down")
+        for latency_ms in args.latency_ms:
+            with SSHServer(remote_dir, latency=latency_ms / 1000) as server:
+                pool = ConnectionPool(connector=server.connect)
+
+                def old_upload():
+                    with pool.connection(HOST) as client:
+                        sftp = client.open_sftp()
+                        sftp.put(source, "/target.bin")
+                        sftp.close()
+
+                def old_download():
+                    with pool.connection(HOST) as client:
+                        sftp = client.open_sftp()
+                        sftp.get("/target.bin", copy)
+                        sftp.close()
+
+                single = SFTPTransfer(pool, parallel=1)
+                split = SFTPTransfer(pool, parallel=args.parallel, split_threshold=1)
+                rows = [
+                    ("sftp.put / sftp.get", old_upload, old_download),
+                    ("engine, 1 channel",
+                     lambda: single.upload(HOST, source, "/target.bin"),
+                     lambda: single.download(HOST, "/target.bin", copy)),
+                    (f"engine, {args.parallel} channels",
+                     lambda: split.upload(HOST, source, "/target.bin"),
+                     lambda: split.download(HOST, "/target.bin", copy)),
+                ]
+                print(f"  {latency_ms:g} ms one way")
+                for label, upload, download in rows:
+                    print(f"    {label:<22} {timed(upload, size):6.1f} / {timed(download, size):6.1f}")
+                pool.close()
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
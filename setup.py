@@ -11,8 +11,8 @@ setup(
     include_package_data=True,
     license="MIT",
     install_requires=[
-        "paramiko>=3.3.1",
-        "textual>=0.40.1",
+        "paramiko>=3.3.1,<6",
+        "textual>=0.48.0",
         "rich>=13.7.0",
         "python-dotenv>=1.0.0",
     ],
@@ -0,0 +1,92 @@
+import codecs
+import selectors
+import time
+from typing import Dict, Iterator, NamedTuple, Optional
+
+import paramiko
+
+# Output streams
+STDOUT = "stdout"
+STDERR = "stderr"
+
+# Bytes read from a channel at a time
+CHUNK_SIZE = 32768
+
+# Longest wait for the channel before checking for the exit status again;
+# an exit status arriving does not wake the selector
+_POLL_INTERVAL = 0.5
+
+
+class OutputChunk(NamedTuple):
+    """A piece of command output, from ``STDOUT`` or ``STDERR``."""
+    stream: str
+    text: str
+
+
+class CommandStream:
+    """Iterates over the output of a running command as it arrives.
+
+    Stdout and stderr chunks are yielded interleaved, in the order they
+    can be read, and ``exit_code`` is set once the output ends. Output is
+    only read from the channel as the caller consumes it, so at most the
+    channel's window is buffered: once it fills, the remote command blocks
+    on its writes until the caller catches up. Bytes are decoded
+    incrementally, so a character split between two reads is decoded whole.
+    """
+
+    def __init__(self, channel: paramiko.Channel, timeout: Optional[float] = None,
+                 encoding: str = "utf-8", chunk_size: int = CHUNK_SIZE):
+        self.channel = channel
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self.exit_code: Optional[int] = None
+        # Bytes of stdout and stderr read so far
+        self.bytes_received = 0
+        decoder = codecs.getincrementaldecoder(encoding)
+        self._decoders: Dict[str, codecs.IncrementalDecoder] = {
+            STDOUT: decoder(errors="replace"),
+            STDERR: decoder(errors="replace"),
+        }
+
+    def __iter__(self) -> Iterator[OutputChunk]:
+        channel = self.channel
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        # Not select(), which refuses descriptors past FD_SETSIZE, as with hundreds of pooled sessions
+        selector: Optional[selectors.BaseSelector] = None
+        try:
+            while True:
+                if channel.recv_ready():
+                    stream, data = STDOUT, channel.recv(self.chunk_size)
+                elif channel.recv_stderr_ready():
+                    stream, data = STDERR, channel.recv_stderr(self.chunk_size)
+                elif channel.exit_status_ready() or channel.closed:
+                    # Output may have arrived together with the exit status
+                    if channel.recv_ready() or channel.recv_stderr_ready():
+                        continue
+                    break
+                else:
+                    wait = _POLL_INTERVAL
+                    if deadline is not None:
+                        wait = min(deadline - time.monotonic(), wait)
+                        if wait <= 0:
+                            raise TimeoutError(f"Command timed out after {self.timeout:g}s")
+                    if selector is None:
+                        selector = selectors.DefaultSelector()
+                        # The channel's fileno becomes readable on output, stderr and close
+                        selector.register(channel, selectors.EVENT_READ)
+                    selector.select(wait)
+                    continue
+                self.bytes_received += len(data)
+                text = self._decoders[stream].decode(data)
+                if text:
+                    yield OutputChunk(stream, text)
+        finally:
+            if selector is not None:
+                selector.close()
+        for stream, decoder in self._decoders.items():
+            # A truncated character left at the end
+            text = decoder.decode(b"", final=True)
+            if text:
+                yield OutputChunk(stream, text)
+        if channel.exit_status_ready():
+            self.exit_code = channel.recv_exit_status()
@@ -0,0 +1,303 @@
+import functools
+import os
+import socket
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Callable, Iterator, List, Optional, Tuple
+
+import paramiko
+
+from .host_manager import SSHHost
+from .metrics import AUTH, CONNECT, DNS, KEX, TCP, TOTAL, Metrics
+
+# (hostname, port, user, key path) identifying one SSH session.
+PoolKey = Tuple[str, int, str, Optional[str]]
+
+# Idle SFTP sessions kept open on each connection; OpenSSH allows ten
+# sessions per connection by default
+MAX_IDLE_SFTP = 8
+
+
+def pool_key(host: SSHHost) -> PoolKey:
+    return (host.host, host.port, host.user, host.key_path)
+
+
+def open_client(host: SSHHost, timeout: float, keepalive: int,
+                metrics: Optional[Metrics] = None) -> paramiko.SSHClient:
+    """Connect a new paramiko client to a host.
+
+    With ``metrics`` enabled the name lookup, TCP connect, key exchange and
+    authentication are each recorded as a phase of the connect.
+    """
+    client = paramiko.SSHClient()
+    client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+    kwargs = {
+        'hostname': host.host,
+        'username': host.user,
+        'port': host.port,
+        'timeout': timeout,
+        'banner_timeout': timeout,
+        'auth_timeout': timeout,
+    }
+    if host.key_path and os.path.exists(host.key_path):
+        kwargs['key_filename'] = host.key_path
+    transports: List[_TimedTransport] = []
+    try:
+        if metrics is not None and metrics.enabled:
+            kwargs['sock'] = _timed_socket(host, timeout, metrics)
+
+            def transport_factory(sock, **options) -> paramiko.Transport:
+                transports.append(_TimedTransport(sock, metrics, host, **options))
+                return transports[-1]
+            kwargs['transport_factory'] = transport_factory
+        client.connect(**kwargs)
+    except BaseException:
+        client.close()
+        if transports and transports[0].kex_done is not None:
+            transports[0].record_auth(ok=False)
+        raise
+    if transports:
+        transports[0].record_auth(ok=True)
+    if keepalive:
+        client.get_transport().set_keepalive(keepalive)
+    return client
+
+
+def _timed_socket(host: SSHHost, timeout: float, metrics: Metrics) -> socket.socket:
+    """Resolve and connect to a host as paramiko does, recording both phases."""
+    with metrics.span(CONNECT, DNS, host):
+        addresses = socket.getaddrinfo(host.host, host.port, socket.AF_UNSPEC, socket.SOCK_STREAM)
+    with metrics.span(CONNECT, TCP, host):
+        error: Optional[OSError] = None
+        for family, kind, proto, _, address in addresses:
+            sock = socket.socket(family, kind, proto)
+            try:
+                sock.settimeout(timeout)
+                sock.connect(address)
+                return sock
+            except OSError as e:
+                sock.close()
+                error = e
+        raise error or OSError(f"No address for {host.host}")
+
+
+class _TimedTransport(paramiko.Transport):
+    """Client transport recording the banner and key exchange, then authentication."""
+
+    def __init__(self, sock: socket.socket, metrics: Metrics, host: SSHHost, **options):
+        super().__init__(sock, **options)
+        self.metrics = metrics
+        self.host = host
+        # perf_counter once the key exchange finished
+        self.kex_done: Optional[float] = None
+
+    def start_client(self, event=None, timeout=None):
+        with self.metrics.span(CONNECT, KEX, self.host):
+            super().start_client(event=event, timeout=timeout)
+        self.kex_done = time.perf_counter()
+
+    def record_auth(self, ok: bool) -> None:
+        """Record the time from the key exchange to now, host key check included."""
+        duration = time.perf_counter() - self.kex_done
+        self.metrics.record(CONNECT, AUTH, self.host, time.time() - duration, duration, ok)
+
+
+def is_alive(client: paramiko.SSHClient) -> bool:
+    transport = client.get_transport()
+    return transport is not None and transport.is_active()
+
+
+@dataclass
+class _Entry:
+    client: Optional[paramiko.SSHClient]
+    last_used: float
+    users: int = 0
+    # Held while the entry is being connected, so only one handshake runs per key
+    connecting: threading.Lock = field(default_factory=threading.Lock)
+    # SFTP sessions on this connection that nobody is using
+    sftp: List[paramiko.SFTPClient] = field(default_factory=list)
+
+
+class ConnectionPool:
+    """Shares live SSH sessions between operations on the same host.
+
+    Sessions are keyed by hostname, port, user and key, so every command or
+    transfer to a host opens a new channel on the existing transport
+    instead of paying for a TCP connect, key exchange and authentication
+    again. Transports send keepalives while pooled. Sessions idle for longer
+    than ``idle_timeout`` or found dead are closed, and at most
+    ``max_connections`` are open at once: beyond that the least recently
+    used idle session is closed, or the caller waits for one to be released.
+    New connections are timed into ``metrics`` when it is enabled.
+    """
+
+    def __init__(self, max_connections: int = 32, idle_timeout: float = 300.0,
+                 keepalive: int = 30, connect_timeout: float = 10.0,
+                 connector: Optional[Callable[[SSHHost, float, int], paramiko.SSHClient]] = None,
+                 clock: Callable[[], float] = time.monotonic, metrics: Optional[Metrics] = None):
+        self.max_connections = max_connections
+        self.idle_timeout = idle_timeout
+        self.keepalive = keepalive
+        self.connect_timeout = connect_timeout
+        # Turned off unless given; connects are timed whatever the connector,
+        # and split into phases by the default one
+        self.metrics = metrics if metrics is not None else Metrics(enabled=False)
+        self._connector = connector or functools.partial(open_client, metrics=self.metrics)
+        self._clock = clock
+        # Least recently used first
+        self._entries: "OrderedDict[PoolKey, _Entry]" = OrderedDict()
+        self._changed = threading.Condition()
+
+    def __len__(self) -> int:
+        with self._changed:
+            return len(self._entries)
+
+    @contextmanager
+    def connection(self, host: SSHHost, timeout: Optional[float] = None) -> Iterator[paramiko.SSHClient]:
+        """Borrow a live client for a host; it stays pooled after the block.
+
+        Several blocks may hold the same client at once, each working on its
+        own channels. ``timeout`` bounds the wait for a free slot when the
+        pool is full.
+        """
+        entry = self._checkout(host, timeout)
+        try:
+            yield entry.client
+        finally:
+            self._checkin(entry)
+
+    @contextmanager
+    def sftp(self, host: SSHHost, timeout: Optional[float] = None) -> Iterator[paramiko.SFTPClient]:
+        """Borrow an SFTP session on a host's pooled connection.
+
+        Sessions stay open on the connection between uses, so consecutive
+        transfers skip opening a channel and the SFTP handshake. A session
+        serves one borrower at a time (paramiko's SFTP client cannot be
+        shared between threads); concurrent borrowers get sessions of their
+        own on the same connection. A session is closed rather than kept if
+        the block raises, since requests may still be outstanding on it.
+        """
+        entry = self._checkout(host, timeout)
+        try:
+            with self._changed:
+                sftp = entry.sftp.pop() if entry.sftp else None
+            if sftp is None or sftp.get_channel().closed:
+                sftp = entry.client.open_sftp()
+            try:
+                yield sftp
+            except BaseException:
+                sftp.close()
+                raise
+            with self._changed:
+                if len(entry.sftp) < MAX_IDLE_SFTP and not sftp.get_channel().closed:
+                    entry.sftp.append(sftp)
+                    sftp = None
+            if sftp is not None:
+                sftp.close()
+        finally:
+            self._checkin(entry)
+
+    def _checkout(self, host: SSHHost, timeout: Optional[float]) -> _Entry:
+        key = pool_key(host)
+        deadline = None if timeout is None else self._clock() + timeout
+        while True:
+            with self._changed:
+                while True:
+                    self._prune_locked()
+                    entry = self._entries.get(key)
+                    if entry is not None and entry.client is not None and not is_alive(entry.client):
+                        # Died while in use; current users will see their channels fail
+                        self._close_locked(key)
+                        entry = None
+                    if entry is not None or self._make_room_locked():
+                        break
+                    remaining = None if deadline is None else deadline - self._clock()
+                    if remaining is not None and remaining <= 0:
+                        raise TimeoutError(f"No free connection slot for {host.host}")
+                    self._changed.wait(remaining)
+                connect = entry is None
+                if connect:
+                    entry = _Entry(client=None, last_used=self._clock())
+                    entry.connecting.acquire()
+                    self._entries[key] = entry
+                else:
+                    self._entries.move_to_end(key)
+                entry.users += 1
+
+            if connect:
+                self._connect(key, entry, host)
+                return entry
+            # Another caller is connecting this key; wait for its handshake
+            with entry.connecting:
+                pass
+            if entry.client is not None:
+                return entry
+            # That handshake failed; try our own
+            self._checkin(entry)
+
+    def _checkin(self, entry: _Entry) -> None:
+        with self._changed:
+            entry.users -= 1
+            entry.last_used = self._clock()
+            self._changed.notify_all()
+
+    def _connect(self, key: PoolKey, entry: _Entry, host: SSHHost) -> None:
+        try:
+            with self.metrics.span(CONNECT, TOTAL, host):
+                entry.client = self._connector(host, self.connect_timeout, self.keepalive)
+        except BaseException:
+            with self._changed:
+                entry.users -= 1
+                if self._entries.get(key) is entry:
+                    del self._entries[key]
+                self._changed.notify_all()
+            raise
+        finally:
+            entry.connecting.release()
+
+    def _make_room_locked(self) -> bool:
+        """Close least recently used idle sessions until a new one fits."""
+        for key, entry in list(self._entries.items()):
+            if len(self._entries) < self.max_connections:
+                break
+            if entry.users == 0 and entry.client is not None:
+                self._close_locked(key)
+        return len(self._entries) < self.max_connections
+
+    def _prune_locked(self) -> None:
+        now = self._clock()
+        for key, entry in list(self._entries.items()):
+            if entry.users or entry.client is None:
+                continue
+            if now - entry.last_used > self.idle_timeout or not is_alive(entry.client):
+                self._close_locked(key)
+
+    def _close_locked(self, key: PoolKey) -> None:
+        entry = self._entries.pop(key)
+        # Closing the transport closes the SFTP sessions' channels too
+        entry.sftp.clear()
+        entry.client.close()
+
+    def prune(self) -> None:
+        """Close sessions that are idle past the timeout or dead."""
+        with self._changed:
+            self._prune_locked()
+            self._changed.notify_all()
+
+    def discard(self, host: SSHHost) -> None:
+        """Close a host's session unless it is in use."""
+        with self._changed:
+            entry = self._entries.get(pool_key(host))
+            if entry is not None and entry.users == 0 and entry.client is not None:
+                self._close_locked(pool_key(host))
+                self._changed.notify_all()
+
+    def close(self) -> None:
+        """Close every pooled session."""
+        with self._changed:
+            for key in [k for k, e in self._entries.items() if e.client is not None]:
+                self._close_locked(key)
+            self._changed.notify_all()
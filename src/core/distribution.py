@@ -0,0 +1,241 @@
+import hashlib
+import mmap
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager, suppress
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set
+
+import paramiko
+
+from .connection_pool import ConnectionPool, PoolKey, pool_key
+from .fanout import CANCELLED, ERROR, OK
+from .host_manager import SSHHost
+from .transfer import CHUNK_SIZE, PART_SUFFIX, SFTPTransfer, replace_remote
+
+# The copy on the host does not match the local file
+MISMATCH = "mismatch"
+
+
+class _Cancelled(Exception):
+    pass
+
+
+@dataclass
+class Delivery:
+    """Outcome of pushing the artifact to one host."""
+    alias: str
+    status: str
+    # SHA-256 of the copy on the host, when it was checked
+    checksum: Optional[str] = None
+    error: Optional[str] = None
+    # Bytes sent to this host
+    sent: int = 0
+    duration: float = 0.0
+
+
+@dataclass
+class DistributionReport:
+    """Per-host outcome of pushing one file to many hosts."""
+    source: str
+    destination: str
+    size: int
+    # SHA-256 of the local file
+    checksum: str
+    deliveries: List[Delivery] = field(default_factory=list)
+    duration: float = 0.0
+
+    @property
+    def succeeded(self) -> List[Delivery]:
+        return [delivery for delivery in self.deliveries if delivery.status == OK]
+
+    @property
+    def failed(self) -> List[Delivery]:
+        return [delivery for delivery in self.deliveries if delivery.status != OK]
+
+
+class TokenBucket:
+    """A bandwidth cap shared between threads.
+
+    ``consume`` takes the bytes about to be sent. The bucket refills at
+    ``rate`` bytes per second up to ``burst``; a caller taking more than
+    is left goes into debt and sleeps until it is paid off, so concurrent
+    senders together stay at the rate.
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        if rate <= 0:
+            raise ValueError("Bandwidth cap must be positive")
+        self.rate = rate
+        self.burst = burst if burst is not None else max(rate / 10, CHUNK_SIZE)
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = self.burst
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def consume(self, amount: int) -> None:
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= amount
+            wait = -self._tokens / self.rate
+        if wait > 0:
+            self._sleep(wait)
+
+
+class ArtifactDistributor:
+    """Pushes one local file to many hosts at once.
+
+    The file is memory-mapped and hashed once; every host is sent slices
+    of the same mapping over a pooled SFTP session with pipelined writes.
+    At most ``max_hosts`` hosts are worked on at once, and at most
+    ``per_host`` deliveries run against one server (aliases sharing a
+    hostname, port, user and key count as one). With ``bandwidth`` set,
+    all hosts together send at most that many bytes per second.
+
+    Each host receives the file as ``<destination>.part``. With ``verify``,
+    its SHA-256 is taken on the host with ``sha256sum`` (or, where the host
+    cannot run commands, by reading the copy back) and a copy that does
+    not match is removed, leaving the destination untouched. A good copy
+    is renamed over the destination and gets the local modification time.
+    ``cancel`` stops hosts that have not started, and interrupts the rest.
+    """
+
+    def __init__(self, pool: ConnectionPool, max_hosts: int = 16, per_host: int = 1,
+                 bandwidth: Optional[float] = None, verify: bool = True,
+                 transfer: Optional[SFTPTransfer] = None, chunk_size: int = CHUNK_SIZE):
+        self.pool = pool
+        self.max_hosts = max_hosts
+        self.per_host = per_host
+        self.bucket = TokenBucket(bandwidth) if bandwidth else None
+        self.verify = verify
+        self.transfer = transfer if transfer is not None else SFTPTransfer(pool)
+        self.chunk_size = chunk_size
+        self._cancelled = threading.Event()
+        self._slots: Dict[PoolKey, threading.Semaphore] = {}
+        self._sessions: Set[paramiko.SFTPClient] = set()
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self) -> None:
+        """Stop the current push; hosts still in flight report as cancelled."""
+        self._cancelled.set()
+        with self._lock:
+            sessions = list(self._sessions)
+        for sftp in sessions:
+            sftp.close()
+
+    def distribute(self, hosts: Iterable[SSHHost], local_path: str, remote_path: str,
+                   on_delivery: Optional[Callable[[Delivery], None]] = None) -> DistributionReport:
+        """Push ``local_path`` to ``remote_path`` on every host.
+
+        ``on_delivery`` is called from the calling thread as each host
+        finishes.
+        """
+        self._cancelled.clear()
+        started = time.monotonic()
+        hosts = list(hosts)
+        mtime = os.stat(local_path).st_mtime
+        with open(local_path, "rb") as f, self._mapped(f) as data:
+            report = DistributionReport(source=local_path, destination=remote_path, size=len(data),
+                                        checksum=hashlib.sha256(data).hexdigest())
+            with ThreadPoolExecutor(max_workers=self.max_hosts, thread_name_prefix="distribute") as executor:
+                futures = [executor.submit(self._deliver, host, data, remote_path, mtime, report.checksum)
+                           for host in hosts]
+                try:
+                    for future in as_completed(futures):
+                        delivery = future.result()
+                        report.deliveries.append(delivery)
+                        if on_delivery is not None:
+                            on_delivery(delivery)
+                except BaseException:
+                    # The workers read the mapping, which must outlive them
+                    self.cancel()
+                    raise
+        report.duration = time.monotonic() - started
+        return report
+
+    @staticmethod
+    @contextmanager
+    def _mapped(f) -> Iterator[memoryview]:
+        if os.fstat(f.fileno()).st_size == 0:
+            # Empty files cannot be mapped
+            yield memoryview(b"")
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)
+            try:
+                yield view
+            finally:
+                view.release()
+
+    @contextmanager
+    def _host_slot(self, host: SSHHost) -> Iterator[None]:
+        with self._lock:
+            slot = self._slots.setdefault(pool_key(host), threading.Semaphore(self.per_host))
+        with slot:
+            yield
+
+    def _deliver(self, host: SSHHost, data: memoryview, remote_path: str, mtime: float,
+                 expected: str) -> Delivery:
+        started = time.monotonic()
+        delivery = Delivery(alias=host.alias, status=CANCELLED)
+        try:
+            with self._host_slot(host):
+                if self.cancelled:
+                    return delivery
+                part_path = remote_path + PART_SUFFIX
+                with self.pool.sftp(host) as sftp:
+                    with self._lock:
+                        self._sessions.add(sftp)
+                    try:
+                        self._send(sftp, data, part_path, delivery)
+                        if self.verify:
+                            delivery.checksum = self.transfer.checksum(host, part_path)
+                            if delivery.checksum != expected:
+                                delivery.status = MISMATCH
+                                delivery.error = f"SHA-256 on the host is {delivery.checksum}"
+                                sftp.remove(part_path)
+                                return delivery
+                        replace_remote(sftp, part_path, remote_path)
+                        sftp.utime(remote_path, (mtime, mtime))
+                    except BaseException:
+                        with suppress(Exception):
+                            sftp.remove(part_path)
+                        raise
+                    finally:
+                        with self._lock:
+                            self._sessions.discard(sftp)
+                delivery.status = OK
+        except Exception as e:
+            if not self.cancelled:
+                delivery.status = ERROR
+                delivery.error = str(e) or type(e).__name__
+        finally:
+            delivery.duration = time.monotonic() - started
+        return delivery
+
+    def _send(self, sftp: paramiko.SFTPClient, data: memoryview, part_path: str,
+              delivery: Delivery) -> None:
+        with sftp.open(part_path, "w") as f:
+            # Writes go out without waiting for each acknowledgement; closing
+            # waits for them all
+            f.set_pipelined(True)
+            for offset in range(0, len(data), self.chunk_size):
+                if self.cancelled:
+                    raise _Cancelled()
+                chunk = data[offset:offset + self.chunk_size]
+                if self.bucket is not None:
+                    self.bucket.consume(len(chunk))
+                f.write(chunk)
+                delivery.sent += len(chunk)
+                chunk.release()
@@ -0,0 +1,136 @@
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List, Optional, Set
+
+import paramiko
+
+from .command_stream import STDOUT, CommandStream
+from .connection_pool import ConnectionPool
+from .host_manager import SSHHost
+from .metrics import CHANNEL, COMMAND, EXEC, EXECUTE, TOTAL
+
+# Result statuses
+OK = "ok"
+FAILED = "failed"
+ERROR = "error"
+TIMEOUT = "timeout"
+CANCELLED = "cancelled"
+
+
+@dataclass
+class HostResult:
+    """Outcome of running a command on one host."""
+    alias: str
+    status: str
+    exit_code: Optional[int] = None
+    stdout: str = ""
+    stderr: str = ""
+    error: Optional[str] = None
+    duration: float = 0.0
+
+
+class FanOutExecutor:
+    """Runs a command on many hosts with bounded concurrency.
+
+    At most ``max_workers`` hosts are worked on at once, each in a pooled
+    thread opening a channel on a session from the connection pool, so a
+    thousand hosts need neither a thousand threads nor a thousand
+    simultaneous handshakes. Results are yielded as each host finishes.
+    Every host gets ``timeout`` seconds, covering both the connection and
+    the command. ``cancel`` stops hosts that have not started and closes
+    the channels of those still running.
+    """
+
+    def __init__(self, pool: ConnectionPool, max_workers: int = 32, timeout: float = 30.0):
+        self.pool = pool
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._cancelled = threading.Event()
+        self._channels: Set[paramiko.Channel] = set()
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self) -> None:
+        """Stop the current run; hosts still in flight report as cancelled."""
+        self._cancelled.set()
+        with self._lock:
+            channels = list(self._channels)
+        for channel in channels:
+            channel.close()
+
+    def run(self, hosts: Iterable[SSHHost], command: str) -> Iterator[HostResult]:
+        """Run ``command`` on every host, yielding each result as it finishes."""
+        self._cancelled.clear()
+        executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="fanout")
+        futures: List[Future] = [executor.submit(self._run_one, host, command) for host in hosts]
+        finished = 0
+        try:
+            for future in as_completed(futures):
+                finished += 1
+                yield future.result()
+        finally:
+            if finished < len(futures):
+                # The caller stopped iterating early
+                self.cancel()
+            # shutdown(cancel_futures=True) needs Python 3.9
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def _run_one(self, host: SSHHost, command: str) -> HostResult:
+        started = time.monotonic()
+        deadline = started + self.timeout
+        result = HostResult(alias=host.alias, status=CANCELLED)
+        if self.cancelled:
+            return result
+        metrics = self.pool.metrics
+        try:
+            with metrics.span(EXECUTE, TOTAL, host), \
+                    self.pool.connection(host, timeout=self.timeout) as client:
+                with metrics.span(EXECUTE, CHANNEL, host):
+                    channel = client.get_transport().open_session(timeout=self._remaining(deadline))
+                with self._lock:
+                    self._channels.add(channel)
+                try:
+                    with metrics.span(EXECUTE, EXEC, host):
+                        channel.exec_command(command)
+                    with metrics.span(EXECUTE, COMMAND, host) as span:
+                        span.bytes = self._collect(channel, deadline, result)
+                finally:
+                    with self._lock:
+                        self._channels.discard(channel)
+                    channel.close()
+        except Exception as e:
+            if not self.cancelled:
+                result.status = TIMEOUT if isinstance(e, TimeoutError) else ERROR
+                result.error = str(e) or type(e).__name__
+        result.duration = time.monotonic() - started
+        return result
+
+    def _collect(self, channel: paramiko.Channel, deadline: float, result: HostResult) -> int:
+        """Read a command's output until it exits, the deadline passes or the run is cancelled.
+
+        Returns the bytes of output read.
+        """
+        stream = CommandStream(channel, timeout=self._remaining(deadline))
+        stdout, stderr = [], []
+        try:
+            for chunk in stream:
+                (stdout if chunk.stream == STDOUT else stderr).append(chunk.text)
+        except TimeoutError:
+            raise TimeoutError(f"Command timed out after {self.timeout:g}s") from None
+        result.stdout = "".join(stdout)
+        result.stderr = "".join(stderr)
+        if not self.cancelled and stream.exit_code is not None:
+            result.exit_code = stream.exit_code
+            result.status = OK if result.exit_code == 0 else FAILED
+        return stream.bytes_received
+
+    @staticmethod
+    def _remaining(deadline: float) -> float:
+        return max(deadline - time.monotonic(), 0.0)
@@ -0,0 +1,71 @@
+from typing import Any, Dict, Iterable, List, Mapping, Tuple
+
+from .records import field_value
+
+# Host fields that get a value -> aliases index.
+INDEXED_FIELDS: Tuple[str, ...] = ("group", "host", "user")
+
+
+class HostIndex:
+    """Secondary indexes from host field values to aliases.
+
+    Each indexed field maps a value to the aliases holding it, kept in
+    insertion order (a dict is used as an ordered set), so ``add`` and
+    ``remove`` are O(1) and lookups never scan the inventory. Empty values
+    are not indexed. Hosts may be host objects or raw field dicts, and must
+    be removed with the same field values they were added with, so callers
+    replace hosts rather than mutate them.
+    """
+
+    def __init__(self, fields: Iterable[str] = INDEXED_FIELDS):
+        self._indexes: Dict[str, Dict[Any, Dict[str, None]]] = {
+            field: {} for field in fields
+        }
+
+    @classmethod
+    def build(cls, hosts: Mapping[str, Any], fields: Iterable[str] = INDEXED_FIELDS) -> "HostIndex":
+        """Build an index over all hosts of a mapping."""
+        index = cls(fields)
+        for alias, host in hosts.items():
+            index.add(alias, host)
+        return index
+
+    @property
+    def fields(self) -> List[str]:
+        return list(self._indexes)
+
+    def add(self, alias: str, host: Any) -> None:
+        """Index ``host`` under ``alias``."""
+        for field, index in self._indexes.items():
+            value = field_value(host, field)
+            if value:
+                index.setdefault(value, {})[alias] = None
+
+    def remove(self, alias: str, host: Any) -> None:
+        """Drop ``alias`` from the entries ``host`` was indexed under."""
+        for field, index in self._indexes.items():
+            value = field_value(host, field)
+            aliases = index.get(value)
+            if aliases is None:
+                continue
+            aliases.pop(alias, None)
+            if not aliases:
+                del index[value]
+
+    def aliases(self, field: str, value: Any) -> List[str]:
+        """Return the aliases whose ``field`` equals ``value``."""
+        return list(self._field(field).get(value, ()))
+
+    def distinct(self, field: str) -> List[Any]:
+        """Return the distinct non-empty values of ``field``."""
+        return list(self._field(field))
+
+    def count(self, field: str, value: Any) -> int:
+        """Return the number of aliases whose ``field`` equals ``value``."""
+        return len(self._field(field).get(value, ()))
+
+    def _field(self, field: str) -> Dict[Any, Dict[str, None]]:
+        try:
+            return self._indexes[field]
+        except KeyError:
+            raise ValueError(f"Field '{field}' is not indexed") from None
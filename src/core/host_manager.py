@@ -1,9 +1,24 @@
-import json
 import os
-from typing import Dict, List, Optional
-from dataclasses import dataclass, asdict
+import sys
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, MutableMapping, Optional, Set, Tuple
+from dataclasses import dataclass, field, fields, replace
 
-@dataclass
+from .host_index import HostIndex
+from .records import LazyHostMap, StoredHost, field_value, intern_value
+from .search_index import SEARCH_FIELDS, SearchIndex
+from .snapshot import SnapshotCache
+from .storage import HostStorage, JournalStorage, JsonStorage, SQLiteHostMap, SQLiteStorage
+from .watcher import FileWatcher, InventoryLock
+from ..utils.helpers import load_settings
+
+# Fields whose values repeat across many hosts; each distinct value is kept once.
+INTERNED_FIELDS = ("user", "group", "key_path")
+
+# Slotted hosts have no per-instance __dict__; dataclass(slots=True) needs Python 3.10.
+_DATACLASS_OPTIONS = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+@dataclass(**_DATACLASS_OPTIONS)
 class SSHHost:
     host: str
     user: str
@@ -13,68 +28,409 @@ class SSHHost:
     group: Optional[str] = None
     key_path: Optional[str] = None
 
+    def __post_init__(self):
+        self.user = intern_value(self.user)
+        self.group = intern_value(self.group)
+        self.key_path = intern_value(self.key_path)
+
+HOST_FIELDS = tuple(f.name for f in fields(SSHHost))
+
+@dataclass
+class HostDiff:
+    """Aliases that were added, removed or modified by a reload.
+
+    ``full`` means the backend cannot tell what changed, so everything
+    should be redrawn.
+    """
+    added: Set[str] = field(default_factory=set)
+    removed: Set[str] = field(default_factory=set)
+    modified: Set[str] = field(default_factory=set)
+    full: bool = False
+
+    def __bool__(self) -> bool:
+        return self.full or bool(self.added or self.removed or self.modified)
+
+    def merge(self, other: "HostDiff") -> None:
+        """Fold a later diff into this one."""
+        self.full = self.full or other.full
+        for alias in other.added:
+            if alias in self.removed:
+                self.removed.discard(alias)
+                self.modified.add(alias)
+            else:
+                self.added.add(alias)
+        for alias in other.removed:
+            if alias in self.added:
+                self.added.discard(alias)
+            else:
+                self.modified.discard(alias)
+                self.removed.add(alias)
+        self.modified.update(other.modified - self.added)
+
+def _stored_items(hosts: MutableMapping[str, Any]) -> Iterator[Tuple[str, StoredHost]]:
+    if isinstance(hosts, LazyHostMap):
+        return hosts.records()
+    return iter(hosts.items())
+
+def diff_hosts(old: MutableMapping[str, Any], new: MutableMapping[str, Any]) -> HostDiff:
+    """Compare two host mappings alias by alias, without building lazy hosts."""
+    diff = HostDiff()
+    old_values = {
+        alias: tuple(field_value(host, name) for name in HOST_FIELDS)
+        for alias, host in _stored_items(old)
+    }
+    for alias, host in _stored_items(new):
+        values = old_values.pop(alias, None)
+        if values is None:
+            diff.added.add(alias)
+        elif values != tuple(field_value(host, name) for name in HOST_FIELDS):
+            diff.modified.add(alias)
+    diff.removed.update(old_values)
+    return diff
+
 class HostManager:
-    def __init__(self, config_dir: str = "config"):
+    def __init__(self, config_dir: str = "config", storage: Optional[HostStorage] = None,
+                 lazy: bool = False):
+        """Initialize the host manager.
+
+        Args:
+            config_dir: Directory holding the host inventory.
+            storage: Storage backend; picked from the config dir if omitted.
+            lazy: Start empty instead of loading every host up front. The
+                caller then feeds the inventory in with ``stream_records``
+                and ``apply_records`` and calls ``finish_loading``.
+        """
         self.config_dir = config_dir
         self.hosts_file = os.path.join(config_dir, "ssh_hosts.json")
         self._ensure_config_dir()
-        self.hosts: Dict[str, SSHHost] = {}
-        self.load_hosts()
+        self.db_file = os.path.join(config_dir, "ssh_hosts.db")
+        # Cooperating writers (other instances, provisioning scripts) take this lock
+        self.lock = InventoryLock(os.path.join(config_dir, "ssh_hosts.lock"))
+        self._storage = storage or self._create_storage()
+        self.watcher = FileWatcher(self._storage.watched_paths())
+        if isinstance(self._storage, JournalStorage):
+            self._storage.watcher = self.watcher
+        # External changes merged in while committing, not yet reported by reload()
+        self._external_diff = HostDiff()
+        self.hosts: MutableMapping[str, SSHHost] = {}
+        self.index: Optional[HostIndex] = None
+        # Built on first search, then kept in sync like ``index``
+        self.search_index: Optional[SearchIndex] = None
+        self.search_indexed = False
+        # Original host of every alias touched by the open batch (None if it was absent).
+        self._batch: Optional[Dict[str, Optional[SSHHost]]] = None
+        self.loaded = False
+        if lazy and not isinstance(self._storage, SQLiteStorage):
+            self.hosts = LazyHostMap(SSHHost, interned=INTERNED_FIELDS)
+            self.index = HostIndex()
+        else:
+            # SQLite does not load rows up front, so it never needs lazy mode.
+            self.load_hosts()
 
     def _ensure_config_dir(self):
         """Ensure the config directory exists."""
         os.makedirs(self.config_dir, exist_ok=True)
-        if not os.path.exists(self.hosts_file):
-            self._save_hosts({})
+
+    def _create_storage(self) -> HostStorage:
+        """Pick the storage backend from settings.json or the config dir contents."""
+        settings = load_settings(self.config_dir)
+        backend = settings.get("storage")
+        if backend is None:
+            backend = "sqlite" if os.path.exists(self.db_file) else "journal"
+        # Binary copy of the parsed ssh_hosts.json, read instead of the JSON while fresh
+        cache = SnapshotCache(self.hosts_file) if settings.get("snapshot_cache", True) else None
+        if backend == "sqlite":
+            return SQLiteStorage(self.db_file, migrate_from=self.hosts_file)
+        if backend == "journal":
+            return JournalStorage(self.hosts_file, file_lock=self.lock, cache=cache, factory=SSHHost)
+        if backend == "json":
+            return JsonStorage(self.hosts_file, cache=cache)
+        raise ValueError(f"Unknown storage backend '{backend}'")
 
     def load_hosts(self) -> None:
-        """Load hosts from the JSON file."""
+        """Load hosts from the storage backend."""
+        with self.lock.shared():
+            self._load()
+        self.loaded = True
+
+    def _load(self) -> None:
+        """Load hosts and rebuild the indexes; the caller holds the lock."""
+        self.hosts = self._storage.load(SSHHost)
+        # SQLite answers field lookups from its own table indexes.
+        self.index = (
+            None if isinstance(self.hosts, SQLiteHostMap) else HostIndex.build(self.hosts)
+        )
+        self.search_index = None
+        self.search_indexed = False
+        self.watcher.mark(hash_contents=True)
+
+    def _reload_changes(self) -> HostDiff:
+        """Reload the hosts and return what changed; the caller holds the lock.
+
+        A built search index is updated for the changed aliases only.
+        """
+        old, search_index, indexed = self.hosts, self.search_index, self.search_indexed
+        self._load()
+        diff = diff_hosts(old, self.hosts)
+        if search_index is not None:
+            for alias in diff.removed:
+                search_index.remove(alias)
+            for alias in diff.added | diff.modified:
+                search_index.add(alias, self.peek_host(alias))
+            self.search_index, self.search_indexed = search_index, indexed
+        return diff
+
+    def reload(self) -> Optional[HostDiff]:
+        """Reload the hosts if the stored inventory changed behind our back.
+
+        Returns None when nothing changed, otherwise the per-alias diff
+        against the hosts held before, including external changes merged in
+        by earlier commits.
+        """
+        diff, self._external_diff = self._external_diff, HostDiff()
+        if isinstance(self._storage, SQLiteStorage):
+            # Rows are read live; only report that another connection wrote.
+            if self._storage.changed_externally():
+                diff.full = True
+        else:
+            with self.lock.shared():
+                if self.watcher.changed():
+                    diff.merge(self._reload_changes())
+        return diff or None
+
+    def stream_records(self, page_size: int = 200) -> Iterator[List[Tuple[str, Optional[Dict[str, Any]]]]]:
+        """Parse the stored inventory incrementally, in pages of raw records.
+
+        Each record is an (alias, fields) pair, where ``None`` fields delete
+        the alias. Nothing is changed until a page is passed to
+        ``apply_records``, so this can run in a worker thread.
+        """
+        with self.lock.shared():
+            self.watcher.mark()
+            page = []
+            for record in self._storage.replay():
+                page.append(record)
+                if len(page) >= page_size:
+                    yield page
+                    page = []
+            if page:
+                yield page
+
+    def apply_records(self, records: Iterable[Tuple[str, Optional[Dict[str, Any]]]]) -> List[str]:
+        """Apply a page from ``stream_records`` to a lazily loading manager.
+
+        Hosts are kept as raw records until they are looked up. Returns the
+        aliases added or changed by the page.
+        """
+        hosts: LazyHostMap = self.hosts
+        changed = []
+        for alias, fields in records:
+            old = hosts.peek(alias)
+            if old is not None:
+                self.index.remove(alias, old)
+            if self.search_index is not None:
+                self.search_index.remove(alias)
+            if fields is None:
+                hosts.discard(alias)
+                continue
+            record = hosts.set_record(alias, fields)
+            self.index.add(alias, record)
+            if self.search_index is not None:
+                self.search_index.add(alias, record)
+            changed.append(alias)
+        return changed
+
+    def finish_loading(self) -> None:
+        """Mark a lazy load as complete."""
+        self.loaded = True
+
+    def _persist(self, originals: Dict[str, Optional[SSHHost]]) -> None:
+        """Persist the aliases touched by a batch, given their hosts before it.
+
+        If another writer changed the inventory since we last read it, its
+        changes are loaded first and ours are applied on top, so neither
+        side's hosts are lost.
+        """
+        changed = list(originals)
+        with self.lock.exclusive():
+            if self.watcher.changed():
+                originals = self._merge_external(changed)
+            self._storage.commit(self.hosts, changed, originals)
+            self.watcher.mark()
+
+    def _merge_external(self, changed: List[str]) -> Dict[str, Optional[SSHHost]]:
+        """Reload the stored hosts and re-apply our uncommitted changes.
+
+        Returns the reloaded hosts of the changed aliases.
+        """
+        ours = {alias: self.hosts.get(alias) for alias in changed}
+        external = self._reload_changes()
+        stored = {alias: self.hosts.get(alias) for alias in changed}
+        for alias, host in ours.items():
+            if host is not None:
+                self._put(alias, host)
+            elif alias in self.hosts:
+                self._remove(alias)
+        external.added.difference_update(changed)
+        external.removed.difference_update(changed)
+        external.modified.difference_update(changed)
+        self._external_diff.merge(external)
+        return stored
+
+    def _put(self, alias: str, host: SSHHost) -> None:
+        """Store a host under an alias, keeping the indexes in sync."""
+        old = self.hosts.get(alias)
+        if self._batch is not None and alias not in self._batch:
+            self._batch[alias] = old
+        if self.index is not None:
+            if old is not None:
+                self.index.remove(alias, old)
+            self.index.add(alias, host)
+        if self.search_index is not None:
+            self.search_index.add(alias, host)
+        self.hosts[alias] = host
+
+    def _remove(self, alias: str) -> None:
+        """Remove a host, keeping the indexes in sync."""
+        old = self.hosts[alias]
+        if self._batch is not None and alias not in self._batch:
+            self._batch[alias] = old
+        if self.index is not None:
+            self.index.remove(alias, old)
+        if self.search_index is not None:
+            self.search_index.remove(alias)
+        del self.hosts[alias]
+
+    @contextmanager
+    def batch(self) -> Iterator["HostManager"]:
+        """Apply several mutations as one transaction.
+
+        Inside the block, mutations only change the in-memory hosts. On exit
+        the touched hosts are validated and persisted with a single write. If
+        the block raises or validation fails, every touched host is restored
+        and nothing is written. Nested batches join the outermost one.
+        """
+        if self._batch is not None:
+            yield self
+            return
+        self._batch = {}
         try:
-            with open(self.hosts_file, 'r') as f:
-                data = json.load(f)
-                self.hosts = {
-                    alias: SSHHost(**host_data)
-                    for alias, host_data in data.items()
-                }
-        except FileNotFoundError:
-            self.hosts = {}
-            self._save_hosts({})
-
-    def _save_hosts(self, hosts: Dict[str, SSHHost]) -> None:
-        """Save hosts to the JSON file."""
-        with open(self.hosts_file, 'w') as f:
-            json.dump(
-                {alias: asdict(host) for alias, host in hosts.items()},
-                f,
-                indent=2
-            )
+            yield self
+            self._validate(self._batch)
+            self._persist(self._batch)
+        except BaseException:
+            self._rollback(self._batch)
+            raise
+        finally:
+            self._batch = None
+
+    def _validate(self, aliases: Iterable[str]) -> None:
+        """Check the hosts stored under the given aliases.
+
+        Only what ``add_host`` requires is checked: field formats are up to
+        the callers, as hosts such as IPv6 addresses are valid for ssh but
+        not for the form's validators.
+        """
+        for alias in aliases:
+            host = self.hosts.get(alias)
+            if host is None:
+                continue
+            if not host.alias:
+                raise ValueError("Host alias is required")
+            if host.alias != alias:
+                raise ValueError(f"Host alias '{host.alias}' does not match '{alias}'")
+
+    def _rollback(self, originals: Dict[str, Optional[SSHHost]]) -> None:
+        """Restore the hosts touched by a failed batch."""
+        self._batch = None
+        for alias, host in originals.items():
+            if host is not None:
+                self._put(alias, host)
+            elif alias in self.hosts:
+                self._remove(alias)
+        self._storage.rollback()
+
+    def _find(self, field: str, value: str) -> List[SSHHost]:
+        """Get all hosts whose indexed field equals a value."""
+        if self.index is None:
+            return self.hosts.find(field, value)
+        return [self.hosts[alias] for alias in self.index.aliases(field, value)]
+
+    def _find_aliases(self, field: str, value: str) -> List[str]:
+        """Get the aliases of the hosts whose indexed field equals a value."""
+        if self.index is None:
+            return self.hosts.find_aliases(field, value)
+        return self.index.aliases(field, value)
+
+    def close(self) -> None:
+        """Flush pending work and release the storage backend."""
+        self._storage.close()
 
     def add_host(self, host: SSHHost) -> None:
         """Add a new host."""
         if not host.alias:
             raise ValueError("Host alias is required")
-        self.hosts[host.alias] = host
-        self._save_hosts(self.hosts)
+        with self.batch():
+            self._put(host.alias, host)
 
     def update_host(self, alias: str, host: SSHHost) -> None:
         """Update an existing host."""
         if alias not in self.hosts:
             raise KeyError(f"Host with alias '{alias}' not found")
-        self.hosts[alias] = host
-        self._save_hosts(self.hosts)
+        with self.batch():
+            self._put(alias, host)
 
     def delete_host(self, alias: str) -> None:
         """Delete a host."""
         if alias not in self.hosts:
             raise KeyError(f"Host with alias '{alias}' not found")
-        del self.hosts[alias]
-        self._save_hosts(self.hosts)
+        with self.batch():
+            self._remove(alias)
+
+    def rename_host(self, alias: str, new_alias: str) -> None:
+        """Move a host to a new alias."""
+        if alias not in self.hosts:
+            raise KeyError(f"Host with alias '{alias}' not found")
+        if new_alias == alias:
+            return
+        if not new_alias:
+            raise ValueError("Host alias is required")
+        if new_alias in self.hosts:
+            raise ValueError(f"Host with alias '{new_alias}' already exists")
+        with self.batch():
+            host = self.hosts[alias]
+            self._remove(alias)
+            self._put(new_alias, replace(host, alias=new_alias))
 
     def get_host(self, alias: str) -> SSHHost:
         """Get a host by alias."""
-        if alias not in self.hosts:
+        host = self.hosts.get(alias)
+        if host is None:
             raise KeyError(f"Host with alias '{alias}' not found")
-        return self.hosts[alias]
+        return host
+
+    def peek_host(self, alias: str) -> Optional[StoredHost]:
+        """Get a host without building it if it was loaded lazily.
+
+        Returns an SSHHost or its raw field dict; read it with ``field_value``.
+        """
+        if isinstance(self.hosts, LazyHostMap):
+            return self.hosts.peek(alias)
+        return self.hosts.get(alias)
+
+    def iter_records(self, group: Optional[str] = None) -> Iterator[Tuple[str, StoredHost]]:
+        """Iterate over (alias, host) pairs, optionally for a single group.
+
+        Lazily loaded hosts are not built; hosts are SSHHost objects or raw
+        field dicts, to be read with ``field_value``.
+        """
+        if group is not None:
+            if self.index is None:
+                return ((host.alias, host) for host in self.hosts.find("group", group))
+            return ((alias, self.peek_host(alias)) for alias in self.index.aliases("group", group))
+        if isinstance(self.hosts, LazyHostMap):
+            return self.hosts.records()
+        return iter(self.hosts.items())
 
     def get_all_hosts(self) -> List[SSHHost]:
         """Get all hosts."""
@@ -82,8 +438,58 @@ class HostManager:
 
     def get_hosts_by_group(self, group: str) -> List[SSHHost]:
         """Get all hosts in a specific group."""
-        return [host for host in self.hosts.values() if host.group == group]
+        return self._find("group", group)
+
+    def get_hosts_by_hostname(self, hostname: str) -> List[SSHHost]:
+        """Get all hosts pointing at a hostname."""
+        return self._find("host", hostname)
+
+    def get_aliases_by_hostname(self, hostname: str) -> List[str]:
+        """Get the aliases of the hosts pointing at a hostname, without building them."""
+        return self._find_aliases("host", hostname)
+
+    def get_hosts_by_user(self, user: str) -> List[SSHHost]:
+        """Get all hosts logging in as a user."""
+        return self._find("user", user)
+
+    def build_search_index(self, chunk_size: int = 500) -> Iterator[int]:
+        """Build the search index a chunk at a time, yielding the hosts indexed so far.
+
+        The index is live from the start, so mutations made between chunks
+        are indexed right away and hosts are indexed with their current
+        fields when their chunk comes up. ``search_indexed`` turns True once
+        every host is in.
+        """
+        if self.index is None:
+            # SQLite searches its table directly.
+            self.search_indexed = True
+            return
+        self.search_index = SearchIndex()
+        self.search_indexed = False
+        aliases = list(self.hosts)
+        for start in range(0, len(aliases), chunk_size):
+            for alias in aliases[start:start + chunk_size]:
+                host = self.peek_host(alias)
+                if host is not None:
+                    self.search_index.add(alias, host)
+            yield min(start + chunk_size, len(aliases))
+        self.search_indexed = True
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[str]:
+        """Return the aliases of hosts matching ``query`` in any field, best first.
+
+        The search index is built on first use unless ``build_search_index``
+        already ran.
+        """
+        if self.index is None:
+            return self.hosts.search(query, SEARCH_FIELDS, limit)
+        if not self.search_indexed:
+            for _ in self.build_search_index():
+                pass
+        return self.search_index.search(query, limit)
 
     def get_groups(self) -> List[str]:
         """Get all unique groups."""
-        return list(set(host.group for host in self.hosts.values() if host.group)) 
\ No newline at end of file
+        if self.index is None:
+            return self.hosts.distinct("group")
+        return self.index.distinct("group")
@@ -0,0 +1,389 @@
+import csv
+import fnmatch
+import getpass
+import glob
+import hashlib
+import json
+import os
+import re
+import shlex
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from .host_manager import HostManager, SSHHost
+from .storage import atomic_write
+from ..utils.helpers import validate_hostname, validate_port, validate_username
+
+# A raw host record as produced by the source parsers: SSHHost field -> value.
+Record = Dict[str, Any]
+
+# OpenSSH refuses to nest Include directives deeper than this.
+MAX_INCLUDE_DEPTH = 16
+
+_CONFIG_LINE = re.compile(r"^(\w+)\s*(?:=\s*|\s+)(.*)$")
+_WILDCARD_CHARS = set("*?!")
+
+
+def _split_config_line(line: str) -> Optional[Tuple[str, List[str]]]:
+    """Split an ssh_config line into a lowercase keyword and its arguments."""
+    match = _CONFIG_LINE.match(line)
+    if not match:
+        return None
+    keyword, rest = match.groups()
+    try:
+        args = shlex.split(rest)
+    except ValueError:
+        args = rest.split()
+    return keyword.lower(), args
+
+
+def _resolve_include(pattern: str, base_dir: str) -> List[str]:
+    """Expand an Include argument into the files it names, in glob order."""
+    pattern = os.path.expanduser(pattern)
+    if not os.path.isabs(pattern):
+        # Relative includes are resolved against the user config dir.
+        pattern = os.path.join(base_dir, pattern)
+    return [path for path in sorted(glob.glob(pattern)) if os.path.isfile(path)]
+
+
+def _config_lines(path: str, base_dir: str, depth: int = 0) -> Iterator[Tuple[str, List[str]]]:
+    """Stream (keyword, args) pairs from an ssh_config file, following Include."""
+    if depth > MAX_INCLUDE_DEPTH:
+        return
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            parsed = _split_config_line(line)
+            if parsed is None:
+                continue
+            keyword, args = parsed
+            if keyword != "include":
+                yield keyword, args
+                continue
+            for pattern in args:
+                for included in _resolve_include(pattern, base_dir):
+                    yield from _config_lines(included, base_dir, depth + 1)
+
+
+def _config_blocks(path: str) -> Iterator[Tuple[int, List[str], Dict[str, str]]]:
+    """Stream (sequence, host patterns, options) blocks from an ssh_config file.
+
+    Options set before the first ``Host`` line form a block matching every
+    host. ``Match`` blocks are not evaluated and their options are dropped.
+    Within a block only the first value of each keyword is kept.
+    """
+    base_dir = os.path.dirname(os.path.abspath(path))
+    seq = 0
+    patterns: Optional[List[str]] = ["*"]
+    options: Dict[str, str] = {}
+    for keyword, args in _config_lines(path, base_dir):
+        if keyword in ("host", "match"):
+            if patterns is not None and options:
+                yield seq, patterns, options
+            seq += 1
+            patterns = args if keyword == "host" else None
+            options = {}
+        elif args and keyword not in options:
+            options[keyword] = args[0]
+    if patterns is not None and options:
+        yield seq, patterns, options
+
+
+def _is_pattern(name: str) -> bool:
+    return any(char in _WILDCARD_CHARS for char in name)
+
+
+def _matches(patterns: List[str], name: str) -> bool:
+    """Apply OpenSSH Host pattern matching, including negated patterns."""
+    matched = False
+    for pattern in patterns:
+        if pattern.startswith("!"):
+            if fnmatch.fnmatchcase(name, pattern[1:]):
+                return False
+        elif fnmatch.fnmatchcase(name, pattern):
+            matched = True
+    return matched
+
+
+def iter_ssh_config(path: str) -> Iterator[Record]:
+    """Stream host records from an OpenSSH client config file.
+
+    Every concrete name on a ``Host`` line becomes a record. Options are
+    resolved the way ssh(1) does it: the first value obtained wins, looking
+    at all matching blocks, wildcard ``Host`` patterns included, in file
+    order. Wildcard blocks are collected in a first pass (they are few), so
+    the second pass only ever holds one block in memory.
+    """
+    pattern_blocks = [
+        (seq, patterns, options)
+        for seq, patterns, options in _config_blocks(path)
+        if any(_is_pattern(p) for p in patterns)
+    ]
+    for seq, patterns, options in _config_blocks(path):
+        for name in patterns:
+            if _is_pattern(name):
+                continue
+            resolved: Dict[str, str] = {}
+            for block_seq, block_patterns, block_options in pattern_blocks:
+                if block_seq > seq:
+                    break
+                if _matches(block_patterns, name):
+                    for key, value in block_options.items():
+                        resolved.setdefault(key, value)
+            for key, value in options.items():
+                resolved.setdefault(key, value)
+            for block_seq, block_patterns, block_options in pattern_blocks:
+                if block_seq > seq and _matches(block_patterns, name):
+                    for key, value in block_options.items():
+                        resolved.setdefault(key, value)
+
+            identity = resolved.get("identityfile")
+            yield {
+                "alias": name,
+                "host": resolved.get("hostname", name).replace("%h", name),
+                "user": resolved.get("user"),
+                "port": resolved.get("port", 22),
+                "key_path": os.path.expanduser(identity) if identity else None,
+            }
+
+
+def iter_known_hosts(path: str) -> Iterator[Record]:
+    """Stream host records from an OpenSSH known_hosts file.
+
+    Hashed entries, markers (``@cert-authority``, ``@revoked``) and wildcard
+    patterns carry no usable host name and are skipped. ``[host]:port``
+    entries keep their port, and get ``host:port`` as alias.
+    """
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith(("#", "@", "|")):
+                continue
+            names = line.split(None, 1)[0]
+            for name in names.split(","):
+                if _is_pattern(name) or name.startswith("|"):
+                    continue
+                port = 22
+                if name.startswith("["):
+                    host, _, port_str = name[1:].partition("]:")
+                    port = int(port_str) if port_str.isdigit() else 22
+                else:
+                    host = name
+                yield {
+                    "alias": host if port == 22 else f"{host}:{port}",
+                    "host": host,
+                    "port": port,
+                }
+
+
+def iter_csv(path: str) -> Iterator[Record]:
+    """Stream host records from a CSV file whose header names SSHHost fields."""
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        for row in csv.DictReader(f):
+            yield {key: value for key, value in row.items() if key and value}
+
+
+def iter_jsonl(path: str) -> Iterator[Record]:
+    """Stream host records from a file with one JSON object per line."""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+PARSERS: Dict[str, Callable[[str], Iterator[Record]]] = {
+    "ssh_config": iter_ssh_config,
+    "known_hosts": iter_known_hosts,
+    "csv": iter_csv,
+    "jsonl": iter_jsonl,
+}
+
+
+def detect_format(path: str) -> str:
+    """Guess the source format from a file name."""
+    name = os.path.basename(path).lower()
+    if "known_hosts" in name:
+        return "known_hosts"
+    if name.endswith(".csv"):
+        return "csv"
+    if name.endswith((".jsonl", ".ndjson")):
+        return "jsonl"
+    return "ssh_config"
+
+
+def _source_files(path: str, fmt: str) -> List[str]:
+    """List every file a source reads, following ssh_config Include directives."""
+    if fmt != "ssh_config":
+        return [path]
+    files = [path]
+    base_dir = os.path.dirname(os.path.abspath(path))
+    pending = [(path, 0)]
+    while pending:
+        current, depth = pending.pop()
+        if depth >= MAX_INCLUDE_DEPTH:
+            continue
+        with open(current, 'r', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                parsed = _split_config_line(line.strip())
+                if parsed is None or parsed[0] != "include":
+                    continue
+                for pattern in parsed[1]:
+                    for included in _resolve_include(pattern, base_dir):
+                        files.append(included)
+                        pending.append((included, depth + 1))
+    return files
+
+
+def _source_digest(path: str, fmt: str) -> str:
+    """Hash the contents of every file a source reads."""
+    digest = hashlib.sha256(fmt.encode())
+    for source_file in _source_files(path, fmt):
+        digest.update(os.path.abspath(source_file).encode() + b"\0")
+        with open(source_file, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 16), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def _host_digest(host: SSHHost) -> str:
+    fields = (host.host, host.user, host.port, host.alias, host.description, host.group, host.key_path)
+    return hashlib.sha1(json.dumps(fields).encode()).hexdigest()
+
+
+@dataclass
+class ImportResult:
+    """Summary of importing one source."""
+    source: str
+    added: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    errors: List[str] = field(default_factory=list)
+    skipped: bool = False
+
+
+class HostImporter:
+    """Imports hosts from ssh_config, known_hosts, CSV and JSONL sources.
+
+    Sources are parsed lazily and validated in batches of ``batch_size``
+    records, and everything is committed to the HostManager in one batch.
+    Content hashes of each source and of every host it produced are kept in
+    ``import_state.json``, so re-importing an unchanged source is a no-op
+    and a changed one only applies the hosts that actually differ.
+    """
+
+    def __init__(self, host_manager: HostManager, batch_size: int = 500,
+                 state_file: Optional[str] = None):
+        self.host_manager = host_manager
+        self.batch_size = batch_size
+        self.state_file = state_file or os.path.join(host_manager.config_dir, "import_state.json")
+
+    def _load_state(self) -> Dict[str, Any]:
+        try:
+            with open(self.state_file, 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def import_source(
+        self,
+        path: str,
+        fmt: Optional[str] = None,
+        group: Optional[str] = None,
+        default_user: Optional[str] = None,
+    ) -> ImportResult:
+        """Import all hosts from a source file.
+
+        Args:
+            path: Path of the source file.
+            fmt: One of ``PARSERS``; detected from the file name if omitted.
+            group: Group for hosts whose source does not set one.
+            default_user: User for hosts whose source does not set one.
+                Defaults to the current login name.
+        """
+        path = os.path.expanduser(path)
+        fmt = fmt or detect_format(path)
+        if fmt not in PARSERS:
+            raise ValueError(f"Unknown import format '{fmt}'")
+        source_key = os.path.abspath(path)
+        result = ImportResult(source=path)
+
+        state = self._load_state()
+        source_state = state.get(source_key, {})
+        digest = _source_digest(path, fmt)
+        options_key = json.dumps([group, default_user])
+        if source_state.get("digest") == digest and source_state.get("options") == options_key:
+            result.skipped = True
+            result.unchanged = len(source_state.get("entries", {}))
+            return result
+
+        defaults = {"user": default_user or getpass.getuser(), "group": group}
+        old_entries: Dict[str, str] = source_state.get("entries", {})
+        entries: Dict[str, str] = {}
+        hosts = self.host_manager.hosts
+
+        with self.host_manager.batch():
+            for chunk in self._chunks(PARSERS[fmt](path)):
+                for host in self._validate(chunk, defaults, result):
+                    host_digest = _host_digest(host)
+                    entries[host.alias] = host_digest
+                    existing = hosts.get(host.alias)
+                    if old_entries.get(host.alias) == host_digest and existing is not None:
+                        result.unchanged += 1
+                    elif existing is None:
+                        self.host_manager.add_host(host)
+                        result.added += 1
+                    elif existing == host:
+                        result.unchanged += 1
+                    else:
+                        self.host_manager.update_host(host.alias, host)
+                        result.updated += 1
+
+        state[source_key] = {"digest": digest, "options": options_key, "entries": entries}
+        atomic_write(self.state_file, json.dumps(state))
+        return result
+
+    def _chunks(self, records: Iterator[Record]) -> Iterator[List[Record]]:
+        chunk: List[Record] = []
+        for record in records:
+            chunk.append(record)
+            if len(chunk) >= self.batch_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def _validate(self, records: List[Record], defaults: Dict[str, Any],
+                  result: ImportResult) -> List[SSHHost]:
+        """Turn a batch of records into hosts, collecting errors for invalid ones."""
+        hosts = []
+        for record in records:
+            alias = record.get("alias") or record.get("host")
+            user = record.get("user") or defaults["user"]
+            port = str(record.get("port") or 22)
+            errors = [
+                error
+                for valid, error in (
+                    validate_hostname(record.get("host") or ""),
+                    validate_username(user),
+                    validate_port(port),
+                )
+                if not valid
+            ]
+            if not alias:
+                errors.append("Alias is required")
+            if errors:
+                result.errors.append(f"{alias or '?'}: {'; '.join(errors)}")
+                continue
+            hosts.append(SSHHost(
+                host=record["host"],
+                user=user,
+                port=int(port),
+                alias=alias,
+                description=record.get("description"),
+                group=record.get("group") or defaults["group"],
+                key_path=record.get("key_path"),
+            ))
+        return hosts
@@ -0,0 +1,249 @@
+import json
+import math
+import time
+from collections import deque
+from typing import IO, Deque, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from .host_manager import SSHHost
+
+# Operations
+CONNECT = "connect"
+EXECUTE = "execute"
+UPLOAD = "upload"
+DOWNLOAD = "download"
+COPY = "copy"
+
+# Phases. Every operation has a TOTAL span; a connect made by the pool's
+# own connector is split into name lookup, TCP connect, banner and key
+# exchange, and authentication, and a command into opening its channel,
+# the exec request and the command running until its output ends.
+TOTAL = "total"
+DNS = "dns"
+TCP = "tcp"
+KEX = "kex"
+AUTH = "auth"
+CHANNEL = "channel"
+EXEC = "exec"
+COMMAND = "command"
+PHASES = (DNS, TCP, KEX, AUTH, CHANNEL, EXEC, COMMAND, TOTAL)
+_PHASE_ORDER = {phase: index for index, phase in enumerate(PHASES)}
+
+# Spans kept by default; the oldest are dropped first
+DEFAULT_CAPACITY = 10000
+
+# Quantiles of the summaries and the Prometheus export
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Prefix of the exported Prometheus metric names
+METRIC_PREFIX = "ssh_tui_manager"
+
+
+class Span(NamedTuple):
+    """One timed phase of an operation on a host."""
+    operation: str
+    phase: str
+    alias: str
+    group: Optional[str]
+    # Unix time the phase started at
+    started: float
+    duration: float
+    ok: bool = True
+    # Bytes moved, for transfers and command output
+    bytes: int = 0
+
+    @property
+    def throughput(self) -> Optional[float]:
+        """Bytes per second, for spans that moved data."""
+        return self.bytes / self.duration if self.bytes and self.duration > 0 else None
+
+    def to_dict(self) -> Dict[str, object]:
+        record = self._asdict()
+        if self.bytes:
+            record["throughput"] = self.throughput
+        return record
+
+
+class Summary(NamedTuple):
+    """Durations of one phase of one operation, for a host or a group."""
+    name: Optional[str]
+    operation: str
+    phase: str
+    count: int
+    errors: int
+    # Seconds at each of QUANTILES
+    quantiles: Tuple[float, ...]
+    total: float
+    bytes: int
+
+    @property
+    def throughput(self) -> Optional[float]:
+        return self.bytes / self.total if self.bytes and self.total > 0 else None
+
+
+def quantile(ordered: List[float], q: float) -> float:
+    """Nearest-rank quantile of sorted values."""
+    return ordered[max(math.ceil(q * len(ordered)) - 1, 0)]
+
+
+class _Timer:
+    """Times the block it guards and records it as a span."""
+
+    __slots__ = ("metrics", "operation", "phase", "host", "bytes", "_started", "_start")
+
+    def __init__(self, metrics: "Metrics", operation: str, phase: str, host: SSHHost):
+        self.metrics = metrics
+        self.operation = operation
+        self.phase = phase
+        self.host = host
+        self.bytes = 0
+
+    def __enter__(self) -> "_Timer":
+        self._started = time.time()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.metrics.record(self.operation, self.phase, self.host, self._started,
+                            time.perf_counter() - self._start, exc_type is None, self.bytes)
+
+
+class _NullTimer:
+    """Stands in for a timer while instrumentation is off."""
+
+    __slots__ = ()
+    bytes = property(lambda self: 0, lambda self, value: None)
+
+    def __enter__(self) -> "_NullTimer":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Metrics:
+    """Timing spans of SSH operations, kept in a ring buffer.
+
+    ``span`` times a block as one phase of an operation on a host;
+    recording appends a tuple to a bounded deque, so the newest
+    ``capacity`` spans are kept without locking or growing. While
+    ``enabled`` is false ``span`` returns a shared no-op timer and nothing
+    is recorded. A ``capacity`` of None keeps every span, for one-off runs
+    exported at the end. The buffer can be summarised per host or group
+    and exported as JSON lines or in the Prometheus text format.
+    """
+
+    def __init__(self, capacity: Optional[int] = DEFAULT_CAPACITY, enabled: bool = True):
+        self.enabled = enabled
+        self._spans: Deque[Span] = deque(maxlen=capacity)
+
+    def __len__(self) -> int:
+        return len(self._spans)
+
+    def span(self, operation: str, phase: str, host: SSHHost):
+        """Context manager timing its block; set ``bytes`` on it for data moved."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, operation, phase, host)
+
+    def record(self, operation: str, phase: str, host: SSHHost, started: float, duration: float,
+               ok: bool = True, nbytes: int = 0) -> None:
+        """Record a phase timed by the caller; ``started`` is a Unix time."""
+        if self.enabled:
+            self._spans.append(Span(operation, phase, host.alias, host.group, started, duration, ok, nbytes))
+
+    def spans(self) -> List[Span]:
+        """The buffered spans, oldest first."""
+        return list(self._spans)
+
+    def clear(self) -> None:
+        self._spans.clear()
+
+    def summary(self, by: str = "alias", spans: Optional[Iterable[Span]] = None) -> List[Summary]:
+        """Count, errors and quantiles of each phase per ``alias`` or ``group``.
+
+        ``by`` may also be None for one summary per phase across all hosts.
+        Sorted by name and operation, with phases in the order they happen.
+        """
+        if by not in ("alias", "group", None):
+            raise ValueError(f"Cannot summarise by {by!r}")
+        buckets: Dict[Tuple[Optional[str], str, str], List[Span]] = {}
+        for span in self.spans() if spans is None else spans:
+            name = None if by is None else getattr(span, by)
+            buckets.setdefault((name, span.operation, span.phase), []).append(span)
+        summaries = []
+        for (name, operation, phase), bucket in sorted(buckets.items(), key=lambda item: (
+                item[0][0] or "", item[0][1], _PHASE_ORDER.get(item[0][2], len(PHASES)), item[0][2])):
+            durations = sorted(span.duration for span in bucket)
+            summaries.append(Summary(
+                name, operation, phase,
+                count=len(bucket),
+                errors=sum(not span.ok for span in bucket),
+                quantiles=tuple(quantile(durations, q) for q in QUANTILES),
+                total=sum(durations),
+                bytes=sum(span.bytes for span in bucket),
+            ))
+        return summaries
+
+    def write_jsonl(self, f: IO[str]) -> int:
+        """Write each buffered span as a JSON object per line; returns how many."""
+        spans = self.spans()
+        for span in spans:
+            f.write(json.dumps(span.to_dict(), separators=(",", ":")))
+            f.write("\n")
+        return len(spans)
+
+    def prometheus(self) -> str:
+        """The buffered spans in the Prometheus text format, as a summary per host and phase.
+
+        Values describe the spans still in the buffer, so they are gauges
+        of recent activity rather than counters since startup.
+        """
+        name = f"{METRIC_PREFIX}_operation_duration_seconds"
+        lines = [
+            f"# HELP {name} Duration of recent SSH operations and their phases.",
+            f"# TYPE {name} summary",
+        ]
+        errors, transferred = [], []
+        spans = self.spans()
+        groups = {span.alias: span.group for span in spans}
+        for summary in self.summary("alias", spans):
+            labels = _labels(operation=summary.operation, phase=summary.phase, alias=summary.name,
+                             group=groups[summary.name] or "")
+            for q, value in zip(QUANTILES, summary.quantiles):
+                lines.append(f'{name}{{{labels},quantile="{q:g}"}} {value!r}')
+            lines.append(f"{name}_sum{{{labels}}} {summary.total!r}")
+            lines.append(f"{name}_count{{{labels}}} {summary.count}")
+            errors.append(f"{METRIC_PREFIX}_operation_errors{{{labels}}} {summary.errors}")
+            if summary.bytes:
+                transferred.append(f"{METRIC_PREFIX}_transferred_bytes{{{labels}}} {summary.bytes}")
+        lines += [
+            f"# HELP {METRIC_PREFIX}_operation_errors Recent SSH operations and phases that failed.",
+            f"# TYPE {METRIC_PREFIX}_operation_errors gauge",
+            *errors,
+            f"# HELP {METRIC_PREFIX}_transferred_bytes Bytes moved by recent SSH operations.",
+            f"# TYPE {METRIC_PREFIX}_transferred_bytes gauge",
+            *transferred,
+        ]
+        return "\n".join(lines) + "\n"
+
+    def export(self, path: str) -> int:
+        """Write the spans to a file; returns how many were buffered.
+
+        Files ending in ``.prom`` get the Prometheus format, others JSON lines.
+        """
+        with open(path, "w") as f:
+            if path.endswith(".prom"):
+                f.write(self.prometheus())
+                return len(self)
+            return self.write_jsonl(f)
+
+
+def _labels(**labels: str) -> str:
+    return ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items())
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
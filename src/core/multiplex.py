@@ -0,0 +1,189 @@
+import hashlib
+import json
+import os
+import re
+import stat
+import subprocess
+import sys
+import tempfile
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Tuple
+
+from .host_manager import SSHHost
+
+# How long a master stays up after its last session closes, in OpenSSH's
+# time format
+CONTROL_PERSIST = "10m"
+# Seconds allowed for ``ssh -O`` to answer
+CONTROL_TIMEOUT = 5.0
+# ssh binds the socket under a temporary name up to this much longer than
+# ControlPath before renaming it; socket paths are limited to 104 bytes on
+# macOS and 108 on Linux
+_SOCKET_PATH_MAX = 104 - 20
+_PID = re.compile(r"pid=(\d+)")
+
+
+def _is_private_dir(path: str) -> bool:
+    """Whether ``path`` is a directory, not a symlink, that only the current user can use."""
+    try:
+        info = os.lstat(path)
+    except OSError:
+        return False
+    return stat.S_ISDIR(info.st_mode) and info.st_uid == os.getuid() and not info.st_mode & 0o077
+
+
+def ssh_command(host: SSHHost) -> List[str]:
+    """The plain ``ssh`` command line for an interactive session with a host."""
+    cmd = ["ssh"]
+
+    # Add port if not default
+    if host.port != 22:
+        cmd.extend(["-p", str(host.port)])
+
+    # Add key if provided
+    if host.key_path:
+        cmd.extend(["-i", host.key_path])
+
+    # Add user@host
+    cmd.append(f"{host.user}@{host.host}")
+    return cmd
+
+
+@dataclass
+class MasterSocket:
+    """A running OpenSSH master connection and the socket it listens on."""
+    alias: str
+    target: str
+    path: str
+    pid: Optional[int] = None
+    # When the master was started, as a Unix time
+    started: float = 0.0
+
+
+class ControlMasters:
+    """OpenSSH ControlMaster sockets, one per server, kept in one directory.
+
+    ``command`` adds ``ControlMaster=auto`` to the ssh command line, so the
+    first session with a server starts a master in the background and
+    later ones, until ``persist`` after the last session closes, run over
+    it without a new handshake. Aliases of the same server (hostname,
+    port, user and key) share a master. Next to each socket is a small
+    JSON file naming the host, which ``masters`` reads back to list them.
+    Multiplexing is not available on Windows, where the plain command is
+    used. It is also turned off if the directory turns out to be a symlink,
+    owned by another user or open to others, since whoever controls it
+    could stand in for the sockets.
+    """
+
+    def __init__(self, control_dir: str, persist: str = CONTROL_PERSIST,
+                 runner: Callable[..., subprocess.CompletedProcess] = subprocess.run):
+        self.control_dir = self._usable_dir(control_dir)
+        self.persist = persist
+        self.runner = runner
+        self.supported = sys.platform != "win32"
+
+    @staticmethod
+    def _usable_dir(control_dir: str) -> str:
+        if len(os.path.join(control_dir, "0" * 16)) <= _SOCKET_PATH_MAX:
+            return control_dir
+        # Too deep for socket names; fall back to the per-user runtime
+        # directory, or a directory in /tmp that ``command`` checks is ours
+        runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+        if runtime_dir and len(os.path.join(runtime_dir, "ssh-tui", "0" * 16)) <= _SOCKET_PATH_MAX:
+            return os.path.join(runtime_dir, "ssh-tui")
+        uid = os.getuid() if hasattr(os, "getuid") else 0
+        return os.path.join(tempfile.gettempdir(), f"ssh-tui-{uid}")
+
+    def path(self, host: SSHHost) -> str:
+        """Path of the master socket for a host's server."""
+        key = f"{host.user}@{host.host}:{host.port}:{host.key_path or ''}"
+        return os.path.join(self.control_dir, hashlib.sha1(key.encode()).hexdigest()[:16])
+
+    def command(self, host: SSHHost) -> List[str]:
+        """The ssh command line for a host, reusing or starting its master.
+
+        Raises OSError if the control directory cannot be created.
+        """
+        cmd = ssh_command(host)
+        if not self.supported:
+            return cmd
+        os.makedirs(self.control_dir, mode=0o700, exist_ok=True)
+        if not _is_private_dir(self.control_dir):
+            self.supported = False
+            return cmd
+        path = self.path(host)
+        with open(path + ".json", "w") as f:
+            json.dump({"alias": host.alias, "target": cmd[-1]}, f)
+        return cmd[:1] + [
+            "-o", "ControlMaster=auto",
+            "-o", f"ControlPath={path}",
+            "-o", f"ControlPersist={self.persist}",
+        ] + cmd[1:]
+
+    def masters(self) -> List[MasterSocket]:
+        """The masters still running; sockets left behind by dead ones are removed."""
+        if not self.supported:
+            return []
+        try:
+            names = sorted(os.listdir(self.control_dir))
+        except FileNotFoundError:
+            return []
+        found = []
+        for name in names:
+            path = os.path.join(self.control_dir, name)
+            if name.endswith(".json"):
+                if not os.path.exists(path[:-len(".json")]):
+                    # Written for a session that never started a master
+                    self._forget(path[:-len(".json")])
+                continue
+            try:
+                info = os.stat(path)
+            except FileNotFoundError:
+                continue
+            if not stat.S_ISSOCK(info.st_mode):
+                continue
+            master = self._describe(path)
+            master.started = info.st_mtime
+            ok, output = self._control(master, "check")
+            if ok:
+                match = _PID.search(output)
+                master.pid = int(match.group(1)) if match else None
+                found.append(master)
+            else:
+                self._forget(path)
+        return found
+
+    def close(self, master: MasterSocket) -> bool:
+        """Stop a master, closing every session running over it."""
+        ok, _ = self._control(master, "exit")
+        if ok or not self._control(master, "check")[0]:
+            self._forget(master.path)
+        return ok
+
+    def _describe(self, path: str) -> MasterSocket:
+        try:
+            with open(path + ".json") as f:
+                details = json.load(f)
+        except (OSError, ValueError):
+            details = {}
+        return MasterSocket(alias=details.get("alias", "?"), target=details.get("target", "localhost"),
+                            path=path)
+
+    def _control(self, master: MasterSocket, operation: str) -> Tuple[bool, str]:
+        """Send a control command (``ssh -O``) to a master."""
+        try:
+            completed = self.runner(
+                ["ssh", "-o", f"ControlPath={master.path}", "-O", operation, master.target],
+                stdin=subprocess.DEVNULL, capture_output=True, text=True, timeout=CONTROL_TIMEOUT,
+            )
+        except (OSError, subprocess.TimeoutExpired) as e:
+            return False, str(e)
+        return completed.returncode == 0, (completed.stderr or "") + (completed.stdout or "")
+
+    @staticmethod
+    def _forget(path: str) -> None:
+        for leftover in (path, path + ".json"):
+            try:
+                os.remove(leftover)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,178 @@
+import asyncio
+import functools
+import socket
+import sys
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Iterable, Optional, Set, Tuple
+
+# (hostname, port) of a probed SSH endpoint.
+Endpoint = Tuple[str, int]
+
+# Threads resolving host names for the prober. Lookups of unknown names
+# can block for seconds, so they get their own threads rather than the
+# event loop's default executor, which the UI's thread workers run on.
+RESOLVER_THREADS = 8
+
+
+@dataclass
+class ProbeResult:
+    """Outcome of one reachability probe."""
+    reachable: bool
+    rtt: Optional[float] = None
+    banner: Optional[str] = None
+    error: Optional[str] = None
+    checked_at: float = 0.0
+
+
+async def probe_endpoint(endpoint: Endpoint, timeout: float,
+                         resolver: Optional[Executor] = None) -> ProbeResult:
+    """Resolve an endpoint, open a TCP connection and read the SSH banner.
+
+    The round-trip time is the time the TCP connect took, not counting
+    the name lookup, which runs on ``resolver``. A host that accepts the
+    connection but sends no SSH banner still counts as up.
+    """
+    hostname, port = endpoint
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    lookup = functools.partial(socket.getaddrinfo, hostname, port, type=socket.SOCK_STREAM)
+    try:
+        addresses = await asyncio.wait_for(loop.run_in_executor(resolver, lookup), timeout)
+        address = addresses[0][4]
+        started = time.perf_counter()
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(address[0], address[1]), deadline - loop.time()
+        )
+    except asyncio.TimeoutError:
+        return ProbeResult(False, error="Timed out")
+    except Exception as e:
+        # Also names the lookup rejects outright, e.g. UnicodeError for "a..b"
+        return ProbeResult(False, error=str(e) or type(e).__name__)
+    rtt = time.perf_counter() - started
+    banner = None
+    try:
+        line = await asyncio.wait_for(reader.readline(), max(deadline - loop.time(), 0.1))
+        if line.startswith(b"SSH-"):
+            banner = line.decode(errors="replace").strip()
+    except (OSError, asyncio.TimeoutError):
+        pass
+    finally:
+        writer.close()
+    return ProbeResult(True, rtt=rtt, banner=banner)
+
+
+class HostProber:
+    """Probes SSH endpoints in the background and caches the results.
+
+    ``run`` keeps at most ``concurrency`` probes in flight. On every round
+    it walks the endpoints in the order ``targets`` gives them (visible rows
+    first) and starts probes for those that are due: reachable endpoints
+    after ``ttl`` seconds, unreachable ones after an interval that doubles
+    with every failed probe, up to ``max_backoff``.
+    """
+
+    def __init__(self, concurrency: int = 64, timeout: float = 3.0, ttl: float = 60.0,
+                 max_backoff: float = 600.0,
+                 probe: Optional[Callable[[Endpoint, float], Awaitable[ProbeResult]]] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.ttl = ttl
+        self.max_backoff = max_backoff
+        self._resolver = ThreadPoolExecutor(RESOLVER_THREADS, thread_name_prefix="probe-resolve")
+        self._probe = probe or functools.partial(probe_endpoint, resolver=self._resolver)
+        self._clock = clock
+        self._results: Dict[Endpoint, ProbeResult] = {}
+        self._failures: Dict[Endpoint, int] = {}
+        # When each probed endpoint is next due, by the clock
+        self._due_at: Dict[Endpoint, float] = {}
+        self._in_flight: Set[Endpoint] = set()
+        # Created by ``run``: before Python 3.10 an event binds to the loop current at creation
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def result(self, endpoint: Endpoint) -> Optional[ProbeResult]:
+        """Return the latest result for an endpoint, however old."""
+        return self._results.get(endpoint)
+
+    def is_due(self, endpoint: Endpoint) -> bool:
+        now = self._clock()
+        return self._due_at.get(endpoint, now) <= now
+
+    def close(self) -> None:
+        """Stop the resolver threads; lookups still running are abandoned.
+
+        Queued lookups were already cancelled along with the probes of
+        ``run``; on Python 3.9+ any left over are dropped here too.
+        """
+        if sys.version_info >= (3, 9):
+            self._resolver.shutdown(wait=False, cancel_futures=True)
+        else:
+            self._resolver.shutdown(wait=False)
+
+    def wake(self) -> None:
+        """Start the next round now, e.g. because the targets changed."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._in_flight)
+
+    async def probe(self, endpoint: Endpoint) -> ProbeResult:
+        """Probe one endpoint now and record the result."""
+        self._in_flight.add(endpoint)
+        try:
+            result = await self._probe(endpoint, self.timeout)
+        finally:
+            self._in_flight.discard(endpoint)
+            # Refill in batches: every round walks the targets from the top
+            if len(self._in_flight) <= self.concurrency * 3 // 4:
+                self.wake()
+        result.checked_at = self._clock()
+        self._results[endpoint] = result
+        if result.reachable:
+            self._failures.pop(endpoint, None)
+            wait = self.ttl
+        else:
+            failures = self._failures[endpoint] = self._failures.get(endpoint, 0) + 1
+            wait = min(self.ttl / 4 * 2 ** (failures - 1), self.max_backoff)
+        self._due_at[endpoint] = result.checked_at + wait
+        return result
+
+    async def run(self, targets: Callable[[], Iterable[Endpoint]],
+                  on_result: Callable[[Endpoint, ProbeResult], None], interval: float = 1.0) -> None:
+        """Probe due endpoints until cancelled.
+
+        ``targets`` is called every round and should list endpoints by
+        priority; ``on_result`` is called with each finished probe.
+        """
+        tasks: Set[asyncio.Task] = set()
+        wakeup = self._wakeup = asyncio.Event()
+
+        async def probe_and_report(endpoint: Endpoint) -> None:
+            on_result(endpoint, await self.probe(endpoint))
+
+        in_flight, due_at = self._in_flight, self._due_at
+        try:
+            while True:
+                wakeup.clear()
+                now = self._clock()
+                for endpoint in targets():
+                    if len(in_flight) >= self.concurrency:
+                        break
+                    if endpoint in in_flight or due_at.get(endpoint, now) > now:
+                        continue
+                    # Counted as in flight right away, before the task first runs
+                    in_flight.add(endpoint)
+                    task = asyncio.create_task(probe_and_report(endpoint))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                try:
+                    await asyncio.wait_for(wakeup.wait(), interval)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            for task in tasks:
+                task.cancel()
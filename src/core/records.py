@@ -0,0 +1,82 @@
+import sys
+from collections import namedtuple
+from dataclasses import MISSING, fields
+from typing import Any, Callable, Dict, Iterable, Iterator, MutableMapping, Optional, Tuple, Union
+
+# A stored host: a built host object, or a record (or raw field dict) with the same attributes.
+StoredHost = Union[Any, Tuple, Dict[str, Any]]
+
+
+def intern_value(value: Any) -> Any:
+    """Intern strings so that equal values share one object."""
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def field_value(host: StoredHost, name: str) -> Any:
+    """Read a field from a host object, a host record or a raw field dict."""
+    if isinstance(host, dict):
+        return host.get(name)
+    return getattr(host, name)
+
+
+class LazyHostMap(MutableMapping):
+    """Mapping of alias to host that builds hosts from raw records on first access.
+
+    Raw field dicts added with ``set_record`` are packed into compact
+    named-tuple records (with the ``interned`` fields interned) and only
+    turned into host objects, through the ``factory`` dataclass, when looked
+    up. ``peek`` and ``records`` give read access without building
+    anything, which is all a table row needs.
+    """
+
+    def __init__(self, factory: Callable[..., Any], interned: Iterable[str] = ()):
+        self._factory = factory
+        names = [f.name for f in fields(factory)]
+        self._defaults = [None if f.default is MISSING else f.default for f in fields(factory)]
+        self._names = names
+        self._interned = {names.index(name) for name in interned}
+        self._record_type = namedtuple("HostRecord", names)
+        self._data: Dict[str, StoredHost] = {}
+
+    def set_record(self, alias: str, data: Dict[str, Any]) -> Tuple:
+        """Store a raw field dict to be built on first access; return the stored record."""
+        values = [data.get(name, default) for name, default in zip(self._names, self._defaults)]
+        for position in self._interned:
+            values[position] = intern_value(values[position])
+        record = self._record_type._make(values)
+        self._data[alias] = record
+        return record
+
+    def peek(self, alias: str) -> Optional[StoredHost]:
+        """Return the stored host or raw record without building it."""
+        return self._data.get(alias)
+
+    def records(self) -> Iterator[Tuple[str, StoredHost]]:
+        """Iterate over (alias, stored host) pairs without building anything."""
+        return iter(list(self._data.items()))
+
+    def discard(self, alias: str) -> None:
+        """Remove an alias if present, without building its host."""
+        self._data.pop(alias, None)
+
+    def __getitem__(self, alias: str) -> Any:
+        host = self._data[alias]
+        if isinstance(host, self._record_type):
+            host = self._factory(*host)
+            self._data[alias] = host
+        return host
+
+    def __setitem__(self, alias: str, host: Any) -> None:
+        self._data[alias] = host
+
+    def __delitem__(self, alias: str) -> None:
+        del self._data[alias]
+
+    def __contains__(self, alias: object) -> bool:
+        return alias in self._data
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
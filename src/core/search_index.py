@@ -0,0 +1,205 @@
+import re
+from array import array
+from collections import Counter
+from math import ceil
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Set, Tuple
+
+from .records import field_value
+
+# Host fields matched by search; the alias must come first.
+SEARCH_FIELDS: Tuple[str, ...] = ("alias", "host", "user", "group", "description")
+
+# Marks the start of a word in the grams used for one- and two-letter queries.
+_WORD_START = "\x00"
+_WORD_RE = re.compile(r"[^\W_]+")
+# Marks the grams of an alias's first one to three characters.
+_ALIAS_START = "\x01"
+# Separates the fields of a host's searchable text.
+_FIELD_SEP = "\n"
+
+
+def _grams(text: str) -> Set[str]:
+    """Trigrams of a lowercased text, plus grams for word and alias starts."""
+    alias = text[:text.index(_FIELD_SEP)] if _FIELD_SEP in text else text
+    grams = {_ALIAS_START + alias[:length] for length in (1, 2, 3) if len(alias) >= length}
+    for value in text.split(_FIELD_SEP):
+        grams.update(value[i:i + 3] for i in range(len(value) - 2))
+        for word in _WORD_RE.findall(value):
+            grams.add(_WORD_START * 2 + word[0])
+            grams.add(_WORD_START + word[:2])
+    return grams
+
+
+def _query_grams(query: str) -> Set[str]:
+    if len(query) < 3:
+        return {_WORD_START * (3 - len(query)) + query}
+    return {query[i:i + 3] for i in range(len(query) - 2)}
+
+
+class SearchIndex:
+    """Trigram index for as-you-type host search.
+
+    Every searched field is split into trigrams, each mapping to the ids of
+    the hosts containing it, so a query only walks the shortest posting list
+    of its trigrams instead of scanning the inventory. Queries of one or two
+    characters match word starts. Results are ranked: exact alias, alias
+    prefix, substring of any field, then fuzzy matches sharing most of the
+    query's trigrams; ties keep inventory order. Extra grams for the first
+    characters of each alias let the prefix matches be found without
+    walking every substring match.
+
+    Posting lists are compact int arrays that only grow: a host gets a new
+    id whenever it is re-added, old ids are skipped as dead, and the lists
+    are rebuilt once dead ids outnumber live ones. Like ``HostIndex``, it is
+    kept up to date with ``add`` and ``remove``.
+    """
+
+    # Fraction of a query's trigrams a fuzzy match must contain
+    FUZZY_OVERLAP = 0.7
+    # Fuzzy matches are only looked for when there are fewer hits than this
+    FUZZY_BELOW = 1
+    # Most fuzzy matches returned
+    FUZZY_LIMIT = 50
+
+    def __init__(self, fields: Iterable[str] = SEARCH_FIELDS):
+        self.fields = tuple(fields)
+        self._ids: Dict[str, int] = {}
+        # By id: the alias and its lowercased searchable text, None once dead
+        self._aliases: List[Optional[str]] = []
+        self._texts: List[Optional[str]] = []
+        self._postings: Dict[str, array] = {}
+
+    @classmethod
+    def build(cls, hosts: Mapping[str, Any], fields: Iterable[str] = SEARCH_FIELDS) -> "SearchIndex":
+        """Build an index over all hosts of a mapping."""
+        index = cls(fields)
+        for alias, host in hosts.items():
+            index.add(alias, host)
+        return index
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def add(self, alias: str, host: Any) -> None:
+        """Index ``host`` under ``alias``, replacing an earlier entry."""
+        self.remove(alias)
+        text = _FIELD_SEP.join(
+            str(field_value(host, field) or "").replace(_FIELD_SEP, " ").lower()
+            for field in self.fields
+        )
+        self._index(alias, text)
+
+    def _index(self, alias: str, text: str) -> None:
+        host_id = len(self._aliases)
+        self._aliases.append(alias)
+        self._texts.append(text)
+        self._ids[alias] = host_id
+        for gram in _grams(text):
+            posting = self._postings.get(gram)
+            if posting is None:
+                posting = self._postings[gram] = array("l")
+            posting.append(host_id)
+
+    def remove(self, alias: str) -> None:
+        """Drop ``alias`` from the index if present."""
+        host_id = self._ids.pop(alias, None)
+        if host_id is None:
+            return
+        self._aliases[host_id] = None
+        self._texts[host_id] = None
+        if len(self._aliases) > 1024 and len(self._ids) < len(self._aliases) // 2:
+            self._compact()
+
+    def _compact(self) -> None:
+        """Rebuild the posting lists without dead ids."""
+        live = [(alias, text) for alias, text in zip(self._aliases, self._texts) if alias is not None]
+        self._ids, self._aliases, self._texts, self._postings = {}, [], [], {}
+        for alias, text in live:
+            self._index(alias, text)
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[str]:
+        """Return the aliases matching ``query``, best matches first.
+
+        With a ``limit``, walking the posting lists stops as soon as enough
+        matches are found.
+        """
+        typed = query.strip()
+        query = typed.lower()
+        if not query:
+            return []
+        texts = self._texts
+        ranked: List[int] = []
+        found: Set[int] = set()
+
+        def take(host_id: int) -> bool:
+            """Add a match; return True once the limit is reached."""
+            if host_id not in found:
+                ranked.append(host_id)
+                found.add(host_id)
+            return limit is not None and len(ranked) >= limit
+
+        for alias in dict.fromkeys((typed, query)):
+            host_id = self._ids.get(alias)
+            if host_id is not None and take(host_id):
+                return self._result(ranked)
+
+        words = [self._postings.get(gram) for gram in _query_grams(query)]
+        prefixes = self._postings.get(_ALIAS_START + query[:3])
+        if prefixes is not None:
+            # An alias prefix is also a substring, so it is in every word list
+            if len(query) >= 3 and None not in words:
+                prefixes = min(words + [prefixes], key=len)
+            for host_id in prefixes:
+                text = texts[host_id]
+                if text is not None and text.startswith(query) and take(host_id):
+                    return self._result(ranked)
+
+        if None not in words:
+            if len(query) < 3:
+                # A word-start gram is an exact match on its own
+                for host_id in words[0]:
+                    if texts[host_id] is not None and take(host_id):
+                        return self._result(ranked)
+            else:
+                for host_id in min(words, key=len):
+                    text = texts[host_id]
+                    if text is not None and query in text and take(host_id):
+                        return self._result(ranked)
+
+        if len(ranked) < self.FUZZY_BELOW and len(query) > 3:
+            ranked.extend(self._fuzzy(query, found))
+        if limit is not None:
+            del ranked[limit:]
+        return self._result(ranked)
+
+    def _result(self, ids: List[int]) -> List[str]:
+        return [self._aliases[host_id] for host_id in ids]
+
+    def _fuzzy(self, query: str, found: Set[int]) -> List[int]:
+        """Ids of hosts sharing most of the query's trigrams, most shared first.
+
+        Candidates come from the posting lists of the query's rarer trigrams
+        only; trigrams found in most hosts are checked against each
+        candidate's text instead of being counted list by list.
+        """
+        grams = _query_grams(query)
+        needed = max(2, ceil(len(grams) * self.FUZZY_OVERLAP))
+        common_size = max(len(self._ids) // 32, 64)
+        hits = Counter()
+        common = []
+        for gram in grams:
+            posting = self._postings.get(gram, ())
+            if len(posting) > common_size:
+                common.append(gram)
+            else:
+                hits.update(posting)
+        texts = self._texts
+        matches = []
+        for host_id, count in hits.items():
+            if host_id in found or texts[host_id] is None:
+                continue
+            count += sum(gram in texts[host_id] for gram in common)
+            if count >= needed:
+                matches.append((-count, host_id))
+        matches.sort()
+        return [host_id for _, host_id in matches[:self.FUZZY_LIMIT]]
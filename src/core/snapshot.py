@@ -0,0 +1,194 @@
+import hashlib
+import os
+import struct
+import sys
+from array import array
+from itertools import chain
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from .watcher import FileFingerprint, file_digest, stat_fingerprint
+
+# File magic; the trailing digit is the format version
+_MAGIC = b"SSHSNAP1"
+# magic, byte order, column count, rows, strings, names bytes, strings bytes,
+# then the source's inode, size, mtime and sha256
+_HEADER = struct.Struct("<8scxHIIIIQQq32s")
+# Column type codes: indexes into the string table (0 is None), or integers
+_STRING, _INTEGER = "S", "I"
+_ARRAY_TYPES = {_STRING: "I", _INTEGER: "q"}
+
+# Columns as decoded from a snapshot: the aliases, then field name -> values by row
+SnapshotColumns = Tuple[List[str], Dict[str, List[Any]]]
+
+
+def source_fingerprint(fileno: int, contents: bytes) -> FileFingerprint:
+    """Fingerprint an open file from its stat fields and the bytes read from it."""
+    st = os.fstat(fileno)
+    return FileFingerprint(st.st_ino, st.st_mtime_ns, st.st_size, hashlib.sha256(contents).hexdigest())
+
+
+def _column_type(values: List[Any]) -> Optional[str]:
+    kinds = set(map(type, values))
+    if kinds == {int}:
+        return _INTEGER
+    if kinds <= {str, type(None)}:
+        return _STRING
+    return None
+
+
+def encode_snapshot(data: Mapping[str, Mapping[str, Any]], fingerprint: FileFingerprint) -> Optional[bytes]:
+    """Encode parsed host records as a columnar snapshot of the file they came from.
+
+    Every distinct string is stored once in a NUL-separated table and the
+    string columns hold indexes into it. Returns None if the records cannot
+    be stored this way: hosts with differing field sets, or field values
+    other than integers and NUL-free strings.
+    """
+    aliases = list(data)
+    records = list(data.values())
+    if set(map(type, aliases)) - {str}:
+        return None
+    if set(map(type, records)) - {dict}:
+        return None
+    names = list(records[0]) if records else []
+    if records and (not names or set(map(len, records)) != {len(names)}):
+        return None
+    try:
+        columns = [[record[name] for record in records] for name in names]
+    except KeyError:
+        return None
+    types = [_column_type(values) for values in columns]
+    if None in types or any("\0" in name for name in names):
+        return None
+
+    string_columns = [values for values, kind in zip(columns, types) if kind == _STRING]
+    table = dict.fromkeys(chain(aliases, *string_columns))
+    table.pop(None, None)
+    index: Dict[Optional[str], int] = {value: position for position, value in enumerate(table, 1)}
+    index[None] = 0
+    body = [array("I", map(index.__getitem__, aliases))]
+    for values, kind in zip(columns, types):
+        body.append(array("q", values) if kind == _INTEGER else array("I", map(index.__getitem__, values)))
+
+    names_blob = "\0".join(names).encode() + "".join(types).encode()
+    strings_blob = "\0".join(table).encode()
+    if strings_blob.count(b"\0") != max(len(table) - 1, 0):
+        # A string holds a NUL, which would split it in two
+        return None
+    header = _HEADER.pack(
+        _MAGIC, sys.byteorder[0].encode(), len(names), len(aliases), len(table),
+        len(names_blob), len(strings_blob),
+        fingerprint.inode, fingerprint.size, fingerprint.mtime_ns, bytes.fromhex(fingerprint.digest),
+    )
+    return b"".join([header, names_blob, strings_blob] + [column.tobytes() for column in body])
+
+
+def read_header(header: bytes) -> Tuple[Tuple[int, ...], FileFingerprint]:
+    """Unpack a snapshot header into its counts and the fingerprint of its source."""
+    (magic, byteorder, ncolumns, rows, nstrings, names_size, strings_size,
+     inode, size, mtime_ns, digest) = _HEADER.unpack(header)
+    if magic != _MAGIC or byteorder != sys.byteorder[0].encode():
+        raise ValueError("Not a host snapshot for this platform")
+    return (ncolumns, rows, nstrings, names_size, strings_size), FileFingerprint(inode, mtime_ns, size, digest.hex())
+
+
+def decode_snapshot(blob: bytes) -> Tuple[SnapshotColumns, FileFingerprint]:
+    """Decode a snapshot written by ``encode_snapshot``; ValueError if it is malformed."""
+    try:
+        (ncolumns, rows, nstrings, names_size, strings_size), fingerprint = read_header(blob[:_HEADER.size])
+    except struct.error as e:
+        raise ValueError(f"Truncated host snapshot: {e}")
+    view = memoryview(blob)
+    offset = _HEADER.size
+    names_blob = bytes(view[offset:offset + names_size])
+    offset += names_size
+    names_text = names_blob[:len(names_blob) - ncolumns].decode()
+    names = names_text.split("\0") if ncolumns else []
+    types = names_blob[len(names_blob) - ncolumns:].decode()
+    strings = bytes(view[offset:offset + strings_size]).decode().split("\0") if nstrings else []
+    offset += strings_size
+    if len(names) != ncolumns or len(strings) != nstrings or set(types) - set(_ARRAY_TYPES):
+        raise ValueError("Corrupt host snapshot header")
+    table: List[Optional[str]] = [None]
+    table.extend(strings)
+
+    sizes = [array("I").itemsize * rows] + [array(_ARRAY_TYPES[kind]).itemsize * rows for kind in types]
+    if len(blob) != offset + sum(sizes):
+        raise ValueError("Truncated host snapshot")
+    arrays = []
+    for typecode, size in zip(["I"] + [_ARRAY_TYPES[kind] for kind in types], sizes):
+        column = array(typecode)
+        column.frombytes(view[offset:offset + size])
+        arrays.append(column)
+        offset += size
+    try:
+        aliases = list(map(table.__getitem__, arrays[0]))
+        columns = {
+            name: column.tolist() if kind == _INTEGER else list(map(table.__getitem__, column))
+            for name, kind, column in zip(names, types, arrays[1:])
+        }
+    except IndexError:
+        raise ValueError("Corrupt host snapshot: string index out of range")
+    return (aliases, columns), fingerprint
+
+
+class SnapshotCache:
+    """Binary snapshot of a JSON host file, used in place of parsing it.
+
+    The snapshot holds the parsed records in columns (see
+    ``encode_snapshot``) along with the inode, size, mtime and sha256 of the
+    file they were parsed from. It is fresh while the file's stat fields
+    are unchanged; when they differ but the size does not, the file is
+    hashed, so a touch or an identical rewrite keeps the snapshot. A
+    missing, stale or corrupt snapshot reads as None, and failing to write
+    one is ignored: the cache never stands in the way of loading the file
+    itself.
+    """
+
+    def __init__(self, source_path: str, path: Optional[str] = None):
+        self.source_path = source_path
+        self.path = path or os.path.splitext(source_path)[0] + ".snapshot"
+
+    def read(self) -> Optional[SnapshotColumns]:
+        """Return the cached columns if the snapshot matches the source file."""
+        current = stat_fingerprint(self.source_path)
+        if current is None:
+            return None
+        try:
+            with open(self.path, 'rb') as f:
+                _, cached = read_header(f.read(_HEADER.size))
+                if not self._fresh(current, cached):
+                    return None
+                f.seek(0)
+                blob = f.read()
+            columns, _ = decode_snapshot(blob)
+        except (OSError, ValueError, struct.error):
+            return None
+        return columns
+
+    def _fresh(self, current: FileFingerprint, cached: FileFingerprint) -> bool:
+        if current.same_stat(cached):
+            return True
+        return current.size == cached.size and file_digest(self.source_path) == cached.digest
+
+    def write(self, data: Mapping[str, Mapping[str, Any]], fingerprint: FileFingerprint) -> bool:
+        """Store ``data``, parsed from the source file as ``fingerprint``; False if not stored."""
+        blob = encode_snapshot(data, fingerprint)
+        if blob is None:
+            self.discard()
+            return False
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(blob)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            return False
+        return True
+
+    def discard(self) -> None:
+        """Remove the snapshot, if any."""
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
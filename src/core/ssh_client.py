@@ -1,66 +1,146 @@
-import os
 import paramiko
-from typing import Optional, Tuple
+from contextlib import contextmanager
+from typing import Iterator, Optional, Tuple
+from .command_stream import STDOUT, CommandStream
+from .connection_pool import ConnectionPool
 from .host_manager import SSHHost
+from .metrics import CHANNEL, COMMAND, EXEC, EXECUTE, TOTAL
+from .transfer import ProgressCallback, SFTPTransfer
 
 class SSHClient:
-    def __init__(self):
-        self.client = paramiko.SSHClient()
-        self.client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+    def __init__(self, pool: Optional[ConnectionPool] = None):
+        """Initialize the client.
+
+        Args:
+            pool: Connection pool to share sessions with other clients; a
+                private one is created if omitted.
+        """
+        self._owns_pool = pool is None
+        self.pool = pool if pool is not None else ConnectionPool()
+        self.transfers = SFTPTransfer(self.pool)
+        self.host: Optional[SSHHost] = None
+
+    @property
+    def client(self) -> Optional[paramiko.SSHClient]:
+        """The pooled paramiko client of the current host, if connected."""
+        if self.host is None:
+            return None
+        with self.pool.connection(self.host) as client:
+            return client
 
     def connect(self, host: SSHHost) -> Tuple[bool, str]:
-        """Connect to an SSH host."""
+        """Connect to an SSH host, reusing a pooled session if there is one."""
         try:
-            kwargs = {
-                'hostname': host.host,
-                'username': host.user,
-                'port': host.port,
-            }
-            
-            if host.key_path and os.path.exists(host.key_path):
-                kwargs['key_filename'] = host.key_path
-            
-            self.client.connect(**kwargs)
+            with self.pool.connection(host):
+                pass
+            self.host = host
             return True, "Connected successfully"
         except Exception as e:
             return False, str(e)
 
     def disconnect(self):
-        """Disconnect from the current SSH session."""
-        if self.client:
-            self.client.close()
+        """Leave the current host; its session stays pooled for reuse."""
+        self.host = None
+
+    def close(self):
+        """Close every pooled session."""
+        self.disconnect()
+        self.pool.close()
 
     def execute_command(self, command: str) -> Tuple[int, str, str]:
-        """Execute a command on the remote host."""
+        """Execute a command on the remote host, collecting all of its output."""
+        stdout, stderr = [], []
         try:
-            stdin, stdout, stderr = self.client.exec_command(command)
-            exit_code = stdout.channel.recv_exit_status()
-            return exit_code, stdout.read().decode(), stderr.read().decode()
+            with self.stream_command(command) as stream:
+                for chunk in stream:
+                    (stdout if chunk.stream == STDOUT else stderr).append(chunk.text)
         except Exception as e:
             return -1, "", str(e)
+        exit_code = stream.exit_code if stream.exit_code is not None else -1
+        return exit_code, "".join(stdout), "".join(stderr)
+
+    @contextmanager
+    def stream_command(self, command: str, timeout: Optional[float] = None,
+                       window_size: Optional[int] = None) -> Iterator[CommandStream]:
+        """Run a command on the remote host and stream its output.
+
+        Iterate over the stream for output chunks as they arrive; the exit
+        status is in ``exit_code`` afterwards. Leaving the block closes the
+        channel, stopping the command if it is still running.
+
+        Args:
+            command: Command to run.
+            timeout: Seconds to wait for the command to finish, or None to
+                wait as long as it runs.
+            window_size: Most bytes of unread output the server may send
+                ahead; paramiko's default if omitted.
 
-    def scp_upload(self, local_path: str, remote_path: str) -> Tuple[bool, str]:
-        """Upload a file to the remote host."""
+        Opening the channel, the exec request and the command are timed into
+        the pool's metrics, with the output's size.
+        """
+        connection = self._connection()
+        host, metrics = self.host, self.pool.metrics
+        with metrics.span(EXECUTE, TOTAL, host), connection as client:
+            options = {} if window_size is None else {"window_size": window_size}
+            with metrics.span(EXECUTE, CHANNEL, host):
+                channel = client.get_transport().open_session(**options)
+            try:
+                with metrics.span(EXECUTE, EXEC, host):
+                    channel.exec_command(command)
+                with metrics.span(EXECUTE, COMMAND, host) as span:
+                    stream = CommandStream(channel, timeout=timeout)
+                    try:
+                        yield stream
+                    finally:
+                        span.bytes = stream.bytes_received
+            finally:
+                channel.close()
+
+    def scp_upload(self, local_path: str, remote_path: str,
+                   progress: Optional[ProgressCallback] = None) -> Tuple[bool, str]:
+        """Upload a file to the remote host, resuming an interrupted upload."""
         try:
-            sftp = self.client.open_sftp()
-            sftp.put(local_path, remote_path)
-            sftp.close()
+            if self.host is None:
+                raise ConnectionError("Not connected")
+            self.transfers.upload(self.host, local_path, remote_path, progress=progress)
             return True, "File uploaded successfully"
         except Exception as e:
             return False, str(e)
 
-    def scp_download(self, remote_path: str, local_path: str) -> Tuple[bool, str]:
-        """Download a file from the remote host."""
+    def scp_download(self, remote_path: str, local_path: str,
+                     progress: Optional[ProgressCallback] = None) -> Tuple[bool, str]:
+        """Download a file from the remote host, resuming an interrupted download."""
         try:
-            sftp = self.client.open_sftp()
-            sftp.get(remote_path, local_path)
-            sftp.close()
+            if self.host is None:
+                raise ConnectionError("Not connected")
+            self.transfers.download(self.host, remote_path, local_path, progress=progress)
             return True, "File downloaded successfully"
         except Exception as e:
             return False, str(e)
 
+    def scp_copy(self, remote_path: str, destination: SSHHost, destination_path: str,
+                 progress: Optional[ProgressCallback] = None, verify: bool = True) -> Tuple[bool, str]:
+        """Copy a file from the remote host to another host without storing it locally."""
+        try:
+            if self.host is None:
+                raise ConnectionError("Not connected")
+            self.transfers.copy(self.host, remote_path, destination, destination_path,
+                                progress=progress, verify=verify)
+            return True, f"File copied to {destination.alias} successfully"
+        except Exception as e:
+            return False, str(e)
+
+    def _connection(self):
+        """Borrow the current host's pooled session, reconnecting it if it died."""
+        if self.host is None:
+            raise ConnectionError("Not connected")
+        return self.pool.connection(self.host)
+
     def __enter__(self):
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self.disconnect() 
\ No newline at end of file
+        if self._owns_pool:
+            self.close()
+        else:
+            self.disconnect()
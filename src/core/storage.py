@@ -0,0 +1,716 @@
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+from contextlib import nullcontext
+from dataclasses import asdict, fields, is_dataclass
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, MutableMapping, Optional, Tuple
+
+from .snapshot import SnapshotCache, SnapshotColumns, source_fingerprint
+from .watcher import FileFingerprint, FileWatcher, file_digest, stat_fingerprint
+
+# Fold the journal into a fresh snapshot once it grows past this many bytes.
+DEFAULT_COMPACT_THRESHOLD = 1024 * 1024
+
+# Base digest of journal records written without the value they replace
+_NO_BASE = object()
+
+
+def _fsync_dir(path: str) -> None:
+    """Flush a directory entry so a preceding rename survives a crash."""
+    if sys.platform == "win32":
+        return
+    fd = os.open(path or ".", os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def atomic_write(path: str, data: str) -> None:
+    """Write ``data`` to ``path`` via a temporary file, fsync and atomic rename."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    _fsync_dir(os.path.dirname(path))
+
+
+def iter_json_object(path: str, chunk_size: int = 1 << 16) -> Iterator[Tuple[str, Any]]:
+    """Stream the (key, value) members of a file holding one top-level JSON object.
+
+    The file is read in chunks and each member is decoded as soon as it is
+    complete, so the first members are available before the rest is read.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        buf = ""
+        pos = 0
+        eof = False
+
+        def fill() -> bool:
+            nonlocal buf, pos, eof
+            if eof:
+                return False
+            chunk = f.read(chunk_size)
+            if not chunk:
+                eof = True
+                return False
+            buf = buf[pos:] + chunk
+            pos = 0
+            return True
+
+        def skip_ws() -> str:
+            nonlocal pos
+            while True:
+                while pos < len(buf) and buf[pos] in " \t\r\n":
+                    pos += 1
+                if pos < len(buf):
+                    return buf[pos]
+                if not fill():
+                    return ""
+
+        def decode() -> Any:
+            nonlocal pos
+            while True:
+                try:
+                    value, end = decoder.raw_decode(buf, pos)
+                except json.JSONDecodeError:
+                    if not fill():
+                        raise
+                    continue
+                # A value ending exactly at the buffer end may be cut short.
+                if end == len(buf) and fill():
+                    continue
+                pos = end
+                return value
+
+        if skip_ws() != "{":
+            raise ValueError(f"{path} does not contain a JSON object")
+        pos += 1
+        while True:
+            char = skip_ws()
+            if char == "}":
+                return
+            if char == ",":
+                pos += 1
+                continue
+            key = decode()
+            if skip_ws() != ":":
+                raise ValueError(f"Malformed JSON object in {path}")
+            pos += 1
+            skip_ws()
+            yield key, decode()
+
+
+def _build_hosts(factory: Callable[..., Any], aliases: List[str], columns: Dict[str, List[Any]]) -> Dict[str, Any]:
+    """Build hosts from snapshot columns.
+
+    A dataclass ``factory`` whose fields are exactly the columns is called
+    positionally, which saves building a keyword dict per host.
+    """
+    if is_dataclass(factory):
+        names = [f.name for f in fields(factory)]
+        if sorted(names) == sorted(columns):
+            return dict(zip(aliases, map(factory, *(columns[name] for name in names))))
+    keys = list(columns)
+    return {alias: factory(**dict(zip(keys, values))) for alias, values in zip(aliases, zip(*columns.values()))}
+
+
+def load_json_hosts(path: str, factory: Callable[..., Any],
+                    cache: Optional[SnapshotCache] = None) -> Dict[str, Any]:
+    """Load a JSON host file, from its binary snapshot when that is fresh.
+
+    Otherwise the file is parsed and the snapshot rebuilt from it. Raises
+    FileNotFoundError if the file does not exist.
+    """
+    cached = cache.read() if cache is not None else None
+    if cached is not None:
+        return _build_hosts(factory, *cached)
+    with open(path, 'rb') as f:
+        contents = f.read()
+        fingerprint = source_fingerprint(f.fileno(), contents) if cache is not None else None
+    data: Dict[str, Any] = json.loads(contents)
+    if cache is not None:
+        cache.write(data, fingerprint)
+    return {alias: factory(**host_data) for alias, host_data in data.items()}
+
+
+def _replay_columns(cached: SnapshotColumns) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    aliases, columns = cached
+    keys = list(columns)
+    for alias, values in zip(aliases, zip(*columns.values())):
+        yield alias, dict(zip(keys, values))
+
+
+def replay_json_hosts(path: str, cache: Optional[SnapshotCache] = None) -> Iterator[Tuple[str, Any]]:
+    """Stream the (alias, fields) records of a JSON host file, from its snapshot when fresh.
+
+    A stale snapshot is rebuilt once the whole file has been streamed,
+    provided the file did not change in the meantime.
+    """
+    cached = cache.read() if cache is not None else None
+    if cached is not None:
+        yield from _replay_columns(cached)
+        return
+    if cache is None:
+        yield from iter_json_object(path)
+        return
+    before = stat_fingerprint(path)
+    data: Dict[str, Any] = {}
+    for alias, host_data in iter_json_object(path):
+        data[alias] = host_data
+        yield alias, host_data
+    after = stat_fingerprint(path)
+    if before is not None and after is not None and before.same_stat(after):
+        cache.write(data, FileFingerprint(before.inode, before.mtime_ns, before.size, file_digest(path)))
+
+
+def _record_digest(host_data: Optional[Mapping[str, Any]]) -> Optional[str]:
+    """Short digest of a host's fields, or None for an absent host."""
+    if host_data is None:
+        return None
+    text = json.dumps(host_data, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(text.encode()).hexdigest()[:16]
+
+
+def _dump_snapshot(hosts: Mapping[str, Any]) -> str:
+    return json.dumps(
+        {alias: asdict(host) for alias, host in hosts.items()},
+        indent=2
+    )
+
+
+class HostStorage:
+    """Base class for host persistence backends."""
+
+    def load(self, factory: Callable[..., Any]) -> MutableMapping[str, Any]:
+        """Load all hosts, building each one with ``factory(**fields)``."""
+        raise NotImplementedError
+
+    def commit(self, hosts: Mapping[str, Any], changed: Iterable[str],
+               previous: Optional[Mapping[str, Any]] = None) -> None:
+        """Persist the ``changed`` aliases of ``hosts``.
+
+        Aliases that are no longer present in ``hosts`` are recorded as
+        deletions. ``previous`` optionally maps the changed aliases to the
+        hosts they held in storage before (None if absent).
+        """
+        raise NotImplementedError
+
+    def replay(self) -> Iterator[Tuple[str, Optional[Dict[str, Any]]]]:
+        """Stream the stored hosts as (alias, fields) records.
+
+        A record with ``None`` fields deletes the alias; applying the records
+        in order yields what ``load`` returns. Backends that can parse
+        incrementally override this so that the first records arrive early.
+        """
+        yield from self.load(dict).items()
+
+    def watched_paths(self) -> List[str]:
+        """Files whose changes by other processes should trigger a reload."""
+        return []
+
+    def rollback(self) -> None:
+        """Discard writes made since the last commit, if the backend buffers any."""
+
+    def close(self) -> None:
+        """Release any resources held by the backend."""
+
+
+class JsonStorage(HostStorage):
+    """Stores every host in a single pretty-printed JSON file.
+
+    With a ``cache``, loads are served from its binary snapshot of the file
+    while that is fresh.
+    """
+
+    def __init__(self, path: str, cache: Optional[SnapshotCache] = None):
+        self.path = path
+        self.cache = cache
+
+    def load(self, factory: Callable[..., Any]) -> MutableMapping[str, Any]:
+        try:
+            return load_json_hosts(self.path, factory, self.cache)
+        except FileNotFoundError:
+            atomic_write(self.path, "{}")
+            return {}
+
+    def replay(self) -> Iterator[Tuple[str, Optional[Dict[str, Any]]]]:
+        if not os.path.exists(self.path):
+            atomic_write(self.path, "{}")
+        return replay_json_hosts(self.path, self.cache)
+
+    def watched_paths(self) -> List[str]:
+        return [self.path]
+
+    def commit(self, hosts: Mapping[str, Any], changed: Iterable[str],
+               previous: Optional[Mapping[str, Any]] = None) -> None:
+        atomic_write(self.path, _dump_snapshot(hosts))
+
+
+class JournalStorage(HostStorage):
+    """Append-only journal on top of a JSON snapshot.
+
+    Every mutation is appended to the journal as one small JSON record per
+    line, and ``load`` rebuilds the hosts as snapshot + journal replay. The
+    snapshot has the same format as :class:`JsonStorage`, so an existing
+    ``ssh_hosts.json`` is picked up as the initial snapshot.
+
+    Once the journal grows past ``compact_threshold`` bytes it is folded into
+    a fresh snapshot, in a background thread unless ``background`` is False.
+    Records are full puts and deletes, so replaying a journal prefix that is
+    already part of the snapshot is harmless; this keeps a crash between the
+    snapshot rename and the journal truncation safe. Compaction writes under
+    the exclusive ``file_lock``, and is dropped if the snapshot was rewritten
+    by someone else since the hosts being folded were read from it.
+
+    With a ``cache``, the snapshot is read from its binary copy while that
+    is fresh; the journal is always replayed on top.
+
+    Records committed with the ``previous`` hosts carry a digest of the
+    value they replace. A record whose digest no longer matches is skipped
+    on replay: the alias was changed in the snapshot by someone else, such
+    as a script editing ``ssh_hosts.json``, and that edit wins. ``factory``
+    is the dataclass the hosts are built with; ``replay`` uses it to compare
+    raw snapshot records that leave out default fields.
+    """
+
+    def __init__(
+        self,
+        snapshot_path: str,
+        journal_path: Optional[str] = None,
+        compact_threshold: int = DEFAULT_COMPACT_THRESHOLD,
+        background: bool = True,
+        fsync: bool = True,
+        file_lock: Optional[Any] = None,
+        cache: Optional[SnapshotCache] = None,
+        factory: Optional[Callable[..., Any]] = None,
+    ):
+        self.snapshot_path = snapshot_path
+        self.cache = cache
+        self.factory = factory
+        self.journal_path = journal_path or f"{snapshot_path}.journal"
+        self.compact_threshold = compact_threshold
+        self.background = background
+        self.fsync = fsync
+        # Inter-process lock (an InventoryLock) held while the files are rewritten.
+        self.file_lock = file_lock
+        # FileWatcher of the files, told about our own rewrites so they are not reloaded
+        self.watcher: Optional[FileWatcher] = None
+        # Stat of the snapshot as last read or written by us
+        self._snapshot_seen: Optional[FileFingerprint] = None
+        self._lock = threading.Lock()
+        self._journal = None
+        self._compactor: Optional[threading.Thread] = None
+
+    def load(self, factory: Callable[..., Any]) -> MutableMapping[str, Any]:
+        self.wait()
+        with self._lock:
+            self._close_journal()
+            self._snapshot_seen = stat_fingerprint(self.snapshot_path)
+            try:
+                hosts = load_json_hosts(self.snapshot_path, factory, self.cache)
+            except FileNotFoundError:
+                hosts = {}
+                atomic_write(self.snapshot_path, "{}")
+                self._snapshot_seen = stat_fingerprint(self.snapshot_path)
+            records = self._applicable(self._journal_records(), hosts.get)
+            for alias, host_data in records:
+                if host_data is None:
+                    hosts.pop(alias, None)
+                else:
+                    hosts[alias] = factory(**host_data)
+        return hosts
+
+    def replay(self) -> Iterator[Tuple[str, Optional[Dict[str, Any]]]]:
+        self.wait()
+        with self._lock:
+            self._close_journal()
+            if not os.path.exists(self.snapshot_path):
+                atomic_write(self.snapshot_path, "{}")
+            self._snapshot_seen = stat_fingerprint(self.snapshot_path)
+            journal = list(self._journal_records())
+        # Keep the snapshot records of journaled aliases to check the records against
+        journaled = {alias for alias, _, base in journal if base is not _NO_BASE}
+        stored: Dict[str, Any] = {}
+        for alias, host_data in replay_json_hosts(self.snapshot_path, self.cache):
+            if alias in journaled:
+                stored[alias] = host_data
+            yield alias, host_data
+        yield from self._applicable(journal, stored.get)
+
+    def _applicable(
+        self,
+        journal: Iterable[Tuple[str, Optional[Dict[str, Any]], Any]],
+        stored: Callable[[str], Any],
+    ) -> Iterator[Tuple[str, Optional[Dict[str, Any]]]]:
+        """Drop the journal records whose alias was changed in the snapshot since.
+
+        ``stored`` returns the snapshot host or raw record of an alias; it is
+        only asked before the alias's first record is applied.
+        """
+        current: Dict[str, Optional[str]] = {}
+        for alias, host_data, base in journal:
+            if base is not _NO_BASE:
+                if alias not in current:
+                    current[alias] = _record_digest(self._fields(stored(alias)))
+                if current[alias] != base:
+                    continue
+            current[alias] = _record_digest(host_data)
+            yield alias, host_data
+
+    def _fields(self, host: Any) -> Optional[Dict[str, Any]]:
+        """The fields of a built host or a raw record, defaults filled in."""
+        if host is None:
+            return None
+        if is_dataclass(host):
+            return asdict(host)
+        if self.factory is not None:
+            return asdict(self.factory(**host))
+        return host
+
+    def watched_paths(self) -> List[str]:
+        return [self.snapshot_path, self.journal_path]
+
+    def _journal_records(self) -> Iterator[Tuple[str, Optional[Dict[str, Any]], Any]]:
+        """Stream (alias, fields, base digest) journal records, dropping a torn trailing record.
+
+        Records written without the replaced value carry ``_NO_BASE``.
+        """
+        try:
+            f = open(self.journal_path, 'rb')
+        except FileNotFoundError:
+            return
+        good_offset = 0
+        with f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                good_offset += len(line)
+                host_data = record["host"] if record["op"] == "put" else None
+                yield record["alias"], host_data, record.get("base", _NO_BASE)
+            torn = f.seek(0, os.SEEK_END) != good_offset
+        if torn:
+            # A crash mid-append left a partial line; cut it off so new
+            # records start on a clean line.
+            with open(self.journal_path, 'r+b') as f:
+                f.truncate(good_offset)
+                os.fsync(f.fileno())
+
+    def commit(self, hosts: Mapping[str, Any], changed: Iterable[str],
+               previous: Optional[Mapping[str, Any]] = None) -> None:
+        lines = []
+        for alias in changed:
+            host = hosts.get(alias)
+            if host is None:
+                record = {"op": "del", "alias": alias}
+            else:
+                record = {"op": "put", "alias": alias, "host": asdict(host)}
+            if previous is not None and alias in previous:
+                record["base"] = _record_digest(self._fields(previous[alias]))
+            lines.append(json.dumps(record, separators=(",", ":")) + "\n")
+        if not lines:
+            return
+
+        with self._lock:
+            journal = self._open_journal()
+            journal.write("".join(lines).encode())
+            journal.flush()
+            if self.fsync:
+                os.fsync(journal.fileno())
+            offset = journal.tell()
+
+        if offset >= self.compact_threshold:
+            self._start_compaction(dict(hosts), offset, self._snapshot_seen)
+
+    def compact(self, hosts: Mapping[str, Any]) -> bool:
+        """Synchronously fold the journal into a fresh snapshot of ``hosts``.
+
+        Returns False if the snapshot changed since ``hosts`` were loaded,
+        in which case nothing is written.
+        """
+        self.wait()
+        with self._lock:
+            offset = self._journal_size()
+        return self._compact(dict(hosts), offset, self._snapshot_seen)
+
+    def wait(self) -> None:
+        """Block until a running background compaction has finished."""
+        compactor = self._compactor
+        if compactor is not None:
+            compactor.join()
+
+    def close(self) -> None:
+        self.wait()
+        with self._lock:
+            self._close_journal()
+
+    def _start_compaction(self, state: Dict[str, Any], offset: int,
+                          seen: Optional[FileFingerprint]) -> None:
+        if not self.background:
+            self._compact(state, offset, seen)
+            return
+        if self._compactor is not None and self._compactor.is_alive():
+            return
+        self._compactor = threading.Thread(
+            target=self._compact,
+            args=(state, offset, seen),
+            name="journal-compactor",
+            daemon=True,
+        )
+        self._compactor.start()
+
+    def _compact(self, state: Dict[str, Any], offset: int, seen: Optional[FileFingerprint]) -> bool:
+        """Write ``state`` as the new snapshot and drop the first ``offset`` journal bytes.
+
+        ``state`` must reflect exactly the journal records before ``offset``
+        on top of the snapshot ``seen``; records appended while the snapshot
+        is being written are carried over. If the snapshot is no longer
+        ``seen``, another writer changed it and nothing is written; the
+        next commit past the threshold tries again. Returns whether the
+        journal was compacted.
+        """
+        file_lock = self.file_lock.exclusive() if self.file_lock else nullcontext()
+        with file_lock:
+            before = stat_fingerprint(self.snapshot_path)
+            if before is None or seen is None or not before.same_stat(seen):
+                return False
+            atomic_write(self.snapshot_path, _dump_snapshot(state))
+            with self._lock:
+                self._close_journal()
+                journal_before = stat_fingerprint(self.journal_path)
+                try:
+                    with open(self.journal_path, 'rb') as f:
+                        f.seek(offset)
+                        tail = f.read()
+                except FileNotFoundError:
+                    tail = b""
+                tmp_path = f"{self.journal_path}.tmp"
+                with open(tmp_path, 'wb') as f:
+                    f.write(tail)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.journal_path)
+                _fsync_dir(os.path.dirname(self.journal_path))
+                self._snapshot_seen = stat_fingerprint(self.snapshot_path)
+            if self.watcher is not None:
+                self.watcher.accept(self.snapshot_path, before)
+                self.watcher.accept(self.journal_path, journal_before)
+        return True
+
+    def _journal_size(self) -> int:
+        try:
+            return os.path.getsize(self.journal_path)
+        except FileNotFoundError:
+            return 0
+
+    def _open_journal(self):
+        if self._journal is None:
+            self._journal = open(self.journal_path, 'ab')
+        return self._journal
+
+    def _close_journal(self) -> None:
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+
+class SQLiteHostMap(MutableMapping):
+    """Mapping of alias to host backed by an SQLite table.
+
+    Hosts are built on access instead of being held in memory, and writes
+    join the connection's open transaction until :meth:`SQLiteStorage.commit`.
+    ``find`` and ``distinct`` are answered from the table's indexes.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, lock: threading.RLock,
+                 factory: Callable[..., Any], columns: List[str]):
+        self._conn = conn
+        self._lock = lock
+        self._factory = factory
+        self._columns = columns
+        quoted = ", ".join(f'"{c}"' for c in columns)
+        self._quoted_columns = quoted
+        self._select = f"SELECT {quoted} FROM hosts"
+        self._upsert = (
+            f"INSERT INTO hosts (alias_key, {quoted}) VALUES (?, {', '.join('?' for _ in columns)}) "
+            f"ON CONFLICT(alias_key) DO UPDATE SET "
+            + ", ".join(f'"{c}" = excluded."{c}"' for c in columns)
+        )
+
+    def _query(self, sql: str, params: Tuple = ()) -> List[Tuple]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _build(self, row: Tuple) -> Any:
+        return self._factory(**dict(zip(self._columns, row)))
+
+    def __getitem__(self, alias: str) -> Any:
+        rows = self._query(f"{self._select} WHERE alias_key = ?", (alias,))
+        if not rows:
+            raise KeyError(alias)
+        return self._build(rows[0])
+
+    def __setitem__(self, alias: str, host: Any) -> None:
+        data = asdict(host)
+        with self._lock:
+            self._conn.execute(self._upsert, (alias, *(data[c] for c in self._columns)))
+
+    def __delitem__(self, alias: str) -> None:
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM hosts WHERE alias_key = ?", (alias,))
+        if cursor.rowcount == 0:
+            raise KeyError(alias)
+
+    def __contains__(self, alias: object) -> bool:
+        return bool(self._query("SELECT 1 FROM hosts WHERE alias_key = ?", (alias,)))
+
+    def __iter__(self) -> Iterator[str]:
+        for (alias,) in self._query("SELECT alias_key FROM hosts ORDER BY rowid"):
+            yield alias
+
+    def __len__(self) -> int:
+        return self._query("SELECT COUNT(*) FROM hosts")[0][0]
+
+    def values(self) -> Iterator[Any]:
+        """Iterate over all hosts with a single query."""
+        for row in self._query(f"{self._select} ORDER BY rowid"):
+            yield self._build(row)
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        """Iterate over all (alias, host) pairs with a single query."""
+        for row in self._query(f"SELECT alias_key, {self._quoted_columns} FROM hosts ORDER BY rowid"):
+            yield row[0], self._build(row[1:])
+
+    def find(self, field: str, value: Any) -> List[Any]:
+        """Return all hosts whose ``field`` equals ``value``."""
+        self._check_field(field)
+        rows = self._query(f'{self._select} WHERE "{field}" = ? ORDER BY rowid', (value,))
+        return [self._build(row) for row in rows]
+
+    def find_aliases(self, field: str, value: Any) -> List[str]:
+        """Return the aliases of the hosts whose ``field`` equals ``value``."""
+        self._check_field(field)
+        rows = self._query(f'SELECT alias_key FROM hosts WHERE "{field}" = ? ORDER BY rowid', (value,))
+        return [alias for (alias,) in rows]
+
+    def distinct(self, field: str) -> List[Any]:
+        """Return the distinct non-empty values of ``field``."""
+        self._check_field(field)
+        rows = self._query(
+            f'SELECT DISTINCT "{field}" FROM hosts WHERE "{field}" IS NOT NULL AND "{field}" != \'\''
+        )
+        return [value for (value,) in rows]
+
+    def search(self, query: str, fields: Iterable[str], limit: Optional[int] = None) -> List[str]:
+        """Return the aliases with ``query`` in any of ``fields``, ignoring case.
+
+        Exact and prefix alias matches come first. This scans the table, which
+        SQLite does quickly enough without holding a search index in memory.
+        """
+        fields = list(fields)
+        for field in fields:
+            self._check_field(field)
+        query = query.strip().lower()
+        matches = " OR ".join(f'instr(lower(coalesce("{field}", \'\')), ?) > 0' for field in fields)
+        rows = self._query(
+            f"SELECT alias_key FROM hosts WHERE {matches} "
+            "ORDER BY lower(alias_key) = ? DESC, substr(lower(alias_key), 1, ?) = ? DESC, rowid "
+            "LIMIT ?",
+            (*(query for _ in fields), query, len(query), query, -1 if limit is None else limit),
+        )
+        return [alias for (alias,) in rows]
+
+    def _check_field(self, field: str) -> None:
+        if field not in self._columns:
+            raise ValueError(f"Unknown host field '{field}'")
+
+
+class SQLiteStorage(HostStorage):
+    """Keeps hosts in an SQLite database instead of loading them all into memory.
+
+    ``load`` returns a :class:`SQLiteHostMap`, so startup cost does not grow
+    with the inventory size. When the hosts table is empty and
+    ``migrate_from`` points at an existing JSON snapshot (and its journal),
+    those hosts are imported in one transaction and the old files are renamed
+    with a ``.migrated`` suffix. A migration cut short is retried on the next
+    load, as the table is still empty then.
+    """
+
+    def __init__(self, path: str, migrate_from: Optional[str] = None):
+        self.path = path
+        self.migrate_from = migrate_from
+        self._lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._data_version: Optional[int] = None
+
+    def load(self, factory: Callable[..., Any]) -> MutableMapping[str, Any]:
+        columns = [f.name for f in fields(factory)]
+        with self._lock:
+            if self._conn is None:
+                self._conn = sqlite3.connect(self.path, check_same_thread=False)
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._create_schema(columns)
+            empty = self._conn.execute("SELECT 1 FROM hosts LIMIT 1").fetchone() is None
+            self._data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        hosts = SQLiteHostMap(self._conn, self._lock, factory, columns)
+        if empty:
+            self._migrate(hosts, factory)
+        return hosts
+
+    def _create_schema(self, columns: List[str]) -> None:
+        """Create the hosts table and its indexes if missing."""
+        column_defs = ", ".join(f'"{c}"' for c in columns)
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS hosts (alias_key TEXT NOT NULL UNIQUE, {column_defs})"
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS hosts_group ON hosts ("group")')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS hosts_host ON hosts ("host")')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS hosts_user ON hosts ("user")')
+        self._conn.commit()
+
+    def _migrate(self, hosts: SQLiteHostMap, factory: Callable[..., Any]) -> None:
+        if not self.migrate_from or not os.path.exists(self.migrate_from):
+            return
+        legacy = JournalStorage(self.migrate_from)
+        for alias, host in legacy.load(factory).items():
+            hosts[alias] = host
+        legacy.close()
+        self.commit(hosts, [])
+        for path in (legacy.snapshot_path, legacy.journal_path):
+            if os.path.exists(path):
+                os.replace(path, f"{path}.migrated")
+
+    def changed_externally(self) -> bool:
+        """Return True if another connection committed since the last call."""
+        with self._lock:
+            version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        changed = version != self._data_version
+        self._data_version = version
+        return changed
+
+    def commit(self, hosts: Mapping[str, Any], changed: Iterable[str],
+               previous: Optional[Mapping[str, Any]] = None) -> None:
+        # SQLiteHostMap writes straight into the open transaction.
+        with self._lock:
+            self._conn.commit()
+
+    def rollback(self) -> None:
+        with self._lock:
+            self._conn.rollback()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
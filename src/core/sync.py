@@ -0,0 +1,491 @@
+import hashlib
+import math
+import os
+import posixpath
+import stat
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+import paramiko
+from paramiko.sftp import CMD_CLOSE, CMD_HANDLE, CMD_NAME, CMD_OPENDIR, CMD_READDIR, CMD_STATUS
+
+from .connection_pool import MAX_IDLE_SFTP, ConnectionPool
+from .host_manager import SSHHost
+from .tar_stream import TarStream
+from .transfer import ProgressCallback, RequestReplies, SFTPTransfer
+
+# SFTP channels used at once. Small files cost a few round trips each, so
+# throughput grows with channels; more than the pool keeps idle would
+# reopen sessions
+WORKERS = MAX_IDLE_SFTP
+# Files at least this large look for a partial copy to resume; smaller ones
+# skip that round trip
+RESUME_THRESHOLD = 1024 * 1024
+# Copying a small file over SFTP costs a few round trips, while a tar
+# stream of many is bound by bandwidth alone. With the "auto" method, the
+# files under TAR_MAX_FILE_SIZE go through one tar stream when there are
+# at least TAR_MIN_FILES of them averaging under TAR_MAX_AVERAGE_SIZE;
+# larger files keep the resumable SFTP path
+TAR_MIN_FILES = 32
+TAR_MAX_FILE_SIZE = 1024 * 1024
+TAR_MAX_AVERAGE_SIZE = 128 * 1024
+METHODS = ("auto", "sftp", "tar")
+# Remote directories listed at once on one SFTP session
+LIST_BATCH = 64
+# Bytes read at a time when hashing local files
+_HASH_BLOCK = 1024 * 1024
+
+
+class FileInfo(NamedTuple):
+    """One entry of a directory listing."""
+    size: int
+    # Whole seconds, the precision SFTP carries
+    mtime: int
+    is_dir: bool
+
+
+# Entries of a tree by "/"-separated path relative to its root; the root
+# itself is not included
+Listing = Dict[str, FileInfo]
+
+
+@dataclass
+class SyncPlan:
+    """Changes a sync makes to the destination, as paths relative to its root.
+
+    An empty path stands for the destination root itself.
+    """
+    # Directories to create, parents first
+    directories: List[str] = field(default_factory=list)
+    files: List[str] = field(default_factory=list)
+    # Those of ``files`` to copy as one tar stream rather than over SFTP
+    streamed: List[str] = field(default_factory=list)
+    extraneous_files: List[str] = field(default_factory=list)
+    # Deepest first
+    extraneous_directories: List[str] = field(default_factory=list)
+    unchanged: int = 0
+    # Size of the files to copy
+    bytes: int = 0
+
+    def __bool__(self) -> bool:
+        return bool(self.directories or self.files or self.extraneous_files
+                    or self.extraneous_directories)
+
+
+@dataclass
+class SyncResult:
+    """Outcome of a sync, or of a dry run when ``dry_run`` is set."""
+    plan: SyncPlan
+    dry_run: bool = False
+    copied: int = 0
+    # Files copied through a tar stream, counted in ``copied`` too
+    streamed: int = 0
+    # Bytes copied, not counting resumed prefixes
+    transferred: int = 0
+    deleted: int = 0
+    # Error message by relative path
+    errors: Dict[str, str] = field(default_factory=dict)
+    duration: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+
+def _kind(mode: Optional[int]) -> Optional[bool]:
+    """Whether a mode is a directory, or None for anything but directories and regular files."""
+    if mode is None:
+        return None
+    if stat.S_ISDIR(mode):
+        return True
+    return False if stat.S_ISREG(mode) else None
+
+
+def _child(parent: str, name: str) -> str:
+    return f"{parent}/{name}" if parent else name
+
+
+def _by_depth(paths: List[str], deepest_first: bool = False) -> List[List[str]]:
+    """Group paths by depth; paths in one group do not contain each other."""
+    levels: Dict[int, List[str]] = {}
+    for path in paths:
+        levels.setdefault(path.count("/") if path else -1, []).append(path)
+    return [levels[depth] for depth in sorted(levels, reverse=deepest_first)]
+
+
+class _LocalTree:
+    _OPERATIONS = {"mkdir": os.mkdir, "remove": os.remove, "rmdir": os.rmdir}
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def path(self, relative: str) -> str:
+        return os.path.join(self.root, *relative.split("/")) if relative else self.root
+
+    def list(self, executor: Executor) -> Optional[Listing]:
+        if not os.path.isdir(self.root):
+            return None
+        listing: Listing = {}
+        pending = [""]
+        while pending:
+            directory = pending.pop()
+            with os.scandir(self.path(directory)) as entries:
+                for entry in entries:
+                    attributes = entry.stat(follow_symlinks=False)
+                    is_dir = _kind(attributes.st_mode)
+                    if is_dir is None:
+                        continue
+                    relative = _child(directory, entry.name)
+                    listing[relative] = FileInfo(attributes.st_size, int(attributes.st_mtime), is_dir)
+                    if is_dir:
+                        pending.append(relative)
+        return listing
+
+    def apply(self, operation: str, paths: List[str]) -> Dict[str, str]:
+        errors = {}
+        for relative in paths:
+            try:
+                self._OPERATIONS[operation](self.path(relative))
+            except OSError as e:
+                errors[relative] = str(e)
+        return errors
+
+    def digest(self, relative: str) -> str:
+        digest = hashlib.sha256()
+        with open(self.path(relative), "rb") as f:
+            for block in iter(lambda: f.read(_HASH_BLOCK), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+
+class _RemoteTree:
+    def __init__(self, transfer: SFTPTransfer, host: SSHHost, root: str, workers: int):
+        self.transfer = transfer
+        self.host = host
+        self.root = root
+        self.workers = workers
+
+    def path(self, relative: str) -> str:
+        return posixpath.join(self.root, relative) if relative else self.root
+
+    def list(self, executor: Executor) -> Optional[Listing]:
+        """List the tree a level at a time, each level split between the workers."""
+        listing: Listing = {}
+        level = [""]
+        while level:
+            count = min(self.workers, math.ceil(len(level) / LIST_BATCH))
+            futures = [executor.submit(self._list_directories, level[i::count]) for i in range(count)]
+            level = []
+            for future in futures:
+                entries, missing = future.result()
+                if "" in missing:
+                    return None
+                for relative, info in entries:
+                    listing[relative] = info
+                    if info.is_dir:
+                        level.append(relative)
+        return listing
+
+    def _list_directories(self, directories: List[str]) -> Tuple[List[Tuple[str, FileInfo]], Set[str]]:
+        """List directories on one session with up to ``LIST_BATCH`` of them open at once.
+
+        This does what ``listdir_attr`` does (open, read until the end,
+        close) with the requests for many directories in flight together,
+        through the SFTP client's request API as ``SFTPTransfer`` reads
+        files. Returns the entries found and the directories that no
+        longer exist.
+        """
+        entries: List[Tuple[str, FileInfo]] = []
+        missing: Set[str] = set()
+        waiting = deque(directories)
+        replies = RequestReplies()
+        # Request number -> directory being opened or read, and its handle
+        requests: Dict[int, Tuple[str, Optional[bytes]]] = {}
+        with self.transfer.pool.sftp(self.host) as sftp:
+            while waiting or requests:
+                while waiting and len(requests) < LIST_BATCH:
+                    directory = waiting.popleft()
+                    requests[sftp._async_request(replies, CMD_OPENDIR, self.path(directory))] = (directory, None)
+                while not replies.replies:
+                    sftp._read_response()
+                for num, (t, msg) in list(replies.replies.items()):
+                    del replies.replies[num]
+                    directory, handle = requests.pop(num)
+                    if t == CMD_STATUS:
+                        try:
+                            sftp._convert_status(msg)
+                        except EOFError:
+                            # Read to the end; the reply to closing is not needed
+                            sftp._async_request(type(None), CMD_CLOSE, handle)
+                            continue
+                        except FileNotFoundError:
+                            if handle is None:
+                                # Removed since its parent was listed
+                                missing.add(directory)
+                                continue
+                            raise
+                        raise paramiko.SFTPError(f"Unexpected reply listing {self.path(directory)}")
+                    if t == CMD_HANDLE:
+                        handle = msg.get_binary()
+                    elif t == CMD_NAME:
+                        for _ in range(msg.get_int()):
+                            name = msg.get_text()
+                            attributes = paramiko.SFTPAttributes._from_msg(msg, name, msg.get_text())
+                            is_dir = _kind(attributes.st_mode)
+                            if name in (".", "..") or is_dir is None:
+                                continue
+                            entries.append((_child(directory, name), FileInfo(
+                                attributes.st_size or 0, int(attributes.st_mtime or 0), is_dir)))
+                    requests[sftp._async_request(replies, CMD_READDIR, handle)] = (directory, handle)
+        return entries, missing
+
+    def apply(self, operation: str, paths: List[str]) -> Dict[str, str]:
+        errors = {}
+        with self.transfer.pool.sftp(self.host) as sftp:
+            for relative in paths:
+                try:
+                    getattr(sftp, operation)(self.path(relative))
+                except IOError as e:
+                    errors[relative] = str(e)
+        return errors
+
+    def digest(self, relative: str) -> str:
+        return self.transfer.digest(self.host, self.path(relative))
+
+
+class _Progress:
+    """Adds up the progress of files copied at once."""
+
+    def __init__(self, total: int, callback: ProgressCallback):
+        self.total = total
+        self.callback = callback
+        self.done = 0
+        self._files: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def file(self, relative: str) -> ProgressCallback:
+        return lambda done, total: self.update(relative, done)
+
+    def update(self, relative: str, done: int) -> None:
+        with self._lock:
+            self.done += done - self._files.get(relative, 0)
+            self._files[relative] = done
+            done = self.done
+        self.callback(done, self.total)
+
+
+class DirectorySync:
+    """Mirrors a directory tree between the local machine and a host, like rsync.
+
+    Both trees are listed at once: the local one with ``os.scandir``, the
+    remote one a level at a time, with the directory listings of a level
+    pipelined over ``workers`` SFTP sessions, so listing costs a few round
+    trips per level of the tree rather than per file or directory. A file is copied when the destination
+    lacks it or its size or modification time differs; with ``checksum``,
+    files of equal size are compared by SHA-256 instead, which reads both
+    copies. Copies go through ``SFTPTransfer`` on ``workers`` channels at
+    once and keep the source's modification time, so syncing an unchanged
+    tree again copies nothing. Many small files are sent as one tar
+    stream instead (see ``TarStream``) when the host can run ``tar``; the
+    ``method`` argument forces one way or the other.
+
+    With ``delete``, destination entries missing from the source are
+    removed before anything is copied. With ``dry_run``, the plan is made
+    and returned without changing anything. Symbolic links and special
+    files are skipped on both sides.
+    """
+
+    def __init__(self, pool: ConnectionPool, transfer: Optional[SFTPTransfer] = None,
+                 workers: int = WORKERS, tar: Optional[TarStream] = None):
+        self.pool = pool
+        self.transfer = transfer if transfer is not None else SFTPTransfer(pool)
+        self.workers = workers
+        self.tar = tar if tar is not None else TarStream(pool)
+
+    def push(self, host: SSHHost, local_dir: str, remote_dir: str, delete: bool = False,
+             dry_run: bool = False, checksum: bool = False, method: str = "auto",
+             progress: Optional[ProgressCallback] = None) -> SyncResult:
+        """Make ``remote_dir`` on the host match ``local_dir``.
+
+        ``progress`` is called from the copying threads with bytes done and
+        the total to copy.
+        """
+        return self._sync(host, local_dir, remote_dir, True, delete, dry_run, checksum, method, progress)
+
+    def pull(self, host: SSHHost, remote_dir: str, local_dir: str, delete: bool = False,
+             dry_run: bool = False, checksum: bool = False, method: str = "auto",
+             progress: Optional[ProgressCallback] = None) -> SyncResult:
+        """Make ``local_dir`` match ``remote_dir`` on the host.
+
+        ``progress`` is called from the copying threads with bytes done and
+        the total to copy.
+        """
+        return self._sync(host, local_dir, remote_dir, False, delete, dry_run, checksum, method, progress)
+
+    def _sync(self, host: SSHHost, local_dir: str, remote_dir: str, upload: bool, delete: bool,
+              dry_run: bool, checksum: bool, method: str,
+              progress: Optional[ProgressCallback]) -> SyncResult:
+        if method not in METHODS:
+            raise ValueError(f"Unknown transfer method '{method}', expected one of {', '.join(METHODS)}")
+        started = time.monotonic()
+        local = _LocalTree(local_dir)
+        remote = _RemoteTree(self.transfer, host, remote_dir, self.workers)
+        source, destination = (local, remote) if upload else (remote, local)
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="sync") as executor:
+            local_listing = executor.submit(local.list, executor)
+            remote_listing = remote.list(executor)
+            listings = (local_listing.result(), remote_listing)
+            source_listing, destination_listing = listings if upload else listings[::-1]
+            if source_listing is None:
+                raise FileNotFoundError(source.root)
+
+            plan = self._plan(executor, source, destination, source_listing,
+                              destination_listing, delete, checksum)
+            plan.streamed = self._streamed(plan.files, source_listing, method)
+            result = SyncResult(plan, dry_run=dry_run)
+            if not dry_run:
+                self._apply(executor, host, upload, local, remote, source_listing, result, progress)
+        result.duration = time.monotonic() - started
+        return result
+
+    def _plan(self, executor: Executor, source, destination, source_listing: Listing,
+              destination_listing: Optional[Listing], delete: bool, checksum: bool) -> SyncPlan:
+        plan = SyncPlan()
+        if destination_listing is None:
+            plan.directories.append("")
+            destination_listing = {}
+
+        candidates = []
+        # Sorted, so directories come before their contents
+        for relative in sorted(source_listing):
+            info = source_listing[relative]
+            existing = destination_listing.get(relative)
+            if info.is_dir:
+                if existing is None or not existing.is_dir:
+                    plan.directories.append(relative)
+            elif existing is None or existing.is_dir or existing.size != info.size:
+                plan.files.append(relative)
+            elif checksum:
+                candidates.append(relative)
+            elif existing.mtime != info.mtime:
+                plan.files.append(relative)
+            else:
+                plan.unchanged += 1
+
+        if candidates:
+            same = {
+                relative: executor.submit(
+                    lambda relative: source.digest(relative) == destination.digest(relative), relative
+                )
+                for relative in candidates
+            }
+            for relative in candidates:
+                if same[relative].result():
+                    plan.unchanged += 1
+                else:
+                    plan.files.append(relative)
+            plan.files.sort()
+
+        if delete:
+            for relative, info in destination_listing.items():
+                wanted = source_listing.get(relative)
+                if wanted is None or wanted.is_dir != info.is_dir:
+                    if info.is_dir:
+                        plan.extraneous_directories.append(relative)
+                    else:
+                        plan.extraneous_files.append(relative)
+            plan.extraneous_files.sort()
+            plan.extraneous_directories.sort(key=lambda path: (-path.count("/"), path))
+
+        plan.bytes = sum(source_listing[relative].size for relative in plan.files)
+        return plan
+
+    @staticmethod
+    def _streamed(files: List[str], listing: Listing, method: str) -> List[str]:
+        """The files to send as a tar stream."""
+        if method != "auto":
+            return list(files) if method == "tar" else []
+        small = [relative for relative in files if listing[relative].size < TAR_MAX_FILE_SIZE]
+        if len(small) < TAR_MIN_FILES:
+            return []
+        if sum(listing[relative].size for relative in small) > len(small) * TAR_MAX_AVERAGE_SIZE:
+            return []
+        return small
+
+    def _apply(self, executor: Executor, host: SSHHost, upload: bool, local: _LocalTree,
+               remote: _RemoteTree, source_listing: Listing, result: SyncResult,
+               progress: Optional[ProgressCallback]) -> None:
+        plan = result.plan
+        destination = remote if upload else local
+        errors = result.errors
+
+        # Deletions go first, so an entry changing between file and directory
+        # is out of the way of its replacement
+        extraneous = plan.extraneous_files + plan.extraneous_directories
+        errors.update(self._batched(executor, destination, "remove", plan.extraneous_files))
+        for level in _by_depth(plan.extraneous_directories, deepest_first=True):
+            errors.update(self._batched(executor, destination, "rmdir", level))
+        result.deleted = sum(1 for relative in extraneous if relative not in errors)
+
+        for level in _by_depth(plan.directories):
+            errors.update(self._batched(executor, destination, "mkdir", level))
+
+        tracker = _Progress(plan.bytes, progress) if progress is not None else None
+
+        def copy(relative: str) -> int:
+            callback = tracker.file(relative) if tracker is not None else None
+            resume = source_listing[relative].size >= RESUME_THRESHOLD
+            if upload:
+                copied = self.transfer.upload(host, local.path(relative), remote.path(relative),
+                                              callback, resume)
+            else:
+                copied = self.transfer.download(host, remote.path(relative), local.path(relative),
+                                                callback, resume)
+            return copied.transferred
+
+        streamed = set(plan.streamed)
+        futures = {executor.submit(copy, relative): relative
+                   for relative in plan.files if relative not in streamed}
+        if streamed:
+            sent = self._stream(host, upload, local, remote, plan.streamed, tracker, result)
+            # Whatever the stream did not deliver gets a second chance over SFTP
+            futures.update((executor.submit(copy, relative), relative)
+                           for relative in plan.streamed if relative not in sent)
+        for future in as_completed(futures):
+            try:
+                result.transferred += future.result()
+                result.copied += 1
+            except Exception as e:
+                errors[futures[future]] = str(e) or type(e).__name__
+
+    def _stream(self, host: SSHHost, upload: bool, local: _LocalTree, remote: _RemoteTree,
+                paths: List[str], tracker: Optional[_Progress], result: SyncResult) -> Set[str]:
+        """Copy files as a tar stream, returning the ones that arrived."""
+        callback = tracker.file("") if tracker is not None else None
+        try:
+            if upload:
+                streamed = self.tar.upload(host, local.root, remote.root, paths, callback)
+            else:
+                streamed = self.tar.download(host, remote.root, local.root, paths, callback)
+        except Exception:
+            # E.g. no tar on the host, or an SFTP-only account; any file
+            # may or may not have arrived, so all go over SFTP
+            if tracker is not None:
+                tracker.update("", 0)
+            return set()
+        result.copied += streamed.files
+        result.streamed += streamed.files
+        result.transferred += streamed.bytes
+        return set(paths) - set(streamed.errors)
+
+    def _batched(self, executor: Executor, tree, operation: str, paths: List[str]) -> Dict[str, str]:
+        """Apply an operation to paths split between the workers, one session per batch."""
+        batches = [paths[i::self.workers] for i in range(min(self.workers, len(paths)))]
+        errors: Dict[str, str] = {}
+        for future in [executor.submit(tree.apply, operation, batch) for batch in batches]:
+            errors.update(future.result())
+        return errors
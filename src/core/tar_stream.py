@@ -0,0 +1,259 @@
+import gzip
+import os
+import shlex
+import tarfile
+import threading
+import time
+from contextlib import contextmanager, suppress
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional
+
+import paramiko
+
+from .connection_pool import ConnectionPool
+from .host_manager import SSHHost
+from .transfer import PART_SUFFIX, ProgressCallback
+
+# gzip level of uploaded archives. Trees of small files are mostly text,
+# which compresses well even at the fastest level, and the archive has to
+# keep up with the link
+COMPRESS_LEVEL = 1
+# Bytes per read when extracting or sending
+BLOCK_SIZE = 65536
+# Bytes of the command's stderr kept for error messages; only the end is kept
+STDERR_LIMIT = 65536
+# Exit status of a shell that cannot find a command
+_NOT_FOUND = 127
+
+
+class TarUnavailable(Exception):
+    """The host cannot run tar over an exec channel, e.g. an SFTP-only account."""
+
+
+@dataclass
+class TarResult:
+    """Outcome of streaming a set of files as one archive."""
+    files: int = 0
+    # Bytes of file data, and bytes of compressed archive on the wire
+    bytes: int = 0
+    wire_bytes: int = 0
+    # Error message by relative path, for files that did not make it
+    errors: Dict[str, str] = field(default_factory=dict)
+    duration: float = 0.0
+
+
+class _ChannelWriter:
+    """A write-only file over a channel's stdin, counting what it sends."""
+
+    def __init__(self, channel: paramiko.Channel):
+        self.channel = channel
+        self.sent = 0
+        # Whether sending failed, as opposed to reading a local file
+        self.broken = False
+
+    def write(self, data: bytes) -> int:
+        try:
+            self.channel.sendall(data)
+        except OSError:
+            self.broken = True
+            raise
+        self.sent += len(data)
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+
+class _ChannelReader:
+    """A read-only file over a channel's stdout, counting what it receives."""
+
+    def __init__(self, channel: paramiko.Channel):
+        self.file = channel.makefile("rb")
+        self.received = 0
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.file.read(size)
+        self.received += len(data)
+        return data
+
+
+class _StderrTail:
+    """Drains a channel's stderr in a thread, keeping the last ``limit`` bytes.
+
+    Unread stderr fills the channel's window, after which the command
+    blocks on it and stops reading stdin or writing stdout, so it is read
+    while the archive streams rather than at the end.
+    """
+
+    def __init__(self, channel: paramiko.Channel, limit: int = STDERR_LIMIT):
+        self.channel = channel
+        self.limit = limit
+        self._data = bytearray()
+        self._thread = threading.Thread(target=self._drain, name="tar-stderr", daemon=True)
+        self._thread.start()
+
+    def _drain(self) -> None:
+        try:
+            for data in iter(lambda: self.channel.recv_stderr(BLOCK_SIZE), b""):
+                self._data += data
+                del self._data[:-self.limit]
+        except OSError:
+            pass
+
+    def text(self) -> str:
+        """Wait for the end of stderr and return what was kept of it."""
+        self._thread.join()
+        return self._data.decode(errors="replace").strip()
+
+
+class TarStream:
+    """Copies many files as one gzipped tar stream through a single exec channel.
+
+    Per-file SFTP costs several round trips per file whatever its size; a
+    tar stream costs one command and is then bound by bandwidth alone.
+    Uploads pipe a ``tarfile`` archive built on the fly into ``tar -xzf -``
+    on the host; downloads send the file list to ``tar -czf -`` and unpack
+    its output as it arrives. Neither side writes a temporary archive.
+    Files keep their modification times. Paths are relative to the roots,
+    which must exist; the host needs a ``tar`` that reads file lists with
+    ``--null -T -``, as GNU tar and bsdtar do.
+    """
+
+    def __init__(self, pool: ConnectionPool, compress_level: int = COMPRESS_LEVEL):
+        self.pool = pool
+        self.compress_level = compress_level
+
+    def upload(self, host: SSHHost, local_root: str, remote_root: str, paths: List[str],
+               progress: Optional[ProgressCallback] = None) -> TarResult:
+        """Copy files under ``local_root`` to the same paths under ``remote_root``.
+
+        Raises ``TarUnavailable`` if the host cannot run tar, and
+        ``IOError`` if it fails; either way any of the files may have been
+        written.
+        """
+        started = time.monotonic()
+        result = TarResult()
+        total = self._total_size(local_root, paths)
+        with self._command(host, f"tar -xzf - -C {shlex.quote(remote_root)}") as channel:
+            writer = _ChannelWriter(channel)
+            stderr = _StderrTail(channel)
+            failure = None
+            try:
+                with gzip.GzipFile(fileobj=writer, mode="wb", compresslevel=self.compress_level,
+                                   mtime=0) as compressed, \
+                        tarfile.open(fileobj=compressed, mode="w|") as archive:
+                    for relative in paths:
+                        path = os.path.join(local_root, *relative.split("/"))
+                        info = archive.gettarinfo(path, arcname=relative)
+                        with open(path, "rb") as f:
+                            archive.addfile(info, f)
+                        result.files += 1
+                        result.bytes += info.size
+                        if progress is not None:
+                            progress(result.bytes, total)
+                channel.shutdown_write()
+            except OSError as e:
+                failure = e
+                # Let the command see the end of its input and exit
+                with suppress(OSError):
+                    channel.shutdown_write()
+            status, error = channel.recv_exit_status(), stderr.text()
+        if status == _NOT_FOUND:
+            raise TarUnavailable(f"tar is not available on {host.alias}: {error}")
+        if failure is not None and not writer.broken:
+            raise failure
+        if status != 0:
+            raise IOError(f"tar on {host.alias} exited with status {status}: {error}")
+        if failure is not None:
+            raise failure
+        result.wire_bytes = writer.sent
+        result.duration = time.monotonic() - started
+        return result
+
+    def download(self, host: SSHHost, remote_root: str, local_root: str, paths: List[str],
+                 progress: Optional[ProgressCallback] = None) -> TarResult:
+        """Copy files under ``remote_root`` to the same paths under ``local_root``.
+
+        Files the host's tar could not read are reported in ``errors``.
+        Raises ``TarUnavailable`` if the host cannot run tar. ``progress``
+        gets 0 as the total, which is not known until the end.
+        """
+        started = time.monotonic()
+        result = TarResult()
+        wanted = set(paths)
+        command = f"tar -czf - -C {shlex.quote(remote_root)} --null -T -"
+        with self._command(host, command) as channel:
+            # Written from another thread: tar starts sending the archive
+            # before it has read the whole list
+            feeder = threading.Thread(target=self._send_list, args=(channel, paths), daemon=True)
+            feeder.start()
+            stderr = _StderrTail(channel)
+            reader = _ChannelReader(channel)
+            failure = None
+            try:
+                with gzip.GzipFile(fileobj=reader, mode="rb") as compressed, \
+                        tarfile.open(fileobj=compressed, mode="r|") as archive:
+                    for member in archive:
+                        # Only the files asked for, which also keeps names
+                        # like "../x" from escaping the root
+                        if not member.isreg() or member.name not in wanted:
+                            continue
+                        self._extract(archive, member, os.path.join(local_root, *member.name.split("/")))
+                        wanted.discard(member.name)
+                        result.files += 1
+                        result.bytes += member.size
+                        if progress is not None:
+                            progress(result.bytes, 0)
+            except (tarfile.TarError, EOFError, OSError) as e:
+                failure = e
+                if not channel.eof_received:
+                    # Stop the command rather than wait for output nobody reads
+                    channel.close()
+            feeder.join()
+            status, error = channel.recv_exit_status(), stderr.text()
+        if status == _NOT_FOUND and not result.files:
+            raise TarUnavailable(f"tar is not available on {host.alias}: {error}")
+        if failure is not None and status == 0:
+            raise failure
+        message = error or str(failure or f"tar exited with status {status}")
+        result.errors = {relative: message for relative in paths if relative in wanted}
+        result.wire_bytes = reader.received
+        result.duration = time.monotonic() - started
+        return result
+
+    @contextmanager
+    def _command(self, host: SSHHost, command: str) -> Iterator[paramiko.Channel]:
+        with self.pool.connection(host) as client:
+            try:
+                channel = client.get_transport().open_session()
+                channel.exec_command(command)
+            except paramiko.SSHException as e:
+                raise TarUnavailable(f"Cannot run commands on {host.alias}: {e}") from e
+            try:
+                yield channel
+            finally:
+                channel.close()
+
+    @staticmethod
+    def _send_list(channel: paramiko.Channel, paths: List[str]) -> None:
+        try:
+            for start in range(0, len(paths), 1024):
+                channel.sendall(b"".join(path.encode() + b"\0" for path in paths[start:start + 1024]))
+            channel.shutdown_write()
+        except OSError:
+            # The command exited; its status says why
+            pass
+
+    @staticmethod
+    def _extract(archive: tarfile.TarFile, member: tarfile.TarInfo, path: str) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        source = archive.extractfile(member)
+        with open(path + PART_SUFFIX, "wb") as f:
+            for block in iter(lambda: source.read(BLOCK_SIZE), b""):
+                f.write(block)
+        os.replace(path + PART_SUFFIX, path)
+        os.utime(path, (member.mtime, member.mtime))
+
+    @staticmethod
+    def _total_size(root: str, paths: List[str]) -> int:
+        return sum(os.stat(os.path.join(root, *relative.split("/"))).st_size for relative in paths)
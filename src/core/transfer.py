@@ -0,0 +1,619 @@
+import hashlib
+import json
+import os
+import shlex
+import stat
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager, suppress
+from dataclasses import dataclass
+from typing import Any, BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple
+
+import paramiko
+from paramiko.sftp import CMD_EXTENDED, CMD_READ, CMD_STATUS, SFTP_OK, SFTP_OP_UNSUPPORTED, int64
+
+from .command_stream import STDOUT, CommandStream
+from .connection_pool import ConnectionPool
+from .host_manager import SSHHost
+from .metrics import COPY, DOWNLOAD, TOTAL, UPLOAD
+
+# Bytes per SFTP read or write request; the largest size servers must accept
+CHUNK_SIZE = 32768
+# Read requests kept in flight per channel
+MAX_REQUESTS = 64
+# Files at least this large are split into ranges copied over parallel channels
+SPLIT_THRESHOLD = 64 * 1024 * 1024
+# Seconds between saves of the resume state while copying
+CHECKPOINT_INTERVAL = 5.0
+# Bytes before a resume offset compared between source and partial copy
+VERIFY_SIZE = 65536
+# Seconds allowed for the checksum command on a host
+CHECKSUM_TIMEOUT = 120.0
+# Prints "<sha256>  <path>"; shasum covers hosts without coreutils
+_CHECKSUM_COMMAND = "sha256sum -- {path} 2>/dev/null || shasum -a 256 -- {path}"
+
+# A partial copy is written next to the destination under this suffix, and
+# renamed over it when complete. Its resume state sits beside it as JSON.
+PART_SUFFIX = ".part"
+STATE_SUFFIX = ".part.json"
+
+# Called with (bytes done, total bytes) as a transfer progresses
+ProgressCallback = Callable[[int, int], None]
+
+
+@dataclass
+class TransferResult:
+    """Outcome of one file transfer."""
+    source: str
+    destination: str
+    size: int
+    # Bytes copied by this transfer, not counting a resumed prefix
+    transferred: int
+    resumed_from: int = 0
+    duration: float = 0.0
+    # Seconds spent waiting on the source for data, and on the destination
+    # to take it; whichever is larger is the leg holding the copy back
+    read_time: float = 0.0
+    write_time: float = 0.0
+    # SHA-256 of the copy, when it was verified
+    checksum: Optional[str] = None
+
+    @property
+    def throughput(self) -> float:
+        """Bytes per second copied by this transfer."""
+        return self.transferred / self.duration if self.duration > 0 else 0.0
+
+    @property
+    def read_throughput(self) -> float:
+        """Bytes per second the source delivered while the copy waited on it."""
+        return self.transferred / self.read_time if self.read_time > 0 else 0.0
+
+    @property
+    def write_throughput(self) -> float:
+        """Bytes per second the destination took while the copy waited on it."""
+        return self.transferred / self.write_time if self.write_time > 0 else 0.0
+
+
+class _LegTimer:
+    """Wall time during which at least one thread waits on one side of a transfer."""
+
+    def __init__(self):
+        self.total = 0.0
+        self._waiting = 0
+        self._since = 0.0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def waiting(self) -> Iterator[None]:
+        with self._lock:
+            if not self._waiting:
+                self._since = time.monotonic()
+            self._waiting += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._waiting -= 1
+                if not self._waiting:
+                    self.total += time.monotonic() - self._since
+
+
+class _LocalFiles:
+    """Local file operations, in the same shape as ``_RemoteFiles``."""
+
+    def stat(self, path: str) -> Optional[os.stat_result]:
+        try:
+            return os.stat(path)
+        except FileNotFoundError:
+            return None
+
+    def open(self, path: str, mode: str) -> BinaryIO:
+        return open(path, mode)
+
+    def read_range(self, f: BinaryIO, start: int, end: int, chunk_size: int,
+                   max_requests: int) -> Iterator[bytes]:
+        f.seek(start)
+        while start < end:
+            data = f.read(min(chunk_size, end - start))
+            if not data:
+                raise EOFError(f"{f.name} ended at {start} bytes, expected {end}")
+            start += len(data)
+            yield data
+
+    def open_writer(self, path: str, offset: int, create: bool = False) -> BinaryIO:
+        f = open(path, "wb" if create else "r+b")
+        f.seek(offset)
+        return f
+
+    def checkpoint(self, f: BinaryIO, path: str) -> BinaryIO:
+        f.flush()
+        return f
+
+    def replace(self, source: str, destination: str) -> None:
+        os.replace(source, destination)
+
+    def remove(self, path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def utime(self, path: str, mtime: float) -> None:
+        os.utime(path, (mtime, mtime))
+
+
+def replace_remote(sftp: paramiko.SFTPClient, source: str, destination: str) -> None:
+    """Rename a remote file over another, as ``os.replace`` does.
+
+    Only a server without the posix-rename extension gets the destination
+    removed and a plain rename, which does not replace existing files; any
+    other failure is raised with the destination left alone.
+    """
+    # Sent by hand: paramiko's posix_rename turns "unsupported" into a bare
+    # IOError like most failures, and does not keep the server's extensions
+    replies = RequestReplies()
+    num = sftp._async_request(replies, CMD_EXTENDED, "posix-rename@openssh.com",
+                              sftp._adjust_cwd(source), sftp._adjust_cwd(destination))
+    while num not in replies.replies:
+        sftp._read_response()
+    t, msg = replies.replies.pop(num)
+    code = msg.get_int() if t == CMD_STATUS else SFTP_OK
+    if code == SFTP_OK:
+        return
+    if code != SFTP_OP_UNSUPPORTED:
+        # Back to the status code, after the request number, for paramiko's own errors
+        msg.rewind()
+        msg.get_int()
+        sftp._convert_status(msg)
+    try:
+        sftp.remove(destination)
+    except FileNotFoundError:
+        pass
+    sftp.rename(source, destination)
+
+
+class RequestReplies:
+    """Collects the replies to pipelined SFTP requests, which may arrive in any order.
+
+    Pass it as the file object of ``SFTPClient._async_request``; each
+    ``_read_response`` call then files one reply under its request number.
+    """
+
+    def __init__(self):
+        self.replies: Dict[int, Tuple[int, paramiko.Message]] = {}
+
+    def _async_response(self, t: int, msg: paramiko.Message, num: int) -> None:
+        self.replies[num] = (t, msg)
+
+
+class _RemoteFiles:
+    """File operations over an SFTP session, with pipelined reads and writes."""
+
+    def __init__(self, sftp: paramiko.SFTPClient):
+        self.sftp = sftp
+
+    def stat(self, path: str) -> Optional[paramiko.SFTPAttributes]:
+        try:
+            return self.sftp.stat(path)
+        except FileNotFoundError:
+            return None
+
+    def open(self, path: str, mode: str) -> paramiko.SFTPFile:
+        return self.sftp.open(path, mode)
+
+    def read_range(self, f: paramiko.SFTPFile, start: int, end: int, chunk_size: int,
+                   max_requests: int) -> Iterator[bytes]:
+        """Read a range with up to ``max_requests`` read requests in flight.
+
+        paramiko's ``readv`` is not used: with a limit on requests in flight,
+        its prefetch counts as finished whenever the replies catch up with
+        the requests sent so far, and the rest of the file is then read one
+        round trip at a time. Requests go through the SFTP client's request
+        API instead, which its own file objects use the same way.
+        """
+        sftp = self.sftp
+        replies = RequestReplies()
+        pending: deque = deque()
+        offset = start
+        while offset < end or pending:
+            while offset < end and len(pending) < max_requests:
+                length = min(chunk_size, end - offset)
+                num = sftp._async_request(replies, CMD_READ, f.handle, int64(offset), int(length))
+                pending.append((num, offset, length))
+                offset += length
+            num, chunk_offset, length = pending.popleft()
+            while num not in replies.replies:
+                sftp._read_response()
+            t, msg = replies.replies.pop(num)
+            if t == CMD_STATUS:
+                # Raises, e.g. EOFError if the file shrank
+                sftp._convert_status(msg)
+            data = msg.get_string()
+            if len(data) < length:
+                # Servers may return less than asked for; fetch the rest directly
+                f.seek(chunk_offset + len(data))
+                data += f.read(length - len(data))
+                if len(data) < length:
+                    raise EOFError(f"File ended at {chunk_offset + len(data)} bytes, expected {end}")
+            yield data
+
+    def open_writer(self, path: str, offset: int, create: bool = False) -> paramiko.SFTPFile:
+        f = self.sftp.open(path, "w" if create else "r+")
+        # Send writes without waiting for each acknowledgement
+        f.set_pipelined(True)
+        f.seek(offset)
+        return f
+
+    def checkpoint(self, f: paramiko.SFTPFile, path: str) -> paramiko.SFTPFile:
+        # Closing waits for every outstanding write to be acknowledged
+        offset = f.tell()
+        f.close()
+        return self.open_writer(path, offset)
+
+    def replace(self, source: str, destination: str) -> None:
+        replace_remote(self.sftp, source, destination)
+
+    def remove(self, path: str) -> None:
+        try:
+            self.sftp.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def utime(self, path: str, mtime: float) -> None:
+        self.sftp.utime(path, (mtime, mtime))
+
+
+_LOCAL = _LocalFiles()
+
+
+class SFTPTransfer:
+    """Copies files to and from hosts, or between two hosts, over pooled SFTP sessions.
+
+    Each transfer borrows an SFTP session from the pool instead of opening
+    one, and keeps up to ``max_requests`` reads (or pipelined writes) in
+    flight, so throughput is not bound by one round trip per chunk. Files
+    of at least ``split_threshold`` bytes are split into ``parallel``
+    ranges copied over separate channels of the same connection.
+
+    Data is written to ``<destination>.part``, renamed over the destination
+    once complete. While copying, the offset reached in every range is
+    saved to ``<destination>.part.json`` every few seconds, after the data
+    before it has been acknowledged. A transfer of the same unchanged
+    source resumes from those offsets, after checking that the bytes just
+    before each one match the source; a range that does not match starts
+    over. The destination gets the source's modification time.
+
+    A copy between two hosts reads from one session and writes to the
+    other as the replies arrive, so nothing touches the local disk and at
+    most ``max_requests`` chunks per range are held in memory. With
+    ``verify``, the SHA-256 of the finished partial copy is compared with
+    the source's before it replaces the destination.
+    """
+
+    def __init__(self, pool: ConnectionPool, parallel: int = 4,
+                 split_threshold: int = SPLIT_THRESHOLD, max_requests: int = MAX_REQUESTS,
+                 chunk_size: int = CHUNK_SIZE):
+        self.pool = pool
+        self.parallel = parallel
+        self.split_threshold = split_threshold
+        self.max_requests = max_requests
+        self.chunk_size = chunk_size
+
+    def upload(self, host: SSHHost, local_path: str, remote_path: str,
+               progress: Optional[ProgressCallback] = None, resume: bool = True) -> TransferResult:
+        """Copy a local file to a host.
+
+        ``progress`` is called from the copying threads.
+        """
+        return self._transfer(None, local_path, host, remote_path, progress, resume)
+
+    def download(self, host: SSHHost, remote_path: str, local_path: str,
+                 progress: Optional[ProgressCallback] = None, resume: bool = True) -> TransferResult:
+        """Copy a file from a host to the local machine.
+
+        ``progress`` is called from the copying threads.
+        """
+        return self._transfer(host, remote_path, None, local_path, progress, resume)
+
+    def copy(self, source_host: SSHHost, source_path: str, destination_host: SSHHost,
+             destination_path: str, progress: Optional[ProgressCallback] = None,
+             resume: bool = True, verify: bool = False) -> TransferResult:
+        """Copy a file from one host to another, streaming it through this machine.
+
+        ``progress`` is called from the copying threads. With ``verify``,
+        raises ``IOError`` and leaves the destination untouched if the copy
+        does not match the source.
+        """
+        return self._transfer(source_host, source_path, destination_host, destination_path,
+                              progress, resume, verify)
+
+    def checksum(self, host: SSHHost, remote_path: str) -> str:
+        """SHA-256 of a file on a host, from ``sha256sum`` there if it can run commands.
+
+        Hosts that cannot, e.g. SFTP-only accounts, have the file read back
+        with ``digest`` instead.
+        """
+        command = _CHECKSUM_COMMAND.format(path=shlex.quote(remote_path))
+        output, exit_code = "", None
+        try:
+            with self.pool.connection(host) as client:
+                channel = client.get_transport().open_session()
+                try:
+                    channel.exec_command(command)
+                    stream = CommandStream(channel, timeout=CHECKSUM_TIMEOUT)
+                    output = "".join(chunk.text for chunk in stream if chunk.stream == STDOUT)
+                    exit_code = stream.exit_code
+                finally:
+                    channel.close()
+        except paramiko.SSHException:
+            # Commands refused
+            pass
+        if exit_code == 0 and output.split():
+            return output.split()[0].lower()
+        return self.digest(host, remote_path)
+
+    def digest(self, host: SSHHost, remote_path: str) -> str:
+        """SHA-256 of a file on a host, hex encoded, read with pipelined requests."""
+        digest = hashlib.sha256()
+        with self.pool.sftp(host) as sftp:
+            files = _RemoteFiles(sftp)
+            size = sftp.stat(remote_path).st_size
+            with files.open(remote_path, "rb") as f:
+                for data in files.read_range(f, 0, size, self.chunk_size, self.max_requests):
+                    digest.update(data)
+        return digest.hexdigest()
+
+    @contextmanager
+    def _sides(self, source_host: Optional[SSHHost],
+               destination_host: Optional[SSHHost]) -> Iterator[Tuple[Any, Any]]:
+        """Borrow SFTP sessions and yield the (source, destination) file operations.
+
+        A host of None is the local machine.
+        """
+        with ExitStack() as stack:
+            source, destination = (
+                _LOCAL if host is None else _RemoteFiles(stack.enter_context(self.pool.sftp(host)))
+                for host in (source_host, destination_host)
+            )
+            yield source, destination
+
+    def _file_checksum(self, host: Optional[SSHHost], path: str) -> str:
+        if host is not None:
+            return self.checksum(host, path)
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for data in iter(lambda: f.read(self.chunk_size * self.max_requests), b""):
+                digest.update(data)
+        return digest.hexdigest()
+
+    def _transfer(self, source_host: Optional[SSHHost], source_path: str,
+                  destination_host: Optional[SSHHost], destination_path: str,
+                  progress: Optional[ProgressCallback], resume: bool,
+                  verify: bool = False) -> TransferResult:
+        """Copy a file, timed into the pool's metrics with the bytes copied.
+
+        A copy between hosts is recorded against its source host.
+        """
+        if source_host is None:
+            operation, host = UPLOAD, destination_host
+        else:
+            operation, host = (DOWNLOAD if destination_host is None else COPY), source_host
+        with self.pool.metrics.span(operation, TOTAL, host) as span:
+            result = self._copy_file(source_host, source_path, destination_host, destination_path,
+                                     progress, resume, verify)
+            span.bytes = result.transferred
+        return result
+
+    def _copy_file(self, source_host: Optional[SSHHost], source_path: str,
+                   destination_host: Optional[SSHHost], destination_path: str,
+                   progress: Optional[ProgressCallback], resume: bool,
+                   verify: bool) -> TransferResult:
+        started = time.monotonic()
+        part_path = destination_path + PART_SUFFIX
+        state_path = destination_path + STATE_SUFFIX
+        checksum = None
+        with self._sides(source_host, destination_host) as (source, destination):
+            attributes = source.stat(source_path)
+            if attributes is None:
+                raise FileNotFoundError(source_path)
+            if stat.S_ISDIR(attributes.st_mode):
+                raise IsADirectoryError(source_path)
+            size, mtime = attributes.st_size, attributes.st_mtime
+            state = self._load_state(destination, state_path, size, mtime) if resume else None
+            if state is not None:
+                if destination.stat(part_path) is None:
+                    state = None
+                else:
+                    for entry in state["ranges"]:
+                        if not self._verify(source, destination, source_path, part_path, entry):
+                            entry[2] = entry[0]
+                    if all(done <= start for start, _, done in state["ranges"]):
+                        state = None
+                if state is None:
+                    # Nothing left to resume from; start over without the state
+                    destination.remove(state_path)
+            copier = _RangeCopier(self, source_path, part_path, state_path, state, progress)
+            if state is None:
+                # The state is only saved once there is something to resume
+                copier.state = {"size": size, "mtime": mtime,
+                                "ranges": [[start, end, start] for start, end in self._plan(size)]}
+                copier.fresh = True
+            resumed = copier.done = sum(done - start for start, _, done in copier.state["ranges"])
+
+            pending = [entry for entry in copier.state["ranges"] if entry[2] < entry[1]]
+            try:
+                if len(pending) == 1:
+                    # Reuse the session already borrowed
+                    copier.copy(source, destination, pending[0])
+                else:
+                    if copier.fresh:
+                        destination.open(part_path, "wb").close()
+                        copier.fresh = False
+                    if pending:
+                        copier.copy_parallel(source_host, destination_host, pending)
+                if verify:
+                    checksum = self._verify_copy(source_host, source_path, destination_host, part_path)
+                destination.replace(part_path, destination_path)
+            except BaseException as e:
+                if isinstance(e, _ChecksumMismatch):
+                    with suppress(Exception):
+                        destination.remove(state_path)
+                if not copier.saved or isinstance(e, _ChecksumMismatch):
+                    # Without a saved state there is nothing to resume from
+                    with suppress(Exception):
+                        destination.remove(part_path)
+                raise
+            destination.utime(destination_path, mtime)
+            if copier.saved:
+                destination.remove(state_path)
+        return TransferResult(
+            source=source_path,
+            destination=destination_path,
+            size=size,
+            transferred=size - resumed,
+            resumed_from=resumed,
+            duration=time.monotonic() - started,
+            read_time=copier.reading.total,
+            write_time=copier.writing.total,
+            checksum=checksum,
+        )
+
+    def _verify_copy(self, source_host: Optional[SSHHost], source_path: str,
+                     destination_host: Optional[SSHHost], part_path: str) -> str:
+        """Hash the source and the finished partial copy side by side; raises if they differ."""
+        with ThreadPoolExecutor(max_workers=2, thread_name_prefix="checksum") as executor:
+            expected = executor.submit(self._file_checksum, source_host, source_path)
+            actual = self._file_checksum(destination_host, part_path)
+            expected = expected.result()
+        if actual != expected:
+            # Resuming would only finish the same bad copy
+            raise _ChecksumMismatch(f"SHA-256 of the copy is {actual}, expected {expected}")
+        return actual
+
+    def _plan(self, size: int) -> List[Tuple[int, int]]:
+        """Split a file into the ranges to copy in parallel."""
+        count = self.parallel if size >= self.split_threshold and self.parallel > 1 else 1
+        step = -(-size // count) if size else 0
+        return [(start, min(start + step, size)) for start in range(0, size, step)] if size else []
+
+    @staticmethod
+    def _load_state(files: Any, path: str, size: int, mtime: float) -> Optional[Dict[str, Any]]:
+        """Read a saved resume state if it belongs to this version of the source."""
+        try:
+            with files.open(path, "rb") as f:
+                state = json.loads(f.read())
+        except (OSError, ValueError):
+            return None
+        if state.get("size") != size or state.get("mtime") != mtime:
+            return None
+        return state
+
+    @staticmethod
+    def _save_state(files: Any, path: str, state: Dict[str, Any]) -> None:
+        with files.open(path, "wb") as f:
+            f.write(json.dumps(state).encode())
+
+    def _verify(self, source: Any, destination: Any, source_path: str, part_path: str,
+                entry: List[int]) -> bool:
+        """Check that the bytes before a range's resume offset match the source."""
+        start, _, done = entry
+        if done <= start:
+            return True
+        offset = max(done - VERIFY_SIZE, start)
+        try:
+            with source.open(source_path, "rb") as f:
+                expected = b"".join(source.read_range(f, offset, done, self.chunk_size, self.max_requests))
+            with destination.open(part_path, "rb") as f:
+                actual = b"".join(destination.read_range(f, offset, done, self.chunk_size, self.max_requests))
+        except (OSError, EOFError):
+            return False
+        return actual == expected
+
+
+class _ChecksumMismatch(IOError):
+    pass
+
+
+class _RangeCopier:
+    """Copies the ranges of one transfer, sharing progress and resume state between threads."""
+
+    def __init__(self, transfer: SFTPTransfer, source_path: str, part_path: str, state_path: str,
+                 state: Optional[Dict[str, Any]], progress: Optional[ProgressCallback]):
+        self.transfer = transfer
+        self.source_path = source_path
+        self.part_path = part_path
+        self.state_path = state_path
+        self.state = state
+        self.progress = progress
+        self.done = 0
+        # Whether the partial copy has yet to be created
+        self.fresh = False
+        # Whether a resume state exists on the destination
+        self.saved = state is not None
+        self.failed = threading.Event()
+        self.reading = _LegTimer()
+        self.writing = _LegTimer()
+        self._lock = threading.Lock()
+
+    def copy_parallel(self, source_host: Optional[SSHHost], destination_host: Optional[SSHHost],
+                      entries: List[List[int]]) -> None:
+        def copy_one(entry: List[int]) -> None:
+            try:
+                with self.transfer._sides(source_host, destination_host) as (source, destination):
+                    self.copy(source, destination, entry)
+            except BaseException:
+                # Stop the other ranges at their next chunk
+                self.failed.set()
+                raise
+
+        with ThreadPoolExecutor(max_workers=len(entries), thread_name_prefix="transfer") as executor:
+            futures = [executor.submit(copy_one, entry) for entry in entries]
+        for future in futures:
+            future.result()
+
+    def copy(self, source: Any, destination: Any, entry: List[int]) -> None:
+        """Copy one range from its resume offset, saving the offset now and then."""
+        transfer = self.transfer
+        _, end, done = entry
+        last_checkpoint = time.monotonic()
+        with source.open(self.source_path, "rb") as reader:
+            writer = destination.open_writer(self.part_path, done, create=self.fresh)
+            try:
+                chunks = source.read_range(reader, done, end, transfer.chunk_size, transfer.max_requests)
+                while True:
+                    with self.reading.waiting():
+                        data = next(chunks, None)
+                    if data is None or self.failed.is_set():
+                        break
+                    with self.writing.waiting():
+                        writer.write(data)
+                    done += len(data)
+                    self._advance(len(data))
+                    if time.monotonic() - last_checkpoint >= CHECKPOINT_INTERVAL:
+                        writer = destination.checkpoint(writer, self.part_path)
+                        self._checkpoint(destination, entry, done)
+                        last_checkpoint = time.monotonic()
+            finally:
+                # Closing waits for the writes to be acknowledged, so the offset
+                # is only saved if it raises nothing (e.g. when the caller
+                # stopped the transfer, but not when the connection dropped)
+                with self.writing.waiting():
+                    writer.close()
+                # A finished range is recorded too if other ranges may fail
+                if done < end or len(self.state["ranges"]) > 1:
+                    self._checkpoint(destination, entry, done)
+
+    def _advance(self, count: int) -> None:
+        with self._lock:
+            self.done += count
+            done = self.done
+        if self.progress is not None:
+            self.progress(done, self.state["size"])
+
+    def _checkpoint(self, destination: Any, entry: List[int], done: int) -> None:
+        with self._lock:
+            entry[2] = done
+            SFTPTransfer._save_state(destination, self.state_path, self.state)
+            self.saved = True
@@ -0,0 +1,183 @@
+import hashlib
+import os
+import sys
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional
+
+if sys.platform == "win32":
+    import msvcrt
+else:
+    import fcntl
+
+
+@dataclass(frozen=True)
+class FileFingerprint:
+    """Identity of a file's contents: stat fields plus an optional content hash."""
+    inode: int
+    mtime_ns: int
+    size: int
+    digest: Optional[str] = None
+
+    def same_stat(self, other: "FileFingerprint") -> bool:
+        return (self.inode, self.mtime_ns, self.size) == (other.inode, other.mtime_ns, other.size)
+
+
+def file_digest(path: str) -> str:
+    """Hash a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def stat_fingerprint(path: str) -> Optional[FileFingerprint]:
+    """Fingerprint a file by its stat fields only; None if it does not exist."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return FileFingerprint(st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+class FileWatcher:
+    """Detects real changes to a set of files.
+
+    ``changed`` first compares inode, mtime and size, which is a cheap stat
+    call per file. Only when those differ is the content hashed, so touching
+    a file or rewriting it with identical content does not count as a
+    change. ``mark`` records the current state, for instance after our own
+    writes, and ``accept`` does so for one file rewritten by another thread.
+    """
+
+    def __init__(self, paths: List[str]):
+        self.paths = list(paths)
+        self._known: Dict[str, Optional[FileFingerprint]] = {}
+        self._lock = threading.Lock()
+        self.mark()
+
+    def mark(self, hash_contents: bool = False) -> None:
+        """Accept the current state of the files as known.
+
+        With ``hash_contents`` the contents are hashed too, so that a later
+        stat-only change (a touch, or an identical rewrite) is not reported.
+        """
+        known = {}
+        for path in self.paths:
+            fingerprint = stat_fingerprint(path)
+            if fingerprint is not None and hash_contents:
+                fingerprint = FileFingerprint(
+                    fingerprint.inode, fingerprint.mtime_ns, fingerprint.size, file_digest(path)
+                )
+            known[path] = fingerprint
+        with self._lock:
+            self._known = known
+
+    def accept(self, path: str, before: Optional[FileFingerprint]) -> None:
+        """Accept our own rewrite of ``path`` if the file was known as ``before`` until then.
+
+        A file that changed in between is left as it was known, so the
+        changes of others are still reported.
+        """
+        with self._lock:
+            known = self._known.get(path)
+            if known is not None and before is not None and known.same_stat(before):
+                self._known[path] = stat_fingerprint(path)
+
+    def changed(self) -> bool:
+        """Return True if any file's contents changed since the last check or mark."""
+        with self._lock:
+            return self._changed()
+
+    def _changed(self) -> bool:
+        changed = False
+        for path in self.paths:
+            known = self._known.get(path)
+            current = stat_fingerprint(path)
+            if current is None or known is None:
+                if current != known:
+                    changed = True
+                self._known[path] = current
+                continue
+            if current.same_stat(known):
+                continue
+            try:
+                digest = file_digest(path)
+            except FileNotFoundError:
+                self._known[path] = None
+                changed = True
+                continue
+            if digest != known.digest:
+                changed = True
+            self._known[path] = FileFingerprint(current.inode, current.mtime_ns, current.size, digest)
+        return changed
+
+
+class InventoryLock:
+    """Advisory lock that cooperating writers of a host inventory take.
+
+    Writers hold it exclusively and readers share it, through ``flock`` on
+    a lock file next to the inventory, so provisioning scripts can join in
+    with ``flock ssh_hosts.lock <command>``. Windows has no shared locks, so
+    both modes lock exclusively there.
+
+    The lock is held per process: while any thread holds it, further
+    acquisitions in the same process (such as a background journal
+    compaction) go ahead in the outer lock's mode. Threads of one process
+    coordinate through the storage backend's own locks.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._mutex = threading.Lock()
+        self._depth = 0
+        self._fd: Optional[int] = None
+
+    @contextmanager
+    def exclusive(self) -> Iterator[None]:
+        with self._locked(shared=False):
+            yield
+
+    @contextmanager
+    def shared(self) -> Iterator[None]:
+        with self._locked(shared=True):
+            yield
+
+    @contextmanager
+    def _locked(self, shared: bool) -> Iterator[None]:
+        with self._mutex:
+            if self._depth == 0:
+                self._acquire(shared)
+            self._depth += 1
+        try:
+            yield
+        finally:
+            with self._mutex:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._release()
+
+    def _acquire(self, shared: bool) -> None:
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if sys.platform == "win32":
+                msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+            else:
+                fcntl.flock(fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        except BaseException:
+            os.close(fd)
+            raise
+        self._fd = fd
+
+    def _release(self) -> None:
+        fd, self._fd = self._fd, None
+        try:
+            if sys.platform == "win32":
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
@@ -4,7 +4,6 @@ import sys
 import os
 import argparse
 from pathlib import Path
-from .tui.interface import SSHManagerApp
 
 def get_config_dir():
     """Get the configuration directory path."""
@@ -31,19 +30,158 @@ def parse_args():
         help="Path to the configuration directory",
         default=None,
     )
+    parser.add_argument(
+        "--import",
+        dest="import_sources",
+        metavar="SOURCE",
+        action="append",
+        help="Import hosts from an ssh_config, known_hosts, CSV or JSONL file and exit (repeatable)",
+    )
+    parser.add_argument(
+        "--import-format",
+        choices=["ssh_config", "known_hosts", "csv", "jsonl"],
+        help="Format of the imported files (detected from the file name by default)",
+        default=None,
+    )
+    parser.add_argument(
+        "--import-group",
+        help="Group for imported hosts that do not set one",
+        default=None,
+    )
+    parser.add_argument(
+        "--push",
+        nargs=2,
+        metavar=("LOCAL_FILE", "REMOTE_PATH"),
+        help="Copy a file to every host (or every host of --group) and exit",
+    )
+    parser.add_argument(
+        "--group",
+        help="Only push to the hosts of this group",
+        default=None,
+    )
+    parser.add_argument(
+        "--bandwidth",
+        type=float,
+        metavar="MB_PER_S",
+        help="Cap on the combined upload rate of --push, in MB/s",
+        default=None,
+    )
+    parser.add_argument(
+        "--max-hosts",
+        type=int,
+        help="Hosts --push copies to at once",
+        default=16,
+    )
+    parser.add_argument(
+        "--metrics",
+        metavar="PATH",
+        help="Write the connect and transfer timings of --push to PATH as JSON lines "
+             "(Prometheus text if PATH ends in .prom)",
+        default=None,
+    )
     return parser.parse_args()
 
+def run_import(config_dir: str, args) -> None:
+    """Import hosts from the given sources without starting the TUI."""
+    from .core.host_manager import HostManager
+    from .core.importer import HostImporter
+
+    host_manager = HostManager(config_dir=config_dir)
+    importer = HostImporter(host_manager)
+    try:
+        for source in args.import_sources:
+            result = importer.import_source(
+                source, fmt=args.import_format, group=args.import_group
+            )
+            if result.skipped:
+                print(f"{source}: unchanged since last import")
+                continue
+            print(
+                f"{source}: {result.added} added, {result.updated} updated, "
+                f"{result.unchanged} unchanged, {len(result.errors)} invalid"
+            )
+            for error in result.errors:
+                print(f"  {error}")
+    finally:
+        host_manager.close()
+
+def run_push(config_dir: str, args) -> bool:
+    """Push a file to a group of hosts, printing a line per host; True if all succeeded."""
+    from .core.connection_pool import ConnectionPool
+    from .core.distribution import ArtifactDistributor
+    from .core.host_manager import HostManager
+    from .core.metrics import Metrics
+
+    local_path, remote_path = args.push
+    host_manager = HostManager(config_dir=config_dir)
+    # Every span is kept for the export at the end
+    metrics = Metrics(capacity=None, enabled=args.metrics is not None)
+    pool = ConnectionPool(metrics=metrics)
+    try:
+        if args.group:
+            hosts = host_manager.get_hosts_by_group(args.group)
+        else:
+            hosts = host_manager.get_all_hosts()
+        if not hosts:
+            raise ValueError(f"No hosts in group '{args.group}'" if args.group else "No hosts")
+
+        distributor = ArtifactDistributor(
+            pool,
+            max_hosts=args.max_hosts,
+            bandwidth=args.bandwidth * 1e6 if args.bandwidth else None,
+        )
+
+        def show(delivery) -> None:
+            detail = delivery.checksum if delivery.error is None else delivery.error
+            print(f"{delivery.alias:<24} {delivery.status:<9} {delivery.duration:7.2f}s  {detail}")
+
+        print(f"Pushing {local_path} to {remote_path} on {len(hosts)} hosts")
+        report = distributor.distribute(hosts, local_path, remote_path, on_delivery=show)
+        print(
+            f"{len(report.succeeded)} ok, {len(report.failed)} failed in {report.duration:.1f}s; "
+            f"sha256 {report.checksum}"
+        )
+        if args.metrics:
+            metrics.export(args.metrics)
+        return not report.failed
+    finally:
+        pool.close()
+        host_manager.close()
+
 def main():
     """Main entry point for the application."""
     args = parse_args()
     
     # Determine configuration directory
     config_dir = args.config_dir if args.config_dir else get_config_dir()
+
+    if args.import_sources:
+        try:
+            run_import(str(config_dir), args)
+        except (OSError, ValueError) as e:
+            print(f"Error: {str(e)}")
+            sys.exit(1)
+        return
+
+    if args.push:
+        try:
+            succeeded = run_push(str(config_dir), args)
+        except (OSError, ValueError) as e:
+            print(f"Error: {str(e)}")
+            sys.exit(1)
+        sys.exit(0 if succeeded else 1)
     
+    # The interface pulls in textual; the headless commands above do not need it
+    from .tui.interface import SSHManagerApp
+
     try:
         # Initialize and run the app
         app = SSHManagerApp(config_dir=str(config_dir))
-        app.run()
+        # Where the terminal cannot be handed over while the app runs, it
+        # exits with the connection to make instead
+        after_exit = app.run()
+        if callable(after_exit):
+            after_exit()
     except KeyboardInterrupt:
         print("\nExiting SSH Manager...")
         sys.exit(0)
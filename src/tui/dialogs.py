@@ -1,7 +1,9 @@
+import os
+
 from textual.app import ComposeResult
 from textual.containers import Container, Vertical
 from textual.screen import ModalScreen
-from textual.widgets import Button, Input, Label, Select
+from textual.widgets import Button, Checkbox, Input, Label, Select
 from textual.validation import Validator
 
 from ..core.host_manager import SSHHost
@@ -271,4 +273,288 @@ class DeleteConfirmationScreen(ModalScreen):
         if event.button.id == "cancel-btn":
             self.dismiss(False)
         elif event.button.id == "delete-btn":
-            self.dismiss(True) 
\ No newline at end of file
+            self.dismiss(True)
+
+
+class CommandScreen(ModalScreen):
+    """Screen asking for a command to run on several hosts."""
+    
+    CSS = """
+    CommandScreen {
+        align: center middle;
+    }
+    
+    #dialog {
+        width: 70;
+        height: auto;
+        border: thick $accent;
+        padding: 1 2;
+        background: $surface;
+    }
+    
+    #command {
+        margin: 1 0;
+    }
+    
+    #buttons {
+        width: 100%;
+        height: 3;
+        align: center middle;
+    }
+    
+    #buttons Button {
+        margin: 0 1;
+    }
+    """
+    
+    def __init__(self, host_count: int, scope: str):
+        """Initialize the command screen.
+        
+        Args:
+            host_count: Number of hosts the command will run on.
+            scope: Description of those hosts, such as the group name.
+        """
+        super().__init__()
+        self.host_count = host_count
+        self.scope = scope
+    
+    def compose(self) -> ComposeResult:
+        """Compose the command screen."""
+        with Container(id="dialog"):
+            yield Label(f"Run a command on {self.host_count} hosts ({self.scope})")
+            yield Input(id="command", placeholder="Command, e.g. uptime")
+            
+            with Container(id="buttons"):
+                yield Button("Run", id="run", variant="primary")
+                yield Button("Cancel", id="cancel")
+    
+    def on_input_submitted(self, event: Input.Submitted) -> None:
+        """Run on Enter."""
+        self._run()
+    
+    def on_button_pressed(self, event: Button.Pressed) -> None:
+        """Handle button presses."""
+        if event.button.id == "cancel":
+            self.dismiss(None)
+        elif event.button.id == "run":
+            self._run()
+    
+    def _run(self) -> None:
+        command = self.query_one("#command").value.strip()
+        if command:
+            self.dismiss(command)
+
+
+class TransferScreen(ModalScreen):
+    """Screen asking what to copy to or from a host."""
+    
+    MODES = [
+        ("Upload a file", "upload"),
+        ("Download a file", "download"),
+        ("Sync a directory to the host", "push"),
+        ("Sync a directory from the host", "pull"),
+        ("Copy a file to another host", "copy"),
+    ]
+    
+    CSS = """
+    TransferScreen {
+        align: center middle;
+    }
+    
+    #dialog {
+        width: 70;
+        height: auto;
+        border: thick $accent;
+        padding: 1 2;
+        background: $surface;
+    }
+    
+    #mode, #local-path, #remote-path, #destination-host, #destination-path {
+        margin: 1 0 0 0;
+    }
+    
+    #sync-options {
+        height: auto;
+        margin-top: 1;
+    }
+    
+    #error {
+        color: $error;
+        height: auto;
+    }
+    
+    #buttons {
+        width: 100%;
+        height: 3;
+        align: center middle;
+    }
+    
+    #buttons Button {
+        margin: 0 1;
+    }
+    """
+    
+    def __init__(self, host_alias: str):
+        """Initialize the transfer screen.
+        
+        Args:
+            host_alias: The alias of the host to transfer with.
+        """
+        super().__init__()
+        self.host_alias = host_alias
+    
+    def compose(self) -> ComposeResult:
+        """Compose the transfer screen."""
+        with Container(id="dialog"):
+            yield Label(f"Copy files with '{self.host_alias}'")
+            yield Select(self.MODES, id="mode", value="upload", allow_blank=False)
+            yield Input(id="local-path", placeholder="Local path")
+            yield Input(id="remote-path", placeholder="Remote path")
+            yield Input(id="destination-host", placeholder="Destination host alias")
+            yield Input(id="destination-path", placeholder="Path on the destination host")
+            with Vertical(id="sync-options"):
+                yield Checkbox("Delete files the source lacks", id="delete")
+                yield Checkbox("Compare contents, not size and time", id="checksum")
+                yield Checkbox("Dry run: only show what would change", id="dry-run")
+            yield Label("", id="error")
+            
+            with Container(id="buttons"):
+                yield Button("Start", id="start", variant="primary")
+                yield Button("Cancel", id="cancel")
+    
+    def on_mount(self) -> None:
+        """Show the inputs of the first mode."""
+        self._show_inputs("upload")
+    
+    def on_select_changed(self, event: Select.Changed) -> None:
+        """Show the inputs the chosen mode needs."""
+        self._show_inputs(event.value)
+    
+    def _show_inputs(self, mode: str) -> None:
+        copy = mode == "copy"
+        self.query_one("#sync-options").display = mode in ("push", "pull")
+        self.query_one("#local-path").display = not copy
+        self.query_one("#destination-host").display = copy
+        self.query_one("#destination-path").display = copy
+    
+    def on_input_submitted(self, event: Input.Submitted) -> None:
+        """Start on Enter."""
+        self._start()
+    
+    def on_button_pressed(self, event: Button.Pressed) -> None:
+        """Handle button presses."""
+        if event.button.id == "cancel":
+            self.dismiss(None)
+        elif event.button.id == "start":
+            self._start()
+    
+    def _start(self) -> None:
+        mode = self.query_one("#mode").value
+        remote_path = self.query_one("#remote-path").value.strip()
+        if mode == "copy":
+            destination_host = self.query_one("#destination-host").value.strip()
+            destination_path = self.query_one("#destination-path").value.strip()
+            if not remote_path or not destination_host or not destination_path:
+                self.query_one("#error").update("Both paths and the destination host are required")
+                return
+            self.dismiss({
+                "mode": mode,
+                "remote_path": remote_path,
+                "destination_host": destination_host,
+                "destination_path": destination_path,
+            })
+            return
+        local_path = self.query_one("#local-path").value.strip()
+        if not local_path or not remote_path:
+            self.query_one("#error").update("Both paths are required")
+            return
+        sync = mode in ("push", "pull")
+        self.dismiss({
+            "mode": mode,
+            "local_path": expand_path(local_path),
+            "remote_path": remote_path,
+            "delete": sync and self.query_one("#delete").value,
+            "checksum": sync and self.query_one("#checksum").value,
+            "dry_run": sync and self.query_one("#dry-run").value,
+        })
+
+
+class PushScreen(ModalScreen):
+    """Screen asking for a file to copy to several hosts."""
+    
+    CSS = """
+    PushScreen {
+        align: center middle;
+    }
+    
+    #dialog {
+        width: 70;
+        height: auto;
+        border: thick $accent;
+        padding: 1 2;
+        background: $surface;
+    }
+    
+    #local-path, #remote-path {
+        margin: 1 0 0 0;
+    }
+    
+    #error {
+        color: $error;
+        height: auto;
+    }
+    
+    #buttons {
+        width: 100%;
+        height: 3;
+        align: center middle;
+    }
+    
+    #buttons Button {
+        margin: 0 1;
+    }
+    """
+    
+    def __init__(self, host_count: int, scope: str):
+        """Initialize the push screen.
+        
+        Args:
+            host_count: Number of hosts the file will be copied to.
+            scope: Description of those hosts, such as the group name.
+        """
+        super().__init__()
+        self.host_count = host_count
+        self.scope = scope
+    
+    def compose(self) -> ComposeResult:
+        """Compose the push screen."""
+        with Container(id="dialog"):
+            yield Label(f"Copy a file to {self.host_count} hosts ({self.scope})")
+            yield Input(id="local-path", placeholder="Local file")
+            yield Input(id="remote-path", placeholder="Remote path, e.g. /opt/app/app.tar.gz")
+            yield Label("", id="error")
+            
+            with Container(id="buttons"):
+                yield Button("Push", id="push", variant="primary")
+                yield Button("Cancel", id="cancel")
+    
+    def on_input_submitted(self, event: Input.Submitted) -> None:
+        """Push on Enter."""
+        self._push()
+    
+    def on_button_pressed(self, event: Button.Pressed) -> None:
+        """Handle button presses."""
+        if event.button.id == "cancel":
+            self.dismiss(None)
+        elif event.button.id == "push":
+            self._push()
+    
+    def _push(self) -> None:
+        local_path = expand_path(self.query_one("#local-path").value.strip())
+        remote_path = self.query_one("#remote-path").value.strip()
+        if not os.path.isfile(local_path):
+            self.query_one("#error").update("Local file not found")
+        elif not remote_path:
+            self.query_one("#error").update("Remote path is required")
+        else:
+            self.dismiss((local_path, remote_path))
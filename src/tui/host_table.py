@@ -0,0 +1,288 @@
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from rich.cells import cell_len, set_cell_size
+from rich.segment import Segment
+from textual import events
+from textual.binding import Binding
+from textual.cache import LRUCache
+from textual.geometry import Region, Size
+from textual.message import Message
+from textual.scroll_view import ScrollView
+from textual.strip import Strip
+
+# Builds the cells of a row from its key
+RowBuilder = Callable[[str], Sequence[str]]
+
+
+class HostTable(ScrollView, can_focus=True):
+    """Table of hosts that only builds the rows on screen.
+
+    The table holds an ordered list of row keys (host aliases). Cells are
+    built by ``row_builder`` when a row scrolls into view and cached per
+    key, so showing 100k hosts costs a list of aliases rather than 100k
+    rendered rows. Rows are added, removed and updated by key, and the
+    cursor stays on its row across changes.
+    """
+
+    DEFAULT_CSS = """
+    HostTable {
+        background: $surface;
+        color: $foreground;
+    }
+    HostTable > .host-table--header {
+        text-style: bold;
+        background: $panel;
+        color: $foreground;
+    }
+    HostTable > .host-table--cursor {
+        background: $block-cursor-blurred-background;
+        color: $block-cursor-blurred-foreground;
+    }
+    HostTable:focus > .host-table--cursor {
+        background: $block-cursor-background;
+        color: $block-cursor-foreground;
+        text-style: bold;
+    }
+    """
+
+    COMPONENT_CLASSES = {"host-table--header", "host-table--cursor"}
+
+    BINDINGS = [
+        Binding("up", "cursor_up", "Up", show=False),
+        Binding("down", "cursor_down", "Down", show=False),
+        Binding("pageup", "page_up", "Page Up", show=False),
+        Binding("pagedown", "page_down", "Page Down", show=False),
+        Binding("home", "first_row", "First Row", show=False),
+        Binding("end", "last_row", "Last Row", show=False),
+        Binding("enter", "select_row", "Select", show=False),
+    ]
+
+    # Rows whose cells stay cached once they scroll out of view
+    CACHED_ROWS = 4096
+
+    class RowSelected(Message):
+        """Posted when a row is chosen with Enter or a click."""
+
+        def __init__(self, table: "HostTable", key: str) -> None:
+            super().__init__()
+            self.table = table
+            self.key = key
+
+        @property
+        def control(self) -> "HostTable":
+            return self.table
+
+    def __init__(self, columns: Sequence[str], row_builder: RowBuilder,
+                 name: Optional[str] = None, id: Optional[str] = None,
+                 classes: Optional[str] = None):
+        super().__init__(name=name, id=id, classes=classes)
+        self.columns = list(columns)
+        self.row_builder = row_builder
+        self.cursor_row = 0
+        self._keys: List[str] = []
+        # Row positions by key, rebuilt on demand after rows are removed
+        self._positions: Optional[Dict[str, int]] = {}
+        self._cells: LRUCache[str, Tuple[str, ...]] = LRUCache(self.CACHED_ROWS)
+        self._widths = [cell_len(label) for label in self.columns]
+
+    @property
+    def row_count(self) -> int:
+        return len(self._keys)
+
+    @property
+    def cursor_key(self) -> Optional[str]:
+        """Key of the row under the cursor, or None if the table is empty."""
+        if not self._keys:
+            return None
+        return self._keys[self.cursor_row]
+
+    def has_row(self, key: str) -> bool:
+        return key in self._position_map()
+
+    def keys(self) -> List[str]:
+        """Return the row keys in display order."""
+        return list(self._keys)
+
+    def visible_keys(self) -> List[str]:
+        """Return the keys of the rows currently scrolled into view."""
+        scroll_y = int(self.scroll_offset.y)
+        return self._keys[scroll_y:scroll_y + self._visible_rows]
+
+    def get_row(self, key: str) -> Tuple[str, ...]:
+        """Return the cells of a row, building them if needed."""
+        if not self.has_row(key):
+            raise KeyError(key)
+        return self._row_cells(key)
+
+    def set_rows(self, keys: Iterable[str]) -> None:
+        """Replace all rows, keeping the cursor on the same key if it is still shown."""
+        cursor_key = self.cursor_key
+        self._keys = list(keys)
+        self._positions = None
+        self._cells.clear()
+        self._restore_cursor(cursor_key)
+        self._rows_changed()
+
+    def add_rows(self, keys: Iterable[str]) -> None:
+        """Append rows for keys that are not shown yet."""
+        positions = self._position_map()
+        for key in keys:
+            if key not in positions:
+                positions[key] = len(self._keys)
+                self._keys.append(key)
+        self._rows_changed()
+
+    def remove_rows(self, keys: Iterable[str]) -> None:
+        """Remove the rows of the given keys, ignoring keys that are not shown."""
+        removed = set(keys) & self._position_map().keys()
+        if not removed:
+            return
+        cursor_key = self.cursor_key
+        self._keys = [key for key in self._keys if key not in removed]
+        self._positions = None
+        for key in removed:
+            self._cells.discard(key)
+        if cursor_key in removed:
+            self.cursor_row = min(self.cursor_row, max(len(self._keys) - 1, 0))
+        else:
+            self._restore_cursor(cursor_key)
+        self._rows_changed()
+
+    def rename_row(self, key: str, new_key: str) -> None:
+        """Give a row a new key in place."""
+        positions = self._position_map()
+        position = positions.pop(key)
+        self._keys[position] = new_key
+        positions[new_key] = position
+        self._cells.discard(key)
+        self.refresh_line(position + 1)
+
+    def update_rows(self, keys: Iterable[str]) -> None:
+        """Rebuild the cells of the given rows the next time they are shown."""
+        positions = self._position_map()
+        for key in keys:
+            self._cells.discard(key)
+            position = positions.get(key)
+            if position is not None:
+                self.refresh_line(position + 1)
+
+    def clear(self) -> None:
+        self.set_rows([])
+
+    def move_cursor(self, key: str) -> None:
+        """Put the cursor on a row and scroll it into view."""
+        self._set_cursor(self._position_map()[key])
+
+    def _position_map(self) -> Dict[str, int]:
+        if self._positions is None:
+            self._positions = {key: position for position, key in enumerate(self._keys)}
+        return self._positions
+
+    def _restore_cursor(self, key: Optional[str]) -> None:
+        position = self._position_map().get(key) if key is not None else None
+        if position is None:
+            position = self.cursor_row
+        self.cursor_row = min(position, max(len(self._keys) - 1, 0))
+
+    def _rows_changed(self) -> None:
+        self._update_virtual_size()
+        self.refresh()
+
+    def _update_virtual_size(self) -> None:
+        # One line for the header, plus one cell of padding around each column
+        width = sum(self._widths) + 2 * len(self._widths)
+        self.virtual_size = Size(width, len(self._keys) + 1)
+
+    def _row_cells(self, key: str) -> Tuple[str, ...]:
+        cells = self._cells.get(key)
+        if cells is None:
+            cells = tuple(str(cell) for cell in self.row_builder(key))
+            self._cells.set(key, cells)
+        return cells
+
+    @property
+    def _visible_rows(self) -> int:
+        return max(self.size.height - 1, 1)
+
+    def _set_cursor(self, row: int) -> None:
+        if not self._keys:
+            return
+        row = max(0, min(row, len(self._keys) - 1))
+        old, self.cursor_row = self.cursor_row, row
+        self.refresh_line(old + 1)
+        self.refresh_line(row + 1)
+        scroll_y = int(self.scroll_offset.y)
+        if row < scroll_y:
+            self.scroll_to(y=row, animate=False)
+        elif row >= scroll_y + self._visible_rows:
+            self.scroll_to(y=row - self._visible_rows + 1, animate=False)
+
+    def render_lines(self, crop: Region) -> List[Strip]:
+        # Build the rows about to be drawn first, so column widths are final
+        scroll_y = int(self.scroll_offset.y)
+        first = scroll_y + max(crop.y - 1, 0)
+        last = min(scroll_y + crop.bottom - 1, len(self._keys))
+        widened = False
+        for key in self._keys[first:last]:
+            for column, cell in enumerate(self._row_cells(key)):
+                if column < len(self._widths) and cell_len(cell) > self._widths[column]:
+                    self._widths[column] = cell_len(cell)
+                    widened = True
+        if widened:
+            self.call_later(self._update_virtual_size)
+        return super().render_lines(crop)
+
+    def render_line(self, y: int) -> Strip:
+        scroll_x, scroll_y = self.scroll_offset
+        width = self.size.width
+        base_style = self.rich_style
+        if y == 0:
+            text = self._format_row(self.columns)
+            style = base_style + self.get_component_rich_style("host-table--header")
+        else:
+            row = scroll_y + y - 1
+            if row >= len(self._keys):
+                return Strip.blank(width, base_style)
+            text = self._format_row(self._row_cells(self._keys[row]))
+            style = base_style
+            if row == self.cursor_row:
+                style += self.get_component_rich_style("host-table--cursor")
+        strip = Strip([Segment(text, style)], cell_len(text))
+        return strip.crop_extend(scroll_x, scroll_x + width, base_style)
+
+    def _format_row(self, cells: Sequence[str]) -> str:
+        return "".join(
+            f" {set_cell_size(cell, width)} " for cell, width in zip(cells, self._widths)
+        )
+
+    def _on_click(self, event: events.Click) -> None:
+        offset = event.get_content_offset(self)
+        if offset is None or offset.y == 0:
+            return
+        row = int(self.scroll_offset.y) + offset.y - 1
+        if row < len(self._keys):
+            self._set_cursor(row)
+            self.action_select_row()
+
+    def action_cursor_up(self) -> None:
+        self._set_cursor(self.cursor_row - 1)
+
+    def action_cursor_down(self) -> None:
+        self._set_cursor(self.cursor_row + 1)
+
+    def action_page_up(self) -> None:
+        self._set_cursor(self.cursor_row - self._visible_rows)
+
+    def action_page_down(self) -> None:
+        self._set_cursor(self.cursor_row + self._visible_rows)
+
+    def action_first_row(self) -> None:
+        self._set_cursor(0)
+
+    def action_last_row(self) -> None:
+        self._set_cursor(len(self._keys) - 1)
+
+    def action_select_row(self) -> None:
+        key = self.cursor_key
+        if key is not None:
+            self.post_message(self.RowSelected(self, key))
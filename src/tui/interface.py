@@ -1,18 +1,33 @@
-from textual.app import App, ComposeResult
+from textual.app import App, ComposeResult, SuspendNotSupported
 from textual.containers import Container, Vertical
-from textual.widgets import Header, Footer, DataTable, Button, Input, Select, Static
+from textual.widgets import Header, Footer, Button, Input, Select, Static
 from textual.binding import Binding
 from textual.reactive import reactive
 from textual.screen import Screen
 from textual import work
-from typing import Optional, Dict, List, Any, Tuple
+from textual.timer import Timer
+from typing import TYPE_CHECKING, Optional, Dict, Iterator, List, Any, Tuple
+import asyncio
 import subprocess
 import os
 import sys
+import time
 
-from ..core.host_manager import HostManager, SSHHost
-from ..core.ssh_client import SSHClient
-from .dialogs import HostFormScreen, DeleteConfirmationScreen
+from ..core.host_manager import HostDiff, HostManager, SSHHost
+from ..core.metrics import DEFAULT_CAPACITY, Metrics
+from ..core.multiplex import CONTROL_PERSIST, ControlMasters, ssh_command
+from ..core.prober import Endpoint, HostProber, ProbeResult
+from ..core.records import StoredHost, field_value
+from ..utils.helpers import load_settings
+from .host_table import HostTable
+
+# paramiko and the dialogs are imported where first used, so the host list
+# is up before they load; a test holds startup to this
+if TYPE_CHECKING:
+    from ..core.ssh_client import SSHClient
+    from ..core.sync import SyncResult
+
+HOST_COLUMNS = ("Alias", "Host", "User", "Port", "Status", "RTT", "Group", "Description")
 
 class SSHManagerApp(App):
     CSS = """
@@ -59,6 +74,11 @@ class SSHManagerApp(App):
         width: 20;
         margin: 1;
     }
+
+    #search-box {
+        width: 30;
+        margin: 1;
+    }
     """
 
     BINDINGS = [
@@ -68,26 +88,79 @@ class SSHManagerApp(App):
         Binding("e", "edit_host", "Edit Host"),
         Binding("c", "connect", "Connect"),
         Binding("f", "group_filter", "Filter by Group"),
+        Binding("/", "search", "Search"),
         Binding("r", "refresh", "Refresh"),
         Binding("s", "scp_menu", "SCP"),
+        Binding("x", "run_command", "Run Command"),
+        Binding("p", "push_file", "Push File"),
+        Binding("m", "masters", "SSH Masters"),
+        Binding("t", "timings", "Timings"),
+        Binding("i", "import_ssh_config", "Import ~/.ssh/config"),
     ]
 
+    # Seconds between checks for changes made by other programs
+    WATCH_INTERVAL = 2.0
+
+    # Seconds to wait after the last keystroke before searching
+    SEARCH_DELAY = 0.15
+    # Most search results shown
+    SEARCH_LIMIT = 1000
+
+    # Most reachability probes in flight at once
+    PROBE_CONCURRENCY = 64
+
+    # Hosts a file push copies to at once
+    PUSH_MAX_HOSTS = 16
+
+    # Seconds between progress updates while copying files
+    TRANSFER_UPDATE_INTERVAL = 0.25
+
     def __init__(self, config_dir: str = "config"):
         super().__init__()
         self.config_dir = config_dir
-        self.host_manager = HostManager(config_dir=config_dir)
-        self.ssh_client = SSHClient()
+        # Hosts are streamed in by a worker after the first paint
+        self.host_manager = HostManager(config_dir=config_dir, lazy=True)
+        self._ssh_client: Optional["SSHClient"] = None
+        self.settings = load_settings(config_dir)
+        self.prober: Optional[HostProber] = None
+        if self.settings.get("probe", True):
+            self.prober = HostProber(
+                concurrency=self.settings.get("probe_concurrency", self.PROBE_CONCURRENCY)
+            )
+        # Interactive sessions share one OpenSSH master connection per server
+        self.masters: Optional[ControlMasters] = None
+        if self.settings.get("multiplex", True):
+            self.masters = ControlMasters(
+                os.path.join(config_dir, "control"),
+                persist=self.settings.get("control_persist", CONTROL_PERSIST),
+            )
+        # Timings of connects, commands and transfers, shown by the timings screen
+        self.metrics = Metrics(
+            capacity=self.settings.get("metrics_capacity", DEFAULT_CAPACITY),
+            enabled=self.settings.get("metrics", True),
+        )
+        # Probed endpoint of each alias, dropped when the host changes
+        self.probe_endpoints: Dict[str, Endpoint] = {}
+        # Distinct endpoints of the table rows in row order, rebuilt after the rows change
+        self.probe_list: Optional[List[Endpoint]] = None
         self.selected_host: Optional[SSHHost] = None
         self.selected_group: Optional[str] = None
+        # Groups currently offered by the group filter
+        self.shown_groups: Optional[List[str]] = None
+        self.search_query = ""
+        self.search_timer: Optional[Timer] = None
         self.status_message = ""
+        # Kept by reference: background updates arrive while dialogs cover the main screen
+        self.host_table = HostTable(HOST_COLUMNS, self._table_row, id="host-table")
 
     def compose(self) -> ComposeResult:
         yield Header()
         with Container(id="main-container"):
-            yield DataTable(id="host-table")
+            yield self.host_table
             with Container(id="action-bar"):
                 # Initialize Select with default options
-                yield Select([("all", "All Groups")], id="group-filter")
+                yield Select([("All Groups", "all")], value="all", allow_blank=False, id="group-filter")
+                yield Input(placeholder="Search hosts", id="search-box")
                 yield Button("Add Host", id="add-btn", variant="primary")
                 yield Button("Edit Host", id="edit-btn")
                 yield Button("Delete Host", id="delete-btn", variant="error")
@@ -100,66 +173,256 @@ class SSHManagerApp(App):
         self.title = "SSH Host Manager"
         self.sub_title = "Manage your SSH connections"
         
-        # Initialize the data table
-        table = self.query_one("#host-table")
-        table.add_columns("Alias", "Host", "User", "Port", "Group", "Description")
-        
         # Set initial group selection
         self.selected_group = "all"
         
-        # Initialize group filter and refresh host table
+        # Disable buttons initially since no host is selected
+        self.update_button_states()
+
+        if self.host_manager.loaded:
+            self._finish_loading()
+        else:
+            self.update_status("Loading hosts...")
+            self.load_hosts_in_background()
+        if self.prober is not None:
+            self.probe_hosts()
+
+    @work(thread=True, exclusive=True, group="load-hosts")
+    def load_hosts_in_background(self) -> None:
+        """Parse the inventory in a worker, handing each page to the UI thread."""
+        for page in self.host_manager.stream_records():
+            self.call_from_thread(self._apply_host_page, page)
+        self.call_from_thread(self._finish_loading)
+
+    def _apply_host_page(self, page) -> None:
+        """Show a freshly parsed page of hosts while the rest is still loading."""
+        aliases = self.host_manager.apply_records(page)
+        self.probe_list = None
+        self.host_table.add_rows(
+            alias for alias in aliases if self._is_shown(self.host_manager.peek_host(alias))
+        )
+        self.update_status(f"Loading hosts... {len(self.host_manager.hosts)}")
+
+    def _finish_loading(self) -> None:
+        """Redraw with the complete inventory once loading is done."""
+        self.host_manager.finish_loading()
         self.refresh_group_filter()
         self.refresh_host_table()
-        
-        # Update status message
         self.update_status("Ready")
-        
-        # Disable buttons initially since no host is selected
-        self.update_button_states()
+        self.set_interval(self.WATCH_INTERVAL, self.check_for_changes)
+        self.build_search_index()
 
-    def refresh_host_table(self) -> None:
-        """Refresh the host table with current data."""
-        table = self.query_one("#host-table")
-        table.clear()
-        
-        hosts = (
-            self.host_manager.get_hosts_by_group(self.selected_group)
-            if self.selected_group and self.selected_group != "all"
-            else self.host_manager.get_all_hosts()
+    @work(exclusive=True, group="search-index")
+    async def build_search_index(self) -> None:
+        """Index the hosts for search in small chunks between UI events."""
+        for _ in self.host_manager.build_search_index():
+            await asyncio.sleep(0)
+        if self.search_query:
+            self.refresh_host_table()
+
+    @work(exclusive=True, group="prober")
+    async def probe_hosts(self) -> None:
+        """Probe the hosts in the table in the background, visible rows first."""
+        await self.prober.run(self._probe_targets, self._show_probe_result)
+
+    def _probe_targets(self) -> Iterator[Endpoint]:
+        for alias in self.host_table.visible_keys():
+            endpoint = self._endpoint(alias)
+            if endpoint is not None:
+                yield endpoint
+        if self.probe_list is None:
+            endpoints = (self._endpoint(alias) for alias in self.host_table.keys())
+            self.probe_list = list(dict.fromkeys(e for e in endpoints if e is not None))
+        yield from self.probe_list
+
+    def _endpoint(self, alias: str) -> Optional[Endpoint]:
+        endpoint = self.probe_endpoints.get(alias)
+        if endpoint is None:
+            host = self.host_manager.peek_host(alias)
+            if host is None:
+                return None
+            port = field_value(host, "port")
+            endpoint = (field_value(host, "host"), port if port is not None else 22)
+            self.probe_endpoints[alias] = endpoint
+        return endpoint
+
+    def _show_probe_result(self, endpoint: Endpoint, result: ProbeResult) -> None:
+        """Redraw the rows of every host at a probed endpoint."""
+        self.host_table.update_rows(
+            alias for alias in self.host_manager.get_aliases_by_hostname(endpoint[0])
+            if self._endpoint(alias) == endpoint
         )
-        
-        for host in hosts:
-            table.add_row(
-                host.alias or "",
-                host.host,
-                host.user,
-                str(host.port),
-                host.group or "",
-                host.description or ""
-            )
+
+    def check_for_changes(self) -> None:
+        """Pick up inventory changes made by other programs."""
+        diff = self.host_manager.reload()
+        if diff:
+            self.apply_host_diff(diff)
+            self.update_status(self._describe_diff(diff))
+
+    @staticmethod
+    def _describe_diff(diff: HostDiff) -> str:
+        if diff.full:
+            return "Host list changed on disk, reloaded"
+        return (
+            f"Host list changed on disk: {len(diff.added)} added, "
+            f"{len(diff.removed)} removed, {len(diff.modified)} modified"
+        )
+
+    def apply_host_diff(self, diff: HostDiff) -> None:
+        """Update only the table rows and group filter entries a diff touches."""
+        self.probe_list = None
+        if diff.full:
+            self.probe_endpoints.clear()
+        for alias in diff.removed | diff.modified:
+            self.probe_endpoints.pop(alias, None)
+        if diff.full or self.search_query:
+            self.refresh_group_filter()
+            self.refresh_host_table()
+            return
+
+        table = self.host_table
+        hidden = set(diff.removed)
+        shown, updated = [], []
+        for alias in diff.added | diff.modified:
+            if not self._is_shown(self.host_manager.peek_host(alias)):
+                hidden.add(alias)
+            elif table.has_row(alias):
+                updated.append(alias)
+            else:
+                shown.append(alias)
+        table.remove_rows(hidden)
+        table.update_rows(updated)
+        table.add_rows(shown)
+
+        if self.selected_host is not None:
+            alias = self.selected_host.alias
+            if alias in diff.removed:
+                self.selected_host = None
+                self.update_button_states()
+            elif alias in diff.modified:
+                self.selected_host = self.host_manager.get_host(alias)
+        self.refresh_group_filter()
+
+    def _check_loaded(self) -> bool:
+        """Refuse changes until the inventory has been fully loaded."""
+        if not self.host_manager.loaded:
+            self.update_status("Still loading hosts, please wait")
+        return self.host_manager.loaded
+
+    @property
+    def ssh_client(self) -> "SSHClient":
+        """The client behind transfers and commands, created on first use."""
+        if self._ssh_client is None:
+            from ..core.connection_pool import ConnectionPool
+            from ..core.ssh_client import SSHClient
+            self._ssh_client = SSHClient(ConnectionPool(metrics=self.metrics))
+        return self._ssh_client
+
+    @ssh_client.setter
+    def ssh_client(self, client: "SSHClient") -> None:
+        self._ssh_client = client
+
+    def on_unmount(self) -> None:
+        # Let a pending journal compaction finish before exiting
+        self.host_manager.close()
+        if self._ssh_client is not None:
+            self._ssh_client.close()
+        if self.prober is not None:
+            self.prober.close()
+
+    def refresh_host_table(self) -> None:
+        """Show every host of the selected group; rows are built as they scroll into view."""
+        table = self.host_table
+        group = self.selected_group if self.selected_group and self.selected_group != "all" else None
+        if self.search_query:
+            table.set_rows(self._search_results())
+        else:
+            table.set_rows(alias for alias, _ in self.host_manager.iter_records(group))
+        self.probe_list = None
+        if self.prober is not None:
+            self.prober.wake()
             
-        # Reset selected host
-        self.selected_host = None
+        # Keep the selected host unless it is filtered out
+        if self.selected_host is not None and not table.has_row(self.selected_host.alias):
+            self.selected_host = None
         
         # Update edit and delete buttons state
         self.update_button_states()
 
+    def _search_results(self) -> List[str]:
+        """Aliases matching the search box within the selected group, best first."""
+        if not self.host_manager.search_indexed:
+            self.update_status("Indexing hosts for search...")
+            return []
+        aliases = self.host_manager.search(self.search_query, limit=self.SEARCH_LIMIT)
+        results = [alias for alias in aliases if self._is_shown(self.host_manager.peek_host(alias))]
+        self.update_status(
+            f"{len(results)}{'+' if len(aliases) == self.SEARCH_LIMIT else ''} hosts match "
+            f"'{self.search_query}'"
+        )
+        return results
+
+    def _is_shown(self, host: Optional[StoredHost]) -> bool:
+        """Whether a host passes the group filter."""
+        if host is None:
+            return False
+        return self.selected_group in (None, "all") or field_value(host, "group") == self.selected_group
+
+    def _table_row(self, alias: str) -> Tuple[str, ...]:
+        """Build the cells of a table row on demand."""
+        host = self.host_manager.peek_host(alias)
+        if host is None:
+            return (alias,) + ("",) * (len(HOST_COLUMNS) - 1)
+        return self._host_row(host)
+
+    def _host_row(self, host: StoredHost) -> Tuple[str, ...]:
+        """Build table cells for a host or a raw host record."""
+        port = field_value(host, "port")
+        port = port if port is not None else 22
+        return (
+            field_value(host, "alias") or "",
+            field_value(host, "host"),
+            field_value(host, "user"),
+            str(port),
+            *self._probe_cells((field_value(host, "host"), port)),
+            field_value(host, "group") or "",
+            field_value(host, "description") or "",
+        )
+
+    def _probe_cells(self, endpoint: Endpoint) -> Tuple[str, str]:
+        """Status and RTT cells from the latest probe of an endpoint."""
+        result = self.prober.result(endpoint) if self.prober is not None else None
+        if result is None:
+            return "", ""
+        if not result.reachable:
+            return "down", ""
+        return "up", f"{result.rtt * 1000:.0f} ms"
+
     def refresh_group_filter(self) -> None:
         """Refresh the group filter dropdown."""
         group_filter = self.query_one("#group-filter")
         
         # Get all unique groups
         groups = self.host_manager.get_groups()
+        if groups == self.shown_groups:
+            return
+        self.shown_groups = groups
         
         # Always include "All" option
-        options = [("all", "All Groups")]
+        options = [("All Groups", "all")]
         
         # Add other groups if they exist
         if groups:
             options.extend([(group, group) for group in groups])
             
-        # Set the options
-        group_filter.options = options
+        # Set the options, keeping the current selection if it still exists
+        with group_filter.prevent(Select.Changed):
+            group_filter.set_options(options)
+            group_filter.value = self.selected_group if self.selected_group in groups else "all"
+        if group_filter.value != self.selected_group:
+            self.selected_group = group_filter.value
+            self.refresh_host_table()
 
     def update_button_states(self) -> None:
         """Update button states based on selection."""
@@ -181,44 +444,57 @@ class SSHManagerApp(App):
 
     async def action_add_host(self) -> None:
         """Add a new host."""
+        if not self._check_loaded():
+            return
+        from .dialogs import HostFormScreen
         host_screen = HostFormScreen()
         result = await self.push_screen(host_screen)
         
         if result:
             try:
                 self.host_manager.add_host(result)
-                self.refresh_group_filter()  # Refresh groups first
-                self.refresh_host_table()
+                self.apply_host_diff(HostDiff(added={result.alias}))
                 self.update_status(f"Host '{result.alias}' added successfully")
             except ValueError as e:
                 self.update_status(f"Error: {str(e)}")
 
     async def action_edit_host(self) -> None:
         """Edit the selected host."""
+        if not self._check_loaded():
+            return
         if not self.selected_host:
             self.update_status("No host selected")
             return
         
+        from .dialogs import HostFormScreen
         host_screen = HostFormScreen(self.selected_host)
         result = await self.push_screen(host_screen)
         
         if result:
             host, original_alias = result
             try:
-                self.host_manager.delete_host(original_alias)
-                self.host_manager.add_host(host)
-                self.refresh_group_filter()  # Refresh groups first
-                self.refresh_host_table()
+                # Rename and update land in a single write, or not at all
+                with self.host_manager.batch():
+                    self.host_manager.rename_host(original_alias, host.alias)
+                    self.host_manager.update_host(host.alias, host)
+                table = self.host_table
+                if host.alias != original_alias and table.has_row(original_alias):
+                    table.rename_row(original_alias, host.alias)
+                self.selected_host = self.host_manager.get_host(host.alias)
+                self.apply_host_diff(HostDiff(modified={host.alias}))
                 self.update_status(f"Host '{host.alias}' updated successfully")
-            except ValueError as e:
+            except (KeyError, ValueError) as e:
                 self.update_status(f"Error: {str(e)}")
 
     async def action_delete_host(self) -> None:
         """Delete the selected host."""
+        if not self._check_loaded():
+            return
         if not self.selected_host:
             self.update_status("No host selected")
             return
         
+        from .dialogs import DeleteConfirmationScreen
         confirm_screen = DeleteConfirmationScreen(self.selected_host.alias)
         confirmed = await self.push_screen(confirm_screen)
         
@@ -226,8 +502,7 @@ class SSHManagerApp(App):
             try:
                 alias = self.selected_host.alias
                 self.host_manager.delete_host(alias)
-                self.refresh_group_filter()  # Refresh groups first
-                self.refresh_host_table()
+                self.apply_host_diff(HostDiff(removed={alias}))
                 self.update_status(f"Host '{alias}' deleted successfully")
             except KeyError as e:
                 self.update_status(f"Error: {str(e)}")
@@ -240,26 +515,28 @@ class SSHManagerApp(App):
         
         host = self.selected_host
         self.update_status(f"Connecting to {host.host}...")
-        
-        # Build SSH command
-        cmd = ["ssh"]
-        
-        # Add port if not default
-        if host.port != 22:
-            cmd.extend(["-p", str(host.port)])
-        
-        # Add key if provided
-        if host.key_path:
-            cmd.extend(["-i", host.key_path])
-        
-        # Add user@host
-        cmd.append(f"{host.user}@{host.host}")
-        
-        # Exit the app and connect
-        self.exit(lambda: self._connect_ssh(cmd))
+        try:
+            cmd = self.masters.command(host) if self.masters is not None else ssh_command(host)
+        except OSError:
+            # The control directory is unusable; connect without a shared master
+            cmd = ssh_command(host)
+        try:
+            # Hand the terminal to ssh and come back when it exits
+            with self.suspend():
+                exit_code = self._connect_ssh(cmd)
+        except SuspendNotSupported:
+            # Exit the app and connect
+            self.exit(lambda: self._connect_ssh(cmd))
+            return
+        if exit_code is None:
+            self.update_status(f"Error: Could not run {cmd[0]}")
+        elif exit_code:
+            self.update_status(f"Disconnected from {host.alias} (exit status {exit_code})")
+        else:
+            self.update_status(f"Disconnected from {host.alias}")
 
-    def _connect_ssh(self, cmd: List[str]) -> None:
-        """Connect to SSH in the terminal."""
+    def _connect_ssh(self, cmd: List[str]) -> Optional[int]:
+        """Connect to SSH in the terminal; returns ssh's exit status."""
         try:
             # Clear the screen first
             if sys.platform == "win32":
@@ -268,9 +545,103 @@ class SSHManagerApp(App):
                 os.system("clear")
                 
             print(f"Connecting with command: {' '.join(cmd)}")
-            subprocess.run(cmd)
+            return subprocess.run(cmd).returncode
         except Exception as e:
             print(f"Error connecting: {str(e)}")
+            return None
+
+    def action_masters(self) -> None:
+        """Show the shared SSH connections left running by interactive sessions."""
+        if self.masters is None:
+            self.update_status("Connection sharing is turned off")
+            return
+        from .masters import ControlMastersScreen
+        self.push_screen(ControlMastersScreen(self.masters))
+
+    def action_timings(self) -> None:
+        """Show percentiles of the connect, command and transfer timings per host or group."""
+        from .timings import TimingsScreen
+        self.push_screen(TimingsScreen(self.metrics, self.config_dir))
+
+    def action_search(self) -> None:
+        """Focus the search box."""
+        self.query_one("#search-box").focus()
+
+    def on_input_changed(self, event: Input.Changed) -> None:
+        """Search once typing pauses; each keystroke cancels the pending search."""
+        if event.input.id != "search-box":
+            return
+        if self.search_timer is not None:
+            self.search_timer.stop()
+        self.search_timer = self.set_timer(
+            self.SEARCH_DELAY, lambda: self.run_search(event.value.strip())
+        )
+
+    def run_search(self, query: str) -> None:
+        """Show the hosts matching a search query, or all hosts for an empty one."""
+        self.search_timer = None
+        if query == self.search_query:
+            return
+        self.search_query = query
+        if not self.host_manager.loaded:
+            return
+        self.refresh_host_table()
+        if not query:
+            self.update_status("Ready")
+
+    def action_run_command(self) -> None:
+        """Run a command on every host currently shown in the table."""
+        if not self._check_loaded():
+            return
+        aliases = self.host_table.keys()
+        if not aliases:
+            self.update_status("No hosts to run a command on")
+            return
+        from ..core.fanout import FanOutExecutor
+        from .dialogs import CommandScreen
+        from .results import CommandResultsScreen
+
+        def run(command: Optional[str]) -> None:
+            if command:
+                hosts = [self.host_manager.get_host(alias) for alias in aliases]
+                executor = FanOutExecutor(self.ssh_client.pool, max_workers=self.ssh_client.pool.max_connections)
+                self.push_screen(CommandResultsScreen(executor, hosts, command))
+
+        self.push_screen(CommandScreen(len(aliases), self._listed_scope()), run)
+
+    def action_push_file(self) -> None:
+        """Copy a file to every host currently shown in the table."""
+        if not self._check_loaded():
+            return
+        aliases = self.host_table.keys()
+        if not aliases:
+            self.update_status("No hosts to push to")
+            return
+        from ..core.distribution import ArtifactDistributor
+        from .dialogs import PushScreen
+        from .results import DistributionResultsScreen
+
+        def push(paths: Optional[Tuple[str, str]]) -> None:
+            if paths:
+                hosts = [self.host_manager.get_host(alias) for alias in aliases]
+                bandwidth = self.settings.get("push_bandwidth_mbps")
+                distributor = ArtifactDistributor(
+                    self.ssh_client.pool,
+                    max_hosts=self.settings.get("push_max_hosts", self.PUSH_MAX_HOSTS),
+                    bandwidth=bandwidth * 1e6 if bandwidth else None,
+                    transfer=self.ssh_client.transfers,
+                )
+                self.push_screen(DistributionResultsScreen(distributor, hosts, *paths))
+
+        self.push_screen(PushScreen(len(aliases), self._listed_scope()), push)
+
+    def _listed_scope(self) -> str:
+        """Describe the hosts listed in the table, for dialogs acting on all of them."""
+        if self.search_query:
+            return f"matching '{self.search_query}'"
+        if self.selected_group not in (None, "all"):
+            return f"group '{self.selected_group}'"
+        return "all hosts"
 
     def action_group_filter(self) -> None:
         """Filter hosts by group."""
@@ -278,33 +649,131 @@ class SSHManagerApp(App):
         group_filter.focus()
 
     def action_refresh(self) -> None:
-        """Refresh the host table."""
-        self.host_manager.load_hosts()
-        self.refresh_group_filter()  # Refresh groups first
-        self.refresh_host_table()
-        self.update_status("Refreshed host list")
+        """Reload the host list if it changed on disk."""
+        if not self._check_loaded():
+            return
+        diff = self.host_manager.reload()
+        if not diff:
+            self.update_status("Host list is up to date")
+            return
+        self.apply_host_diff(diff)
+        self.update_status(self._describe_diff(diff))
 
-    async def action_scp_menu(self) -> None:
-        """Show SCP menu."""
+    def action_import_ssh_config(self) -> None:
+        """Import hosts from ~/.ssh/config."""
+        if not self._check_loaded():
+            return
+        path = os.path.expanduser("~/.ssh/config")
+        if not os.path.exists(path):
+            self.update_status("No ~/.ssh/config found")
+            return
+
+        from ..core.importer import HostImporter
+        try:
+            result = HostImporter(self.host_manager).import_source(path)
+        except (OSError, ValueError) as e:
+            self.update_status(f"Error: {str(e)}")
+            return
+
+        if result.skipped:
+            self.update_status("~/.ssh/config unchanged since last import")
+            return
+        self.apply_host_diff(HostDiff(full=True))
+        self.update_status(
+            f"Imported ~/.ssh/config: {result.added} added, {result.updated} updated, "
+            f"{len(result.errors)} invalid"
+        )
+
+    def action_scp_menu(self) -> None:
+        """Copy a file or sync a directory with the selected host."""
         if not self.selected_host:
             self.update_status("No host selected")
             return
-            
-        # TODO: Implement SCP functionality
-        self.update_status("SCP functionality not yet implemented")
-
-    def on_data_table_row_selected(self, event: DataTable.RowSelected) -> None:
-        """Handle row selection in the data table."""
-        table = self.query_one("#host-table")
-        if event.row_key is not None:
-            row = table.get_row(event.row_key)
-            alias = row[0]
-            try:
-                self.selected_host = self.host_manager.get_host(alias)
-                self.update_status(f"Selected host: {alias}")
-                self.update_button_states()
-            except KeyError:
-                self.update_status(f"Error: Host '{alias}' not found")
+        from .dialogs import TransferScreen
+        host = self.selected_host
+
+        def start(request: Optional[Dict[str, Any]]) -> None:
+            if request:
+                self.transfer_files(host, request)
+
+        self.push_screen(TransferScreen(host.alias), start)
+
+    @work(thread=True, exclusive=True, group="transfer")
+    def transfer_files(self, host: SSHHost, request: Dict[str, Any]) -> None:
+        """Run a transfer or sync in a worker, reporting progress in the status bar."""
+        mode = request["mode"]
+        local_path, remote_path = request.get("local_path"), request["remote_path"]
+        label = {"upload": "Uploading to", "download": "Downloading from",
+                 "push": "Syncing to", "pull": "Syncing from", "copy": "Copying from"}[mode]
+        last_update = 0.0
+
+        def progress(done: int, total: int) -> None:
+            nonlocal last_update
+            now = time.monotonic()
+            if now - last_update >= self.TRANSFER_UPDATE_INTERVAL:
+                last_update = now
+                percent = done * 100 // total if total else 100
+                self.call_from_thread(self.update_status, f"{label} {host.alias}: {percent}%")
+
+        self.call_from_thread(self.update_status, f"{label} {host.alias}...")
+        transfers = self.ssh_client.transfers
+        try:
+            if mode in ("push", "pull"):
+                options = {key: request[key] for key in ("delete", "dry_run", "checksum")}
+                from ..core.sync import DirectorySync
+                sync = DirectorySync(self.ssh_client.pool, transfers)
+                if mode == "push":
+                    result = sync.push(host, local_path, remote_path, progress=progress, **options)
+                else:
+                    result = sync.pull(host, remote_path, local_path, progress=progress, **options)
+                message = self._describe_sync(host.alias, result)
+            elif mode == "copy":
+                try:
+                    destination = self.host_manager.get_host(request["destination_host"])
+                except KeyError as e:
+                    raise ValueError(e.args[0]) from e
+                copied = transfers.copy(host, remote_path, destination, request["destination_path"],
+                                        progress=progress, verify=True)
+                message = (f"Copied {os.path.basename(copied.source)} to {destination.alias}: "
+                           f"{copied.size / 1e6:.1f} MB at {copied.throughput / 1e6:.1f} MB/s "
+                           f"(read {copied.read_throughput / 1e6:.1f} MB/s, "
+                           f"write {copied.write_throughput / 1e6:.1f} MB/s), SHA-256 verified")
+            else:
+                if mode == "upload":
+                    copied = transfers.upload(host, local_path, remote_path, progress=progress)
+                else:
+                    copied = transfers.download(host, remote_path, local_path, progress=progress)
+                verb = "Uploaded" if mode == "upload" else "Downloaded"
+                message = (f"{verb} {os.path.basename(copied.source)}: "
+                           f"{copied.size / 1e6:.1f} MB at {copied.throughput / 1e6:.1f} MB/s")
+        except Exception as e:
+            message = f"Error: {str(e) or type(e).__name__}"
+        self.call_from_thread(self.update_status, message)
+
+    @staticmethod
+    def _describe_sync(alias: str, result: "SyncResult") -> str:
+        plan = result.plan
+        if result.dry_run:
+            return (f"Dry run for {alias}: {len(plan.files)} files ({plan.bytes / 1e6:.1f} MB) to copy, "
+                    f"{len(plan.extraneous_files) + len(plan.extraneous_directories)} to delete, "
+                    f"{plan.unchanged} unchanged")
+        message = (f"Synced with {alias}: {result.copied} files copied "
+                   f"({result.transferred / 1e6:.1f} MB), {result.deleted} deleted, "
+                   f"{plan.unchanged} unchanged")
+        if result.errors:
+            path, error = next(iter(result.errors.items()))
+            message += f", {len(result.errors)} failed ({path}: {error})"
+        return message
+
+    def on_host_table_row_selected(self, event: HostTable.RowSelected) -> None:
+        """Handle row selection in the host table."""
+        alias = event.key
+        try:
+            self.selected_host = self.host_manager.get_host(alias)
+            self.update_status(f"Selected host: {alias}")
+            self.update_button_states()
+        except KeyError:
+            self.update_status(f"Error: Host '{alias}' not found")
 
     def on_button_pressed(self, event: Button.Pressed) -> None:
         """Handle button press events."""
@@ -322,5 +791,7 @@ class SSHManagerApp(App):
 
     def on_select_changed(self, event: Select.Changed) -> None:
         """Handle group filter selection changes."""
+        if event.value == self.selected_group:
+            return
         self.selected_group = event.value
         self.refresh_host_table() 
\ No newline at end of file
@@ -0,0 +1,128 @@
+import time
+from typing import Dict, List
+
+from textual import work
+from textual.app import ComposeResult
+from textual.binding import Binding
+from textual.containers import Container
+from textual.screen import Screen
+from textual.widgets import Button, DataTable, Footer, Label, Static
+
+from ..core.multiplex import ControlMasters, MasterSocket
+
+
+def _age(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h{minutes:02d}m" if hours else f"{minutes}m{seconds:02d}s"
+
+
+class ControlMastersScreen(Screen):
+    """Lists the running OpenSSH master connections and closes them."""
+
+    CSS = """
+    #masters {
+        height: 1fr;
+        border: solid green;
+    }
+
+    #summary {
+        height: 1;
+    }
+
+    #buttons {
+        height: auto;
+        layout: horizontal;
+    }
+
+    #buttons Button {
+        margin: 0 1;
+    }
+    """
+
+    BINDINGS = [
+        Binding("escape", "close", "Close"),
+        Binding("d", "close_master", "Close Master"),
+        Binding("a", "close_all", "Close All"),
+        Binding("r", "refresh", "Refresh"),
+    ]
+
+    def __init__(self, masters: ControlMasters):
+        super().__init__()
+        self.masters = masters
+        self.shown: Dict[str, MasterSocket] = {}
+
+    def compose(self) -> ComposeResult:
+        yield Label("Shared SSH connections")
+        yield DataTable(id="masters", cursor_type="row")
+        yield Static(id="summary")
+        with Container(id="buttons"):
+            yield Button("Close Master", id="close-master-btn", variant="error")
+            yield Button("Close All", id="close-all-btn")
+            yield Button("Refresh", id="refresh-btn")
+            yield Button("Close", id="close-btn")
+        yield Footer()
+
+    def on_mount(self) -> None:
+        self.query_one("#masters").add_columns("Alias", "Target", "PID", "Up For", "Socket")
+        self.action_refresh()
+
+    def action_refresh(self) -> None:
+        self.query_one("#summary").update("Checking masters...")
+        self.list_masters()
+
+    @work(thread=True, exclusive=True, group="masters")
+    def list_masters(self) -> None:
+        """Check the sockets in a worker; each check runs ``ssh -O check``."""
+        self.app.call_from_thread(self.show_masters, self.masters.masters())
+
+    def show_masters(self, masters: List[MasterSocket]) -> None:
+        if not self.is_attached:
+            return
+        table = self.query_one("#masters")
+        table.clear()
+        self.shown = {master.path: master for master in masters}
+        now = time.time()
+        for master in masters:
+            table.add_row(
+                master.alias,
+                master.target,
+                "" if master.pid is None else str(master.pid),
+                _age(now - master.started),
+                master.path,
+                key=master.path,
+            )
+        self.query_one("#summary").update(f"{len(masters)} masters running")
+
+    def action_close_master(self) -> None:
+        table = self.query_one("#masters")
+        if not table.row_count:
+            return
+        path = table.coordinate_to_cell_key(table.cursor_coordinate).row_key.value
+        self.close_masters([self.shown[path]])
+
+    def action_close_all(self) -> None:
+        self.close_masters(list(self.shown.values()))
+
+    @work(thread=True, exclusive=True, group="masters")
+    def close_masters(self, masters: List[MasterSocket]) -> None:
+        """Stop masters in a worker, then list what is left."""
+        failed = [master.alias for master in masters if not self.masters.close(master)]
+        remaining = self.masters.masters()
+        self.app.call_from_thread(self.show_masters, remaining)
+        if failed:
+            self.app.call_from_thread(self.query_one("#summary").update,
+                                      f"Could not close: {', '.join(failed)}")
+
+    def action_close(self) -> None:
+        self.dismiss()
+
+    def on_button_pressed(self, event: Button.Pressed) -> None:
+        if event.button.id == "close-master-btn":
+            self.action_close_master()
+        elif event.button.id == "close-all-btn":
+            self.action_close_all()
+        elif event.button.id == "refresh-btn":
+            self.action_refresh()
+        elif event.button.id == "close-btn":
+            self.action_close()
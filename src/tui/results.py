@@ -0,0 +1,215 @@
+from typing import Dict, List, Union
+
+from rich.text import Text
+from textual import work
+from textual.app import ComposeResult
+from textual.binding import Binding
+from textual.containers import Container
+from textual.screen import Screen
+from textual.widgets import Button, DataTable, Footer, Label, Static
+
+from ..core.distribution import ArtifactDistributor, Delivery
+from ..core.fanout import OK, FanOutExecutor, HostResult
+from ..core.host_manager import SSHHost
+
+
+class _HostResultsScreen(Screen):
+    """A table of per-host outcomes filling in as a run across hosts goes on.
+
+    Subclasses add the columns and start the run when mounted. Textual
+    calls a handler from every class in the hierarchy, so mount and row
+    handlers live in the subclasses only.
+    """
+
+    CSS = """
+    #results {
+        height: 2fr;
+        border: solid green;
+    }
+
+    #output {
+        height: 1fr;
+        border: solid $accent;
+        overflow-y: auto;
+    }
+
+    #summary {
+        height: 1;
+    }
+
+    #buttons {
+        height: auto;
+        layout: horizontal;
+    }
+
+    #buttons Button {
+        margin: 0 1;
+    }
+    """
+
+    BINDINGS = [
+        Binding("escape", "close", "Close"),
+        Binding("x", "cancel", "Cancel Run"),
+    ]
+
+    def __init__(self, executor: Union[FanOutExecutor, ArtifactDistributor], hosts: List[SSHHost]):
+        super().__init__()
+        self.executor = executor
+        self.hosts = hosts
+        self.results: Dict[str, Union[HostResult, Delivery]] = {}
+        self.running = True
+
+    def compose(self) -> ComposeResult:
+        yield Label(Text(self.heading()))
+        yield DataTable(id="results", cursor_type="row")
+        yield Static(id="output")
+        yield Static(id="summary")
+        with Container(id="buttons"):
+            yield Button("Cancel Run", id="cancel-btn", variant="error")
+            yield Button("Close", id="close-btn")
+        yield Footer()
+
+    def heading(self) -> str:
+        raise NotImplementedError
+
+    def finish(self) -> None:
+        self.running = False
+        if not self.is_attached:
+            return
+        self.query_one("#cancel-btn").disabled = True
+        self.update_summary()
+
+    def update_summary(self) -> None:
+        self.query_one("#summary").update(self.summary())
+
+    def summary(self) -> str:
+        ok = sum(result.status == OK for result in self.results.values())
+        state = "running" if self.running else ("cancelled" if self.executor.cancelled else "done")
+        return (f"{len(self.results)}/{len(self.hosts)} finished, {ok} ok, "
+                f"{len(self.results) - ok} not ok ({state})")
+
+    def action_cancel(self) -> None:
+        if self.running:
+            self.executor.cancel()
+
+    def action_close(self) -> None:
+        self.action_cancel()
+        self.dismiss()
+
+    def on_button_pressed(self, event: Button.Pressed) -> None:
+        if event.button.id == "cancel-btn":
+            self.action_cancel()
+        elif event.button.id == "close-btn":
+            self.action_close()
+
+
+class CommandResultsScreen(_HostResultsScreen):
+    """Shows the results of a fan-out command as each host finishes."""
+
+    def __init__(self, executor: FanOutExecutor, hosts: List[SSHHost], command: str):
+        super().__init__(executor, hosts)
+        self.command = command
+
+    def heading(self) -> str:
+        return f"$ {self.command}  ({len(self.hosts)} hosts)"
+
+    def on_mount(self) -> None:
+        table = self.query_one("#results")
+        table.add_columns("Alias", "Status", "Exit", "Time", "Output")
+        self.update_summary()
+        self.run_command()
+
+    @work(thread=True, exclusive=True, group="fanout")
+    def run_command(self) -> None:
+        """Run the command in a worker, posting each result as it arrives."""
+        for result in self.executor.run(self.hosts, self.command):
+            self.app.call_from_thread(self.add_result, result)
+        self.app.call_from_thread(self.finish)
+
+    def add_result(self, result: HostResult) -> None:
+        if not self.is_attached:
+            # Closed while the run was winding down
+            return
+        self.results[result.alias] = result
+        output = (result.stdout or result.stderr or result.error or "").strip()
+        self.query_one("#results").add_row(
+            result.alias,
+            result.status,
+            "" if result.exit_code is None else str(result.exit_code),
+            f"{result.duration:.2f}s",
+            output.splitlines()[0] if output else "",
+            key=result.alias,
+        )
+        self.update_summary()
+
+    def on_data_table_row_highlighted(self, event: DataTable.RowHighlighted) -> None:
+        """Show the full output of the highlighted host."""
+        result = self.results.get(event.row_key.value)
+        if result is None:
+            return
+        parts = [result.stdout, result.stderr, result.error or ""]
+        self.query_one("#output").update(Text("\n".join(part for part in parts if part).strip()))
+
+
+class DistributionResultsScreen(_HostResultsScreen):
+    """Shows each host's outcome as a file push reaches it."""
+
+    BINDINGS = [
+        Binding("escape", "close", "Close"),
+        Binding("x", "cancel", "Cancel Push"),
+    ]
+
+    def __init__(self, distributor: ArtifactDistributor, hosts: List[SSHHost],
+                 local_path: str, remote_path: str):
+        super().__init__(distributor, hosts)
+        self.local_path = local_path
+        self.remote_path = remote_path
+        self.checksum = ""
+
+    def heading(self) -> str:
+        return f"Push {self.local_path} -> {self.remote_path}  ({len(self.hosts)} hosts)"
+
+    def on_mount(self) -> None:
+        table = self.query_one("#results")
+        table.add_columns("Alias", "Status", "Time", "MB/s", "SHA-256 / Error")
+        self.query_one("#cancel-btn").label = "Cancel Push"
+        self.update_summary()
+        self.push_file()
+
+    @work(thread=True, exclusive=True, group="distribute")
+    def push_file(self) -> None:
+        """Push the file in a worker, posting each host as it finishes."""
+        try:
+            report = self.executor.distribute(
+                self.hosts, self.local_path, self.remote_path,
+                on_delivery=lambda delivery: self.app.call_from_thread(self.add_result, delivery),
+            )
+            self.checksum = report.checksum
+        except (OSError, ValueError) as e:
+            self.app.call_from_thread(self.query_one("#output").update, f"Error: {str(e)}")
+        self.app.call_from_thread(self.finish)
+
+    def add_result(self, result: Delivery) -> None:
+        if not self.is_attached:
+            return
+        self.results[result.alias] = result
+        rate = result.sent / result.duration / 1e6 if result.duration > 0 else 0.0
+        self.query_one("#results").add_row(
+            result.alias,
+            result.status,
+            f"{result.duration:.2f}s",
+            f"{rate:.1f}",
+            result.error or result.checksum or "",
+            key=result.alias,
+        )
+        self.update_summary()
+
+    def summary(self) -> str:
+        summary = super().summary()
+        return f"{summary}; local sha256 {self.checksum}" if self.checksum else summary
+
+    def on_data_table_row_highlighted(self, event: DataTable.RowHighlighted) -> None:
+        """Show the full checksum or error of the highlighted host."""
+        result = self.results.get(event.row_key.value)
+        if result is not None:
+            self.query_one("#output").update(Text(result.error or result.checksum or ""))
@@ -0,0 +1,142 @@
+import os
+from typing import Optional
+
+from textual.app import ComposeResult
+from textual.binding import Binding
+from textual.containers import Container
+from textual.screen import Screen
+from textual.widgets import Button, DataTable, Footer, Label, Static
+
+from ..core.metrics import Metrics
+
+
+def _duration(seconds: float) -> str:
+    if seconds < 1:
+        return f"{seconds * 1000:.1f} ms"
+    return f"{seconds:.2f} s"
+
+
+def _rate(bytes_per_second: Optional[float]) -> str:
+    if bytes_per_second is None:
+        return ""
+    return f"{bytes_per_second / 1e6:.2f} MB/s"
+
+
+class TimingsScreen(Screen):
+    """Percentiles of the recorded SSH operation phases, per host or per group."""
+
+    CSS = """
+    #timings {
+        height: 1fr;
+        border: solid green;
+    }
+
+    #summary {
+        height: 1;
+    }
+
+    #buttons {
+        height: auto;
+        layout: horizontal;
+    }
+
+    #buttons Button {
+        margin: 0 1;
+    }
+    """
+
+    BINDINGS = [
+        Binding("escape", "close", "Close"),
+        Binding("g", "toggle_grouping", "Hosts/Groups"),
+        Binding("e", "export", "Export"),
+        Binding("c", "clear", "Clear"),
+    ]
+
+    # Seconds between redraws while the screen is open
+    REFRESH_INTERVAL = 2.0
+
+    def __init__(self, metrics: Metrics, export_dir: str):
+        super().__init__()
+        self.metrics = metrics
+        self.export_dir = export_dir
+        # "alias" or "group"
+        self.by = "alias"
+
+    def compose(self) -> ComposeResult:
+        yield Label("SSH operation timings")
+        yield DataTable(id="timings", cursor_type="row")
+        yield Static(id="summary")
+        with Container(id="buttons"):
+            yield Button("By Group", id="grouping-btn")
+            yield Button("Export", id="export-btn", variant="primary")
+            yield Button("Clear", id="clear-btn")
+            yield Button("Close", id="close-btn")
+        yield Footer()
+
+    def on_mount(self) -> None:
+        self.show_timings()
+        self.set_interval(self.REFRESH_INTERVAL, self.show_timings)
+
+    def show_timings(self) -> None:
+        table = self.query_one("#timings", DataTable)
+        row = table.cursor_row
+        table.clear(columns=True)
+        table.add_columns("Host" if self.by == "alias" else "Group", "Operation", "Phase",
+                          "Count", "Errors", "p50", "p95", "p99", "Throughput")
+        for summary in self.metrics.summary(self.by):
+            p50, p95, p99 = summary.quantiles
+            table.add_row(
+                summary.name or "(none)",
+                summary.operation,
+                summary.phase,
+                str(summary.count),
+                str(summary.errors) if summary.errors else "",
+                _duration(p50),
+                _duration(p95),
+                _duration(p99),
+                _rate(summary.throughput),
+            )
+        if table.row_count:
+            table.move_cursor(row=min(row, table.row_count - 1))
+        self.update_summary()
+
+    def update_summary(self, message: Optional[str] = None) -> None:
+        if message is None:
+            if not self.metrics.enabled:
+                message = 'Timing is turned off; set "metrics": true in settings.json'
+            else:
+                message = f"{len(self.metrics)} spans recorded"
+        self.query_one("#summary", Static).update(message)
+
+    def action_toggle_grouping(self) -> None:
+        self.by = "group" if self.by == "alias" else "alias"
+        self.query_one("#grouping-btn", Button).label = "By Host" if self.by == "group" else "By Group"
+        self.show_timings()
+
+    def action_export(self) -> None:
+        """Write the spans as JSON lines and in the Prometheus text format."""
+        paths = [os.path.join(self.export_dir, name) for name in ("metrics.jsonl", "metrics.prom")]
+        try:
+            for path in paths:
+                count = self.metrics.export(path)
+        except OSError as e:
+            self.update_summary(f"Export failed: {e}")
+            return
+        self.update_summary(f"Exported {count} spans to {' and '.join(paths)}")
+
+    def action_clear(self) -> None:
+        self.metrics.clear()
+        self.show_timings()
+
+    def action_close(self) -> None:
+        self.dismiss()
+
+    def on_button_pressed(self, event: Button.Pressed) -> None:
+        if event.button.id == "grouping-btn":
+            self.action_toggle_grouping()
+        elif event.button.id == "export-btn":
+            self.action_export()
+        elif event.button.id == "clear-btn":
+            self.action_clear()
+        elif event.button.id == "close-btn":
+            self.action_close()
@@ -1,6 +1,7 @@
+import json
 import os
 import re
-from typing import Optional, Tuple
+from typing import Any, Dict, Optional, Tuple
 
 def validate_hostname(hostname: str) -> Tuple[bool, str]:
     """Validate a hostname or IP address."""
@@ -62,4 +63,12 @@ def validate_key_path(path: Optional[str]) -> Tuple[bool, str]:
 
 def expand_path(path: str) -> str:
     """Expand user path (e.g., ~/keys/id_rsa to /home/user/keys/id_rsa)."""
-    return os.path.expanduser(path) 
\ No newline at end of file
+    return os.path.expanduser(path) 
+
+def load_settings(config_dir: str) -> Dict[str, Any]:
+    """Load settings.json from the configuration directory, if present."""
+    try:
+        with open(os.path.join(config_dir, "settings.json"), 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
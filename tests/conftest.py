@@ -0,0 +1,169 @@
+import gc
+import json
+import os
+import time
+from typing import Callable, Dict, List, Optional
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Fraction a benchmark may be slower than its baseline before it fails
+BENCHMARK_THRESHOLD = 0.5
+# Seconds each benchmark keeps taking rounds for, beyond its minimum number
+BENCHMARK_MIN_TIME = 1.0
+BENCHMARK_BASELINE = os.path.join(ROOT, "benchmarks", "baseline.json")
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("benchmark", "performance benchmarks")
+    group.addoption("--benchmark", action="store_true",
+                    help="Run the tests marked 'benchmark' (skipped otherwise)")
+    group.addoption("--benchmark-baseline", default=BENCHMARK_BASELINE,
+                    help="JSON file of baseline timings to compare against")
+    group.addoption("--benchmark-save", action="store_true",
+                    help="Write the timings of this run to the baseline instead of failing on regressions")
+    group.addoption("--benchmark-threshold", type=float, default=BENCHMARK_THRESHOLD,
+                    help="Fraction a benchmark may be slower than its baseline, e.g. 0.5")
+    group.addoption("--benchmark-min-time", type=float, default=BENCHMARK_MIN_TIME,
+                    help="Seconds to keep timing rounds of each benchmark for")
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "benchmark: performance benchmark, run with --benchmark")
+    if config.getoption("--benchmark"):
+        config.benchmark_results = BenchmarkResults(
+            config.getoption("--benchmark-baseline"),
+            config.getoption("--benchmark-threshold"),
+        )
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--benchmark"):
+        return
+    skip = pytest.mark.skip(reason="benchmark; run with --benchmark")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip)
+
+
+def pytest_sessionfinish(session):
+    results = getattr(session.config, "benchmark_results", None)
+    if results is not None and session.config.getoption("--benchmark-save") and results.timings:
+        results.save()
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    results = getattr(config, "benchmark_results", None)
+    if results is None or not results.timings:
+        return
+    terminalreporter.section("benchmarks")
+    for line in results.report():
+        terminalreporter.write_line(line)
+    if config.getoption("--benchmark-save"):
+        terminalreporter.write_line(f"baseline written to {results.baseline_path}")
+
+
+class BenchmarkResults:
+    """Timings of one benchmark run and the baseline they are held against.
+
+    Timings are the best of several rounds, in seconds per call, keyed by
+    the benchmark's test id plus an optional name. The baseline is a JSON
+    object of the same keys; it holds timings of one machine, so save a
+    fresh one (``--benchmark-save``) when comparing on another.
+    """
+
+    def __init__(self, baseline_path: str, threshold: float):
+        self.baseline_path = baseline_path
+        self.threshold = threshold
+        try:
+            with open(baseline_path) as f:
+                self.baseline: Dict[str, float] = json.load(f)
+        except FileNotFoundError:
+            self.baseline = {}
+        self.timings: Dict[str, float] = {}
+
+    def add(self, key: str, seconds: float) -> Optional[str]:
+        """Record a timing; returns a failure message if it regressed past the threshold."""
+        self.timings[key] = seconds
+        baseline = self.baseline.get(key)
+        if baseline is not None and seconds > baseline * (1 + self.threshold):
+            return (f"{key}: {_format(seconds)} against a baseline of {_format(baseline)} "
+                    f"({seconds / baseline - 1:+.0%}, threshold {self.threshold:+.0%})")
+        return None
+
+    def report(self) -> List[str]:
+        lines = []
+        for key, seconds in self.timings.items():
+            baseline = self.baseline.get(key)
+            change = "new" if baseline is None else f"{seconds / baseline - 1:+.0%}"
+            lines.append(f"{_format(seconds):>12}  {change:>6}  {key}")
+        return lines
+
+    def save(self) -> None:
+        """Merge this run's timings into the baseline file."""
+        baseline = dict(self.baseline, **self.timings)
+        os.makedirs(os.path.dirname(os.path.abspath(self.baseline_path)), exist_ok=True)
+        with open(self.baseline_path, "w") as f:
+            json.dump(dict(sorted(baseline.items())), f, indent=2)
+            f.write("\n")
+
+
+def _format(seconds: float) -> str:
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:.1f} us"
+    if seconds < 1:
+        return f"{seconds * 1e3:.2f} ms"
+    return f"{seconds:.3f} s"
+
+
+class Benchmark:
+    """Times code for the test using it and checks the timings against the baseline."""
+
+    def __init__(self, request):
+        self.results: BenchmarkResults = request.config.benchmark_results
+        self.fail = not request.config.getoption("--benchmark-save")
+        self.min_time = request.config.getoption("--benchmark-min-time")
+        # The test id without its directory, which depends on where pytest was run from
+        self.key = f"{request.node.path.name}::{request.node.nodeid.split('::', 1)[1]}"
+
+    def __call__(self, func: Callable[[], object], rounds: int = 5, number: int = 1,
+                 setup: Optional[Callable[[], object]] = None, name: Optional[str] = None) -> float:
+        """Time ``func``, best of ``rounds`` or more rounds of ``number`` calls; returns seconds per call.
+
+        Rounds go on until ``--benchmark-min-time`` has passed, so quick
+        benchmarks take the best of many rounds and a single slow one does
+        not decide the result. ``setup`` runs untimed before each round. The
+        garbage collector is off while timing, as in ``timeit``.
+        """
+        times = []
+        deadline = time.perf_counter() + self.min_time
+        while len(times) < rounds or time.perf_counter() < deadline:
+            if setup is not None:
+                setup()
+            gc_enabled = gc.isenabled()
+            gc.disable()
+            try:
+                started = time.perf_counter()
+                for _ in range(number):
+                    func()
+                times.append((time.perf_counter() - started) / number)
+            finally:
+                if gc_enabled:
+                    gc.enable()
+        return self.record(min(times), name)
+
+    def record(self, seconds: float, name: Optional[str] = None) -> float:
+        """Record a timing taken by the test itself, such as one spanning awaits."""
+        key = self.key if name is None else f"{self.key}::{name}"
+        failure = self.results.add(key, seconds)
+        if failure is not None and self.fail:
+            pytest.fail(f"Performance regression: {failure}", pytrace=False)
+        return seconds
+
+
+@pytest.fixture
+def benchmark(request) -> Benchmark:
+    """Time code against the baseline; only available with ``--benchmark``."""
+    if not hasattr(request.config, "benchmark_results"):
+        pytest.skip("benchmark; run with --benchmark")
+    return Benchmark(request)
@@ -0,0 +1,113 @@
+"""A simulated SSH fleet for exercising code built on the connection pool.
+
+``FakeFleet.connect`` stands in for the pool's connector. Commands finish
+after the fleet's latency, echoing the host alias; hosts listed in
+``failing`` exit with status 1 and hosts in ``hanging`` never finish.
+Channels expose a pipe through ``fileno`` so they can be waited on like
+paramiko channels.
+"""
+
+import os
+import threading
+import time
+from typing import Iterable, Optional
+
+
+class FakeChannel:
+    def __init__(self, fleet: "FakeFleet", alias: str):
+        self.fleet = fleet
+        self.alias = alias
+        self.closed = False
+        self._stdout = b""
+        self._stderr = b""
+        self._exit_status: Optional[int] = None
+        self._read_fd, self._write_fd = os.pipe()
+
+    def exec_command(self, command: str) -> None:
+        self.fleet.commands.append((self.alias, command))
+        if self.alias not in self.fleet.hanging:
+            threading.Timer(self.fleet.latency, self._finish).start()
+
+    def _finish(self) -> None:
+        if self.alias in self.fleet.failing:
+            self._stderr, self._exit_status = f"{self.alias} failed\n".encode(), 1
+        else:
+            self._stdout, self._exit_status = f"{self.alias}\n".encode(), 0
+        self._wake()
+
+    def _wake(self) -> None:
+        try:
+            os.write(self._write_fd, b"x")
+        except OSError:
+            pass
+
+    def fileno(self) -> int:
+        return self._read_fd
+
+    def recv_ready(self) -> bool:
+        return bool(self._stdout)
+
+    def recv(self, size: int) -> bytes:
+        data, self._stdout = self._stdout[:size], self._stdout[size:]
+        return data
+
+    def recv_stderr_ready(self) -> bool:
+        return bool(self._stderr)
+
+    def recv_stderr(self, size: int) -> bytes:
+        data, self._stderr = self._stderr[:size], self._stderr[size:]
+        return data
+
+    def exit_status_ready(self) -> bool:
+        return self._exit_status is not None
+
+    def recv_exit_status(self) -> int:
+        return self._exit_status
+
+    def close(self) -> None:
+        self.closed = True
+        self._wake()
+
+    def __del__(self):
+        os.close(self._read_fd)
+        os.close(self._write_fd)
+
+
+class FakeTransport:
+    def __init__(self, fleet: "FakeFleet", alias: str):
+        self.fleet = fleet
+        self.alias = alias
+        self.active = True
+
+    def is_active(self) -> bool:
+        return self.active
+
+    def open_session(self, timeout: Optional[float] = None) -> FakeChannel:
+        return FakeChannel(self.fleet, self.alias)
+
+
+class FakeClient:
+    def __init__(self, fleet: "FakeFleet", alias: str):
+        self.transport = FakeTransport(fleet, alias)
+
+    def get_transport(self) -> FakeTransport:
+        return self.transport
+
+    def close(self) -> None:
+        self.transport.active = False
+
+
+class FakeFleet:
+    def __init__(self, latency: float = 0.01, connect_latency: float = 0.0,
+                 failing: Iterable[str] = (), hanging: Iterable[str] = ()):
+        self.latency = latency
+        self.connect_latency = connect_latency
+        self.failing = set(failing)
+        self.hanging = set(hanging)
+        self.connections = 0
+        self.commands = []
+
+    def connect(self, host, timeout: float, keepalive: int) -> FakeClient:
+        time.sleep(self.connect_latency)
+        self.connections += 1
+        return FakeClient(self, host.alias)
@@ -0,0 +1,535 @@
+"""In-process SSH servers for exercising real paramiko sessions.
+
+``SSHServer`` serves SFTP over a directory on 127.0.0.1 and accepts any
+user, password or key. Commands run through ``/bin/sh`` with the
+directory as working directory, so relative paths mean the same to
+commands and to SFTP, as they do in a home directory on a real host;
+with ``commands=False`` exec requests are refused, as for SFTP-only
+accounts. ``responses`` maps commands to canned output, which is
+answered without starting a process. ``SSHServer.connect`` stands in for
+the connection pool's connector, but any client reaching the port gets
+the same treatment, including the pool's own ``open_client`` and the
+prober.
+
+Every accepted connection can be put on a simulated link (``Link``):
+``latency`` delays every packet by that many seconds in each direction,
+so a round trip costs twice the latency; ``bandwidth`` caps each
+direction at that many bytes per second; ``cut_after`` drops the
+connection once that many bytes were sent to the client. One event loop
+thread relays all shaped connections, so hundreds of servers need no
+more threads than their sessions do. ``handshake_delay`` holds back the
+server's banner, ``drop_rate`` closes that fraction of connections
+before the banner (drawn from a generator seeded with ``seed``), and
+``reject_auth`` refuses every login.
+
+``SSHFleet`` starts many servers, each serving its own directory, and
+writes an ``ssh_hosts.json`` whose hosts point at them and log in with a
+generated key.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import socket
+import subprocess
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, List, Mapping, Optional, Set, Union
+
+import paramiko
+
+from src.core.host_manager import SSHHost
+
+_host_key: Optional[paramiko.RSAKey] = None
+_client_key: Optional[paramiko.ECDSAKey] = None
+_key_lock = threading.Lock()
+# Server transports log here; clients hanging up mid-handshake, as probes do, are expected
+_LOG_CHANNEL = "tests.ssh_server"
+logging.getLogger(_LOG_CHANNEL).addHandler(logging.NullHandler())
+# Bytes read at a time by the link relay; small enough to pace bandwidth smoothly
+_CHUNK = 16384
+
+
+def host_key() -> paramiko.RSAKey:
+    global _host_key
+    with _key_lock:
+        if _host_key is None:
+            _host_key = paramiko.RSAKey.generate(2048)
+    return _host_key
+
+
+def client_key() -> paramiko.ECDSAKey:
+    global _client_key
+    with _key_lock:
+        if _client_key is None:
+            # Not RSA, whose private key takes tens of milliseconds to load on every connect
+            _client_key = paramiko.ECDSAKey.generate()
+    return _client_key
+
+
+@dataclass
+class CannedCommand:
+    """Output a server sends for a command instead of running it."""
+    stdout: str = ""
+    stderr: str = ""
+    exit_status: int = 0
+    # Seconds before the output is sent
+    delay: float = 0.0
+
+
+class _AcceptAll(paramiko.ServerInterface):
+    def __init__(self, server: "SSHServer"):
+        self.server = server
+
+    def get_allowed_auths(self, username):
+        return "password,publickey"
+
+    def check_auth_password(self, username, password):
+        return paramiko.AUTH_FAILED if self.server.reject_auth else paramiko.AUTH_SUCCESSFUL
+
+    def check_auth_publickey(self, username, key):
+        return paramiko.AUTH_FAILED if self.server.reject_auth else paramiko.AUTH_SUCCESSFUL
+
+    def check_channel_request(self, kind, chanid):
+        if kind == "session":
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_exec_request(self, channel, command):
+        command = command.decode()
+        self.server.commands_run.append(command)
+        response = self.server.responses.get(command)
+        if response is not None:
+            if isinstance(response, str):
+                response = CannedCommand(stdout=response)
+            channel.transport.after_reply(threading.Thread(target=_reply, args=(channel, response),
+                                                           daemon=True).start)
+            return True
+        if not self.server.commands:
+            return False
+        process = subprocess.Popen(command, shell=True, cwd=self.server.root, stdin=subprocess.PIPE,
+                                   stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        channel.transport.after_reply(threading.Thread(target=_run_command, args=(channel, process),
+                                                       daemon=True).start)
+        return True
+
+
+class _Transport(paramiko.Transport):
+    """Server transport that can hold back work until a request was answered.
+
+    paramiko acknowledges a channel request only after the server
+    interface returns, so output sent by a thread started from
+    ``check_channel_exec_request`` can overtake the acknowledgement; a
+    channel closed before it fails on the client with "Channel closed.".
+    """
+
+    def __init__(self, sock):
+        super().__init__(sock)
+        self._after_reply: List[Callable[[], None]] = []
+
+    def after_reply(self, callback: Callable[[], None]) -> None:
+        """Call ``callback`` once the request being handled has been answered."""
+        self._after_reply.append(callback)
+
+    def _send_user_message(self, data):
+        super()._send_user_message(data)
+        # Requests are handled, and answered, on the transport's own thread
+        if threading.current_thread() is self:
+            while self._after_reply:
+                self._after_reply.pop(0)()
+
+
+def _reply(channel: paramiko.Channel, response: CannedCommand) -> None:
+    """Send canned output and exit status on a channel."""
+    time.sleep(response.delay)
+    try:
+        if response.stdout:
+            channel.sendall(response.stdout.encode())
+        if response.stderr:
+            channel.sendall_stderr(response.stderr.encode())
+        channel.send_exit_status(response.exit_status)
+    except OSError:
+        pass
+    channel.close()
+
+
+def _pump(source, send) -> bool:
+    try:
+        for data in iter(lambda: source.read1(65536), b""):
+            send(data)
+    except OSError:
+        return False
+    return True
+
+
+def _run_command(channel: paramiko.Channel, process: subprocess.Popen) -> None:
+    """Connect a command's pipes to a channel and report its exit status."""
+    def feed() -> None:
+        try:
+            for data in iter(lambda: channel.recv(65536), b""):
+                process.stdin.write(data)
+            process.stdin.close()
+        except (OSError, ValueError):
+            pass
+
+    threads = [threading.Thread(target=feed, daemon=True),
+               threading.Thread(target=_pump, args=(process.stderr, channel.sendall_stderr), daemon=True)]
+    for thread in threads:
+        thread.start()
+    if not _pump(process.stdout, channel.sendall):
+        # The client went away
+        process.kill()
+    threads[1].join()
+    channel.send_exit_status(process.wait())
+    channel.close()
+
+
+class RootedSFTPServer(paramiko.SFTPServerInterface):
+    """SFTP over a local directory, which the client sees as ``/``."""
+
+    def __init__(self, server, *args, root: str, posix_rename: bool = True, **kwargs):
+        super().__init__(server, *args, **kwargs)
+        self.root = root
+        self.posix_renames = posix_rename
+
+    def _path(self, path: str) -> str:
+        return os.path.join(self.root, os.path.normpath("/" + path).lstrip("/"))
+
+    @staticmethod
+    def _attributes(path: str, stat: os.stat_result) -> paramiko.SFTPAttributes:
+        attributes = paramiko.SFTPAttributes.from_stat(stat)
+        attributes.filename = os.path.basename(path)
+        return attributes
+
+    def list_folder(self, path):
+        path = self._path(path)
+        try:
+            return [self._attributes(entry.path, entry.stat(follow_symlinks=False))
+                    for entry in os.scandir(path)]
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+
+    def stat(self, path):
+        try:
+            return self._attributes(path, os.stat(self._path(path)))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+
+    def lstat(self, path):
+        try:
+            return self._attributes(path, os.lstat(self._path(path)))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+
+    def open(self, path, flags, attr):
+        path = self._path(path)
+        try:
+            fd = os.open(path, flags, getattr(attr, "st_mode", None) or 0o644)
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+        if flags & os.O_WRONLY:
+            mode = "ab" if flags & os.O_APPEND else "wb"
+        elif flags & os.O_RDWR:
+            mode = "a+b" if flags & os.O_APPEND else "r+b"
+        else:
+            mode = "rb"
+        handle = paramiko.SFTPHandle(flags)
+        handle.filename = path
+        handle.readfile = handle.writefile = os.fdopen(fd, mode)
+        return handle
+
+    def remove(self, path):
+        return self._call(os.remove, self._path(path))
+
+    def rename(self, oldpath, newpath):
+        if os.path.exists(self._path(newpath)):
+            return paramiko.SFTP_FAILURE
+        return self._call(os.rename, self._path(oldpath), self._path(newpath))
+
+    def posix_rename(self, oldpath, newpath):
+        if not self.posix_renames:
+            return paramiko.SFTP_OP_UNSUPPORTED
+        return self._call(os.replace, self._path(oldpath), self._path(newpath))
+
+    def mkdir(self, path, attr):
+        return self._call(os.mkdir, self._path(path))
+
+    def rmdir(self, path):
+        return self._call(os.rmdir, self._path(path))
+
+    def chattr(self, path, attr):
+        return self._call(paramiko.SFTPServer.set_file_attr, self._path(path), attr)
+
+    @staticmethod
+    def _call(function, *args) -> int:
+        try:
+            function(*args)
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+        return paramiko.SFTP_OK
+
+
+@dataclass
+class Link:
+    """How a simulated network link treats the bytes crossing it."""
+    # Seconds every packet is held back, in each direction
+    latency: float = 0.0
+    # Bytes per second in each direction, or None for no cap
+    bandwidth: Optional[float] = None
+    # Bytes sent to the client before the link drops, or None to never drop
+    cut_after: Optional[int] = None
+
+    @property
+    def shaped(self) -> bool:
+        return bool(self.latency or self.bandwidth or self.cut_after is not None)
+
+
+class _LinkCut(Exception):
+    pass
+
+
+class _Shaper:
+    """Event loop thread relaying the connections of every shaped link."""
+
+    _instance: Optional["_Shaper"] = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def get(cls) -> "_Shaper":
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = cls()
+            return cls._instance
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        # The loop only holds weak references to tasks, and nothing else
+        # holds the streams a relay waits on
+        self._relays: Set[asyncio.Task] = set()
+        threading.Thread(target=self.loop.run_forever, name="link-shaper", daemon=True).start()
+
+    def relay(self, outer: socket.socket, inner: socket.socket, link: Link) -> None:
+        """Relay between a client's socket and the server's end, shaped by ``link``."""
+        self.loop.call_soon_threadsafe(self._start, outer, inner, link)
+
+    def _start(self, outer: socket.socket, inner: socket.socket, link: Link) -> None:
+        task = self.loop.create_task(self._relay(outer, inner, link))
+        self._relays.add(task)
+        task.add_done_callback(self._relays.discard)
+
+    async def _relay(self, outer: socket.socket, inner: socket.socket, link: Link) -> None:
+        outer_reader, outer_writer = await asyncio.open_connection(sock=outer)
+        inner_reader, inner_writer = await asyncio.open_connection(sock=inner)
+        pipes = [
+            asyncio.ensure_future(self._pipe(outer_reader, inner_writer, link, None)),
+            asyncio.ensure_future(self._pipe(inner_reader, outer_writer, link, link.cut_after)),
+        ]
+        done, pending = await asyncio.wait(pipes, return_when=asyncio.FIRST_EXCEPTION)
+        failed = any(pipe.exception() is not None for pipe in done)
+        for pipe in pending:
+            # A cut link or a broken socket takes the other direction down with it
+            pipe.cancel()
+        for writer in (outer_writer, inner_writer):
+            if failed:
+                writer.transport.abort()
+            else:
+                writer.close()
+
+    async def _pipe(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                    link: Link, limit: Optional[int]) -> None:
+        """Copy one direction, delivering each read after the latency at the capped rate."""
+        loop = asyncio.get_running_loop()
+        pending: "asyncio.Queue" = asyncio.Queue()
+
+        async def deliver() -> None:
+            free_at = 0.0
+            sent = 0
+            while True:
+                due, data = await pending.get()
+                if not data:
+                    if writer.can_write_eof():
+                        writer.write_eof()
+                    return
+                if limit is not None:
+                    data = data[:limit - sent]
+                if link.bandwidth:
+                    due = free_at = max(due, free_at) + len(data) / link.bandwidth
+                delay = due - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                writer.write(data)
+                await writer.drain()
+                sent += len(data)
+                if limit is not None and sent >= limit:
+                    raise _LinkCut()
+
+        delivery = asyncio.ensure_future(deliver())
+        try:
+            while not delivery.done():
+                read = asyncio.ensure_future(reader.read(_CHUNK))
+                await asyncio.wait([read, delivery], return_when=asyncio.FIRST_COMPLETED)
+                if not read.done():
+                    read.cancel()
+                    break
+                try:
+                    data = read.result()
+                except OSError:
+                    data = b""
+                pending.put_nowait((loop.time() + link.latency, data))
+                if not data:
+                    break
+            await delivery
+        finally:
+            delivery.cancel()
+
+
+class SSHServer:
+    def __init__(self, root: str, latency: float = 0.0, commands: bool = True,
+                 bandwidth: Optional[float] = None, handshake_delay: float = 0.0,
+                 responses: Optional[Mapping[str, Union[str, CannedCommand]]] = None,
+                 reject_auth: bool = False, drop_rate: float = 0.0, cut_after: Optional[int] = None,
+                 seed: int = 0, posix_rename: bool = True):
+        self.root = root
+        self.commands = commands
+        # Whether the SFTP server supports the posix-rename extension
+        self.posix_rename = posix_rename
+        self.link = Link(latency=latency, bandwidth=bandwidth, cut_after=cut_after)
+        self.handshake_delay = handshake_delay
+        self.responses: Dict[str, Union[str, CannedCommand]] = dict(responses or {})
+        self.reject_auth = reject_auth
+        self.drop_rate = drop_rate
+        self._random = random.Random(seed)
+        # Calls to ``connect``, and connections accepted from any client
+        self.connections = 0
+        self.accepted = 0
+        # Commands received, in order
+        self.commands_run: List[str] = []
+        # Generated before any connection arrives rather than by the first handshakes
+        host_key()
+        self._listener = socket.create_server(("127.0.0.1", 0))
+        self.port = self._listener.getsockname()[1]
+        self._transports: List[paramiko.Transport] = []
+        self._closed = False
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    @property
+    def latency(self) -> float:
+        return self.link.latency
+
+    def _accept(self) -> None:
+        while not self._closed:
+            try:
+                sock, _ = self._listener.accept()
+            except OSError:
+                return
+            self.accepted += 1
+            if self.drop_rate and self._random.random() < self.drop_rate:
+                sock.close()
+                continue
+            threading.Thread(target=self._serve, args=(sock,), daemon=True).start()
+
+    def _serve(self, sock: socket.socket) -> None:
+        """Run the SSH server side of an accepted connection."""
+        if self.handshake_delay:
+            time.sleep(self.handshake_delay)
+        if self.link.shaped:
+            outer = sock
+            sock, inner = socket.socketpair()
+            _Shaper.get().relay(outer, inner, self.link)
+        transport = _Transport(sock)
+        transport.set_log_channel(_LOG_CHANNEL)
+        transport.add_server_key(host_key())
+        transport.set_subsystem_handler("sftp", paramiko.SFTPServer, RootedSFTPServer, root=self.root,
+                                      posix_rename=self.posix_rename)
+        self._transports.append(transport)
+        if self._closed:
+            transport.close()
+            return
+        try:
+            transport.start_server(server=_AcceptAll(self))
+        except (paramiko.SSHException, EOFError, OSError):
+            transport.close()
+
+    def connect(self, host, timeout: float = 10.0, keepalive: int = 0) -> paramiko.SSHClient:
+        """Open a paramiko client to the server; usable as a pool connector."""
+        self.connections += 1
+        client = paramiko.SSHClient()
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        client.connect("127.0.0.1", port=self.port, username=getattr(host, "user", "test"),
+                       password="test", timeout=timeout, banner_timeout=timeout,
+                       look_for_keys=False, allow_agent=False)
+        return client
+
+    def close(self) -> None:
+        self._closed = True
+        try:
+            # Wakes the accept thread, whose blocked accept() keeps the port open otherwise
+            self._listener.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._listener.close()
+        for transport in list(self._transports):
+            transport.close()
+
+    def __enter__(self) -> "SSHServer":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+
+class SSHFleet:
+    """Many SSHServers on localhost and the inventory that points at them.
+
+    Each host gets a server of its own serving ``root/<alias>``; the
+    keyword ``options`` apply to every server, and ``per_host(index)`` may
+    return options overriding them for one host, e.g. to make a few hosts
+    slow or failing. Hosts log in as ``user`` with a generated key written
+    to ``root/client_key``, so the application's own connection code
+    reaches them without a custom connector.
+    """
+
+    def __init__(self, count: int, root: str, prefix: str = "sim", groups: int = 10, user: str = "sim",
+                 per_host: Optional[Callable[[int], Dict[str, Any]]] = None, **options: Any):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self.key_path = os.path.join(root, "client_key")
+        client_key().write_private_key_file(self.key_path)
+        self.servers: Dict[str, SSHServer] = {}
+        self.hosts: List[SSHHost] = []
+        try:
+            for i in range(count):
+                alias = f"{prefix}{i}"
+                home = os.path.join(root, alias)
+                os.makedirs(home, exist_ok=True)
+                server = SSHServer(home, **dict(options, **(per_host(i) if per_host else {})))
+                self.servers[alias] = server
+                self.hosts.append(SSHHost(host="127.0.0.1", user=user, port=server.port, alias=alias,
+                                          group=f"{prefix}-{i % groups}", key_path=self.key_path))
+        except BaseException:
+            self.close()
+            raise
+
+    def server(self, alias: str) -> SSHServer:
+        return self.servers[alias]
+
+    def write_inventory(self, config_dir: str) -> str:
+        """Write an ssh_hosts.json of the fleet's hosts; returns its path."""
+        os.makedirs(config_dir, exist_ok=True)
+        path = os.path.join(config_dir, "ssh_hosts.json")
+        with open(path, "w") as f:
+            json.dump({host.alias: asdict(host) for host in self.hosts}, f, indent=2)
+        return path
+
+    def close(self) -> None:
+        for server in self.servers.values():
+            server.close()
+
+    def __enter__(self) -> "SSHFleet":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
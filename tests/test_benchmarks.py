@@ -0,0 +1,164 @@
+"""Performance benchmarks, run with ``pytest --benchmark``.
+
+Each benchmark runs at 1k, 10k and 100k synthetic hosts and is checked
+against the timings in ``benchmarks/baseline.json``; see ``conftest.py``
+for the options. Without ``--benchmark`` only the baseline comparison
+itself is tested.
+"""
+
+import asyncio
+import itertools
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import pytest
+
+from src.core.host_manager import HostManager, SSHHost
+from src.core.storage import JournalStorage, atomic_write
+from src.utils.helpers import validate_hostname, validate_port, validate_username
+from tests.conftest import BenchmarkResults
+
+SIZES = [1000, 10000, 100000]
+GROUPS = 200
+
+
+def synthetic_inventory(count):
+    return {
+        f"node{i}": {
+            "host": f"node{i}.dc{i % 8}.example.com",
+            "user": ("deploy", "root", "admin", "ubuntu")[i % 4],
+            "port": 22 if i % 10 else 2222,
+            "alias": f"node{i}",
+            "description": "web frontend" if i % 5 == 0 else None,
+            "group": f"rack-{i % GROUPS}",
+            "key_path": None,
+        }
+        for i in range(count)
+    }
+
+
+@pytest.fixture(scope="module", params=SIZES, ids=lambda size: f"{size}hosts")
+def inventory(request):
+    """A config dir holding a pretty-printed inventory; its files are not to be modified."""
+    config_dir = tempfile.mkdtemp()
+    atomic_write(os.path.join(config_dir, "ssh_hosts.json"),
+                 json.dumps(synthetic_inventory(request.param), indent=2))
+    with open(os.path.join(config_dir, "settings.json"), "w") as f:
+        json.dump({"probe": False, "multiplex": False}, f)
+    yield config_dir
+    shutil.rmtree(config_dir)
+
+
+@pytest.fixture
+def manager(inventory, tmp_path):
+    """A manager over a private copy of the inventory, journaling without fsync."""
+    shutil.copy(os.path.join(inventory, "ssh_hosts.json"), tmp_path)
+    storage = JournalStorage(str(tmp_path / "ssh_hosts.json"), background=False, fsync=False)
+    manager = HostManager(config_dir=str(tmp_path), storage=storage)
+    yield manager
+    manager.close()
+
+
+@pytest.mark.benchmark
+class TestHostManagerBenchmarks:
+    def test_load_hosts(self, inventory, benchmark):
+        """Load the inventory from its binary snapshot."""
+        manager = HostManager(config_dir=inventory)
+        benchmark(manager.load_hosts, rounds=3)
+
+    def test_load_hosts_json(self, inventory, benchmark, tmp_path):
+        """Load the inventory by parsing the JSON file."""
+        shutil.copy(os.path.join(inventory, "ssh_hosts.json"), tmp_path)
+        with open(tmp_path / "settings.json", "w") as f:
+            json.dump({"snapshot_cache": False}, f)
+        manager = HostManager(config_dir=str(tmp_path))
+        benchmark(manager.load_hosts, rounds=3)
+
+    def test_add_host(self, manager, benchmark):
+        hosts = (SSHHost(host=f"new{i}.example.com", user="deploy", alias=f"new{i}", group="new")
+                 for i in itertools.count())
+        benchmark(lambda: manager.add_host(next(hosts)), number=200)
+
+    def test_update_host(self, manager, benchmark):
+        aliases = itertools.cycle(list(manager.hosts)[:200])
+
+        def update():
+            alias = next(aliases)
+            manager.update_host(alias, SSHHost(host=f"{alias}.moved.example.com", user="root",
+                                               alias=alias, group="moved"))
+        benchmark(update, number=200)
+
+    def test_delete_host(self, manager, benchmark):
+        added = []
+
+        def add():
+            for _ in range(200):
+                alias = f"doomed{len(added)}"
+                manager.add_host(SSHHost(host=f"{alias}.example.com", user="deploy", alias=alias))
+                added.append(alias)
+        doomed = iter(added)
+        benchmark(lambda: manager.delete_host(next(doomed)), number=200, setup=add)
+
+    def test_get_hosts_by_group(self, manager, benchmark):
+        groups = itertools.cycle([f"rack-{i}" for i in range(GROUPS)])
+        benchmark(lambda: manager.get_hosts_by_group(next(groups)), number=1000)
+
+    def test_get_groups(self, manager, benchmark):
+        benchmark(manager.get_groups, number=1000)
+
+
+@pytest.mark.benchmark
+class TestValidatorBenchmarks:
+    def test_validate_inventory(self, inventory, benchmark):
+        """Validate the hostname, port and user of every host, as an import does."""
+        with open(os.path.join(inventory, "ssh_hosts.json")) as f:
+            hosts = list(json.load(f).values())
+
+        def validate():
+            for host in hosts:
+                validate_hostname(host["host"])
+                validate_port(str(host["port"]))
+                validate_username(host["user"])
+        benchmark(validate, rounds=3)
+
+
+@pytest.mark.benchmark
+class TestTableBenchmarks:
+    def test_refresh_host_table(self, inventory, benchmark):
+        """Refill the host table with every host and repaint, under a headless pilot."""
+        from src.tui.interface import SSHManagerApp
+
+        async def run():
+            app = SSHManagerApp(config_dir=inventory)
+            async with app.run_test(size=(120, 40)) as pilot:
+                while not (app.host_manager.loaded and app.host_table.keys()):
+                    await pilot.pause(0.01)
+                times = []
+                deadline = time.perf_counter() + benchmark.min_time
+                while len(times) < 5 or time.perf_counter() < deadline:
+                    started = time.perf_counter()
+                    app.refresh_host_table()
+                    await pilot.pause()
+                    times.append(time.perf_counter() - started)
+                return min(times)
+
+        benchmark.record(asyncio.run(run()))
+
+
+class TestBenchmarkResults:
+    def test_regression_threshold(self, tmp_path):
+        """Test that timings past the threshold fail and saved timings become the baseline."""
+        path = str(tmp_path / "baseline.json")
+        results = BenchmarkResults(path, threshold=0.25)
+        assert results.add("load", 1.0) is None
+        results.save()
+
+        rerun = BenchmarkResults(path, threshold=0.25)
+        assert rerun.baseline == {"load": 1.0}
+        assert rerun.add("load", 1.2) is None
+        assert "+50%" in rerun.add("load", 1.5)
+        assert rerun.add("new", 9.0) is None
+        assert [line.split()[-2:] for line in rerun.report()] == [["+50%", "load"], ["new", "new"]]
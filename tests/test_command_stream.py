@@ -0,0 +1,119 @@
+import os
+
+import pytest
+
+from src.core.command_stream import STDERR, STDOUT, CommandStream
+from src.core.connection_pool import ConnectionPool
+from src.core.host_manager import SSHHost
+from src.core.ssh_client import SSHClient
+from tests.fake_fleet import FakeFleet
+
+
+class ScriptedChannel:
+    """A channel replaying a fixed sequence of stdout and stderr reads."""
+
+    def __init__(self, reads, exit_status=0, finished=True):
+        self.reads = list(reads)
+        self.exit_status = exit_status
+        self.finished = finished
+        self.closed = False
+        self.recv_calls = 0
+        self._read_fd, self._write_fd = os.pipe()
+
+    def fileno(self):
+        return self._read_fd
+
+    def recv_ready(self):
+        return bool(self.reads) and self.reads[0][0] == STDOUT
+
+    def recv_stderr_ready(self):
+        return bool(self.reads) and self.reads[0][0] == STDERR
+
+    def recv(self, size):
+        self.recv_calls += 1
+        return self.reads.pop(0)[1]
+
+    recv_stderr = recv
+
+    def exit_status_ready(self):
+        return self.finished and not self.reads
+
+    def recv_exit_status(self):
+        return self.exit_status
+
+    def __del__(self):
+        os.close(self._read_fd)
+        os.close(self._write_fd)
+
+
+class LateChannel(ScriptedChannel):
+    """A channel whose last chunk arrives just as the exit status is reported."""
+
+    def __init__(self, reads, last, **kwargs):
+        super().__init__(reads, **kwargs)
+        self.last = last
+
+    def exit_status_ready(self):
+        if self.reads:
+            return False
+        if self.last is not None:
+            self.reads.append(self.last)
+            self.last = None
+        return self.finished
+
+
+class TestCommandStream:
+    def test_interleaves_streams_and_reports_exit_code(self):
+        """Test that chunks keep their stream and order and the exit code comes last."""
+        channel = ScriptedChannel(
+            [(STDOUT, b"one\n"), (STDERR, b"warn\n"), (STDOUT, b"two\n")], exit_status=3
+        )
+        stream = CommandStream(channel)
+        assert stream.exit_code is None
+        chunks = list(stream)
+        assert [(chunk.stream, chunk.text) for chunk in chunks] == [
+            (STDOUT, "one\n"), (STDERR, "warn\n"), (STDOUT, "two\n")
+        ]
+        assert stream.exit_code == 3
+
+    def test_decodes_characters_split_between_reads(self):
+        """Test that a multi-byte character split across reads decodes whole."""
+        data = "héllo wörld".encode()
+        channel = ScriptedChannel([(STDOUT, data[:2]), (STDOUT, data[2:8]), (STDOUT, data[8:])])
+        assert "".join(chunk.text for chunk in CommandStream(channel)) == "héllo wörld"
+
+        channel = ScriptedChannel([(STDOUT, data[:2])])
+        assert "".join(chunk.text for chunk in CommandStream(channel)) == "h�"
+
+    def test_reads_only_as_output_is_consumed(self):
+        """Test that output stays in the channel until the caller asks for it."""
+        channel = ScriptedChannel([(STDOUT, b"x" * 10)] * 100)
+        chunks = iter(CommandStream(channel))
+        next(chunks)
+        assert channel.recv_calls == 1
+        assert len(channel.reads) == 99
+
+    def test_reads_output_arriving_with_exit_status(self):
+        """Test that output buffered by the time the exit status is seen is still read."""
+        channel = LateChannel([(STDOUT, b"one\n")], (STDERR, b"last\n"), exit_status=2)
+        stream = CommandStream(channel)
+        assert [(chunk.stream, chunk.text) for chunk in stream] == [(STDOUT, "one\n"), (STDERR, "last\n")]
+        assert stream.exit_code == 2
+
+    def test_times_out(self):
+        """Test that a command producing nothing times out."""
+        channel = ScriptedChannel([], finished=False)
+        with pytest.raises(TimeoutError):
+            list(CommandStream(channel, timeout=0.05))
+
+
+class TestExecuteCommand:
+    def test_collects_output_and_exit_code(self):
+        """Test that execute_command returns the streamed output of a command."""
+        fleet = FakeFleet(failing=["bad"])
+        with SSHClient(ConnectionPool(connector=fleet.connect)) as client:
+            client.connect(SSHHost(host="good.example.com", user="u", alias="good"))
+            assert client.execute_command("uptime") == (0, "good\n", "")
+            client.connect(SSHHost(host="bad.example.com", user="u", alias="bad"))
+            assert client.execute_command("uptime") == (1, "", "bad failed\n")
+        assert fleet.commands == [("good", "uptime"), ("bad", "uptime")]
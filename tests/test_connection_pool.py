@@ -0,0 +1,125 @@
+import threading
+import time
+import pytest
+from src.core.connection_pool import ConnectionPool
+from src.core.host_manager import SSHHost
+
+class FakeTransport:
+    def __init__(self):
+        self.active = True
+
+    def is_active(self):
+        return self.active
+
+class FakeClient:
+    def __init__(self, host):
+        self.host = host
+        self.transport = FakeTransport()
+        self.closed = False
+
+    def get_transport(self):
+        return self.transport
+
+    def close(self):
+        self.closed = True
+        self.transport.active = False
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class TestConnectionPool:
+    @pytest.fixture
+    def clock(self):
+        return FakeClock()
+
+    @pytest.fixture
+    def opened(self):
+        """Clients opened by the pool, in order."""
+        return []
+
+    @pytest.fixture
+    def make_pool(self, clock, opened):
+        def connector(host, timeout, keepalive):
+            time.sleep(0.01)  # Let concurrent callers pile up behind a handshake
+            client = FakeClient(host)
+            opened.append(client)
+            return client
+
+        def make_pool(**kwargs):
+            return ConnectionPool(connector=connector, clock=clock, **kwargs)
+        return make_pool
+
+    def host(self, name, user="u"):
+        return SSHHost(host=name, user=user, alias=name)
+
+    def test_reuses_sessions_per_key(self, make_pool, opened):
+        """Test that one session is opened per host, port, user and key."""
+        pool = make_pool()
+        for _ in range(3):
+            with pool.connection(self.host("a")) as client:
+                assert client is opened[0]
+        with pool.connection(self.host("a", user="root")):
+            pass
+        assert len(opened) == 2
+        assert len(pool) == 2
+
+    def test_evicts_idle_and_dead_sessions(self, make_pool, opened, clock):
+        """Test that idle sessions expire and dead ones are replaced."""
+        pool = make_pool(idle_timeout=60)
+        with pool.connection(self.host("a")):
+            pass
+        with pool.connection(self.host("b")):
+            pass
+        clock.now = 61
+        pool.prune()
+        assert len(pool) == 0
+        assert all(client.closed for client in opened)
+
+        with pool.connection(self.host("a")):
+            pass
+        opened[-1].transport.active = False
+        with pool.connection(self.host("a")) as client:
+            assert client is opened[-1]
+        assert len(opened) == 4
+
+    def test_caps_open_sessions(self, make_pool, opened):
+        """Test that the least recently used idle session makes room, or callers wait."""
+        pool = make_pool(max_connections=2)
+        with pool.connection(self.host("a")):
+            pass
+        with pool.connection(self.host("b")):
+            pass
+        with pool.connection(self.host("a")):
+            pass
+        with pool.connection(self.host("c")):
+            pass
+        assert opened[1].closed and not opened[0].closed
+
+        with pool.connection(self.host("a")), pool.connection(self.host("c")):
+            with pytest.raises(TimeoutError):
+                with pool.connection(self.host("d"), timeout=0):
+                    pass
+        with pool.connection(self.host("d"), timeout=1):
+            pass
+        assert len(pool) == 2
+
+    def test_one_handshake_for_concurrent_callers(self, make_pool, opened):
+        """Test that callers racing for a new host share one handshake."""
+        pool = make_pool()
+        clients = []
+
+        def borrow():
+            with pool.connection(self.host("a")) as client:
+                clients.append(client)
+
+        threads = [threading.Thread(target=borrow) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(opened) == 1
+        assert all(client is opened[0] for client in clients)
@@ -0,0 +1,120 @@
+import hashlib
+import os
+import tempfile
+import threading
+from contextlib import ExitStack
+
+import pytest
+
+from src.core.connection_pool import ConnectionPool
+from src.core.distribution import MISMATCH, ArtifactDistributor, TokenBucket
+from src.core.fanout import ERROR, OK
+from src.core.host_manager import SSHHost
+
+from tests.ssh_server import SSHServer
+
+
+@pytest.fixture
+def fleet():
+    """Three hosts with their own roots; the last cannot run commands."""
+    with ExitStack() as stack:
+        local_dir = stack.enter_context(tempfile.TemporaryDirectory())
+        servers = {}
+        for i in range(3):
+            root = stack.enter_context(tempfile.TemporaryDirectory())
+            servers[f"web{i}"] = stack.enter_context(SSHServer(root, commands=i != 2))
+        pool = ConnectionPool(
+            connector=lambda host, timeout, keepalive: servers[host.host].connect(host, timeout, keepalive)
+        )
+        hosts = [SSHHost(host=name, user="deploy", alias=name) for name in servers]
+        source = os.path.join(local_dir, "app.tar.gz")
+        with open(source, "wb") as f:
+            f.write(os.urandom(300_000))
+        os.utime(source, (1_600_000_000, 1_600_000_000))
+        yield pool, servers, hosts, source
+        pool.close()
+
+
+class TestArtifactDistributor:
+    def test_delivers_to_every_host(self, fleet):
+        """Test that every host gets a verified copy with the local mtime and no part file."""
+        pool, servers, hosts, source = fleet
+        with open(source, "rb") as f:
+            expected = hashlib.sha256(f.read()).hexdigest()
+        seen = []
+        report = ArtifactDistributor(pool, chunk_size=32768).distribute(
+            hosts, source, "app.tar.gz", on_delivery=lambda delivery: seen.append(delivery.alias))
+        assert report.checksum == expected and report.size == 300_000
+        assert sorted(seen) == ["web0", "web1", "web2"]
+        assert not report.failed
+        for delivery in report.deliveries:
+            assert delivery.checksum == expected and delivery.sent == 300_000
+        for server in servers.values():
+            assert os.listdir(server.root) == ["app.tar.gz"]
+            path = os.path.join(server.root, "app.tar.gz")
+            assert os.stat(path).st_mtime == 1_600_000_000
+            with open(path, "rb") as f:
+                assert hashlib.sha256(f.read()).hexdigest() == expected
+
+    def test_reports_failures(self, fleet):
+        """Test that a bad copy is removed and a missing directory is an error."""
+        pool, servers, hosts, source = fleet
+        with open(os.path.join(servers["web0"].root, "app.tar.gz"), "w") as f:
+            f.write("previous release")
+        distributor = ArtifactDistributor(pool)
+        distributor.transfer.checksum = lambda host, path: "0" * 64
+        report = distributor.distribute(hosts[:1], source, "app.tar.gz")
+        assert report.deliveries[0].status == MISMATCH
+        with open(os.path.join(servers["web0"].root, "app.tar.gz")) as f:
+            assert f.read() == "previous release"
+        assert os.listdir(servers["web0"].root) == ["app.tar.gz"]
+
+        report = ArtifactDistributor(pool).distribute(hosts[1:], source, "missing/app.tar.gz")
+        assert [delivery.status for delivery in report.deliveries] == [ERROR, ERROR]
+        assert all(delivery.error for delivery in report.deliveries)
+
+    def test_one_delivery_per_server(self, fleet):
+        """Test that aliases of the same server are delivered to one at a time."""
+        pool, servers, hosts, source = fleet
+        aliases = [SSHHost(host="web0", user="deploy", alias=f"web0-{i}") for i in range(3)]
+        distributor = ArtifactDistributor(pool, per_host=1)
+        send = distributor._send
+        active, peak, lock = [0], [0], threading.Lock()
+
+        def counting_send(*args):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            try:
+                send(*args)
+            finally:
+                with lock:
+                    active[0] -= 1
+
+        distributor._send = counting_send
+        report = distributor.distribute(aliases, source, "app.tar.gz")
+        assert [delivery.status for delivery in report.deliveries] == [OK] * 3
+        assert peak[0] == 1
+
+
+class TestTokenBucket:
+    def test_limits_rate(self):
+        """Test that callers sleep off whatever they take beyond the rate."""
+        now, slept = [0.0], []
+
+        def sleep(seconds):
+            slept.append(seconds)
+            now[0] += seconds
+
+        bucket = TokenBucket(1000, burst=100, clock=lambda: now[0], sleep=sleep)
+        bucket.consume(100)
+        assert slept == []
+        bucket.consume(500)
+        assert slept == [pytest.approx(0.5)]
+        now[0] += 10
+        bucket.consume(50)
+        assert len(slept) == 1
+
+    def test_rejects_zero_rate(self):
+        with pytest.raises(ValueError):
+            TokenBucket(0)
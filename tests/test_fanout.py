@@ -0,0 +1,47 @@
+import threading
+import time
+from src.core.connection_pool import ConnectionPool
+from src.core.fanout import CANCELLED, FAILED, OK, TIMEOUT, FanOutExecutor
+from src.core.host_manager import SSHHost
+from tests.fake_fleet import FakeFleet
+
+def hosts(count):
+    return [SSHHost(host=f"h{i}.example.com", user="u", alias=f"h{i}") for i in range(count)]
+
+class TestFanOutExecutor:
+    def make_executor(self, fleet, **kwargs):
+        return FanOutExecutor(ConnectionPool(connector=fleet.connect), **kwargs)
+
+    def test_runs_on_every_host(self):
+        """Test that every host reports its result, with bounded threads."""
+        fleet = FakeFleet(failing=["h3"])
+        executor = self.make_executor(fleet, max_workers=8)
+        threads_before = threading.active_count()
+        results = {result.alias: result for result in executor.run(hosts(50), "hostname")}
+
+        assert len(results) == 50
+        assert results["h1"].status == OK and results["h1"].stdout == "h1\n"
+        assert results["h3"].status == FAILED and results["h3"].exit_code == 1
+        assert results["h3"].stderr == "h3 failed\n"
+        # 8 workers plus at most one timer thread per running command
+        assert threading.active_count() - threads_before <= 16
+
+    def test_per_host_timeout(self):
+        """Test that a hanging host times out without holding up the others."""
+        fleet = FakeFleet(hanging=["h0"])
+        executor = self.make_executor(fleet, timeout=0.2)
+        results = {result.alias: result for result in executor.run(hosts(4), "uptime")}
+        assert results["h0"].status == TIMEOUT
+        assert all(results[f"h{i}"].status == OK for i in range(1, 4))
+
+    def test_cancel(self):
+        """Test that cancelling stops running and queued hosts."""
+        fleet = FakeFleet(hanging=["h0", "h1"])
+        executor = self.make_executor(fleet, max_workers=2)
+        threading.Timer(0.1, executor.cancel).start()
+        started = time.monotonic()
+        results = list(executor.run(hosts(10), "sleep 100"))
+        assert time.monotonic() - started < 2
+        assert len(results) == 10
+        assert all(result.status == CANCELLED for result in results)
+        assert len(fleet.commands) == 2
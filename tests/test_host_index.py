@@ -0,0 +1,71 @@
+import pytest
+import tempfile
+from src.core.host_manager import HostManager, SSHHost
+from src.core.host_index import HostIndex
+
+class TestHostIndex:
+    @pytest.fixture
+    def temp_config_dir(self):
+        """Create a temporary config directory for testing."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            yield temp_dir
+
+    @pytest.fixture
+    def host_manager(self, temp_config_dir):
+        """Create a host manager with a few hosts."""
+        manager = HostManager(config_dir=temp_config_dir)
+        manager.add_host(SSHHost(host="web1.com", user="deploy", alias="web1", group="web"))
+        manager.add_host(SSHHost(host="web2.com", user="deploy", alias="web2", group="web"))
+        manager.add_host(SSHHost(host="db.com", user="postgres", alias="db", group="db"))
+        return manager
+
+    def assert_consistent(self, manager):
+        """Check the incremental index against one rebuilt from scratch."""
+        rebuilt = HostIndex.build(manager.hosts)
+        for field in rebuilt.fields:
+            assert set(manager.index.distinct(field)) == set(rebuilt.distinct(field))
+            for value in rebuilt.distinct(field):
+                assert set(manager.index.aliases(field, value)) == set(rebuilt.aliases(field, value))
+
+    def test_add(self, host_manager):
+        """Test that added hosts are indexed."""
+        self.assert_consistent(host_manager)
+        assert [h.alias for h in host_manager.get_hosts_by_group("web")] == ["web1", "web2"]
+        assert [h.alias for h in host_manager.get_hosts_by_user("postgres")] == ["db"]
+        assert [h.alias for h in host_manager.get_hosts_by_hostname("web2.com")] == ["web2"]
+        assert host_manager.get_aliases_by_hostname("web2.com") == ["web2"]
+
+    def test_add_existing_alias(self, host_manager):
+        """Test that re-adding an alias replaces its old index entries."""
+        host_manager.add_host(SSHHost(host="db2.com", user="postgres", alias="db", group="db2"))
+        self.assert_consistent(host_manager)
+        assert "db" not in host_manager.get_groups()
+        assert host_manager.get_hosts_by_hostname("db.com") == []
+
+    def test_update(self, host_manager):
+        """Test that updates move hosts between index entries."""
+        host_manager.update_host(
+            "web2", SSHHost(host="web2.com", user="admin", alias="web2", group="db")
+        )
+        self.assert_consistent(host_manager)
+        assert {h.alias for h in host_manager.get_hosts_by_group("db")} == {"db", "web2"}
+        assert [h.alias for h in host_manager.get_hosts_by_user("admin")] == ["web2"]
+
+    def test_delete(self, host_manager):
+        """Test that deleting the last host of a group drops the group."""
+        host_manager.delete_host("db")
+        self.assert_consistent(host_manager)
+        assert host_manager.get_groups() == ["web"]
+        assert host_manager.get_hosts_by_user("postgres") == []
+
+    def test_load(self, host_manager, temp_config_dir):
+        """Test that a reload rebuilds the indexes."""
+        host_manager.close()
+        reloaded = HostManager(config_dir=temp_config_dir)
+        self.assert_consistent(reloaded)
+        assert reloaded.get_groups() == ["web", "db"]
+
+    def test_unindexed_field(self, host_manager):
+        """Test that looking up a field without an index fails loudly."""
+        with pytest.raises(ValueError):
+            host_manager.index.aliases("port", 22)
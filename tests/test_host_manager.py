@@ -154,4 +154,92 @@ class TestHostManager:
             assert host.group == "group1"
         
         for host in group2_hosts:
-            assert host.group == "group2" 
\ No newline at end of file
+            assert host.group == "group2" 
+
+    def test_batch_persists_once(self, host_manager):
+        """Test that a batch writes all of its mutations at once."""
+        commits = []
+        commit = host_manager._storage.commit
+        host_manager._storage.commit = lambda hosts, changed, previous=None: (
+            commits.append(list(changed)), commit(hosts, changed, previous)
+        )
+
+        with host_manager.batch():
+            for i in range(5):
+                host_manager.add_host(SSHHost(host=f"h{i}.com", user="u", alias=f"h{i}"))
+            host_manager.delete_host("h0")
+
+        assert commits == [["h0", "h1", "h2", "h3", "h4"]]
+        host_manager.load_hosts()
+        assert sorted(host_manager.hosts) == ["h1", "h2", "h3", "h4"]
+
+    def test_batch_rollback(self, host_manager):
+        """Test that a failing batch leaves hosts and indexes untouched."""
+        host_manager.add_host(SSHHost(host="a.com", user="u", alias="a", group="g1"))
+
+        with pytest.raises(ValueError):
+            with host_manager.batch():
+                host_manager.update_host("a", SSHHost(host="a.com", user="u", alias="a", group="g2"))
+                host_manager.add_host(SSHHost(host="b.com", user="u", alias="b"))
+                host_manager.update_host("b", SSHHost(host="b.com", user="u", alias="c"))
+
+        assert list(host_manager.hosts) == ["a"]
+        assert host_manager.get_groups() == ["g1"]
+        host_manager.load_hosts()
+        assert list(host_manager.hosts) == ["a"]
+        assert host_manager.hosts["a"].group == "g1"
+
+    def test_batch_keeps_hosts_add_host_accepts(self, host_manager):
+        """Test that a batch does not reject hosts the form would, such as IPv6 addresses."""
+        with host_manager.batch():
+            host_manager.add_host(SSHHost(host="2001:db8::1", user="u", alias="v6"))
+            host_manager.add_host(SSHHost(host="db_1.internal", user="u", alias="db"))
+        host_manager.update_host("v6", SSHHost(host="fe80::1%eth0", user="u", alias="v6"))
+
+        host_manager.load_hosts()
+        assert host_manager.hosts["v6"].host == "fe80::1%eth0"
+        assert host_manager.hosts["db"].host == "db_1.internal"
+
+    def test_rename_host(self, host_manager):
+        """Test renaming a host together with an update."""
+        host_manager.add_host(SSHHost(host="a.com", user="u", alias="a", group="g1"))
+        host_manager.add_host(SSHHost(host="b.com", user="u", alias="b"))
+
+        with host_manager.batch():
+            host_manager.rename_host("a", "renamed")
+            host_manager.update_host(
+                "renamed", SSHHost(host="new.com", user="u", alias="renamed", group="g1")
+            )
+
+        host_manager.load_hosts()
+        assert sorted(host_manager.hosts) == ["b", "renamed"]
+        assert host_manager.hosts["renamed"].host == "new.com"
+        assert [h.alias for h in host_manager.get_hosts_by_group("g1")] == ["renamed"]
+
+        with pytest.raises(ValueError):
+            host_manager.rename_host("renamed", "b")
+
+    def test_lazy_load(self, host_manager, temp_config_dir):
+        """Test that a lazy manager streams pages and builds hosts on access."""
+        for i in range(5):
+            host_manager.add_host(SSHHost(host=f"h{i}.com", user="u", alias=f"h{i}", group="g"))
+        host_manager.delete_host("h1")
+        host_manager.close()
+
+        lazy = HostManager(config_dir=temp_config_dir, lazy=True)
+        assert not lazy.loaded
+        assert len(lazy.hosts) == 0
+
+        pages = list(lazy.stream_records(page_size=2))
+        assert len(pages) == 3
+        for page in pages:
+            lazy.apply_records(page)
+        lazy.finish_loading()
+
+        assert lazy.loaded
+        assert sorted(lazy.hosts) == ["h0", "h2", "h3", "h4"]
+        assert not isinstance(lazy.peek_host("h2"), SSHHost)
+        assert lazy.peek_host("h2").host == "h2.com"
+        assert lazy.get_host("h2").host == "h2.com"
+        assert isinstance(lazy.peek_host("h2"), SSHHost)
+        assert [alias for alias, _ in lazy.iter_records("g")] == ["h0", "h2", "h3", "h4"]
@@ -0,0 +1,71 @@
+import asyncio
+from textual.app import App, ComposeResult
+from src.tui.host_table import HostTable
+
+class TableApp(App):
+    def __init__(self):
+        super().__init__()
+        self.built = []
+        self.values = {}
+
+    def compose(self) -> ComposeResult:
+        yield HostTable(("Alias", "Value"), self.build_row)
+
+    def build_row(self, key):
+        self.built.append(key)
+        return (key, self.values.get(key, ""))
+
+def run_with_table(check):
+    """Run ``check(app, table, pilot)`` against a mounted table."""
+    async def run():
+        app = TableApp()
+        async with app.run_test(size=(80, 24)) as pilot:
+            await check(app, app.query_one(HostTable), pilot)
+    asyncio.run(run())
+
+class TestHostTable:
+    def test_only_visible_rows_are_built(self):
+        """Test that a large table only builds the rows on screen."""
+        async def check(app, table, pilot):
+            table.set_rows(f"h{i}" for i in range(100000))
+            await pilot.pause()
+            assert table.row_count == 100000
+            assert 0 < len(app.built) < 24
+
+            app.built.clear()
+            table.focus()
+            await pilot.press("end")
+            await pilot.pause()
+            assert "h99999" in app.built
+            assert len(app.built) < 24
+        run_with_table(check)
+
+    def test_cursor_follows_its_row(self):
+        """Test that the cursor stays on its key when rows change around it."""
+        async def check(app, table, pilot):
+            table.set_rows(["a", "b", "c", "d"])
+            table.move_cursor("c")
+            table.remove_rows(["a"])
+            assert table.cursor_key == "c"
+            table.set_rows(["x", "c", "y"])
+            assert table.cursor_key == "c"
+            table.rename_row("c", "z")
+            assert table.cursor_key == "z"
+            table.remove_rows(["z"])
+            assert table.cursor_key == "y"
+        run_with_table(check)
+
+    def test_update_rows_rebuilds_cells(self):
+        """Test that updated rows are rebuilt while others stay cached."""
+        async def check(app, table, pilot):
+            table.set_rows(["a", "b"])
+            await pilot.pause()
+            app.values["a"] = "new"
+            app.built.clear()
+            table.update_rows(["a"])
+            await pilot.pause()
+            assert app.built == ["a"]
+            assert table.get_row("a") == ("a", "new")
+            table.add_rows(["b", "c"])
+            assert table.keys() == ["a", "b", "c"]
+        run_with_table(check)
@@ -0,0 +1,110 @@
+import os
+import json
+import pytest
+import tempfile
+from src.core.host_manager import HostManager
+from src.core.importer import HostImporter, iter_known_hosts, iter_ssh_config
+
+SSH_CONFIG = """
+User globaluser
+
+Host web1 web2
+    HostName %h.example.com
+    Port 2222
+
+Host db
+    HostName 10.0.0.5
+    User postgres
+    IdentityFile ~/.ssh/db_key
+
+Include conf.d/*.conf
+
+Host * !db
+    User fallback
+    Port 2200
+"""
+
+class TestImporter:
+    @pytest.fixture
+    def temp_config_dir(self):
+        """Create a temporary config directory for testing."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            yield temp_dir
+
+    @pytest.fixture
+    def ssh_config(self, temp_config_dir):
+        """Write an ssh_config with an included file."""
+        os.makedirs(os.path.join(temp_config_dir, "conf.d"))
+        with open(os.path.join(temp_config_dir, "conf.d", "extra.conf"), "w") as f:
+            f.write("Host cache\n    HostName cache.example.com\n")
+        path = os.path.join(temp_config_dir, "config")
+        with open(path, "w") as f:
+            f.write(SSH_CONFIG)
+        return path
+
+    @pytest.fixture
+    def host_manager(self, temp_config_dir):
+        """Create a host manager with a temporary config directory."""
+        return HostManager(config_dir=os.path.join(temp_config_dir, "manager"))
+
+    def test_ssh_config(self, ssh_config):
+        """Test ssh_config parsing with includes and first-value-wins patterns."""
+        records = {r["alias"]: r for r in iter_ssh_config(ssh_config)}
+
+        assert sorted(records) == ["cache", "db", "web1", "web2"]
+        assert records["web1"]["host"] == "web1.example.com"
+        assert records["web1"]["port"] == "2222"
+        assert records["web1"]["user"] == "globaluser"
+        assert records["db"]["user"] == "globaluser"
+        assert records["db"]["port"] == 22
+        assert records["db"]["key_path"] == os.path.expanduser("~/.ssh/db_key")
+        assert records["cache"]["host"] == "cache.example.com"
+        assert records["cache"]["port"] == "2200"
+
+    def test_known_hosts(self, temp_config_dir):
+        """Test known_hosts parsing."""
+        path = os.path.join(temp_config_dir, "known_hosts")
+        with open(path, "w") as f:
+            f.write("a.com,10.0.0.1 ssh-ed25519 AAAA\n")
+            f.write("[b.com]:2222 ssh-rsa AAAA\n")
+            f.write("|1|hashed|entry= ssh-rsa AAAA\n")
+            f.write("@revoked c.com ssh-rsa AAAA\n")
+
+        records = list(iter_known_hosts(path))
+        assert [r["alias"] for r in records] == ["a.com", "10.0.0.1", "b.com:2222"]
+        assert records[2]["port"] == 2222
+
+    def test_import_is_incremental(self, host_manager, temp_config_dir):
+        """Test that re-imports only apply changed entries."""
+        path = os.path.join(temp_config_dir, "hosts.jsonl")
+        rows = [
+            {"alias": "a", "host": "a.com", "user": "u"},
+            {"alias": "b", "host": "b.com", "user": "u", "group": "g"},
+            {"alias": "bad", "host": "not a host", "user": "u"},
+        ]
+        with open(path, "w") as f:
+            f.write("\n".join(json.dumps(row) for row in rows))
+
+        importer = HostImporter(host_manager, batch_size=2)
+        result = importer.import_source(path)
+        assert (result.added, result.updated, len(result.errors)) == (2, 0, 1)
+        assert sorted(host_manager.hosts) == ["a", "b"]
+
+        assert importer.import_source(path).skipped
+
+        rows[1]["host"] = "b2.com"
+        with open(path, "w") as f:
+            f.write("\n".join(json.dumps(row) for row in rows))
+        result = importer.import_source(path)
+        assert (result.added, result.updated, result.unchanged) == (0, 1, 1)
+        assert host_manager.get_host("b").host == "b2.com"
+
+    def test_import_csv(self, host_manager, temp_config_dir):
+        """Test importing a CSV export into a group."""
+        path = os.path.join(temp_config_dir, "hosts.csv")
+        with open(path, "w") as f:
+            f.write("alias,host,user,port\nweb,web.com,deploy,2222\n")
+
+        HostImporter(host_manager).import_source(path, group="imported")
+        host = host_manager.get_host("web")
+        assert (host.port, host.group) == (2222, "imported")
@@ -0,0 +1,178 @@
+import asyncio
+import io
+import json
+import os
+import tempfile
+
+import pytest
+
+from src.core.connection_pool import ConnectionPool
+from src.core.fanout import FanOutExecutor
+from src.core.host_manager import SSHHost
+from src.core.metrics import (CHANNEL, COMMAND, CONNECT, EXEC, EXECUTE, TOTAL, UPLOAD, Metrics,
+                              quantile)
+from tests.fake_fleet import FakeFleet
+
+WEB = SSHHost(host="web.example.com", user="deploy", alias="web", group="prod")
+DB = SSHHost(host="db.example.com", user="deploy", alias="db", group="prod")
+
+
+def filled(durations, host=WEB, operation=CONNECT, phase=TOTAL, **options):
+    metrics = Metrics(**options)
+    for duration in durations:
+        metrics.record(operation, phase, host, 1000.0, duration)
+    return metrics
+
+
+class TestMetrics:
+    def test_ring_buffer(self):
+        """Test that only the newest spans are kept."""
+        metrics = filled([0.1, 0.2, 0.3, 0.4, 0.5], capacity=3)
+        assert [span.duration for span in metrics.spans()] == [0.3, 0.4, 0.5]
+        metrics.clear()
+        assert len(metrics) == 0
+
+    def test_span(self):
+        """Test that a timed block records its outcome and the bytes it moved."""
+        metrics = Metrics()
+        with metrics.span(UPLOAD, TOTAL, WEB) as span:
+            span.bytes = 1000
+        with pytest.raises(OSError):
+            with metrics.span(UPLOAD, TOTAL, DB):
+                raise OSError("gone")
+        ok, failed = metrics.spans()
+        assert (ok.alias, ok.group, ok.ok, ok.bytes) == ("web", "prod", True, 1000)
+        assert ok.throughput == 1000 / ok.duration
+        assert (failed.alias, failed.ok, failed.throughput) == ("db", False, None)
+
+    def test_disabled(self):
+        """Test that nothing is recorded while instrumentation is off."""
+        metrics = Metrics(enabled=False)
+        with metrics.span(UPLOAD, TOTAL, WEB) as span:
+            span.bytes = 1000
+        metrics.record(CONNECT, TOTAL, WEB, 0.0, 1.0)
+        assert metrics.spans() == []
+        assert metrics.span(CONNECT, TOTAL, DB) is metrics.span(EXECUTE, TOTAL, WEB)
+
+    def test_summary(self):
+        """Test quantiles and error counts per host, per group and overall."""
+        metrics = filled([i / 1000 for i in range(100, 0, -1)])
+        metrics.record(CONNECT, TOTAL, DB, 1000.0, 0.5, ok=False)
+        metrics.record(EXECUTE, COMMAND, DB, 1000.0, 0.1, nbytes=500)
+        metrics.record(EXECUTE, CHANNEL, DB, 1000.0, 0.01)
+
+        by_host = {(s.name, s.operation, s.phase): s for s in metrics.summary("alias")}
+        web = by_host["web", CONNECT, TOTAL]
+        assert (web.count, web.errors, web.quantiles) == (100, 0, (0.05, 0.095, 0.099))
+        assert by_host["db", CONNECT, TOTAL].errors == 1
+        assert by_host["db", EXECUTE, COMMAND].throughput == 5000
+        # Phases in the order they happen
+        assert [s.phase for s in metrics.summary("alias") if s.name == "db"] == [TOTAL, CHANNEL, COMMAND]
+
+        prod = {(s.operation, s.phase): s for s in metrics.summary("group")}
+        assert prod[CONNECT, TOTAL].count == 101 and prod[CONNECT, TOTAL].name == "prod"
+        assert {s.name for s in metrics.summary(None)} == {None}
+        with pytest.raises(ValueError):
+            metrics.summary("user")
+        assert quantile([1.0], 0.99) == 1.0
+
+    def test_jsonl(self):
+        """Test that every span is exported as one JSON object per line."""
+        metrics = filled([0.25])
+        metrics.record(UPLOAD, TOTAL, DB, 1000.0, 2.0, nbytes=4000)
+        f = io.StringIO()
+        assert metrics.write_jsonl(f) == 2
+        first, second = map(json.loads, f.getvalue().splitlines())
+        assert first == {"operation": CONNECT, "phase": TOTAL, "alias": "web", "group": "prod",
+                         "started": 1000.0, "duration": 0.25, "ok": True, "bytes": 0}
+        assert second["throughput"] == 2000
+
+    def test_prometheus(self):
+        """Test the text format: quantiles, sum and count per series, and escaped labels."""
+        odd = SSHHost(host="odd.example.com", user="u", alias='say "hi"\\', group=None)
+        metrics = filled([0.1, 0.3])
+        metrics.record(UPLOAD, TOTAL, odd, 1000.0, 1.0, ok=False, nbytes=10)
+        lines = metrics.prometheus().splitlines()
+        name = "ssh_tui_manager_operation_duration_seconds"
+        labels = 'operation="connect",phase="total",alias="web",group="prod"'
+        assert f'{name}{{{labels},quantile="0.5"}} 0.1' in lines
+        assert f'{name}{{{labels},quantile="0.99"}} 0.3' in lines
+        assert f"{name}_count{{{labels}}} 2" in lines
+        odd_labels = 'operation="upload",phase="total",alias="say \\"hi\\"\\\\",group=""'
+        assert f"ssh_tui_manager_operation_errors{{{odd_labels}}} 1" in lines
+        assert f"ssh_tui_manager_transferred_bytes{{{odd_labels}}} 10" in lines
+        assert f"# TYPE {name} summary" in lines
+
+    def test_export(self):
+        """Test that the file name picks the export format."""
+        metrics = filled([0.1, 0.2])
+        with tempfile.TemporaryDirectory() as directory:
+            for name in ("spans.jsonl", "spans.prom"):
+                assert metrics.export(os.path.join(directory, name)) == 2
+            with open(os.path.join(directory, "spans.jsonl")) as f:
+                assert len(f.readlines()) == 2
+            with open(os.path.join(directory, "spans.prom")) as f:
+                assert f.readline().startswith("# HELP")
+
+
+class TestInstrumentation:
+    def test_fanout_spans(self):
+        """Test that fan-out records the connect and every phase of each command."""
+        metrics = Metrics()
+        pool = ConnectionPool(connector=FakeFleet(failing=["h1"]).connect, metrics=metrics)
+        hosts = [SSHHost(host=f"h{i}.example.com", user="u", alias=f"h{i}", group="g") for i in range(3)]
+        list(FanOutExecutor(pool).run(hosts, "hostname"))
+
+        phases = {(s.alias, s.operation, s.phase): s for s in metrics.spans()}
+        assert len(phases) == len(metrics) == 15
+        # A custom connector is timed as a whole
+        assert (("h0", CONNECT, TOTAL) in phases) and not any(
+            s.operation == CONNECT and s.phase != TOTAL for s in metrics.spans())
+        for phase in (CHANNEL, EXEC, COMMAND, TOTAL):
+            assert phases["h0", EXECUTE, phase].ok
+        assert phases["h0", EXECUTE, COMMAND].bytes == len("h0\n")
+        # Failing commands still ran fine as far as SSH is concerned
+        assert phases["h1", EXECUTE, TOTAL].ok
+
+    def test_disabled_pool(self):
+        """Test that pools record nothing unless given enabled metrics."""
+        pool = ConnectionPool(connector=FakeFleet().connect)
+        list(FanOutExecutor(pool).run([WEB], "hostname"))
+        assert not pool.metrics.enabled and len(pool.metrics) == 0
+
+
+class TestTimingsScreen:
+    def test_panel(self):
+        """Test the percentiles table, switching to groups, and exporting."""
+        from src.tui.interface import SSHManagerApp
+
+        async def run(config_dir):
+            app = SSHManagerApp(config_dir=config_dir)
+            async with app.run_test(size=(140, 40)) as pilot:
+                for duration in (0.01, 0.02, 0.03):
+                    app.metrics.record(CONNECT, TOTAL, WEB, 1000.0, duration)
+                app.metrics.record(UPLOAD, TOTAL, DB, 1000.0, 2.0, nbytes=4_000_000)
+                await pilot.press("t")
+                await pilot.pause()
+                table = app.screen.query_one("#timings")
+                rows = [table.get_row_at(i) for i in range(table.row_count)]
+                assert rows == [
+                    ["db", UPLOAD, TOTAL, "1", "", "2.00 s", "2.00 s", "2.00 s", "2.00 MB/s"],
+                    ["web", CONNECT, TOTAL, "3", "", "20.0 ms", "30.0 ms", "30.0 ms", ""],
+                ]
+
+                await pilot.press("g")
+                await pilot.pause()
+                assert [table.get_row_at(i)[:4] for i in range(table.row_count)] == [
+                    ["prod", CONNECT, TOTAL, "3"], ["prod", UPLOAD, TOTAL, "1"]]
+
+                await pilot.press("e")
+                await pilot.pause()
+                with open(os.path.join(config_dir, "metrics.jsonl")) as f:
+                    assert len(f.readlines()) == 4
+                assert os.path.exists(os.path.join(config_dir, "metrics.prom"))
+
+        with tempfile.TemporaryDirectory() as config_dir:
+            with open(os.path.join(config_dir, "settings.json"), "w") as f:
+                json.dump({"probe": False, "multiplex": False}, f)
+            asyncio.run(run(config_dir))
@@ -0,0 +1,113 @@
+import os
+import socket
+import subprocess
+import tempfile
+
+import pytest
+
+from src.core.host_manager import SSHHost
+from src.core.multiplex import ControlMasters, ssh_command
+
+HOST = SSHHost(host="db.example.com", user="admin", alias="db", port=2222, key_path="/keys/id_ed25519")
+
+
+class FakeSSH:
+    """Answers ``ssh -O`` for the sockets listed as alive."""
+
+    def __init__(self):
+        self.alive = set()
+        self.calls = []
+
+    def __call__(self, cmd, **kwargs):
+        path = cmd[2][len("ControlPath="):]
+        operation = cmd[4]
+        self.calls.append((operation, path))
+        if path not in self.alive:
+            return subprocess.CompletedProcess(cmd, 255, "", "Control socket connect: No such file\n")
+        if operation == "exit":
+            self.alive.discard(path)
+            os.remove(path)
+            return subprocess.CompletedProcess(cmd, 0, "", "Exit request sent.\n")
+        return subprocess.CompletedProcess(cmd, 0, "", "Master running (pid=4242)\r\n")
+
+
+def listening_socket(path):
+    sock = socket.socket(socket.AF_UNIX)
+    sock.bind(path)
+    return sock
+
+
+@pytest.fixture
+def masters():
+    with tempfile.TemporaryDirectory(dir="/tmp") as control_dir:
+        yield ControlMasters(control_dir, persist="5m", runner=FakeSSH())
+
+
+class TestControlMasters:
+    def test_command(self, masters):
+        """Test that connections go through a master socket shared by aliases of one server."""
+        cmd = masters.command(HOST)
+        assert ssh_command(HOST) == ["ssh", "-p", "2222", "-i", "/keys/id_ed25519", "admin@db.example.com"]
+        assert cmd[:1] + cmd[7:] == ssh_command(HOST)
+        assert cmd[1:7] == ["-o", "ControlMaster=auto", "-o", f"ControlPath={masters.path(HOST)}",
+                            "-o", "ControlPersist=5m"]
+
+        other = SSHHost(host="db.example.com", user="admin", alias="db-again", port=2222,
+                        key_path="/keys/id_ed25519")
+        assert masters.path(other) == masters.path(HOST)
+        assert masters.path(SSHHost(host="db.example.com", user="root", alias="db-root")) != masters.path(HOST)
+
+    def test_list_and_close(self, masters):
+        """Test that live masters are listed and closed, and dead sockets cleaned up."""
+        masters.command(HOST)
+        live = masters.path(HOST)
+        dead_host = SSHHost(host="web.example.com", user="admin", alias="web")
+        masters.command(dead_host)
+        dead = masters.path(dead_host)
+        masters.command(SSHHost(host="never.example.com", user="admin", alias="never"))
+        sockets = [listening_socket(live), listening_socket(dead)]
+        masters.runner.alive.add(live)
+        try:
+            found = masters.masters()
+            assert [(master.alias, master.target, master.pid) for master in found] == \
+                [("db", "admin@db.example.com", 4242)]
+            # The dead socket and the file of the session that never started a master are gone
+            assert sorted(os.listdir(masters.control_dir)) == sorted([os.path.basename(live),
+                                                                     os.path.basename(live) + ".json"])
+
+            assert masters.close(found[0])
+            assert masters.masters() == []
+            assert os.listdir(masters.control_dir) == []
+        finally:
+            for sock in sockets:
+                sock.close()
+
+    def test_long_directory(self):
+        """Test that a directory too deep for socket paths falls back to a short one."""
+        masters = ControlMasters("/" + "x" * 120)
+        assert len(masters.path(HOST)) < 100
+
+    def test_long_directory_uses_runtime_dir(self, monkeypatch):
+        """Test that the fallback directory is under XDG_RUNTIME_DIR when it is set."""
+        with tempfile.TemporaryDirectory(dir="/tmp") as runtime_dir:
+            monkeypatch.setenv("XDG_RUNTIME_DIR", runtime_dir)
+            masters = ControlMasters("/" + "x" * 120, runner=FakeSSH())
+            assert masters.control_dir == os.path.join(runtime_dir, "ssh-tui")
+            assert "ControlMaster=auto" in masters.command(HOST)
+            assert os.stat(masters.control_dir).st_mode & 0o777 == 0o700
+
+    def test_unsafe_directory_disables_multiplexing(self):
+        """Test that a control directory others can use, or a symlink, is not trusted."""
+        with tempfile.TemporaryDirectory(dir="/tmp") as parent:
+            shared = os.path.join(parent, "shared")
+            os.mkdir(shared)
+            os.chmod(shared, 0o777)
+            private = os.path.join(parent, "private")
+            os.mkdir(private, 0o700)
+            link = os.path.join(parent, "link")
+            os.symlink(private, link)
+            for control_dir in (shared, link):
+                masters = ControlMasters(control_dir, runner=FakeSSH())
+                assert masters.command(HOST) == ssh_command(HOST)
+                assert not masters.supported and masters.masters() == []
+            assert os.listdir(shared) == os.listdir(private) == []
@@ -0,0 +1,120 @@
+import asyncio
+import socket
+
+from src.core.prober import HostProber, ProbeResult, probe_endpoint
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestProbeEndpoint:
+    def test_reads_ssh_banner(self):
+        """Test that a listening SSH server is reported up with its banner."""
+        async def run():
+            async def greet(reader, writer):
+                writer.write(b"SSH-2.0-OpenSSH_9.6\r\n")
+                await writer.drain()
+                writer.close()
+
+            server = await asyncio.start_server(greet, "127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            async with server:
+                return await probe_endpoint(("127.0.0.1", port), timeout=2.0)
+
+        result = asyncio.run(run())
+        assert result.reachable
+        assert result.banner == "SSH-2.0-OpenSSH_9.6"
+        assert result.rtt is not None and result.rtt >= 0
+
+    def test_closed_port_is_down(self):
+        """Test that a refused connection is reported down."""
+        result = asyncio.run(probe_endpoint(("127.0.0.1", free_port()), timeout=2.0))
+        assert not result.reachable
+        assert result.error
+
+    def test_invalid_hostname_is_down(self):
+        """Test that a name the lookup rejects is reported down rather than raising."""
+        for hostname in ("a..b", "x" * 300):
+            result = asyncio.run(probe_endpoint((hostname, 22), timeout=2.0))
+            assert not result.reachable
+            assert result.error
+
+
+class TestHostProber:
+    def test_backs_off_from_down_hosts(self):
+        """Test that down hosts are retried after a growing interval and up hosts after the TTL."""
+        async def fake_probe(endpoint, timeout):
+            return ProbeResult(endpoint[0] == "up", rtt=0.01)
+
+        clock = FakeClock()
+        prober = HostProber(ttl=60.0, max_backoff=100.0, probe=fake_probe, clock=clock)
+
+        async def run():
+            await prober.probe(("up", 22))
+            await prober.probe(("down", 22))
+            assert not prober.is_due(("up", 22))
+            clock.now = 15.0
+            assert prober.is_due(("down", 22))
+            assert not prober.is_due(("up", 22))
+            await prober.probe(("down", 22))
+            clock.now = 40.0
+            assert not prober.is_due(("down", 22))
+            clock.now = 45.0
+            assert prober.is_due(("down", 22))
+            await prober.probe(("down", 22))
+            clock.now = 80.0
+            assert prober.is_due(("up", 22))
+            assert not prober.is_due(("down", 22))
+            clock.now = 105.0
+            assert prober.is_due(("down", 22))
+            await prober.probe(("down", 22))
+            # Capped at max_backoff
+            clock.now = 204.0
+            assert not prober.is_due(("down", 22))
+            clock.now = 205.0
+            assert prober.is_due(("down", 22))
+
+        asyncio.run(run())
+        assert prober.result(("up", 22)).reachable
+        assert not prober.result(("down", 22)).reachable
+
+    def test_caps_probes_in_flight_and_goes_in_order(self):
+        """Test that no more than the concurrency limit run at once, first targets first."""
+        started = []
+        peak = 0
+
+        async def fake_probe(endpoint, timeout):
+            nonlocal peak
+            started.append(endpoint)
+            peak = max(peak, prober.in_flight)
+            await asyncio.sleep(0.01)
+            return ProbeResult(True, rtt=0.01)
+
+        prober = HostProber(concurrency=4, probe=fake_probe)
+        targets = [(f"h{i}", 22) for i in range(40)]
+        finished = []
+
+        async def run():
+            task = asyncio.create_task(
+                prober.run(lambda: targets, lambda endpoint, result: finished.append(endpoint),
+                           interval=0.05)
+            )
+            while len(finished) < len(targets):
+                await asyncio.sleep(0.01)
+            task.cancel()
+
+        asyncio.run(run())
+        assert peak == 4
+        assert started[:4] == targets[:4]
+        assert sorted(finished) == sorted(targets)
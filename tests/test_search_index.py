@@ -0,0 +1,93 @@
+import os
+import json
+import pytest
+import tempfile
+from src.core.host_manager import HostManager, SSHHost
+from src.core.search_index import SearchIndex
+
+def host(alias, hostname, user="deploy", group=None, description=None):
+    return SSHHost(host=hostname, user=user, alias=alias, group=group, description=description)
+
+class TestSearchIndex:
+    @pytest.fixture
+    def index(self):
+        """Create an index over a few hosts."""
+        return SearchIndex.build({
+            "web10": host("web10", "web10.example.com", group="web"),
+            "db": host("db", "db.example.com", user="postgres", description="primary web database"),
+            "web": host("web", "frontend.example.com", group="edge"),
+            "web1": host("web1", "web1.example.com", group="web"),
+        })
+
+    def test_ranking(self, index):
+        """Test that exact aliases come first, then alias prefixes, then other fields."""
+        assert index.search("web") == ["web", "web10", "web1", "db"]
+        assert index.search("WEB1") == ["web1", "web10"]
+        assert index.search("postgres") == ["db"]
+        assert index.search("web", limit=2) == ["web", "web10"]
+        assert index.search("") == []
+        assert index.search("nothing") == []
+
+    def test_short_queries_match_word_starts(self, index):
+        """Test that one- and two-letter queries match the start of words."""
+        assert index.search("p") == ["db"]
+        assert index.search("fr") == ["web"]
+        assert index.search("ro") == []
+
+    def test_fuzzy_match(self, index):
+        """Test that a query with a typo still finds hosts sharing most trigrams."""
+        assert index.search("frontedn.example") == ["web"]
+
+    def test_incremental_updates(self, index):
+        """Test that added, changed and removed hosts are reflected."""
+        index.add("cache", host("cache", "redis.example.com"))
+        index.add("web1", host("web1", "old.example.com"))
+        index.remove("db")
+        assert index.search("redis") == ["cache"]
+        assert index.search("old.example") == ["web1"]
+        assert index.search("postgres") == []
+        assert len(index) == 4
+
+    def test_compaction_keeps_results(self):
+        """Test that rebuilding the posting lists after many removals loses nothing."""
+        index = SearchIndex()
+        for i in range(3000):
+            index.add(f"h{i}", host(f"h{i}", f"h{i}.example.com"))
+        for i in range(2000):
+            index.remove(f"h{i}")
+        assert index.search("h2999") == ["h2999"]
+        assert len(index.search("example")) == 1000
+
+class TestHostManagerSearch:
+    @pytest.fixture
+    def temp_config_dir(self):
+        """Create a temporary config directory for testing."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            yield temp_dir
+
+    def test_search_follows_mutations(self, temp_config_dir):
+        """Test that the search index tracks mutations and failed batches."""
+        manager = HostManager(config_dir=temp_config_dir)
+        manager.add_host(host("web1", "web1.example.com"))
+        assert manager.search("web") == ["web1"]
+
+        manager.add_host(host("web2", "web2.example.com"))
+        manager.rename_host("web1", "app1")
+        with pytest.raises(ValueError):
+            with manager.batch():
+                manager.delete_host("web2")
+                manager.update_host("app1", host("other", "web3.example.com"))
+        assert manager.search("web") == ["web2", "app1"]
+        assert manager.search("app") == ["app1"]
+
+    def test_search_with_sqlite(self, temp_config_dir):
+        """Test that the SQLite backend searches its table with the same ranking."""
+        with open(os.path.join(temp_config_dir, "settings.json"), "w") as f:
+            json.dump({"storage": "sqlite"}, f)
+        manager = HostManager(config_dir=temp_config_dir)
+        manager.add_host(host("db", "db.example.com", description="web database"))
+        manager.add_host(host("web1", "web1.example.com"))
+        manager.add_host(host("web", "frontend.example.com"))
+        assert manager.search("WEB") == ["web", "web1", "db"]
+        assert manager.search("web", limit=1) == ["web"]
+        manager.close()
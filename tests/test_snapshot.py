@@ -0,0 +1,131 @@
+import json
+import os
+import tempfile
+
+import pytest
+
+from src.core import storage
+from src.core.host_manager import HostManager, SSHHost
+from src.core.snapshot import SnapshotCache, decode_snapshot, encode_snapshot
+from src.core.watcher import FileFingerprint
+
+HOSTS = {
+    "web": {"host": "web.example.com", "user": "deploy", "port": 22, "alias": "web",
+            "description": "Front end ü", "group": "prod", "key_path": None},
+    "db": {"host": "db.example.com", "user": "deploy", "port": 2222, "alias": "db",
+           "description": None, "group": "prod", "key_path": "/keys/id_ed25519"},
+}
+
+
+@pytest.fixture
+def config_dir():
+    with tempfile.TemporaryDirectory() as config_dir:
+        with open(os.path.join(config_dir, "ssh_hosts.json"), "w") as f:
+            json.dump(HOSTS, f, indent=2)
+        yield config_dir
+
+
+def snapshot_path(config_dir):
+    return os.path.join(config_dir, "ssh_hosts.snapshot")
+
+
+def snapshot_identity(config_dir):
+    """Inode and mtime of the snapshot, which change whenever it is rewritten."""
+    st = os.stat(snapshot_path(config_dir))
+    return st.st_ino, st.st_mtime_ns
+
+
+class TestSnapshotFormat:
+    def test_round_trip(self):
+        """Test that records, None values and the source fingerprint survive encoding."""
+        fingerprint = FileFingerprint(7, 123456789, 4096, "ab" * 32)
+        (aliases, columns), decoded = decode_snapshot(encode_snapshot(HOSTS, fingerprint))
+        assert decoded == fingerprint
+        assert aliases == ["web", "db"]
+        assert {alias: {name: values[row] for name, values in columns.items()}
+                for row, alias in enumerate(aliases)} == HOSTS
+
+    def test_unsupported_records(self):
+        """Test that records the columns cannot hold are refused."""
+        fingerprint = FileFingerprint(1, 1, 1, "00" * 32)
+        assert encode_snapshot({"a": {"host": "a"}, "b": {"host": "b", "user": "u"}}, fingerprint) is None
+        assert encode_snapshot({"a": {"host": "a", "port": "22"}, "b": {"host": "b", "port": 22}},
+                               fingerprint) is None
+        assert encode_snapshot({"a": {"host": "a\0b"}}, fingerprint) is None
+
+    def test_corrupt(self):
+        """Test that truncated and garbled snapshots are rejected."""
+        blob = encode_snapshot(HOSTS, FileFingerprint(1, 1, 1, "00" * 32))
+        for bad in (blob[:20], blob[:-1], b"X" + blob[1:]):
+            with pytest.raises(ValueError):
+                decode_snapshot(bad)
+
+
+class TestSnapshotCache:
+    def test_warm_load_skips_json(self, config_dir, monkeypatch):
+        """Test that a second load is served from the snapshot without parsing JSON."""
+        cold = HostManager(config_dir=config_dir)
+        assert os.path.exists(snapshot_path(config_dir))
+
+        with monkeypatch.context() as patch:
+            patch.setattr(storage.json, "loads", None)
+            warm = HostManager(config_dir=config_dir)
+        assert warm.hosts == cold.hosts
+        assert warm.hosts["db"] == SSHHost(**HOSTS["db"])
+        assert warm.index.aliases("group", "prod") == ["web", "db"]
+
+    def test_journal_replayed_on_snapshot(self, config_dir):
+        """Test that journal records still apply on top of a cached snapshot."""
+        HostManager(config_dir=config_dir)
+        cached = snapshot_identity(config_dir)
+        with open(os.path.join(config_dir, "ssh_hosts.json.journal"), "a") as f:
+            f.write('{"op":"del","alias":"web"}\n')
+        manager = HostManager(config_dir=config_dir)
+        assert list(manager.hosts) == ["db"]
+        assert snapshot_identity(config_dir) == cached
+
+    def test_touch_keeps_snapshot(self, config_dir):
+        """Test that touching the file keeps the snapshot fresh."""
+        HostManager(config_dir=config_dir)
+        cached = snapshot_identity(config_dir)
+        os.utime(os.path.join(config_dir, "ssh_hosts.json"), ns=(1, 1))
+        assert HostManager(config_dir=config_dir).get_host("web").host == "web.example.com"
+        assert snapshot_identity(config_dir) == cached
+
+    def test_stale_snapshot_rebuilt(self, config_dir):
+        """Test that a changed file is parsed and its snapshot rebuilt."""
+        HostManager(config_dir=config_dir)
+        changed = dict(HOSTS, web=dict(HOSTS["web"], host="web2.example.com"))
+        with open(os.path.join(config_dir, "ssh_hosts.json"), "w") as f:
+            json.dump(changed, f, indent=2)
+
+        assert HostManager(config_dir=config_dir).get_host("web").host == "web2.example.com"
+        cache = SnapshotCache(os.path.join(config_dir, "ssh_hosts.json"))
+        aliases, columns = cache.read()
+        assert columns["host"][aliases.index("web")] == "web2.example.com"
+
+    def test_corrupt_snapshot_ignored(self, config_dir):
+        """Test that a damaged snapshot falls back to the JSON file and is replaced."""
+        HostManager(config_dir=config_dir)
+        with open(snapshot_path(config_dir), "r+b") as f:
+            f.truncate(100)
+        assert HostManager(config_dir=config_dir).get_host("db").port == 2222
+        assert SnapshotCache(os.path.join(config_dir, "ssh_hosts.json")).read() is not None
+
+    def test_lazy_stream(self, config_dir):
+        """Test that streamed loads build and then use the snapshot."""
+        def stream():
+            manager = HostManager(config_dir=config_dir, lazy=True)
+            return [record for page in manager.stream_records() for record in page]
+
+        cold = stream()
+        cached = snapshot_identity(config_dir)
+        assert stream() == cold == list(HOSTS.items())
+        assert snapshot_identity(config_dir) == cached
+
+    def test_disabled(self, config_dir):
+        """Test that the snapshot can be turned off in settings."""
+        with open(os.path.join(config_dir, "settings.json"), "w") as f:
+            json.dump({"snapshot_cache": False}, f)
+        assert len(HostManager(config_dir=config_dir).hosts) == 2
+        assert not os.path.exists(snapshot_path(config_dir))
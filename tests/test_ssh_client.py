@@ -0,0 +1,219 @@
+import asyncio
+import os
+import tempfile
+import time
+
+import pytest
+
+from src.core.connection_pool import ConnectionPool
+from src.core.fanout import OK, FanOutExecutor
+from src.core.host_manager import HostManager
+from src.core.metrics import AUTH, CONNECT, DNS, DOWNLOAD, EXECUTE, KEX, TCP, TOTAL, Metrics
+from src.core.prober import HostProber
+from src.core.ssh_client import SSHClient
+from tests.ssh_server import CannedCommand, SSHFleet
+
+RESPONSES = {
+    "uptime": " 10:00:00 up 42 days,  1 user,  load average: 0.00, 0.01, 0.05\n",
+    "false": CannedCommand(stderr="no luck\n", exit_status=1),
+}
+
+
+def make_fleet(count, **options):
+    """Start a fleet in a temporary directory that is removed with it."""
+    root = tempfile.TemporaryDirectory()
+    fleet = SSHFleet(count, root.name, responses=RESPONSES, **options)
+    fleet.cleanup = root.cleanup
+    return fleet
+
+
+@pytest.fixture
+def fleet():
+    fleet = make_fleet(3, per_host=lambda i: {"reject_auth": True} if i == 2 else {})
+    yield fleet
+    fleet.close()
+    fleet.cleanup()
+
+
+@pytest.fixture
+def client():
+    with SSHClient() as client:
+        yield client
+
+
+class TestSSHClient:
+    def test_connect_and_execute(self, fleet, client):
+        """Test commands through the pool's own connector, canned and run by the shell."""
+        host = fleet.hosts[0]
+        assert client.connect(host) == (True, "Connected successfully")
+        code, stdout, stderr = client.execute_command("uptime")
+        assert (code, stdout, stderr) == (0, RESPONSES["uptime"], "")
+        assert client.execute_command("false") == (1, "", "no luck\n")
+        assert client.execute_command("echo $((6 * 7))") == (0, "42\n", "")
+        assert fleet.server(host.alias).accepted == 1
+        assert fleet.server(host.alias).commands_run == ["uptime", "false", "echo $((6 * 7))"]
+
+    def test_connect_failures(self, fleet, client):
+        """Test that rejected logins and unreachable hosts report errors."""
+        ok, message = client.connect(fleet.hosts[2])
+        assert not ok and message
+        assert fleet.server(fleet.hosts[2].alias).accepted == 1
+        assert client.host is None
+
+        fleet.server(fleet.hosts[1].alias).close()
+        ok, _ = client.connect(fleet.hosts[1])
+        assert not ok
+        assert client.execute_command("uptime") == (-1, "", "Not connected")
+
+    def test_upload_and_download(self, fleet, client):
+        """Test that files round-trip through SFTP."""
+        host = fleet.hosts[0]
+        home = fleet.server(host.alias).root
+        data = os.urandom(300_000)
+        with tempfile.TemporaryDirectory() as local_dir:
+            source = os.path.join(local_dir, "source.bin")
+            with open(source, "wb") as f:
+                f.write(data)
+            assert client.scp_upload(source, "upload.bin") == (False, "Not connected")
+
+            client.connect(host)
+            assert client.scp_upload(source, "upload.bin") == (True, "File uploaded successfully")
+            with open(os.path.join(home, "upload.bin"), "rb") as f:
+                assert f.read() == data
+
+            target = os.path.join(local_dir, "target.bin")
+            assert client.scp_download("upload.bin", target) == (True, "File downloaded successfully")
+            with open(target, "rb") as f:
+                assert f.read() == data
+
+    def test_copy_between_hosts(self, fleet, client):
+        """Test that a file is copied from one host to another."""
+        source, destination = fleet.hosts[:2]
+        with open(os.path.join(fleet.server(source.alias).root, "app.tar"), "wb") as f:
+            f.write(b"x" * 100_000)
+        client.connect(source)
+        ok, message = client.scp_copy("app.tar", destination, "app.tar", verify=False)
+        assert ok, message
+        assert os.path.getsize(os.path.join(fleet.server(destination.alias).root, "app.tar")) == 100_000
+
+
+    def test_timings(self, fleet):
+        """Test that connects are split into phases and transfers carry their size."""
+        metrics = Metrics()
+        with SSHClient(ConnectionPool(metrics=metrics)) as client:
+            host = fleet.hosts[0]
+            with open(os.path.join(fleet.server(host.alias).root, "data.bin"), "wb") as f:
+                f.write(b"x" * 50_000)
+            client.connect(host)
+            client.execute_command("uptime")
+            with tempfile.TemporaryDirectory() as local_dir:
+                client.scp_download("data.bin", os.path.join(local_dir, "data.bin"))
+            assert not client.connect(fleet.hosts[2])[0]
+
+        spans = {(span.alias, span.operation, span.phase): span for span in metrics.spans()}
+        connect = [spans[host.alias, CONNECT, phase] for phase in (DNS, TCP, KEX, AUTH, TOTAL)]
+        assert all(span.ok for span in connect)
+        assert sum(span.duration for span in connect[:-1]) <= connect[-1].duration
+        assert spans[host.alias, EXECUTE, TOTAL].ok
+        assert spans[host.alias, DOWNLOAD, TOTAL].bytes == 50_000
+        rejected = fleet.hosts[2].alias
+        assert spans[rejected, CONNECT, KEX].ok
+        assert not spans[rejected, CONNECT, AUTH].ok and not spans[rejected, CONNECT, TOTAL].ok
+
+
+class TestLinkShaping:
+    def test_handshake_delay_and_latency(self):
+        """Test that connects wait for the banner and round trips pay the latency twice."""
+        fleet = make_fleet(1, handshake_delay=0.2, latency=0.05)
+        try:
+            with SSHClient() as client:
+                started = time.perf_counter()
+                assert client.connect(fleet.hosts[0])[0]
+                assert time.perf_counter() - started >= 0.2
+
+                started = time.perf_counter()
+                assert client.execute_command("uptime")[0] == 0
+                # Channel open, exec request, then output and close: at least two round trips
+                assert time.perf_counter() - started >= 0.2
+        finally:
+            fleet.close()
+            fleet.cleanup()
+
+    def test_bandwidth_cap(self):
+        """Test that a download cannot beat the bandwidth cap."""
+        fleet = make_fleet(1, bandwidth=1_000_000)
+        try:
+            host = fleet.hosts[0]
+            with open(os.path.join(fleet.server(host.alias).root, "big.bin"), "wb") as f:
+                f.write(os.urandom(500_000))
+            with SSHClient() as client, tempfile.TemporaryDirectory() as local_dir:
+                client.connect(host)
+                started = time.perf_counter()
+                ok, _ = client.scp_download("big.bin", os.path.join(local_dir, "big.bin"))
+                assert ok
+                assert time.perf_counter() - started >= 0.45
+        finally:
+            fleet.close()
+            fleet.cleanup()
+
+    def test_link_cut_and_dropped_connections(self):
+        """Test that a link cut mid-transfer and a dropped connection surface as failures."""
+        fleet = make_fleet(2, per_host=lambda i: {"cut_after": 200_000} if i == 0 else {"drop_rate": 1.0})
+        try:
+            cut, dropped = fleet.hosts
+            with open(os.path.join(fleet.server(cut.alias).root, "big.bin"), "wb") as f:
+                f.write(os.urandom(1_000_000))
+            with SSHClient(ConnectionPool(connect_timeout=5)) as client, \
+                    tempfile.TemporaryDirectory() as local_dir:
+                assert client.connect(cut)[0]
+                ok, _ = client.scp_download("big.bin", os.path.join(local_dir, "big.bin"))
+                assert not ok
+                assert not client.connect(dropped)[0]
+                assert fleet.server(dropped.alias).accepted == 1
+        finally:
+            fleet.close()
+            fleet.cleanup()
+
+
+class TestFleet:
+    HOSTS = 40
+
+    @pytest.fixture
+    def large_fleet(self):
+        fleet = make_fleet(self.HOSTS, latency=0.02, groups=4,
+                           per_host=lambda i: {"reject_auth": True} if i % 10 == 9 else {})
+        yield fleet
+        fleet.close()
+        fleet.cleanup()
+
+    def test_inventory(self, large_fleet):
+        """Test that the generated inventory loads and points at the servers."""
+        with tempfile.TemporaryDirectory() as config_dir:
+            large_fleet.write_inventory(config_dir)
+            manager = HostManager(config_dir=config_dir)
+            assert len(manager.hosts) == self.HOSTS
+            assert len(manager.get_groups()) == 4
+            host = manager.get_host("sim7")
+            assert (host.host, host.port) == ("127.0.0.1", large_fleet.server("sim7").port)
+
+    def test_fanout_and_probe(self, large_fleet):
+        """Test fan-out over pooled sessions and probing against every server."""
+        executor = FanOutExecutor(ConnectionPool(max_connections=self.HOSTS), max_workers=16, timeout=20)
+        results = {result.alias: result for result in executor.run(large_fleet.hosts, "uptime")}
+        failing = {f"sim{i}" for i in range(9, self.HOSTS, 10)}
+        assert {alias for alias, result in results.items() if result.status != OK} == failing
+        assert all(results[alias].stdout == RESPONSES["uptime"] for alias in results if alias not in failing)
+
+        # A second run reuses every pooled session
+        list(executor.run(large_fleet.hosts[:9], "uptime"))
+        assert all(large_fleet.server(host.alias).accepted == 1 for host in large_fleet.hosts[:9])
+
+        prober = HostProber(concurrency=16, timeout=5)
+
+        async def probe_all():
+            return await asyncio.gather(*(prober.probe((host.host, host.port)) for host in large_fleet.hosts))
+        try:
+            probes = asyncio.run(probe_all())
+        finally:
+            prober.close()
+        assert all(probe.reachable and probe.banner.startswith("SSH-2.0") for probe in probes)
@@ -0,0 +1,92 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Seconds of import time spent outside textual and rich, which the
+# interface cannot start without; about 0.15 s with paramiko deferred,
+# against 0.33 s before
+IMPORT_BUDGET = 0.25
+# Seconds from starting the interpreter to a painted host list
+LAUNCH_BUDGET = 2.0
+# Imported only once a feature needs them
+DEFERRED = ("paramiko", "cryptography", "invoke", "src.core.ssh_client", "src.core.sync",
+            "src.core.distribution", "src.tui.dialogs", "src.tui.results", "src.tui.masters",
+            "src.tui.timings")
+
+LAUNCH = """
+import sys
+from src.tui.interface import SSHManagerApp
+
+async def wait_for_hosts(pilot):
+    app = pilot.app
+    while not (app.host_manager.loaded and app.host_table.keys()):
+        await pilot.pause(0.005)
+    loaded = sorted(name for name in sys.modules if name.split(".")[0] in ("paramiko", "cryptography"))
+    print("ready", *loaded, flush=True)
+    app.exit()
+
+SSHManagerApp(config_dir=sys.argv[1]).run(headless=True, auto_pilot=wait_for_hosts)
+"""
+
+
+def import_times(*modules):
+    """Self time in seconds of every module imported by a fresh interpreter."""
+    code = "; ".join(f"import {module}" for module in modules)
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT,
+                               capture_output=True, text=True, check=True)
+    times = {}
+    for line in completed.stderr.splitlines():
+        parts = [part.strip() for part in line[len("import time:"):].split("|")]
+        if line.startswith("import time:") and parts[0].isdigit():
+            times[parts[2]] = int(parts[0]) / 1e6
+    return times
+
+
+@pytest.fixture
+def config_dir():
+    with tempfile.TemporaryDirectory() as config_dir:
+        hosts = {f"node{i}": {"host": f"node{i}.example.com", "user": "deploy", "port": 22,
+                              "alias": f"node{i}", "group": f"rack-{i % 20}"}
+                 for i in range(500)}
+        with open(os.path.join(config_dir, "ssh_hosts.json"), "w") as f:
+            json.dump(hosts, f)
+        with open(os.path.join(config_dir, "settings.json"), "w") as f:
+            json.dump({"probe": False}, f)
+        yield config_dir
+
+
+class TestStartup:
+    def test_heavy_modules_deferred(self):
+        """Test that the entry point and interface import without paramiko or the dialogs."""
+        imported = import_times("src.main", "src.tui.interface")
+        assert "src.tui.interface" in imported
+        for module in DEFERRED:
+            assert module not in imported, f"{module} is imported at startup"
+
+    def test_import_budget(self):
+        """Test that imports outside the UI framework stay within budget, best of three."""
+        best = min(
+            sum(seconds for name, seconds in import_times("src.main", "src.tui.interface").items()
+                if name.split(".")[0] not in ("textual", "rich"))
+            for _ in range(3)
+        )
+        assert best < IMPORT_BUDGET, f"{best:.3f}s of imports"
+
+    def test_launch_budget(self, config_dir):
+        """Test that the host list is up within budget, without paramiko, best of three."""
+        best = None
+        for _ in range(3):
+            started = time.perf_counter()
+            completed = subprocess.run([sys.executable, "-c", LAUNCH, config_dir], cwd=ROOT,
+                                       capture_output=True, text=True, timeout=60)
+            elapsed = time.perf_counter() - started
+            assert completed.stdout.split() == ["ready"], completed.stderr[-2000:]
+            best = elapsed if best is None else min(best, elapsed)
+        assert best < LAUNCH_BUDGET, f"{best:.2f}s to the host list"
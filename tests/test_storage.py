@@ -0,0 +1,251 @@
+import os
+import json
+import subprocess
+import sys
+import pytest
+import tempfile
+import time
+from src.core.host_manager import HostManager, SSHHost
+from src.core.storage import JournalStorage, SQLiteHostMap, SQLiteStorage, iter_json_object
+
+class TestJournalStorage:
+    @pytest.fixture
+    def temp_config_dir(self):
+        """Create a temporary config directory for testing."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            yield temp_dir
+
+    def make_manager(self, config_dir, **kwargs):
+        storage = JournalStorage(
+            os.path.join(config_dir, "ssh_hosts.json"), background=False, **kwargs
+        )
+        return HostManager(config_dir=config_dir, storage=storage)
+
+    def test_mutations_append_to_journal(self, temp_config_dir):
+        """Test that mutations are appended instead of rewriting the snapshot."""
+        manager = self.make_manager(temp_config_dir)
+        manager.add_host(SSHHost(host="a.com", user="u", alias="a"))
+        manager.add_host(SSHHost(host="b.com", user="u", alias="b"))
+        manager.delete_host("a")
+
+        with open(manager.hosts_file) as f:
+            assert json.load(f) == {}
+        with open(manager.hosts_file + ".journal") as f:
+            records = [json.loads(line) for line in f]
+        assert [r["op"] for r in records] == ["put", "put", "del"]
+
+    def test_load_replays_journal(self, temp_config_dir):
+        """Test that a reload rebuilds the hosts from snapshot + journal."""
+        manager = self.make_manager(temp_config_dir)
+        manager.add_host(SSHHost(host="a.com", user="u", alias="a"))
+        manager.add_host(SSHHost(host="b.com", user="u", alias="b"))
+        manager.update_host("b", SSHHost(host="b2.com", user="u", alias="b"))
+        manager.delete_host("a")
+        manager.close()
+
+        reloaded = self.make_manager(temp_config_dir)
+        assert list(reloaded.hosts) == ["b"]
+        assert reloaded.hosts["b"].host == "b2.com"
+
+    def test_existing_json_is_initial_snapshot(self, temp_config_dir):
+        """Test that a plain ssh_hosts.json file still loads."""
+        with open(os.path.join(temp_config_dir, "ssh_hosts.json"), "w") as f:
+            json.dump({"old": {"host": "old.com", "user": "u", "alias": "old"}}, f)
+
+        manager = self.make_manager(temp_config_dir)
+        assert manager.get_host("old").host == "old.com"
+
+    def test_compaction(self, temp_config_dir):
+        """Test that the journal is folded into the snapshot past the threshold."""
+        manager = self.make_manager(temp_config_dir, compact_threshold=512)
+        for i in range(20):
+            manager.add_host(SSHHost(host=f"h{i}.com", user="u", alias=f"h{i}"))
+        journal_path = manager.hosts_file + ".journal"
+        assert os.path.getsize(journal_path) < 512
+
+        with open(manager.hosts_file) as f:
+            snapshot = json.load(f)
+        assert len(snapshot) >= 1
+
+        manager.close()
+        reloaded = self.make_manager(temp_config_dir)
+        assert len(reloaded.hosts) == 20
+
+    def test_torn_record_is_dropped(self, temp_config_dir):
+        """Test that a partially written trailing record is ignored."""
+        manager = self.make_manager(temp_config_dir)
+        manager.add_host(SSHHost(host="a.com", user="u", alias="a"))
+        manager.close()
+        journal_path = manager.hosts_file + ".journal"
+        with open(journal_path, "a") as f:
+            f.write('{"op":"put","alias":"b","ho')
+
+        reloaded = self.make_manager(temp_config_dir)
+        assert list(reloaded.hosts) == ["a"]
+        reloaded.add_host(SSHHost(host="c.com", user="u", alias="c"))
+        reloaded.close()
+        assert list(self.make_manager(temp_config_dir).hosts) == ["a", "c"]
+
+    def test_external_edit_wins_over_journal(self, temp_config_dir):
+        """Test that editing a journaled alias in ssh_hosts.json overrides the journal."""
+        path = os.path.join(temp_config_dir, "ssh_hosts.json")
+        with open(path, "w") as f:
+            json.dump({alias: {"host": f"{alias}.com", "user": "u", "alias": alias}
+                       for alias in ("a", "b", "d")}, f)
+        manager = HostManager(config_dir=temp_config_dir)
+        manager.update_host("a", SSHHost(host="a-app.com", user="u", alias="a"))
+        manager.update_host("b", SSHHost(host="b-app.com", user="u", alias="b"))
+        manager.delete_host("d")
+
+        # A script rewrites the JSON it sees, which has none of the journaled changes
+        with open(path, "w") as f:
+            json.dump({
+                "a": {"host": "a-script.com", "user": "u", "alias": "a"},
+                "b": {"host": "b.com", "user": "u", "alias": "b"},
+                "c": {"host": "c.com", "user": "u", "alias": "c"},
+                "d": {"host": "d.com", "user": "u", "alias": "d"},
+            }, f)
+
+        diff = manager.reload()
+        assert (diff.added, diff.modified, diff.removed) == ({"c"}, {"a"}, set())
+        expected = {"a": "a-script.com", "b": "b-app.com", "c": "c.com"}
+        assert {alias: host.host for alias, host in manager.hosts.items()} == expected
+
+        # Later edits of the alias apply on top of the script's version
+        manager.update_host("a", SSHHost(host="a-again.com", user="u", alias="a"))
+        manager.close()
+        expected["a"] = "a-again.com"
+        reopened = HostManager(config_dir=temp_config_dir)
+        assert {alias: host.host for alias, host in reopened.hosts.items()} == expected
+
+        lazy = HostManager(config_dir=temp_config_dir, lazy=True)
+        for page in lazy.stream_records():
+            lazy.apply_records(page)
+        assert {alias: lazy.get_host(alias).host for alias in lazy.hosts} == expected
+
+    @pytest.mark.skipif(sys.platform == "win32", reason="uses flock")
+    def test_compaction_waits_for_locked_script(self, temp_config_dir):
+        """Test that compaction neither overwrites nor races a script holding the lock."""
+        manager = HostManager(config_dir=temp_config_dir)
+        manager.add_host(SSHHost(host="a.com", user="u", alias="a"))
+        # A script takes the lock, rewrites ssh_hosts.json and keeps the lock a while
+        script = subprocess.Popen([sys.executable, "-c", """
+import fcntl, json, os, sys, time
+with open("ssh_hosts.lock", "a") as lock:
+    fcntl.flock(lock, fcntl.LOCK_EX)
+    with open("ssh_hosts.json.tmp", "w") as f:
+        json.dump({"s": {"host": "s.com", "user": "u", "alias": "s"}}, f)
+    os.replace("ssh_hosts.json.tmp", "ssh_hosts.json")
+    print("locked", flush=True)
+    time.sleep(0.5)
+"""], cwd=temp_config_dir, stdout=subprocess.PIPE, text=True)
+        try:
+            assert script.stdout.readline() == "locked\n"
+            started = time.monotonic()
+            assert not manager._storage.compact(manager.hosts)
+            # It waited for the script to let go of the lock
+            assert time.monotonic() - started >= 0.4
+        finally:
+            script.wait()
+            script.stdout.close()
+        with open(manager.hosts_file) as f:
+            assert list(json.load(f)) == ["s"]
+
+        assert manager.reload().added == {"s"}
+        assert manager._storage.compact(manager.hosts)
+        # Our own rewrite is not reported as an external change
+        assert not manager.reload()
+        with open(manager.hosts_file) as f:
+            assert sorted(json.load(f)) == ["a", "s"]
+        assert os.path.getsize(manager.hosts_file + ".journal") == 0
+        manager.close()
+
+class TestSQLiteStorage:
+    @pytest.fixture
+    def temp_config_dir(self):
+        """Create a temporary config directory with the SQLite backend selected."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with open(os.path.join(temp_dir, "settings.json"), "w") as f:
+                json.dump({"storage": "sqlite"}, f)
+            yield temp_dir
+
+    def test_crud_and_queries(self, temp_config_dir):
+        """Test that the public API works on top of SQLite."""
+        manager = HostManager(config_dir=temp_config_dir)
+        manager.add_host(SSHHost(host="a.com", user="u", alias="a", group="web"))
+        manager.add_host(SSHHost(host="b.com", user="u", alias="b", group="db"))
+        manager.add_host(SSHHost(host="c.com", user="u", alias="c", group="web"))
+        manager.update_host("a", SSHHost(host="a2.com", user="u", alias="a", group="web"))
+        manager.delete_host("b")
+
+        assert isinstance(manager.hosts, SQLiteHostMap)
+        assert manager.get_host("a").host == "a2.com"
+        assert [h.alias for h in manager.get_hosts_by_group("web")] == ["a", "c"]
+        assert manager.get_groups() == ["web"]
+        assert [h.alias for h in manager.get_all_hosts()] == ["a", "c"]
+        assert manager.get_aliases_by_hostname("c.com") == ["c"]
+        with pytest.raises(KeyError):
+            manager.get_host("b")
+        manager.close()
+
+        reloaded = HostManager(config_dir=temp_config_dir)
+        assert len(reloaded.hosts) == 2
+
+    def test_database_selects_backend(self, temp_config_dir):
+        """Test that an existing ssh_hosts.db is used without a setting."""
+        manager = HostManager(config_dir=temp_config_dir)
+        manager.add_host(SSHHost(host="a.com", user="u", alias="a"))
+        manager.close()
+        os.remove(os.path.join(temp_config_dir, "settings.json"))
+
+        reloaded = HostManager(config_dir=temp_config_dir)
+        assert isinstance(reloaded.hosts, SQLiteHostMap)
+        assert "a" in reloaded.hosts
+
+    def test_migrates_json_inventory(self, temp_config_dir):
+        """Test that ssh_hosts.json and its journal are imported once."""
+        legacy = HostManager(config_dir=temp_config_dir, storage=JournalStorage(
+            os.path.join(temp_config_dir, "ssh_hosts.json")
+        ))
+        legacy.add_host(SSHHost(host="a.com", user="u", alias="a", group="web"))
+        legacy.add_host(SSHHost(host="b.com", user="u", alias="b"))
+        legacy.close()
+
+        manager = HostManager(config_dir=temp_config_dir)
+        assert sorted(manager.hosts) == ["a", "b"]
+        assert manager.get_groups() == ["web"]
+        assert not os.path.exists(manager.hosts_file)
+        assert os.path.exists(manager.hosts_file + ".migrated")
+
+    def test_interrupted_migration_is_retried(self, temp_config_dir):
+        """Test that a database left with an empty table still imports ssh_hosts.json."""
+        # As if a start-up was cut off right after creating the schema
+        storage = SQLiteStorage(os.path.join(temp_config_dir, "ssh_hosts.db"))
+        storage.load(SSHHost)
+        storage.close()
+        with open(os.path.join(temp_config_dir, "ssh_hosts.json"), "w") as f:
+            json.dump({"a": {"host": "a.com", "user": "u", "alias": "a"}}, f)
+
+        manager = HostManager(config_dir=temp_config_dir)
+        assert list(manager.hosts) == ["a"]
+        assert os.path.exists(manager.hosts_file + ".migrated")
+
+class TestIterJsonObject:
+    def test_streams_members(self):
+        """Test that members are decoded across chunk boundaries."""
+        data = {f"h{i}": {"host": f"h{i}.com", "port": i, "tags": [1, {"x": "}"}]} for i in range(50)}
+        with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+            json.dump(data, f, indent=2)
+        try:
+            assert dict(iter_json_object(f.name, chunk_size=7)) == data
+        finally:
+            os.remove(f.name)
+
+    def test_empty_object(self):
+        """Test an empty snapshot."""
+        with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+            f.write(" {\n}\n")
+        try:
+            assert list(iter_json_object(f.name)) == []
+        finally:
+            os.remove(f.name)
@@ -0,0 +1,120 @@
+import os
+import tempfile
+
+import pytest
+
+from src.core.connection_pool import ConnectionPool
+from src.core.host_manager import SSHHost
+from src.core.sync import DirectorySync
+
+from tests.ssh_server import SSHServer
+
+HOST = SSHHost(host="files.example.com", user="deploy", alias="files")
+
+
+def write(path, data, mtime=1_600_000_000):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(data)
+    os.utime(path, (mtime, mtime))
+
+
+def tree(root):
+    """Every file under a directory with its contents, and every directory."""
+    found = {}
+    for directory, dirs, files in os.walk(root):
+        relative = os.path.relpath(directory, root).replace(os.sep, "/")
+        for name in dirs:
+            found[os.path.normpath(f"{relative}/{name}")] = None
+        for name in files:
+            with open(os.path.join(directory, name)) as f:
+                found[os.path.normpath(f"{relative}/{name}")] = f.read()
+    return found
+
+
+class TestDirectorySync:
+    @pytest.fixture
+    def setup(self):
+        with tempfile.TemporaryDirectory() as local_dir, tempfile.TemporaryDirectory() as remote_dir:
+            with SSHServer(remote_dir) as server:
+                pool = ConnectionPool(connector=server.connect)
+                source = os.path.join(local_dir, "site")
+                write(os.path.join(source, "index.html"), "home")
+                write(os.path.join(source, "css", "main.css"), "body {}")
+                write(os.path.join(source, "img", "a", "logo.svg"), "<svg/>")
+                os.makedirs(os.path.join(source, "empty"))
+                yield DirectorySync(pool), server, local_dir, remote_dir, source
+                pool.close()
+
+    def test_push_copies_only_changes(self, setup):
+        """Test that a push mirrors the tree and a second one copies nothing."""
+        sync, server, local_dir, remote_dir, source = setup
+        result = sync.push(HOST, source, "/www")
+        assert result.ok and result.copied == 3
+        assert result.plan.directories == ["", "css", "empty", "img", "img/a"]
+        assert tree(os.path.join(remote_dir, "www")) == tree(source)
+        assert os.stat(os.path.join(remote_dir, "www", "css", "main.css")).st_mtime == 1_600_000_000
+
+        result = sync.push(HOST, source, "/www")
+        assert not result.plan and result.plan.unchanged == 3
+        assert server.connections == 1
+
+        # A new size or a new modification time is a change
+        write(os.path.join(source, "index.html"), "home page")
+        write(os.path.join(source, "css", "main.css"), "body {}", mtime=1_700_000_000)
+        result = sync.push(HOST, source, "/www")
+        assert sorted(result.plan.files) == ["css/main.css", "index.html"]
+        assert tree(os.path.join(remote_dir, "www")) == tree(source)
+
+    def test_checksum(self, setup):
+        """Test that checksums catch same-size edits and skip files only touched."""
+        sync, server, local_dir, remote_dir, source = setup
+        sync.push(HOST, source, "/www")
+        write(os.path.join(remote_dir, "www", "index.html"), "HOME")
+        write(os.path.join(source, "css", "main.css"), "body {}", mtime=1_700_000_000)
+
+        result = sync.push(HOST, source, "/www", checksum=True)
+        assert result.plan.files == ["index.html"]
+        assert result.plan.unchanged == 2
+        with open(os.path.join(remote_dir, "www", "index.html")) as f:
+            assert f.read() == "home"
+
+    def test_dry_run_and_delete(self, setup):
+        """Test that a dry run only plans, and delete removes what the source lacks."""
+        sync, server, local_dir, remote_dir, source = setup
+        sync.push(HOST, source, "/www")
+        write(os.path.join(remote_dir, "www", "old", "deep", "stale.txt"), "stale")
+        write(os.path.join(remote_dir, "www", "notes.txt"), "notes")
+        # A file on one side where the other has a directory
+        os.rmdir(os.path.join(source, "empty"))
+        write(os.path.join(source, "empty"), "now a file")
+        before = tree(os.path.join(remote_dir, "www"))
+
+        plan = sync.push(HOST, source, "/www", delete=True, dry_run=True).plan
+        assert plan.files == ["empty"]
+        assert plan.extraneous_files == ["notes.txt", "old/deep/stale.txt"]
+        assert plan.extraneous_directories == ["old/deep", "empty", "old"]
+        assert tree(os.path.join(remote_dir, "www")) == before
+
+        result = sync.push(HOST, source, "/www")
+        assert "empty" in result.errors
+        assert tree(os.path.join(remote_dir, "www")) == before
+
+        result = sync.push(HOST, source, "/www", delete=True)
+        assert result.ok and result.deleted == 5
+        assert tree(os.path.join(remote_dir, "www")) == tree(source)
+
+    def test_pull(self, setup):
+        """Test that a pull mirrors a remote tree into a local directory."""
+        sync, server, local_dir, remote_dir, source = setup
+        sync.push(HOST, source, "/www")
+        copy = os.path.join(local_dir, "copy")
+        write(os.path.join(copy, "local-only.txt"), "mine")
+
+        result = sync.pull(HOST, "/www", copy, delete=True)
+        assert result.ok and result.copied == 3 and result.deleted == 1
+        assert tree(copy) == tree(source)
+        assert os.stat(os.path.join(copy, "img", "a", "logo.svg")).st_mtime == 1_600_000_000
+
+        with pytest.raises(FileNotFoundError):
+            sync.pull(HOST, "/missing", copy)
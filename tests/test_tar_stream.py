@@ -0,0 +1,143 @@
+import os
+import tempfile
+import threading
+
+import pytest
+
+from src.core.connection_pool import ConnectionPool
+from src.core.host_manager import SSHHost
+from src.core.sync import DirectorySync
+from src.core.tar_stream import STDERR_LIMIT, TarStream, TarUnavailable
+
+from tests.ssh_server import SSHServer
+
+HOST = SSHHost(host="files.example.com", user="deploy", alias="files")
+
+
+def make_tree(root, count=40, size=200):
+    paths = []
+    for i in range(count):
+        relative = f"pkg{i % 4}/lib/file{i}.js"
+        path = os.path.join(root, *relative.split("/"))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(f"module.exports = {i};\n" * (size // 24))
+        os.utime(path, (1_600_000_000 + i, 1_600_000_000 + i))
+        paths.append(relative)
+    return paths
+
+
+def read(root, relative):
+    with open(os.path.join(root, *relative.split("/"))) as f:
+        return f.read()
+
+
+@pytest.fixture
+def dirs():
+    with tempfile.TemporaryDirectory() as local_dir, tempfile.TemporaryDirectory() as remote_dir:
+        yield local_dir, remote_dir
+
+
+class TestTarStream:
+    def test_round_trip(self, dirs):
+        """Test that files go up and come back through tar with their mtimes."""
+        local_dir, remote_dir = dirs
+        source = os.path.join(local_dir, "source")
+        paths = make_tree(source)
+        os.mkdir(os.path.join(remote_dir, "app"))
+        with SSHServer(remote_dir) as server:
+            pool = ConnectionPool(connector=server.connect)
+            tar = TarStream(pool)
+            progress = []
+            result = tar.upload(HOST, source, "app", paths, progress=lambda d, t: progress.append((d, t)))
+            assert result.files == len(paths) and not result.errors
+            assert 0 < result.wire_bytes < result.bytes
+            assert progress[-1] == (result.bytes, result.bytes)
+            for relative in paths:
+                assert read(os.path.join(remote_dir, "app"), relative) == read(source, relative)
+            assert os.stat(os.path.join(remote_dir, "app", "pkg1", "lib", "file5.js")).st_mtime == 1_600_000_005
+
+            copy = os.path.join(local_dir, "copy")
+            result = tar.download(HOST, "app", copy, paths + ["pkg0/missing.js"])
+            assert result.files == len(paths)
+            assert list(result.errors) == ["pkg0/missing.js"]
+            for relative in paths:
+                assert read(copy, relative) == read(source, relative)
+            assert os.stat(os.path.join(copy, "pkg1", "lib", "file5.js")).st_mtime == 1_600_000_005
+            assert server.connections == 1
+            pool.close()
+
+    def test_no_commands(self, dirs):
+        """Test that a host refusing commands is reported as having no tar."""
+        local_dir, remote_dir = dirs
+        paths = make_tree(local_dir, count=2)
+        with SSHServer(remote_dir, commands=False) as server:
+            pool = ConnectionPool(connector=server.connect)
+            with pytest.raises(TarUnavailable):
+                TarStream(pool).upload(HOST, local_dir, ".", paths)
+            pool.close()
+
+    def test_lots_of_stderr(self, dirs):
+        """Test that a download with more stderr than the channel window holds does not stall."""
+        local_dir, remote_dir = dirs
+        paths = make_tree(os.path.join(remote_dir, "app"), count=2)
+        # Each missing file costs a line of stderr, several megabytes in all
+        missing = [f"missing/{i:06d}/" + "x" * 40 for i in range(50000)]
+        with SSHServer(remote_dir) as server:
+            pool = ConnectionPool(connector=server.connect)
+            outcome = []
+            download = threading.Thread(target=lambda: outcome.append(
+                TarStream(pool).download(HOST, "app", os.path.join(local_dir, "copy"), paths + missing)
+            ), daemon=True)
+            download.start()
+            download.join(60)
+            assert not download.is_alive()
+            result, = outcome
+            assert result.files == 2
+            assert sorted(result.errors) == sorted(missing)
+            message = result.errors[missing[-1]]
+            assert missing[-1] in message and len(message) <= STDERR_LIMIT
+            pool.close()
+
+
+class TestSyncMethod:
+    @pytest.mark.parametrize("commands", [True, False])
+    def test_auto_streams_small_files(self, dirs, commands):
+        """Test that many small files go as a tar stream, or over SFTP without tar."""
+        local_dir, remote_dir = dirs
+        source = os.path.join(local_dir, "source")
+        paths = make_tree(source)
+        with open(os.path.join(source, "bundle.bin"), "wb") as f:
+            f.write(os.urandom(2 * 1024 * 1024))
+        with SSHServer(remote_dir, commands=commands) as server:
+            pool = ConnectionPool(connector=server.connect)
+            sync = DirectorySync(pool)
+            plan = sync.push(HOST, source, "app", dry_run=True).plan
+            assert sorted(plan.streamed) == sorted(paths)
+
+            result = sync.push(HOST, source, "app")
+            assert result.ok and result.copied == len(paths) + 1
+            assert result.streamed == (len(paths) if commands else 0)
+            assert not sync.push(HOST, source, "app").plan
+
+            result = sync.pull(HOST, "app", os.path.join(local_dir, "copy"))
+            assert result.ok and result.streamed == (len(paths) if commands else 0)
+            for relative in paths + ["bundle.bin"]:
+                with open(os.path.join(source, relative), "rb") as a, \
+                        open(os.path.join(local_dir, "copy", relative), "rb") as b:
+                    assert a.read() == b.read()
+            pool.close()
+
+    def test_forced_methods(self, dirs):
+        """Test that the method argument overrides the automatic choice."""
+        local_dir, remote_dir = dirs
+        paths = make_tree(local_dir, count=3)
+        with SSHServer(remote_dir) as server:
+            pool = ConnectionPool(connector=server.connect)
+            sync = DirectorySync(pool)
+            assert sync.push(HOST, local_dir, "app", dry_run=True).plan.streamed == []
+            assert sorted(sync.push(HOST, local_dir, "app", dry_run=True, method="tar").plan.streamed) == sorted(paths)
+            assert sync.push(HOST, local_dir, "app", dry_run=True, method="sftp").plan.streamed == []
+            with pytest.raises(ValueError):
+                sync.push(HOST, local_dir, "app", method="rsync")
+            pool.close()
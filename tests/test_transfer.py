@@ -0,0 +1,232 @@
+import hashlib
+import json
+import os
+import tempfile
+
+import pytest
+
+from src.core.connection_pool import ConnectionPool
+from src.core.host_manager import SSHHost
+from src.core.ssh_client import SSHClient
+from src.core.transfer import PART_SUFFIX, STATE_SUFFIX, SFTPTransfer, replace_remote
+from tests.ssh_server import SSHServer
+
+HOST = SSHHost(host="files.example.com", user="deploy", alias="files")
+
+
+class Interrupted(Exception):
+    pass
+
+
+def stop_after(limit):
+    """A progress callback that interrupts the transfer once ``limit`` bytes are done."""
+    def progress(done, total):
+        if done >= limit:
+            raise Interrupted()
+    return progress
+
+
+class TestSFTPTransfer:
+    @pytest.fixture
+    def setup(self):
+        with tempfile.TemporaryDirectory() as local_dir, tempfile.TemporaryDirectory() as remote_dir:
+            with SSHServer(remote_dir) as server:
+                pool = ConnectionPool(connector=server.connect)
+                data = os.urandom(3 * 1024 * 1024 + 123)
+                source = os.path.join(local_dir, "source.bin")
+                with open(source, "wb") as f:
+                    f.write(data)
+                os.utime(source, (1_600_000_000, 1_600_000_000))
+                yield pool, server, local_dir, remote_dir, source, data
+                pool.close()
+
+    def test_round_trip(self, setup):
+        """Test that a file survives an upload and a download with its mtime and no leftovers."""
+        pool, server, local_dir, remote_dir, source, data = setup
+        transfer = SFTPTransfer(pool)
+        progress = []
+        result = transfer.upload(HOST, source, "/target.bin", progress=lambda d, t: progress.append((d, t)))
+        assert result.transferred == len(data) and result.resumed_from == 0
+        assert progress[-1] == (len(data), len(data))
+        with open(os.path.join(remote_dir, "target.bin"), "rb") as f:
+            assert f.read() == data
+        assert os.listdir(remote_dir) == ["target.bin"]
+        assert os.stat(os.path.join(remote_dir, "target.bin")).st_mtime == 1_600_000_000
+
+        copy = os.path.join(local_dir, "copy.bin")
+        transfer.download(HOST, "/target.bin", copy)
+        with open(copy, "rb") as f:
+            assert f.read() == data
+        assert sorted(os.listdir(local_dir)) == ["copy.bin", "source.bin"]
+
+        # One connection and one SFTP session served both transfers
+        assert server.connections == 1
+        with pool.sftp(HOST) as first:
+            pass
+        with pool.sftp(HOST) as second:
+            assert second is first
+
+    def test_parallel_ranges(self, setup):
+        """Test that a large file is split into ranges over several channels."""
+        pool, server, local_dir, remote_dir, source, data = setup
+        transfer = SFTPTransfer(pool, parallel=3, split_threshold=1024 * 1024)
+        transfer.upload(HOST, source, "/target.bin")
+        copy = os.path.join(local_dir, "copy.bin")
+        transfer.download(HOST, "/target.bin", copy)
+        with open(copy, "rb") as f:
+            assert f.read() == data
+        assert server.connections == 1
+
+    def test_resume_after_interruption(self, setup):
+        """Test that an interrupted transfer continues from the saved offsets."""
+        pool, server, local_dir, remote_dir, source, data = setup
+        transfer = SFTPTransfer(pool, parallel=2, split_threshold=1024 * 1024)
+        with pytest.raises(Interrupted):
+            transfer.upload(HOST, source, "/target.bin", progress=stop_after(len(data) // 2))
+        assert sorted(os.listdir(remote_dir)) == ["target.bin" + PART_SUFFIX, "target.bin" + STATE_SUFFIX]
+
+        result = transfer.upload(HOST, source, "/target.bin")
+        assert result.resumed_from >= len(data) // 2
+        assert result.transferred == len(data) - result.resumed_from
+        with open(os.path.join(remote_dir, "target.bin"), "rb") as f:
+            assert f.read() == data
+        assert os.listdir(remote_dir) == ["target.bin"]
+
+    def test_no_resume_from_mismatched_data(self, setup):
+        """Test that a partial copy that no longer matches is copied again."""
+        pool, server, local_dir, remote_dir, source, data = setup
+        transfer = SFTPTransfer(pool)
+        with pytest.raises(Interrupted):
+            transfer.upload(HOST, source, "/target.bin", progress=stop_after(len(data) // 2))
+        with open(os.path.join(remote_dir, "target.bin" + STATE_SUFFIX)) as f:
+            (_, _, done), = json.load(f)["ranges"]
+        with open(os.path.join(remote_dir, "target.bin" + PART_SUFFIX), "r+b") as f:
+            f.seek(done - 10)
+            f.write(b"garbage")
+        result = transfer.upload(HOST, source, "/target.bin")
+        assert result.resumed_from == 0
+
+        # A changed source starts over too
+        with pytest.raises(Interrupted):
+            transfer.upload(HOST, source, "/target.bin", progress=stop_after(len(data) // 2))
+        os.utime(source, (1_700_000_000, 1_700_000_000))
+        result = transfer.upload(HOST, source, "/target.bin")
+        assert result.resumed_from == 0
+        with open(os.path.join(remote_dir, "target.bin"), "rb") as f:
+            assert f.read() == data
+
+    def test_state_without_partial_copy(self, setup):
+        """Test that a resume state whose partial copy is gone is dropped instead of failing."""
+        pool, server, local_dir, remote_dir, source, data = setup
+        transfer = SFTPTransfer(pool, parallel=2, split_threshold=1024 * 1024)
+        for parallel in (2, 1):
+            transfer.parallel = parallel
+            with pytest.raises(Interrupted):
+                transfer.upload(HOST, source, "/target.bin", progress=stop_after(len(data) // 2))
+            os.remove(os.path.join(remote_dir, "target.bin" + PART_SUFFIX))
+            result = transfer.upload(HOST, source, "/target.bin")
+            assert result.resumed_from == 0
+            with open(os.path.join(remote_dir, "target.bin"), "rb") as f:
+                assert f.read() == data
+            assert os.listdir(remote_dir) == ["target.bin"]
+
+    def test_ssh_client_wrappers(self, setup):
+        """Test that scp_upload and scp_download go through the transfer engine."""
+        pool, server, local_dir, remote_dir, source, data = setup
+        client = SSHClient(pool)
+        assert client.scp_upload(source, "/target.bin") == (False, "Not connected")
+        assert client.connect(HOST)[0]
+        assert client.scp_upload(source, "/target.bin") == (True, "File uploaded successfully")
+        copy = os.path.join(local_dir, "copy.bin")
+        assert client.scp_download("/target.bin", copy) == (True, "File downloaded successfully")
+        with open(copy, "rb") as f:
+            assert f.read() == data
+        assert not client.scp_download("/missing.bin", copy)[0]
+
+
+class TestRemoteCopy:
+    @pytest.fixture
+    def setup(self):
+        """Two hosts with their own roots and a file on the first."""
+        with tempfile.TemporaryDirectory() as source_dir, tempfile.TemporaryDirectory() as destination_dir:
+            with SSHServer(source_dir) as source_server, SSHServer(destination_dir, commands=False) as other:
+                servers = {"db1": source_server, "db2": other}
+                pool = ConnectionPool(
+                    connector=lambda host, timeout, keepalive: servers[host.host].connect(host, timeout, keepalive)
+                )
+                data = os.urandom(3 * 1024 * 1024 + 123)
+                with open(os.path.join(source_dir, "dump.sql"), "wb") as f:
+                    f.write(data)
+                os.utime(os.path.join(source_dir, "dump.sql"), (1_600_000_000, 1_600_000_000))
+                hosts = [SSHHost(host=name, user="deploy", alias=name) for name in servers]
+                yield pool, hosts, destination_dir, data
+                pool.close()
+
+    @pytest.mark.parametrize("parallel", [1, 3])
+    def test_copy_between_hosts(self, setup, parallel):
+        """Test that a file goes from host to host, verified, with both legs timed."""
+        pool, (source, destination), destination_dir, data = setup
+        transfer = SFTPTransfer(pool, parallel=parallel, split_threshold=1024 * 1024)
+        result = transfer.copy(source, "/dump.sql", destination, "/copy.sql", verify=True)
+        assert result.transferred == len(data)
+        assert result.checksum == hashlib.sha256(data).hexdigest()
+        assert result.read_time > 0 and result.write_time > 0
+        assert result.read_throughput >= result.throughput
+        with open(os.path.join(destination_dir, "copy.sql"), "rb") as f:
+            assert f.read() == data
+        assert os.listdir(destination_dir) == ["copy.sql"]
+        assert os.stat(os.path.join(destination_dir, "copy.sql")).st_mtime == 1_600_000_000
+
+    def test_resume_and_mismatch(self, setup):
+        """Test that an interrupted copy resumes, and a bad copy never replaces the destination."""
+        pool, (source, destination), destination_dir, data = setup
+        transfer = SFTPTransfer(pool)
+        with pytest.raises(Interrupted):
+            transfer.copy(source, "/dump.sql", destination, "/copy.sql", progress=stop_after(len(data) // 2))
+        result = transfer.copy(source, "/dump.sql", destination, "/copy.sql", verify=True)
+        assert result.resumed_from >= len(data) // 2
+        with open(os.path.join(destination_dir, "copy.sql"), "rb") as f:
+            assert f.read() == data
+
+        transfer.checksum = lambda host, path: "0" * 64 if host is destination else SFTPTransfer.checksum(
+            transfer, host, path)
+        with pytest.raises(IOError):
+            transfer.copy(source, "/dump.sql", destination, "/copy.sql", verify=True, resume=False)
+        assert os.listdir(destination_dir) == ["copy.sql"]
+
+        client = SSHClient(pool)
+        assert client.connect(source)[0]
+        assert client.scp_copy("/dump.sql", destination, "/other.sql") == (True, "File copied to db2 successfully")
+        assert client.scp_copy("/missing.sql", destination, "/copy.sql")[0] is False
+
+
+class TestReplaceRemote:
+    @pytest.mark.parametrize("posix_rename", [True, False])
+    def test_replaces_destination(self, posix_rename):
+        """Test that a file replaces another, with or without the posix-rename extension."""
+        with tempfile.TemporaryDirectory() as remote_dir:
+            for name in ("new", "old"):
+                with open(os.path.join(remote_dir, name), "w") as f:
+                    f.write(name)
+            with SSHServer(remote_dir, posix_rename=posix_rename) as server:
+                pool = ConnectionPool(connector=server.connect)
+                with pool.sftp(HOST) as sftp:
+                    replace_remote(sftp, "/new", "/old")
+                    replace_remote(sftp, "/old", "/other")
+                pool.close()
+            assert os.listdir(remote_dir) == ["other"]
+            with open(os.path.join(remote_dir, "other")) as f:
+                assert f.read() == "new"
+
+    def test_failure_keeps_destination(self):
+        """Test that a failed rename is raised without falling back to removing the destination."""
+        with tempfile.TemporaryDirectory() as remote_dir:
+            with open(os.path.join(remote_dir, "old"), "w") as f:
+                f.write("old")
+            with SSHServer(remote_dir) as server:
+                pool = ConnectionPool(connector=server.connect)
+                with pool.sftp(HOST) as sftp:
+                    with pytest.raises(FileNotFoundError):
+                        replace_remote(sftp, "/missing", "/old")
+                pool.close()
+            assert os.listdir(remote_dir) == ["old"]
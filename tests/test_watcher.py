@@ -0,0 +1,76 @@
+import os
+import time
+import pytest
+import tempfile
+from src.core.host_manager import HostManager, SSHHost
+from src.core.watcher import FileWatcher, InventoryLock
+
+class TestFileWatcher:
+    @pytest.fixture
+    def temp_config_dir(self):
+        """Create a temporary config directory for testing."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            yield temp_dir
+
+    def test_touch_is_not_a_change(self, temp_config_dir):
+        """Test that updating only the mtime is not reported as a change."""
+        path = os.path.join(temp_config_dir, "hosts.json")
+        with open(path, "w") as f:
+            f.write("{}")
+        watcher = FileWatcher([path])
+        watcher.mark(hash_contents=True)
+
+        later = time.time() + 10
+        os.utime(path, (later, later))
+        assert not watcher.changed()
+
+        with open(path, "w") as f:
+            f.write('{"a": {}}')
+        assert watcher.changed()
+        assert not watcher.changed()
+
+    def test_reload_reports_external_changes(self, temp_config_dir):
+        """Test that reload returns what another writer added, changed and removed."""
+        manager = HostManager(config_dir=temp_config_dir)
+        manager.add_host(SSHHost(host="a.com", user="u", alias="a"))
+        manager.add_host(SSHHost(host="b.com", user="u", alias="b"))
+        assert not manager.reload()
+
+        other = HostManager(config_dir=temp_config_dir)
+        other.add_host(SSHHost(host="c.com", user="u", alias="c"))
+        other.update_host("a", SSHHost(host="a2.com", user="u", alias="a"))
+        other.delete_host("b")
+        other.close()
+
+        diff = manager.reload()
+        assert diff.added == {"c"}
+        assert diff.modified == {"a"}
+        assert diff.removed == {"b"}
+        assert manager.get_host("a").host == "a2.com"
+        assert manager.get_hosts_by_hostname("a2.com")[0].alias == "a"
+        assert not manager.reload()
+
+    def test_concurrent_writers_do_not_clobber(self, temp_config_dir):
+        """Test that a write merges changes another writer made in the meantime."""
+        first = HostManager(config_dir=temp_config_dir)
+        second = HostManager(config_dir=temp_config_dir)
+        first.add_host(SSHHost(host="a.com", user="u", alias="a"))
+        second.add_host(SSHHost(host="b.com", user="u", alias="b"))
+
+        assert set(second.hosts) == {"a", "b"}
+        assert second.reload().added == {"a"}
+        first.close()
+        second.close()
+
+        reopened = HostManager(config_dir=temp_config_dir)
+        assert set(reopened.hosts) == {"a", "b"}
+
+    def test_inventory_lock_is_reentrant(self, temp_config_dir):
+        """Test that nested acquisitions in one process do not deadlock."""
+        lock = InventoryLock(os.path.join(temp_config_dir, "ssh_hosts.lock"))
+        with lock.exclusive():
+            with lock.shared():
+                with lock.exclusive():
+                    pass
+        with lock.exclusive():
+            pass